@@ -402,6 +402,48 @@ if cythonize is not None:
                           "src/DTAIDistanceC/DTAIDistanceC"],
             extra_compile_args=[],
             extra_link_args=[]))
+    # Single precision (float32) variants, compiled from the same sources with seq_t=float
+    extensions.append(
+        Extension(
+            "dtaidistance.dtw_cc_f32",
+            ["src/dtaidistance/dtw_cc_f32.pyx",
+             "src/DTAIDistanceC/DTAIDistanceC/dd_dtw_f32.c",
+             "src/DTAIDistanceC/DTAIDistanceC/dd_ed_f32.c",
+             "src/DTAIDistanceC/DTAIDistanceC/dd_globals_f32.c"
+             ],
+            depends=["src/dtaidistance/dtw_cc.pyx",
+                     "src/dtaidistance/dtw_cc.pxd",
+                     "src/DTAIDistanceC/DTAIDistanceC/dd_dtw.c",
+                     "src/DTAIDistanceC/DTAIDistanceC/dd_ed.c",
+                     "src/DTAIDistanceC/DTAIDistanceC/dd_globals.c",
+                     "src/DTAIDistanceC/DTAIDistanceC/dd_globals.h",
+                     "src/DTAIDistanceC/DTAIDistanceC/dd_ed.h"],
+            include_dirs=[str(dtaidistancec_path),
+                          "src/DTAIDistanceC/DTAIDistanceC"],
+            define_macros=[("DTAI_SEQ_T_FLOAT", None)],
+            extra_compile_args=[],
+            extra_link_args=[]))
+    extensions.append(
+        Extension(
+            "dtaidistance.dtw_cc_omp_f32",
+            ["src/dtaidistance/dtw_cc_omp_f32.pyx",
+             "src/DTAIDistanceC/DTAIDistanceC/dd_dtw_openmp_f32.c",
+             "src/DTAIDistanceC/DTAIDistanceC/dd_dtw_f32.c",
+             "src/DTAIDistanceC/DTAIDistanceC/dd_ed_f32.c",
+             "src/DTAIDistanceC/DTAIDistanceC/dd_globals_f32.c"],
+            depends=["src/dtaidistance/dtw_cc_omp.pxi",
+                     "src/DTAIDistanceC/DTAIDistanceC/dd_dtw_openmp.c",
+                     "src/DTAIDistanceC/DTAIDistanceC/dd_dtw.c",
+                     "src/DTAIDistanceC/DTAIDistanceC/dd_ed.c",
+                     "src/DTAIDistanceC/DTAIDistanceC/dd_globals.c",
+                     "src/DTAIDistanceC/DTAIDistanceC/dd_globals.h",
+                     "src/DTAIDistanceC/DTAIDistanceC/dd_dtw.h",
+                     "src/DTAIDistanceC/DTAIDistanceC/dd_ed.h"],
+            include_dirs=[str(dtaidistancec_path),
+                          "src/DTAIDistanceC/DTAIDistanceC"],
+            define_macros=[("DTAI_SEQ_T_FLOAT", None)],
+            extra_compile_args=[],
+            extra_link_args=[]))
     extensions.append(
         Extension(
             "dtaidistance.loco_cc",
@@ -32,7 +32,14 @@ DTWSettings dtw_settings_default(void) {
         .psi_2e = 0,
         .use_pruning = false,
         .inner_dist = 0,  // 0: squared euclidean, 1: euclidean
-        .window_type = 0
+        .window_type = 0,
+        .use_lb = false,
+        .use_eapruning = false,
+        .itakura_slope = 0,
+        .band = NULL,
+        .band_length = 0,
+        .control = NULL,
+        .schedule = 0
     };
     return s;
 }
@@ -55,6 +62,109 @@ void dtw_settings_set_psi(idx_t psi, DTWSettings *settings) {
     settings->psi_2e = psi;
 }
 
+/* True if the settings restrict the warping paths with an Itakura parallelogram or a custom band. */
+bool dtw_settings_has_band(DTWSettings *settings) {
+    return settings->itakura_slope > 0 || settings->band != NULL;
+}
+
+/* Columns [cb, ce) of row ri that are within the Itakura parallelogram, without connecting rows. */
+void dtw_itakura_row(idx_t ri, idx_t l1, idx_t l2, seq_t slope, idx_t *cb, idx_t *ce) {
+    if (l1 <= 1 || l2 <= 1) {
+        *cb = 0;
+        *ce = l2;
+        return;
+    }
+    if (slope < 1) {
+        slope = 1;
+    }
+    double a = (double)(l2 - 1) / (double)(l1 - 1);  // slope of the diagonal
+    double diag = ri * a;
+    double lower = MAX(diag / slope, (l2 - 1) - slope * a * (l1 - 1 - ri));
+    double upper = MIN(diag * slope, (l2 - 1) - a * (l1 - 1 - ri) / slope);
+    // Always include the diagonal such that no row is empty
+    lower = MIN(lower, floor(diag));
+    upper = MAX(upper, ceil(diag));
+    *cb = MAX(0, (idx_t)ceil(lower - 1e-9));
+    *ce = MIN(l2, (idx_t)floor(upper + 1e-9) + 1);
+}
+
+/*!
+ Columns that can be used in row ri of the warping paths matrix given the Itakura
+ parallelogram and custom band in the settings.
+ 
+ @param ri Row index
+ @param l1 Length of first series (number of rows)
+ @param l2 Length of second series (number of columns)
+ @param settings Settings object
+ @param cb Stores the first column
+ @param ce Stores the column after the last column
+ */
+void dtw_settings_band_row(idx_t ri, idx_t l1, idx_t l2, DTWSettings *settings, idx_t *cb, idx_t *ce) {
+    idx_t b, e, bn, en;
+    *cb = 0;
+    *ce = l2;
+    if (settings->itakura_slope > 0) {
+        dtw_itakura_row(ri, l1, l2, settings->itakura_slope, &b, &e);
+        if (ri + 1 < l1) {
+            // Connect to the next row (the diagonal can be steeper than one)
+            dtw_itakura_row(ri + 1, l1, l2, settings->itakura_slope, &bn, &en);
+            e = MAX(e, bn);
+        }
+        *cb = b;
+        *ce = e;
+    }
+    if (settings->band != NULL && ri < settings->band_length) {
+        *cb = MAX(*cb, settings->band[2 * ri]);
+        *ce = MIN(*ce, settings->band[2 * ri + 1]);
+    }
+}
+
+/*!
+ Check whether the path used by the Euclidean distance (see ub_euclidean) is within the
+ Itakura parallelogram and custom band. Only then it is an upper bound that can be
+ used for pruning (use_pruning).
+ */
+bool dtw_settings_band_has_euclidean(idx_t l1, idx_t l2, DTWSettings *settings) {
+    idx_t ri, cb, ce;
+    if (!dtw_settings_has_band(settings)) {
+        return true;
+    }
+    for (ri=0; ri<l1; ri++) {
+        dtw_settings_band_row(ri, l1, l2, settings, &cb, &ce);
+        if (cb > MIN(ri, l2 - 1) || ce <= MIN(ri, l2 - 1)) {
+            return false;
+        }
+    }
+    // The last element of s1 is compared to the remaining elements of s2
+    return ce == l2;
+}
+
+/*!
+ Smallest window (see DTWSettings) that includes all cells of the Itakura parallelogram and
+ custom band. Used to reduce the width of the compact warping paths matrix.
+ 
+ @return Window, or zero if no band is used
+ */
+idx_t dtw_settings_band_window(idx_t l1, idx_t l2, DTWSettings *settings) {
+    idx_t ri, cb, ce;
+    idx_t window = 1;
+    idx_t dl = (l1 > l2) ? l1 - l2 : 0;
+    idx_t dc = (l2 > l1) ? l2 - l1 : 0;
+    if (!dtw_settings_has_band(settings)) {
+        return 0;
+    }
+    for (ri=0; ri<l1; ri++) {
+        dtw_settings_band_row(ri, l1, l2, settings, &cb, &ce);
+        if (cb >= ce) {
+            continue;
+        }
+        // Window includes columns ri - dl - window + 1 <= ci < ri + dc + window
+        window = MAX(window, ri - dl - cb + 1);
+        window = MAX(window, ce - ri - dc);
+    }
+    return window;
+}
+
 void dtw_settings_print(DTWSettings *settings) {
     printf("DTWSettings {\n");
     printf("  window = %zu\n", settings->window);
@@ -67,12 +177,193 @@ void dtw_settings_print(DTWSettings *settings) {
     printf("  use_pruning = %d\n", settings->use_pruning);
     printf("  inner_dist = %d\n", settings->inner_dist);
     printf("  window_type = %d\n", settings->window_type);
+    printf("  use_lb = %d\n", settings->use_lb);
+    printf("  use_eapruning = %d\n", settings->use_eapruning);
+    printf("  itakura_slope = %f\n", settings->itakura_slope);
+    printf("  band_length = %zu\n", settings->band_length);
+    printf("  schedule = %d\n", settings->schedule);
     printf("}\n");
 }
 
+// MARK: Control
+
+DTWControl dtw_control_default(void) {
+    DTWControl c = {
+        .done = 0,
+        .total = 0,
+        .stop = 0,
+        .callback = NULL,
+        .callback_data = NULL
+    };
+    return c;
+}
+
+/*!
+ Whether the computation should stop.
+ */
+bool dtw_control_stopped(DTWControl *control) {
+    return control != NULL && control->stop != 0;
+}
+
+/*!
+ Call the callback function and stop if it returns a non-zero value.
+ Should only be called by the thread that started the computation.
+ */
+void dtw_control_callback(DTWControl *control) {
+    int stop;
+    if (control == NULL || control->callback == NULL || control->stop != 0) {
+        return;
+    }
+    stop = control->callback(control);
+    if (stop != 0) {
+        control->stop = stop;
+    }
+}
+
+/*!
+ Register that nb distances are computed (single thread).
+ 
+ @see dtw_control_update_parallel for the parallel version.
+ */
+void dtw_control_update(DTWControl *control, idx_t nb) {
+    if (control == NULL) {
+        return;
+    }
+    control->done += nb;
+    dtw_control_callback(control);
+}
+
+
+// MARK: Stats
+
+DTWStats dtw_stats = {0, 0, 0, 0, 0, 0};
+bool dtw_stats_enabled = false;
+
+DTWStats dtw_stats_default(void) {
+    DTWStats s = {
+        .pairs = 0,
+        .cells = 0,
+        .rows_abandoned = 0,
+        .pairs_abandoned = 0,
+        .pairs_pruned = 0,
+        .lbs = 0
+    };
+    return s;
+}
+
+/*!
+ Start or stop counting the work done by the DTW kernels in the global dtw_stats.
+ */
+void dtw_stats_enable(bool enable) {
+    dtw_stats_enabled = enable;
+}
+
+void dtw_stats_reset(void) {
+    dtw_stats = dtw_stats_default();
+}
+
+/*!
+ Add the counters of one computation to the global dtw_stats.
+
+ The kernels count in a local struct and merge at the end, such that threads
+ only synchronize once per computation. Does nothing if the stats are not enabled.
+ */
+/* Atomic add, also when compiled without OpenMP (e.g. for the threads of Python). */
+static void dtw_stats_atomic_add(idx_t *counter, idx_t value) {
+#if defined(_OPENMP)
+    #pragma omp atomic
+    *counter += value;
+#elif defined(__GNUC__) || defined(__clang__)
+    __atomic_fetch_add(counter, value, __ATOMIC_RELAXED);
+#else
+    *counter += value;
+#endif
+}
+
+void dtw_stats_merge(DTWStats *stats) {
+    if (!dtw_stats_enabled) {
+        return;
+    }
+    dtw_stats_atomic_add(&dtw_stats.pairs, stats->pairs);
+    dtw_stats_atomic_add(&dtw_stats.cells, stats->cells);
+    dtw_stats_atomic_add(&dtw_stats.rows_abandoned, stats->rows_abandoned);
+    dtw_stats_atomic_add(&dtw_stats.pairs_abandoned, stats->pairs_abandoned);
+    dtw_stats_atomic_add(&dtw_stats.pairs_pruned, stats->pairs_pruned);
+    dtw_stats_atomic_add(&dtw_stats.lbs, stats->lbs);
+}
+
+/* Count a lower bound computation and whether it pruned a pair. */
+static void dtw_stats_merge_lb(bool pruned) {
+    if (!dtw_stats_enabled) {
+        return;
+    }
+    DTWStats stats = dtw_stats_default();
+    stats.lbs = 1;
+    stats.pairs_pruned = pruned;
+    dtw_stats_merge(&stats);
+}
+
+
 // MARK: DTW
 
 
+/* Copy a strided series to a new contiguous array (the caller frees it). */
+static seq_t *dtw_gather(seq_t *s, idx_t l, idx_t stride, int ndim, idx_t dstride) {
+    seq_t *out = (seq_t *)malloc(sizeof(seq_t) * MAX(1, l * ndim));
+    if (!out) {
+        printf("Error: dtw_gather - Cannot allocate memory (size=%zu)\n", l * ndim);
+        return NULL;
+    }
+    for (idx_t i=0; i<l; i++) {
+        for (int d=0; d<ndim; d++) {
+            out[i * ndim + d] = s[i * stride + d * dstride];
+        }
+    }
+    return out;
+}
+
+
+/* Euclidean upper bound for strided n-dimensional series, see euclidean_distance_ndim. */
+static seq_t ub_euclidean_ndim_strided(seq_t *s1, idx_t l1, idx_t stride1, idx_t dstride1,
+                                       seq_t *s2, idx_t l2, idx_t stride2, idx_t dstride2, int ndim) {
+    seq_t ub = 0;
+    seq_t d;
+    // If the two series differ in length, the last element of the shortest series
+    // is compared to the remaining elements in the longer series
+    for (idx_t i=0; i<MAX(l1, l2); i++) {
+        idx_t i1 = MIN(i, l1 - 1) * stride1;
+        idx_t i2 = MIN(i, l2 - 1) * stride2;
+        d = 0;
+        for (int k=0; k<ndim; k++) {
+            d += SEDIST(s1[i1 + k * dstride1], s2[i2 + k * dstride2]);
+        }
+        ub += d;
+    }
+    return sqrt(ub);
+}
+
+
+/* Euclidean upper bound for strided series, see euclidean_distance. */
+static seq_t ub_euclidean_strided(seq_t *s1, idx_t l1, idx_t stride1,
+                                  seq_t *s2, idx_t l2, idx_t stride2) {
+    idx_t n = MIN(l1, l2);
+    seq_t ub = 0;
+    for (idx_t i=0; i<n; i++) {
+        ub += SEDIST(s1[i * stride1], s2[i * stride2]);
+    }
+    if (l1 > l2) {
+        for (idx_t i=n; i<l1; i++) {
+            ub += SEDIST(s1[i * stride1], s2[(n - 1) * stride2]);
+        }
+    } else if (l1 < l2) {
+        for (idx_t i=n; i<l2; i++) {
+            ub += SEDIST(s1[(n - 1) * stride1], s2[i * stride2]);
+        }
+    }
+    return sqrt(ub);
+}
+
+
 /**
 Compute the DTW between two series.
 Use the Squared Euclidean inner distance.
@@ -86,6 +377,47 @@ Use the Squared Euclidean inner distance.
 seq_t dtw_distance(seq_t *s1, idx_t l1,
                       seq_t *s2, idx_t l2, 
                       DTWSettings *settings) {
+    return dtw_distance_strided(s1, l1, 1, s2, l2, 1, settings);
+}
+
+
+/**
+Compute the DTW between two series that are not contiguous in memory.
+
+Element i of the first series is s1[i * stride1]. For example, a column of
+a C-contiguous matrix with n columns has stride n. The series are not copied,
+except if the lower bounds (use_lb, use_eapruning) or the Euclidean inner
+distance are used.
+
+@param s1 First sequence
+@param l1 Length of first sequence
+@param stride1 Distance (in number of values) between two elements of s1
+@param s2 Second sequence
+@param l2 Length of second sequence
+@param stride2 Distance (in number of values) between two elements of s2
+@param settings A DTWSettings struct with options for the DTW algorithm.
+
+@see dtw_distance
+*/
+seq_t dtw_distance_strided(seq_t *s1, idx_t l1, idx_t stride1,
+                           seq_t *s2, idx_t l2, idx_t stride2,
+                           DTWSettings *settings) {
+    if ((stride1 != 1 || stride2 != 1) &&
+        (settings->use_lb || settings->use_eapruning || settings->inner_dist == 1)) {
+        // These options rely on methods for contiguous series
+        seq_t *c1 = dtw_gather(s1, l1, stride1, 1, 0);
+        seq_t *c2 = dtw_gather(s2, l2, stride2, 1, 0);
+        seq_t result = INFINITY;
+        if (c1 && c2) {
+            result = dtw_distance(c1, l1, c2, l2, settings);
+        }
+        free(c1);
+        free(c2);
+        return result;
+    }
+    if (settings->use_lb && lb_cascade_prune(s1, l1, s2, l2, settings)) {
+        return INFINITY;
+    }
     if (settings->inner_dist == 1) {
         return dtw_distance_euclidean(s1, l1, s2, l2,  settings);
     }
@@ -110,8 +442,8 @@ seq_t dtw_distance(seq_t *s1, idx_t l1,
     #ifdef DTWDEBUG
     printf("r=%zu, c=%zu\n", l1, l2);
     #endif
-    if (settings->use_pruning) {
-        max_dist = ub_euclidean(s1, l1, s2, l2);
+    if (settings->use_pruning && dtw_settings_band_has_euclidean(l1, l2, settings)) {
+        max_dist = ub_euclidean_strided(s1, l1, stride1, s2, l2, stride2);
         max_dist = pow(max_dist, 2);
     } else if (max_dist == 0) {
         max_dist = INFINITY;
@@ -156,6 +488,18 @@ seq_t dtw_distance(seq_t *s1, idx_t l1,
     for (j=0; j<length*2; j++) {
         dtw[j] = INFINITY;
     }
+    // EAPrunedDTW: cb[i+1] is a lower bound on the cost of the rows after row i
+    bool eapruning = settings->use_eapruning && max_dist != INFINITY;
+    bool abandoned = false;
+    // The tolerance avoids pruning the best path because of rounding errors
+    seq_t max_dist_row = max_dist * (1 + SEQ_T_REL_TOL);
+    seq_t *cb = NULL;
+    if (eapruning && lb_is_valid(settings)) {
+        cb = (seq_t *)malloc(sizeof(seq_t) * (3*l1 + 1));
+        if (cb) {
+            lb_keogh_cumulative(s1, l1, s2, l2, settings, cb, &cb[l1 + 1]);
+        }
+    }
     // Deal with psi-relaxation in first row
     for (i=0; i<settings->psi_2b + 1; i++) {
         dtw[i] = 0;
@@ -166,6 +510,10 @@ seq_t dtw_distance(seq_t *s1, idx_t l1,
     int i1 = 0;
     idx_t minj;
     idx_t maxj;
+    bool use_band = dtw_settings_has_band(settings);
+    bool psi_start;
+    idx_t band_b = 0;
+    idx_t band_e = l2;
     idx_t curidx = 0;
     idx_t dl_window = dl + window - 1;
     idx_t ldiff_window = window;
@@ -174,8 +522,10 @@ seq_t dtw_distance(seq_t *s1, idx_t l1,
     }
     seq_t minv;
     seq_t d;
+    seq_t s1i;
     seq_t tempv;
     seq_t psi_shortest = INFINITY;
+    DTWStats stats = dtw_stats_default();
     // keepRunning = 1;
     for (i=0; i<l1; i++) {
         // if (!keepRunning){  // not compatible with OMP
@@ -208,6 +558,13 @@ seq_t dtw_distance(seq_t *s1, idx_t l1,
         //     skip = 0;
         // }
         skip = skip * (length != l2 + 1);
+        // The free start of psi is in the first column, also if the band of this row starts later
+        psi_start = (settings->psi_1b != 0 && i < settings->psi_1b && maxj == 0 && sc == 0);
+        if (use_band) {
+            dtw_settings_band_row(i, l1, l2, settings, &band_b, &band_e);
+            maxj = MAX(maxj, band_b);
+            minj = MIN(minj, band_e);
+        }
         // PrunedDTW
         if (sc > maxj) {
             #ifdef DTWDEBUG
@@ -217,8 +574,12 @@ seq_t dtw_distance(seq_t *s1, idx_t l1,
         }
         smaller_found = false;
         ec_next = i;
+        if (cb) {
+            max_dist_row = max_dist * (1 + SEQ_T_REL_TOL) - cb[i + 1];
+        }
+        s1i = s1[i * stride1];
         // Deal with psi-relaxation in first column
-        if (settings->psi_1b != 0 && maxj == 0 && i < settings->psi_1b) {
+        if (psi_start) {
             dtw[i1*length + 0] = 0;
         }
         #ifdef DTWDEBUG
@@ -226,9 +587,9 @@ seq_t dtw_distance(seq_t *s1, idx_t l1,
         #endif
         for (j=maxj; j<minj; j++) {
             #ifdef DTWDEBUG
-            printf("ri=%zu,ci=%zu, s1[i] = s1[%zu] = %f , s2[j] = s2[%zu] = %f\n", i, j, i, s1[i], j, s2[j]);
+            printf("ri=%zu,ci=%zu, s1[i] = s1[%zu] = %f , s2[j] = s2[%zu] = %f\n", i, j, i, s1i, j, s2[j * stride2]);
             #endif
-            d = SEDIST(s1[i], s2[j]);
+            d = SEDIST(s1i, s2[j * stride2]);
             if (d > max_step) {
                 // Let the value be INFINITY as initialized
                 continue;
@@ -256,9 +617,9 @@ seq_t dtw_distance(seq_t *s1, idx_t l1,
             printf("i=%zu, j=%zu, d=%f, skip=%zu, skipp=%zu\n",i,j,d,skip,skipp);
             #endif
             // PrunedDTW
-            if (dtw[curidx] > max_dist) {
+            if (dtw[curidx] > max_dist_row) {
                 #ifdef DTWDEBUG
-                printf("dtw[%zu] = %f > %f\n", curidx, dtw[curidx], max_dist);
+                printf("dtw[%zu] = %f > %f\n", curidx, dtw[curidx], max_dist_row);
                 #endif
                 if (!smaller_found) {
                     sc = j + 1;
@@ -267,6 +628,7 @@ seq_t dtw_distance(seq_t *s1, idx_t l1,
                     #ifdef DTWDEBUG
                     printf("Break because of pruning with j=%zu, ec=%zu (saved %zu computations)\n", j, ec, minj-j);
                     #endif
+                    stats.cells++;
                     break;
                 }
             } else {
@@ -274,6 +636,7 @@ seq_t dtw_distance(seq_t *s1, idx_t l1,
                 ec_next = j + 1;
             }
         }
+        stats.cells += j - maxj;
         ec = ec_next;
         // Deal with Psi-relaxation in last column
         if (settings->psi_1e != 0 && minj == l2 && l1 - 1 - i <= settings->psi_1e) {
@@ -286,13 +649,25 @@ seq_t dtw_distance(seq_t *s1, idx_t l1,
         #ifdef DTWDEBUG
         dtw_print_twoline(dtw, l1, l2, length, i0, i1, skip, skipp, maxj, minj);
         #endif
+        // EAPrunedDTW: all paths through this row exceed max_dist
+        if (eapruning && !smaller_found && i >= settings->psi_1b) {
+            abandoned = true;
+            stats.pairs_abandoned = 1;
+            stats.rows_abandoned = l1 - 1 - i;
+            break;
+        }
     }
+    free(cb);
     if (window - 1 < 0) {
         l2 += window - 1;
     }
-    seq_t result = sqrt(dtw[length * i1 + l2 - skip]);
-    // Deal with psi-relaxation in the last row
-    if (settings->psi_1e != 0 || settings->psi_2e != 0) {
+    seq_t result = INFINITY;
+    if (abandoned) {
+        // Only paths that ended earlier because of psi-relaxation can be shorter
+        if (settings->psi_1e != 0) {
+            result = sqrt(psi_shortest);
+        }
+    } else if (settings->psi_1e != 0 || settings->psi_2e != 0) {
         if (settings->psi_2e != 0) {
             for (i=l2 - skip - settings->psi_2e; i<l2 - skip + 1; i++) { // iterate over vci
                 if (dtw[i1*length + i] < psi_shortest) {
@@ -301,7 +676,11 @@ seq_t dtw_distance(seq_t *s1, idx_t l1,
             }
         }
         result = sqrt(psi_shortest);
+    } else {
+        result = sqrt(dtw[length * i1 + l2 - skip]);
     }
+    stats.pairs = 1;
+    dtw_stats_merge(&stats);
     free(dtw);
     // signal(SIGINT, SIG_DFL);  // not compatible with OMP
     if (settings->max_dist !=0 && result > settings->max_dist) {
@@ -313,6 +692,35 @@ seq_t dtw_distance(seq_t *s1, idx_t l1,
 
 
 
+/*!
+Compute the DTW between two series, the lower bound cascade (if use_lb is set)
+uses the precomputed envelope of the first series.
+
+@param s1 First sequence
+@param l1 Length of first sequence
+@param lower1 Lower envelope of s1 for a series of length l2 (see lb_envelope)
+@param upper1 Upper envelope of s1 for a series of length l2
+@param s2 Second sequence
+@param l2 Length of second sequence
+@param settings A DTWSettings struct with options for the DTW algorithm.
+
+@see dtw_distance
+*/
+seq_t dtw_distance_envelope(seq_t *s1, idx_t l1, seq_t *lower1, seq_t *upper1,
+                            seq_t *s2, idx_t l2, DTWSettings *settings) {
+    if (!settings->use_lb) {
+        return dtw_distance(s1, l1, s2, l2, settings);
+    }
+    if (lb_cascade_prune_envelope(s1, l1, lower1, upper1, s2, l2, NULL, NULL, settings)) {
+        return INFINITY;
+    }
+    DTWSettings s = *settings;
+    s.use_lb = false;
+    return dtw_distance(s1, l1, s2, l2, &s);
+}
+
+
+
 /**
 Compute the DTW between two n-dimensional series.
 Use the Squared Euclidean inner distance.
@@ -327,6 +735,46 @@ Use the Squared Euclidean inner distance.
 seq_t dtw_distance_ndim(seq_t *s1, idx_t l1,
                       seq_t *s2, idx_t l2, int ndim,
                       DTWSettings *settings) {
+    return dtw_distance_ndim_strided(s1, l1, ndim, 1, s2, l2, ndim, 1, ndim, settings);
+}
+
+
+/**
+Compute the DTW between two n-dimensional series that are not contiguous in memory.
+
+Dimension d of element i of the first series is s1[i * stride1 + d * dstride1].
+A C-contiguous series has stride ndim and dstride 1, a Fortran-ordered series
+has stride 1 and dstride l1. The series are not copied, except if the Euclidean
+inner distance is used.
+
+@param s1 First sequence
+@param l1 Length of first sequence
+@param stride1 Distance (in number of values) between two elements of s1
+@param dstride1 Distance (in number of values) between two dimensions of s1
+@param s2 Second sequence
+@param l2 Length of second sequence
+@param stride2 Distance (in number of values) between two elements of s2
+@param dstride2 Distance (in number of values) between two dimensions of s2
+@param ndim Number of dimensions
+@param settings A DTWSettings struct with options for the DTW algorithm.
+
+@see dtw_distance_ndim
+*/
+seq_t dtw_distance_ndim_strided(seq_t *s1, idx_t l1, idx_t stride1, idx_t dstride1,
+                                seq_t *s2, idx_t l2, idx_t stride2, idx_t dstride2,
+                                int ndim, DTWSettings *settings) {
+    if (settings->inner_dist == 1 &&
+        (stride1 != ndim || dstride1 != 1 || stride2 != ndim || dstride2 != 1)) {
+        seq_t *c1 = dtw_gather(s1, l1, stride1, ndim, dstride1);
+        seq_t *c2 = dtw_gather(s2, l2, stride2, ndim, dstride2);
+        seq_t result = INFINITY;
+        if (c1 && c2) {
+            result = dtw_distance_ndim_euclidean(c1, l1, c2, l2, ndim, settings);
+        }
+        free(c1);
+        free(c2);
+        return result;
+    }
     if (settings->inner_dist == 1) {
         return dtw_distance_ndim_euclidean(s1, l1, s2, l2, ndim,  settings);
     }
@@ -351,8 +799,12 @@ seq_t dtw_distance_ndim(seq_t *s1, idx_t l1,
     #ifdef DTWDEBUG
     printf("r=%zu, c=%zu\n", l1, l2);
     #endif
-    if (settings->use_pruning) {
-        max_dist = ub_euclidean_ndim(s1, l1, s2, l2, ndim);
+    if (settings->use_pruning && dtw_settings_band_has_euclidean(l1, l2, settings)) {
+        if (stride1 == ndim && dstride1 == 1 && stride2 == ndim && dstride2 == 1) {
+            max_dist = ub_euclidean_ndim(s1, l1, s2, l2, ndim);
+        } else {
+            max_dist = ub_euclidean_ndim_strided(s1, l1, stride1, dstride1, s2, l2, stride2, dstride2, ndim);
+        }
         max_dist = pow(max_dist, 2);
     } else if (max_dist == 0) {
         max_dist = INFINITY;
@@ -409,6 +861,10 @@ seq_t dtw_distance_ndim(seq_t *s1, idx_t l1,
     int i1 = 0;
     idx_t minj;
     idx_t maxj;
+    bool use_band = dtw_settings_has_band(settings);
+    bool psi_start;
+    idx_t band_b = 0;
+    idx_t band_e = l2;
     idx_t curidx = 0;
     idx_t dl_window = dl + window - 1;
     idx_t ldiff_window = window;
@@ -419,6 +875,7 @@ seq_t dtw_distance_ndim(seq_t *s1, idx_t l1,
     seq_t d;
     seq_t tempv;
     seq_t psi_shortest = INFINITY;
+    DTWStats stats = dtw_stats_default();
     // keepRunning = 1;
     for (i=0; i<l1; i++) {
         // if (!keepRunning){  // not compatible with OMP
@@ -426,7 +883,7 @@ seq_t dtw_distance_ndim(seq_t *s1, idx_t l1,
         //     printf("Stop computing DTW...\n");
         //     return INFINITY;
         // }
-        i_idx = i * ndim;
+        i_idx = i * stride1;
         // maxj = i;
         // if (maxj > dl_window) {
         //     maxj -= dl_window;
@@ -452,6 +909,13 @@ seq_t dtw_distance_ndim(seq_t *s1, idx_t l1,
         //     skip = 0;
         // }
         skip = skip * (length != l2 + 1);
+        // The free start of psi is in the first column, also if the band of this row starts later
+        psi_start = (settings->psi_1b != 0 && i < settings->psi_1b && maxj == 0 && sc == 0);
+        if (use_band) {
+            dtw_settings_band_row(i, l1, l2, settings, &band_b, &band_e);
+            maxj = MAX(maxj, band_b);
+            minj = MIN(minj, band_e);
+        }
         // PrunedDTW
         if (sc > maxj) {
             #ifdef DTWDEBUG
@@ -462,20 +926,20 @@ seq_t dtw_distance_ndim(seq_t *s1, idx_t l1,
         smaller_found = false;
         ec_next = i;
         // Deal with psi-relaxation in first column
-        if (settings->psi_1b != 0 && maxj == 0 && i < settings->psi_1b) {
+        if (psi_start) {
             dtw[i1*length + 0] = 0;
         }
         #ifdef DTWDEBUG
         printf("i=%zu, maxj=%zu, minj=%zu\n", i, maxj, minj);
         #endif
         for (j=maxj; j<minj; j++) {
-            j_idx = j * ndim;
+            j_idx = j * stride2;
             #ifdef DTWDEBUG
-            printf("ri=%zu,ci=%zu, s1[i] = s1[%zu] = %f , s2[j] = s2[%zu] = %f\n", i, j, i, s1[i], j, s2[j]);
+            printf("ri=%zu,ci=%zu, s1[i] = s1[%zu] = %f , s2[j] = s2[%zu] = %f\n", i, j, i, s1[i_idx], j, s2[j_idx]);
             #endif
             d = 0;
             for (int d_i=0; d_i<ndim; d_i++) {
-                d += SEDIST(s1[i_idx + d_i], s2[j_idx + d_i]);
+                d += SEDIST(s1[i_idx + d_i * dstride1], s2[j_idx + d_i * dstride2]);
             }
             if (d > max_step) {
                 // Let the value be INFINITY as initialized
@@ -515,6 +979,7 @@ seq_t dtw_distance_ndim(seq_t *s1, idx_t l1,
                     #ifdef DTWDEBUG
                     printf("Break because of pruning with j=%zu, ec=%zu (saved %zu computations)\n", j, ec, minj-j);
                     #endif
+                    stats.cells++;
                     break;
                 }
             } else {
@@ -522,6 +987,7 @@ seq_t dtw_distance_ndim(seq_t *s1, idx_t l1,
                 ec_next = j + 1;
             }
         }
+        stats.cells += j - maxj;
         ec = ec_next;
         // Deal with Psi-relaxation in last column
         if (settings->psi_1e != 0 && minj == l2 && l1 - 1 - i <= settings->psi_1e) {
@@ -550,6 +1016,8 @@ seq_t dtw_distance_ndim(seq_t *s1, idx_t l1,
         }
         result = sqrt(psi_shortest);
     }
+    stats.pairs = 1;
+    dtw_stats_merge(&stats);
     free(dtw);
     // signal(SIGINT, SIG_DFL);  // not compatible with OMP
     if (settings->max_dist !=0 && result > settings->max_dist) {
@@ -595,7 +1063,7 @@ seq_t dtw_distance_euclidean(seq_t *s1, idx_t l1,
     #ifdef DTWDEBUG
     printf("r=%zu, c=%zu\n", l1, l2);
     #endif
-    if (settings->use_pruning) {
+    if (settings->use_pruning && dtw_settings_band_has_euclidean(l1, l2, settings)) {
         max_dist = ub_euclidean_euclidean(s1, l1, s2, l2);
     } else if (max_dist == 0) {
         max_dist = INFINITY;
@@ -640,6 +1108,18 @@ seq_t dtw_distance_euclidean(seq_t *s1, idx_t l1,
     for (j=0; j<length*2; j++) {
         dtw[j] = INFINITY;
     }
+    // EAPrunedDTW: cb[i+1] is a lower bound on the cost of the rows after row i
+    bool eapruning = settings->use_eapruning && max_dist != INFINITY;
+    bool abandoned = false;
+    // The tolerance avoids pruning the best path because of rounding errors
+    seq_t max_dist_row = max_dist * (1 + SEQ_T_REL_TOL);
+    seq_t *cb = NULL;
+    if (eapruning && lb_is_valid(settings)) {
+        cb = (seq_t *)malloc(sizeof(seq_t) * (3*l1 + 1));
+        if (cb) {
+            lb_keogh_cumulative(s1, l1, s2, l2, settings, cb, &cb[l1 + 1]);
+        }
+    }
     // Deal with psi-relaxation in first row
     for (i=0; i<settings->psi_2b + 1; i++) {
         dtw[i] = 0;
@@ -650,6 +1130,10 @@ seq_t dtw_distance_euclidean(seq_t *s1, idx_t l1,
     int i1 = 0;
     idx_t minj;
     idx_t maxj;
+    bool use_band = dtw_settings_has_band(settings);
+    bool psi_start;
+    idx_t band_b = 0;
+    idx_t band_e = l2;
     idx_t curidx = 0;
     idx_t dl_window = dl + window - 1;
     idx_t ldiff_window = window;
@@ -660,6 +1144,7 @@ seq_t dtw_distance_euclidean(seq_t *s1, idx_t l1,
     seq_t d;
     seq_t tempv;
     seq_t psi_shortest = INFINITY;
+    DTWStats stats = dtw_stats_default();
     // keepRunning = 1;
     for (i=0; i<l1; i++) {
         // if (!keepRunning){  // not compatible with OMP
@@ -692,6 +1177,13 @@ seq_t dtw_distance_euclidean(seq_t *s1, idx_t l1,
         //     skip = 0;
         // }
         skip = skip * (length != l2 + 1);
+        // The free start of psi is in the first column, also if the band of this row starts later
+        psi_start = (settings->psi_1b != 0 && i < settings->psi_1b && maxj == 0 && sc == 0);
+        if (use_band) {
+            dtw_settings_band_row(i, l1, l2, settings, &band_b, &band_e);
+            maxj = MAX(maxj, band_b);
+            minj = MIN(minj, band_e);
+        }
         // PrunedDTW
         if (sc > maxj) {
             #ifdef DTWDEBUG
@@ -701,8 +1193,11 @@ seq_t dtw_distance_euclidean(seq_t *s1, idx_t l1,
         }
         smaller_found = false;
         ec_next = i;
+        if (cb) {
+            max_dist_row = max_dist * (1 + SEQ_T_REL_TOL) - cb[i + 1];
+        }
         // Deal with psi-relaxation in first column
-        if (settings->psi_1b != 0 && maxj == 0 && i < settings->psi_1b) {
+        if (psi_start) {
             dtw[i1*length + 0] = 0;
         }
         #ifdef DTWDEBUG
@@ -740,9 +1235,9 @@ seq_t dtw_distance_euclidean(seq_t *s1, idx_t l1,
             printf("i=%zu, j=%zu, d=%f, skip=%zu, skipp=%zu\n",i,j,d,skip,skipp);
             #endif
             // PrunedDTW
-            if (dtw[curidx] > max_dist) {
+            if (dtw[curidx] > max_dist_row) {
                 #ifdef DTWDEBUG
-                printf("dtw[%zu] = %f > %f\n", curidx, dtw[curidx], max_dist);
+                printf("dtw[%zu] = %f > %f\n", curidx, dtw[curidx], max_dist_row);
                 #endif
                 if (!smaller_found) {
                     sc = j + 1;
@@ -751,6 +1246,7 @@ seq_t dtw_distance_euclidean(seq_t *s1, idx_t l1,
                     #ifdef DTWDEBUG
                     printf("Break because of pruning with j=%zu, ec=%zu (saved %zu computations)\n", j, ec, minj-j);
                     #endif
+                    stats.cells++;
                     break;
                 }
             } else {
@@ -758,6 +1254,7 @@ seq_t dtw_distance_euclidean(seq_t *s1, idx_t l1,
                 ec_next = j + 1;
             }
         }
+        stats.cells += j - maxj;
         ec = ec_next;
         // Deal with Psi-relaxation in last column
         if (settings->psi_1e != 0 && minj == l2 && l1 - 1 - i <= settings->psi_1e) {
@@ -770,13 +1267,25 @@ seq_t dtw_distance_euclidean(seq_t *s1, idx_t l1,
         #ifdef DTWDEBUG
         dtw_print_twoline(dtw, l1, l2, length, i0, i1, skip, skipp, maxj, minj);
         #endif
+        // EAPrunedDTW: all paths through this row exceed max_dist
+        if (eapruning && !smaller_found && i >= settings->psi_1b) {
+            abandoned = true;
+            stats.pairs_abandoned = 1;
+            stats.rows_abandoned = l1 - 1 - i;
+            break;
+        }
     }
+    free(cb);
     if (window - 1 < 0) {
         l2 += window - 1;
     }
-    seq_t result = dtw[length * i1 + l2 - skip];
-    // Deal with psi-relaxation in the last row
-    if (settings->psi_1e != 0 || settings->psi_2e != 0) {
+    seq_t result = INFINITY;
+    if (abandoned) {
+        // Only paths that ended earlier because of psi-relaxation can be shorter
+        if (settings->psi_1e != 0) {
+            result = psi_shortest;
+        }
+    } else if (settings->psi_1e != 0 || settings->psi_2e != 0) {
         if (settings->psi_2e != 0) {
             for (i=l2 - skip - settings->psi_2e; i<l2 - skip + 1; i++) { // iterate over vci
                 if (dtw[i1*length + i] < psi_shortest) {
@@ -785,7 +1294,11 @@ seq_t dtw_distance_euclidean(seq_t *s1, idx_t l1,
             }
         }
         result = psi_shortest;
+    } else {
+        result = dtw[length * i1 + l2 - skip];
     }
+    stats.pairs = 1;
+    dtw_stats_merge(&stats);
     free(dtw);
     // signal(SIGINT, SIG_DFL);  // not compatible with OMP
     if (settings->max_dist !=0 && result > settings->max_dist) {
@@ -832,7 +1345,7 @@ seq_t dtw_distance_ndim_euclidean(seq_t *s1, idx_t l1,
     #ifdef DTWDEBUG
     printf("r=%zu, c=%zu\n", l1, l2);
     #endif
-    if (settings->use_pruning) {
+    if (settings->use_pruning && dtw_settings_band_has_euclidean(l1, l2, settings)) {
         max_dist = ub_euclidean_ndim_euclidean(s1, l1, s2, l2, ndim);
     } else if (max_dist == 0) {
         max_dist = INFINITY;
@@ -889,6 +1402,10 @@ seq_t dtw_distance_ndim_euclidean(seq_t *s1, idx_t l1,
     int i1 = 0;
     idx_t minj;
     idx_t maxj;
+    bool use_band = dtw_settings_has_band(settings);
+    bool psi_start;
+    idx_t band_b = 0;
+    idx_t band_e = l2;
     idx_t curidx = 0;
     idx_t dl_window = dl + window - 1;
     idx_t ldiff_window = window;
@@ -899,6 +1416,7 @@ seq_t dtw_distance_ndim_euclidean(seq_t *s1, idx_t l1,
     seq_t d;
     seq_t tempv;
     seq_t psi_shortest = INFINITY;
+    DTWStats stats = dtw_stats_default();
     // keepRunning = 1;
     for (i=0; i<l1; i++) {
         // if (!keepRunning){  // not compatible with OMP
@@ -932,6 +1450,13 @@ seq_t dtw_distance_ndim_euclidean(seq_t *s1, idx_t l1,
         //     skip = 0;
         // }
         skip = skip * (length != l2 + 1);
+        // The free start of psi is in the first column, also if the band of this row starts later
+        psi_start = (settings->psi_1b != 0 && i < settings->psi_1b && maxj == 0 && sc == 0);
+        if (use_band) {
+            dtw_settings_band_row(i, l1, l2, settings, &band_b, &band_e);
+            maxj = MAX(maxj, band_b);
+            minj = MIN(minj, band_e);
+        }
         // PrunedDTW
         if (sc > maxj) {
             #ifdef DTWDEBUG
@@ -942,7 +1467,7 @@ seq_t dtw_distance_ndim_euclidean(seq_t *s1, idx_t l1,
         smaller_found = false;
         ec_next = i;
         // Deal with psi-relaxation in first column
-        if (settings->psi_1b != 0 && maxj == 0 && i < settings->psi_1b) {
+        if (psi_start) {
             dtw[i1*length + 0] = 0;
         }
         #ifdef DTWDEBUG
@@ -996,6 +1521,7 @@ seq_t dtw_distance_ndim_euclidean(seq_t *s1, idx_t l1,
                     #ifdef DTWDEBUG
                     printf("Break because of pruning with j=%zu, ec=%zu (saved %zu computations)\n", j, ec, minj-j);
                     #endif
+                    stats.cells++;
                     break;
                 }
             } else {
@@ -1003,6 +1529,7 @@ seq_t dtw_distance_ndim_euclidean(seq_t *s1, idx_t l1,
                 ec_next = j + 1;
             }
         }
+        stats.cells += j - maxj;
         ec = ec_next;
         // Deal with Psi-relaxation in last column
         if (settings->psi_1e != 0 && minj == l2 && l1 - 1 - i <= settings->psi_1e) {
@@ -1031,6 +1558,8 @@ seq_t dtw_distance_ndim_euclidean(seq_t *s1, idx_t l1,
         }
         result = psi_shortest;
     }
+    stats.pairs = 1;
+    dtw_stats_merge(&stats);
     free(dtw);
     // signal(SIGINT, SIG_DFL);  // not compatible with OMP
     if (settings->max_dist !=0 && result > settings->max_dist) {
@@ -1091,7 +1620,7 @@ seq_t dtw_warping_paths_ndim(seq_t *wps,
     bool smaller_found;
 
     DTWWps p = dtw_wps_parts(l1, l2, settings);
-    if (settings->use_pruning) {
+    if (settings->use_pruning && dtw_settings_band_has_euclidean(l1, l2, settings)) {
         if (ndim == 1) {
             p.max_dist = ub_euclidean(s1, l1, s2, l2);
         } else {
@@ -1101,6 +1630,12 @@ seq_t dtw_warping_paths_ndim(seq_t *wps,
     }
 
     idx_t ri, ci, min_ci, max_ci, wpsi, wpsi_start;
+    idx_t ci_first;
+    DTWStats stats = dtw_stats_default();
+    bool use_band = dtw_settings_has_band(settings);
+    idx_t band_b = 0;
+    idx_t band_e = l2;
+    idx_t ci_start;
 
     // Top row: ri = -1
     for (wpsi=0; wpsi<settings->psi_2b+1; wpsi++) {
@@ -1140,19 +1675,24 @@ seq_t dtw_warping_paths_ndim(seq_t *wps,
     max_ci = p.window + p.ldiffc; // ri < overlap_right_i
     for (ri=0; ri<p.ri1; ri++) {
         ri_idx = ri * ndim;
+        if (use_band) {
+            dtw_settings_band_row(ri, l1, l2, settings, &band_b, &band_e);
+        }
         ci = min_ci;
         wpsi = 1; // index for min_ci
         // PrunedDTW
-        if (sc <= min_ci) {} else {
-            for (; ci<sc; ci++) {
+        ci_start = MIN(MAX(sc, band_b), max_ci);
+        if (ci_start <= min_ci) {} else {
+            for (; ci<ci_start; ci++) {
                 wps[ri_width + wpsi] = INFINITY;
                 wpsi++;
             }
         }
         smaller_found = false;
         ec_next = ri;
+        ci_first = ci;
         // A region assumes wps has the same column indices in the previous row
-        for (; ci<max_ci; ci++) {
+        for (; ci<MIN(max_ci, band_e); ci++) {
             ci_idx = ci * ndim;
             d = 0;
             for (int d_i=0; d_i<ndim; d_i++) {
@@ -1169,11 +1709,14 @@ seq_t dtw_warping_paths_ndim(seq_t *wps,
             } else {
                 if (!smaller_found)
                     sc = ci + 1;
-                if (ci >= ec)
+                if (ci >= ec) {
+                    stats.cells++;
                     break;
+                }
             }
             wpsi++;
         }
+        stats.cells += ci - ci_first;
         ec = ec_next;
         for (idx_t i=ri_width + wpsi; i<ri_width + p.width; i++) {
             wps[i] = INFINITY;
@@ -1190,18 +1733,23 @@ seq_t dtw_warping_paths_ndim(seq_t *wps,
     max_ci = l2; // ri >= overlap_right_i
     for (ri=p.ri1; ri<p.ri2; ri++) {
         ri_idx = ri * ndim;
+        if (use_band) {
+            dtw_settings_band_row(ri, l1, l2, settings, &band_b, &band_e);
+        }
         wpsi = 1;
         ci = min_ci;
         // PrunedDTW
-        if (sc <= min_ci) {} else {
-            for (; ci<sc; ci++) {
+        ci_start = MIN(MAX(sc, band_b), max_ci);
+        if (ci_start <= min_ci) {} else {
+            for (; ci<ci_start; ci++) {
                 wps[ri_width + wpsi] = INFINITY;
                 wpsi++;
             }
         }
         smaller_found = false;
         ec_next = ri;
-        for (; ci<max_ci; ci++) {
+        ci_first = ci;
+        for (; ci<MIN(max_ci, band_e); ci++) {
             ci_idx = ci * ndim;
             d = 0;
             for (int d_i=0; d_i<ndim; d_i++) {
@@ -1219,11 +1767,14 @@ seq_t dtw_warping_paths_ndim(seq_t *wps,
             } else {
                 if (!smaller_found)
                     sc = ci + 1;
-                if (ci >= ec)
+                if (ci >= ec) {
+                    stats.cells++;
                     break;
+                }
             }
             wpsi++;
         }
+        stats.cells += ci - ci_first;
         ec = ec_next;
         for (idx_t i=ri_width + wpsi; i<ri_width + p.width; i++) {
             wps[i] = INFINITY;
@@ -1239,19 +1790,24 @@ seq_t dtw_warping_paths_ndim(seq_t *wps,
     max_ci = 1 + 2 * p.window - 1 + p.ldiff;
     for (ri=p.ri2; ri<p.ri3; ri++) {
         ri_idx = ri * ndim;
+        if (use_band) {
+            dtw_settings_band_row(ri, l1, l2, settings, &band_b, &band_e);
+        }
         ci = min_ci;
         wps[ri_width] = INFINITY;
         wpsi = 1;
         // PrunedDTW
-        if (sc <= min_ci) {} else {
-            for (; ci<sc; ci++) {
+        ci_start = MIN(MAX(sc, band_b), max_ci);
+        if (ci_start <= min_ci) {} else {
+            for (; ci<ci_start; ci++) {
                 wps[ri_width + wpsi] = INFINITY;
                 wpsi++;
             }
         }
         smaller_found = false;
         ec_next = ri;
-        for (; ci<max_ci; ci++) {
+        ci_first = ci;
+        for (; ci<MIN(max_ci, band_e); ci++) {
             ci_idx = ci * ndim;
             d = 0;
             for (int d_i=0; d_i<ndim; d_i++) {
@@ -1269,11 +1825,14 @@ seq_t dtw_warping_paths_ndim(seq_t *wps,
             } else {
                 if (!smaller_found)
                     sc = ci + 1;
-                if (ci >= ec)
+                if (ci >= ec) {
+                    stats.cells++;
                     break;
+                }
             }
             wpsi++;
         }
+        stats.cells += ci - ci_first;
         ec = ec_next;
         for (idx_t i=ri_width + wpsi; i<ri_width + p.width; i++) {
             wps[i] = INFINITY;
@@ -1297,21 +1856,26 @@ seq_t dtw_warping_paths_ndim(seq_t *wps,
     }
     for (ri=p.ri3; ri<l1; ri++) {
         ri_idx = ri * ndim;
+        if (use_band) {
+            dtw_settings_band_row(ri, l1, l2, settings, &band_b, &band_e);
+        }
         ci = min_ci;
         wpsi = wpsi_start;
         for (idx_t i=ri_width; i<(ri_width + wpsi); i++) {
             wps[i] = INFINITY;
         }
         // PrunedDTW
-        if (sc <= min_ci) {} else {
-            for (; ci<sc; ci++) {
+        ci_start = MIN(MAX(sc, band_b), l2);
+        if (ci_start <= min_ci) {} else {
+            for (; ci<ci_start; ci++) {
                 wps[ri_width + wpsi] = INFINITY;
                 wpsi++;
             }
         }
         smaller_found = false;
         ec_next = ri;
-        for (; ci<l2; ci++) {
+        ci_first = ci;
+        for (; ci<MIN(l2, band_e); ci++) {
             ci_idx = ci * ndim;
             d = 0;
             for (int d_i=0; d_i<ndim; d_i++) {
@@ -1329,11 +1893,14 @@ seq_t dtw_warping_paths_ndim(seq_t *wps,
             } else {
                 if (!smaller_found)
                     sc = ci + 1;
-                if (ci >= ec)
+                if (ci >= ec) {
+                    stats.cells++;
                     break;
+                }
             }
             wpsi++;
         }
+        stats.cells += ci - ci_first;
         ec = ec_next;
         for (idx_t i=ri_width + wpsi; i<ri_width + p.width; i++) {
             wps[i] = INFINITY;
@@ -1354,6 +1921,11 @@ seq_t dtw_warping_paths_ndim(seq_t *wps,
 
     seq_t rvalue = 0;
     idx_t final_wpsi = ri_widthp + wpsi - 1;
+    if (use_band && band_e < l2) {
+        // The band of the last row stops before the last column, the cell of the
+        // last column is not computed (and is INFINITY)
+        final_wpsi = MIN(final_wpsi + l2 - band_e, ri_widthp + p.width - 1);
+    }
     // Deal with Psi-relaxation
     if (return_dtw && settings->psi_1e == 0 && settings->psi_2e == 0) {
         rvalue = wps[final_wpsi];
@@ -1433,6 +2005,8 @@ seq_t dtw_warping_paths_ndim(seq_t *wps,
         }
     }
 
+    stats.pairs = 1;
+    dtw_stats_merge(&stats);
     return rvalue;
 }
 
@@ -1463,7 +2037,7 @@ seq_t dtw_warping_paths_ndim_euclidean(seq_t *wps,
     bool smaller_found;
 
     DTWWps p = dtw_wps_parts(l1, l2, settings);
-    if (settings->use_pruning) {
+    if (settings->use_pruning && dtw_settings_band_has_euclidean(l1, l2, settings)) {
         if (ndim == 1) {
             p.max_dist = ub_euclidean(s1, l1, s2, l2);
         } else {
@@ -1472,6 +2046,12 @@ seq_t dtw_warping_paths_ndim_euclidean(seq_t *wps,
     }
 
     idx_t ri, ci, min_ci, max_ci, wpsi, wpsi_start;
+    idx_t ci_first;
+    DTWStats stats = dtw_stats_default();
+    bool use_band = dtw_settings_has_band(settings);
+    idx_t band_b = 0;
+    idx_t band_e = l2;
+    idx_t ci_start;
 
     // Top row: ri = -1
     for (wpsi=0; wpsi<settings->psi_2b+1; wpsi++) {
@@ -1511,19 +2091,24 @@ seq_t dtw_warping_paths_ndim_euclidean(seq_t *wps,
     max_ci = p.window + p.ldiffc; // ri < overlap_right_i
     for (ri=0; ri<p.ri1; ri++) {
         ri_idx = ri * ndim;
+        if (use_band) {
+            dtw_settings_band_row(ri, l1, l2, settings, &band_b, &band_e);
+        }
         ci = min_ci;
         wpsi = 1; // index for min_ci
         // PrunedDTW
-        if (sc <= min_ci) {} else {
-            for (; ci<sc; ci++) {
+        ci_start = MIN(MAX(sc, band_b), max_ci);
+        if (ci_start <= min_ci) {} else {
+            for (; ci<ci_start; ci++) {
                 wps[ri_width + wpsi] = INFINITY;
                 wpsi++;
             }
         }
         smaller_found = false;
         ec_next = ri;
+        ci_first = ci;
         // A region assumes wps has the same column indices in the previous row
-        for (; ci<max_ci; ci++) {
+        for (; ci<MIN(max_ci, band_e); ci++) {
             ci_idx = ci * ndim;
             d = 0;
             for (int d_i=0; d_i<ndim; d_i++) {
@@ -1541,11 +2126,14 @@ seq_t dtw_warping_paths_ndim_euclidean(seq_t *wps,
             } else {
                 if (!smaller_found)
                     sc = ci + 1;
-                if (ci >= ec)
+                if (ci >= ec) {
+                    stats.cells++;
                     break;
+                }
             }
             wpsi++;
         }
+        stats.cells += ci - ci_first;
         ec = ec_next;
         for (idx_t i=ri_width + wpsi; i<ri_width + p.width; i++) {
             wps[i] = INFINITY;
@@ -1562,18 +2150,23 @@ seq_t dtw_warping_paths_ndim_euclidean(seq_t *wps,
     max_ci = l2; // ri >= overlap_right_i
     for (ri=p.ri1; ri<p.ri2; ri++) {
         ri_idx = ri * ndim;
+        if (use_band) {
+            dtw_settings_band_row(ri, l1, l2, settings, &band_b, &band_e);
+        }
         wpsi = 1;
         ci = min_ci;
         // PrunedDTW
-        if (sc <= min_ci) {} else {
-            for (; ci<sc; ci++) {
+        ci_start = MIN(MAX(sc, band_b), max_ci);
+        if (ci_start <= min_ci) {} else {
+            for (; ci<ci_start; ci++) {
                 wps[ri_width + wpsi] = INFINITY;
                 wpsi++;
             }
         }
         smaller_found = false;
         ec_next = ri;
-        for (; ci<max_ci; ci++) {
+        ci_first = ci;
+        for (; ci<MIN(max_ci, band_e); ci++) {
             ci_idx = ci * ndim;
             d = 0;
             for (int d_i=0; d_i<ndim; d_i++) {
@@ -1592,11 +2185,14 @@ seq_t dtw_warping_paths_ndim_euclidean(seq_t *wps,
             } else {
                 if (!smaller_found)
                     sc = ci + 1;
-                if (ci >= ec)
+                if (ci >= ec) {
+                    stats.cells++;
                     break;
+                }
             }
             wpsi++;
         }
+        stats.cells += ci - ci_first;
         ec = ec_next;
         for (idx_t i=ri_width + wpsi; i<ri_width + p.width; i++) {
             wps[i] = INFINITY;
@@ -1612,19 +2208,24 @@ seq_t dtw_warping_paths_ndim_euclidean(seq_t *wps,
     max_ci = 1 + 2 * p.window - 1 + p.ldiff;
     for (ri=p.ri2; ri<p.ri3; ri++) {
         ri_idx = ri * ndim;
+        if (use_band) {
+            dtw_settings_band_row(ri, l1, l2, settings, &band_b, &band_e);
+        }
         ci = min_ci;
         wps[ri_width] = INFINITY;
         wpsi = 1;
         // PrunedDTW
-        if (sc <= min_ci) {} else {
-            for (; ci<sc; ci++) {
+        ci_start = MIN(MAX(sc, band_b), max_ci);
+        if (ci_start <= min_ci) {} else {
+            for (; ci<ci_start; ci++) {
                 wps[ri_width + wpsi] = INFINITY;
                 wpsi++;
             }
         }
         smaller_found = false;
         ec_next = ri;
-        for (; ci<max_ci; ci++) {
+        ci_first = ci;
+        for (; ci<MIN(max_ci, band_e); ci++) {
             ci_idx = ci * ndim;
             d = 0;
             for (int d_i=0; d_i<ndim; d_i++) {
@@ -1643,11 +2244,14 @@ seq_t dtw_warping_paths_ndim_euclidean(seq_t *wps,
             } else {
                 if (!smaller_found)
                     sc = ci + 1;
-                if (ci >= ec)
+                if (ci >= ec) {
+                    stats.cells++;
                     break;
+                }
             }
             wpsi++;
         }
+        stats.cells += ci - ci_first;
         ec = ec_next;
         for (idx_t i=ri_width + wpsi; i<ri_width + p.width; i++) {
             wps[i] = INFINITY;
@@ -1671,21 +2275,26 @@ seq_t dtw_warping_paths_ndim_euclidean(seq_t *wps,
     }
     for (ri=p.ri3; ri<l1; ri++) {
         ri_idx = ri * ndim;
+        if (use_band) {
+            dtw_settings_band_row(ri, l1, l2, settings, &band_b, &band_e);
+        }
         ci = min_ci;
         wpsi = wpsi_start;
         for (idx_t i=ri_width; i<(ri_width + wpsi); i++) {
             wps[i] = INFINITY;
         }
         // PrunedDTW
-        if (sc <= min_ci) {} else {
-            for (; ci<sc; ci++) {
+        ci_start = MIN(MAX(sc, band_b), l2);
+        if (ci_start <= min_ci) {} else {
+            for (; ci<ci_start; ci++) {
                 wps[ri_width + wpsi] = INFINITY;
                 wpsi++;
             }
         }
         smaller_found = false;
         ec_next = ri;
-        for (; ci<l2; ci++) {
+        ci_first = ci;
+        for (; ci<MIN(l2, band_e); ci++) {
             ci_idx = ci * ndim;
             d = 0;
             for (int d_i=0; d_i<ndim; d_i++) {
@@ -1704,11 +2313,14 @@ seq_t dtw_warping_paths_ndim_euclidean(seq_t *wps,
             } else {
                 if (!smaller_found)
                     sc = ci + 1;
-                if (ci >= ec)
+                if (ci >= ec) {
+                    stats.cells++;
                     break;
+                }
             }
             wpsi++;
         }
+        stats.cells += ci - ci_first;
         ec = ec_next;
         for (idx_t i=ri_width + wpsi; i<ri_width + p.width; i++) {
             wps[i] = INFINITY;
@@ -1729,6 +2341,11 @@ seq_t dtw_warping_paths_ndim_euclidean(seq_t *wps,
 
     seq_t rvalue = 0;
     idx_t final_wpsi = ri_widthp + wpsi - 1;
+    if (use_band && band_e < l2) {
+        // The band of the last row stops before the last column, the cell of the
+        // last column is not computed (and is INFINITY)
+        final_wpsi = MIN(final_wpsi + l2 - band_e, ri_widthp + p.width - 1);
+    }
     // Deal with Psi-relaxation
     if (return_dtw && settings->psi_1e == 0 && settings->psi_2e == 0) {
         rvalue = wps[final_wpsi];
@@ -1796,6 +2413,8 @@ seq_t dtw_warping_paths_ndim_euclidean(seq_t *wps,
         rvalue = INFINITY;
     }
 
+    stats.pairs = 1;
+    dtw_stats_merge(&stats);
     return rvalue;
 }
 
@@ -3956,42 +4575,245 @@ idx_t dtw_best_path_prob(seq_t *wps, idx_t *i1, idx_t *i2, idx_t l1, idx_t l2, s
 }
 
 /*!
- Compute warping path between two sequences.
+ Compute DTW and the warping path between two sequences when a custom band is used.
  
- @param from_s First sequence
- @param from_l Length of first sequence
- @param to_s Second sequence
- @param to_l Length of second sequence
- @param from_i Stores warping path indices for the first sequence
- @param to_i Stores warping path indices for the second sequence
- @param length_i Stores resulting path  length for from_i and to_i
+ Only the cells in the band (intersected with the window and Itakura parallelogram)
+ are stored, thus memory is linear in the number of cells in the band instead of in
+ the width of the band around the diagonal. Used by `dtw_warping_path` when the
+ settings contain a band and no psi-relaxation. Rows are allowed to be
+ disconnected or empty, the distance is then infinity.
+ 
+ @param s1 First sequence
+ @param l1 Length of first sequence
+ @param s2 Second sequence
+ @param l2 Length of second sequence
+ @param i1 Stores the warping path indices for the first sequence, reverse ordered
+ @param i2 Stores the warping path indices for the second sequence, reverse ordered
+ @param length_i Stores resulting path length, zero if the distance is infinity
  @param settings Settings object
  @return distance
  */
-seq_t dtw_warping_path(seq_t *from_s, idx_t from_l, seq_t* to_s, idx_t to_l, idx_t *from_i, idx_t *to_i, idx_t * length_i, DTWSettings * settings) {
-    return dtw_warping_path_ndim(from_s, from_l, to_s, to_l, from_i, to_i, length_i, 1, settings);
-}
-
-seq_t dtw_warping_path_ndim(seq_t *from_s, idx_t from_l, seq_t* to_s, idx_t to_l, idx_t *from_i, idx_t *to_i, idx_t * length_i, int ndim, DTWSettings * settings) {
-    idx_t wps_length = dtw_settings_wps_length(from_l, to_l, settings);
-    seq_t *wps = (seq_t *)malloc(wps_length * sizeof(seq_t));
-    if (wps == NULL) {
-        printf("ERROR: Cannot allocate memory for storing the cumulative cost matrix (wps)");
-        exit(1);
+static seq_t dtw_warping_path_banded(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2,
+                                     idx_t *i1, idx_t *i2, idx_t *length_i,
+                                     DTWSettings *settings) {
+    idx_t i, j, k, idx, idxp, cb, ce;
+    seq_t d, minv, tempv, minrow, diagv, upv, leftv;
+    bool euclidean = (settings->inner_dist == 1);
+    idx_t window = settings->window;
+    seq_t max_step = settings->max_step;
+    seq_t max_dist = settings->max_dist;
+    seq_t penalty_horizontal = settings->penalty_s2;  // vertical move in matrix (down) = expanding s2
+    seq_t penalty_vertical = settings->penalty_s1;    // horizontal move in matrix (right) = expanding s1
+    idx_t ldiff = (l1 > l2) ? l1 - l2 : l2 - l1;
+    idx_t dl = (l1 > l2) ? ldiff : 0;
+    
+    *length_i = 0;
+    if (settings->max_length_diff != 0 && ldiff > settings->max_length_diff) {
+        return INFINITY;
     }
-    seq_t d;
-    if (settings->inner_dist == 1) {
-        d = dtw_warping_paths_ndim_euclidean(wps, from_s, from_l, to_s, to_l, true, true, true,                        ndim, settings);
-    } else {
-        d = dtw_warping_paths_ndim(wps, from_s, from_l, to_s, to_l, true, true, true,                        ndim, settings);
-        d = sqrt(d);
+    if (window == 0) {
+        window = MAX(l1, l2);
     }
-    *length_i = dtw_best_path(wps, from_i, to_i, from_l, to_l, settings);
-    free(wps);
-    return d;
-}
-
-/*!
+    idx_t dl_window = dl + window - 1;
+    idx_t ldiff_window = window + ((l2 > l1) ? ldiff : 0);
+    if (settings->use_pruning && dtw_settings_band_has_euclidean(l1, l2, settings)) {
+        if (euclidean) {
+            max_dist = ub_euclidean_euclidean(s1, l1, s2, l2);
+        } else {
+            max_dist = ub_euclidean(s1, l1, s2, l2);
+        }
+    } else if (max_dist == 0) {
+        max_dist = INFINITY;
+    }
+    if (max_step == 0) {
+        max_step = INFINITY;
+    }
+    // For backward compatibility: if asymmetric penalties are not set, use symmetric penalty
+    if (penalty_horizontal == 0 && penalty_vertical == 0 && settings->penalty != 0) {
+        penalty_horizontal = settings->penalty;
+        penalty_vertical = settings->penalty;
+    }
+    if (!euclidean) {
+        max_dist = pow(max_dist, 2);
+        max_step = pow(max_step, 2);
+        penalty_horizontal = pow(penalty_horizontal, 2);
+        penalty_vertical = pow(penalty_vertical, 2);
+    }
+    // The tolerance avoids pruning the best path because of rounding errors
+    seq_t max_dist_row = max_dist * (1 + SEQ_T_REL_TOL);
+    
+    // Row i contains the columns band[2*i] <= j < band[2*i+1] and is stored from offsets[i]
+    idx_t *band = (idx_t *)malloc(sizeof(idx_t) * (3 * l1 + 1));
+    if (!band) {
+        printf("Error: dtw_warping_path_banded - Cannot allocate memory (size=%zu)\n", 3 * l1 + 1);
+        return INFINITY;
+    }
+    idx_t *offsets = &band[2 * l1];
+    offsets[0] = 0;
+    for (i=0; i<l1; i++) {
+        dtw_settings_band_row(i, l1, l2, settings, &cb, &ce);
+        cb = MAX(cb, (i > dl_window) ? i - dl_window : 0);
+        ce = MIN(ce, i + ldiff_window);
+        if (ce < cb) {
+            ce = cb;
+        }
+        band[2 * i] = cb;
+        band[2 * i + 1] = ce;
+        offsets[i + 1] = offsets[i] + (ce - cb);
+    }
+    seq_t *cost = (seq_t *)malloc(sizeof(seq_t) * MAX(offsets[l1], 1));
+    if (!cost) {
+        printf("Error: dtw_warping_path_banded - Cannot allocate memory (size=%zu)\n", offsets[l1]);
+        free(band);
+        return INFINITY;
+    }
+    
+    seq_t result = INFINITY;
+    bool abandoned = false;
+    for (i=0; i<l1; i++) {
+        minrow = INFINITY;
+        for (j=band[2 * i]; j<band[2 * i + 1]; j++) {
+            idx = offsets[i] + j - band[2 * i];
+            if (euclidean) {
+                d = fabs(s1[i] - s2[j]);
+            } else {
+                d = SEDIST(s1[i], s2[j]);
+            }
+            if (d > max_step) {
+                cost[idx] = INFINITY;
+                continue;
+            }
+            if (i == 0 && j == 0) {
+                minv = 0;
+            } else {
+                minv = INFINITY;
+            }
+            if (i > 0) {
+                idxp = offsets[i - 1] - band[2 * (i - 1)];
+                if (j > band[2 * (i - 1)] && j - 1 < band[2 * (i - 1) + 1]) {
+                    minv = cost[idxp + j - 1];
+                }
+                if (j >= band[2 * (i - 1)] && j < band[2 * (i - 1) + 1]) {
+                    tempv = cost[idxp + j] + penalty_horizontal;
+                    if (tempv < minv) {
+                        minv = tempv;
+                    }
+                }
+            }
+            if (j > band[2 * i]) {
+                tempv = cost[idx - 1] + penalty_vertical;
+                if (tempv < minv) {
+                    minv = tempv;
+                }
+            }
+            cost[idx] = d + minv;
+            if (cost[idx] < minrow) {
+                minrow = cost[idx];
+            }
+        }
+        if (minrow == INFINITY || minrow > max_dist_row) {
+            // All paths through this row are too long
+            abandoned = true;
+            break;
+        }
+    }
+    if (!abandoned && band[2 * l1 - 1] == l2) {
+        result = cost[offsets[l1] - 1];
+    }
+    if (result > max_dist_row) {
+        result = INFINITY;
+    }
+    
+    if (result != INFINITY) {
+        i = l1 - 1;
+        j = l2 - 1;
+        k = 0;
+        while (true) {
+            i1[k] = i;
+            i2[k] = j;
+            k++;
+            if (i == 0 && j == 0) {
+                break;
+            }
+            diagv = INFINITY;
+            upv = INFINITY;
+            leftv = INFINITY;
+            if (i > 0) {
+                idxp = offsets[i - 1] - band[2 * (i - 1)];
+                if (j > band[2 * (i - 1)] && j - 1 < band[2 * (i - 1) + 1]) {
+                    diagv = cost[idxp + j - 1];
+                }
+                if (j >= band[2 * (i - 1)] && j < band[2 * (i - 1) + 1]) {
+                    upv = cost[idxp + j] + penalty_horizontal;
+                }
+            }
+            if (j > band[2 * i]) {
+                leftv = cost[offsets[i] + j - band[2 * i] - 1] + penalty_vertical;
+            }
+            if (diagv <= upv && diagv <= leftv) {
+                i--;
+                j--;
+            } else if (upv <= leftv) {
+                i--;
+            } else {
+                j--;
+            }
+        }
+        *length_i = k;
+    }
+    free(cost);
+    free(band);
+    if (!euclidean) {
+        result = sqrt(result);
+    }
+    if (settings->max_dist != 0 && result > settings->max_dist) {
+        result = INFINITY;
+        *length_i = 0;
+    }
+    return result;
+}
+
+/*!
+ Compute warping path between two sequences.
+ 
+ @param from_s First sequence
+ @param from_l Length of first sequence
+ @param to_s Second sequence
+ @param to_l Length of second sequence
+ @param from_i Stores warping path indices for the first sequence
+ @param to_i Stores warping path indices for the second sequence
+ @param length_i Stores resulting path  length for from_i and to_i
+ @param settings Settings object
+ @return distance
+ */
+seq_t dtw_warping_path(seq_t *from_s, idx_t from_l, seq_t* to_s, idx_t to_l, idx_t *from_i, idx_t *to_i, idx_t * length_i, DTWSettings * settings) {
+    return dtw_warping_path_ndim(from_s, from_l, to_s, to_l, from_i, to_i, length_i, 1, settings);
+}
+
+seq_t dtw_warping_path_ndim(seq_t *from_s, idx_t from_l, seq_t* to_s, idx_t to_l, idx_t *from_i, idx_t *to_i, idx_t * length_i, int ndim, DTWSettings * settings) {
+    if (ndim == 1 && settings->band != NULL && from_l > 0 && to_l > 0 &&
+        settings->psi_1b == 0 && settings->psi_1e == 0 && settings->psi_2b == 0 && settings->psi_2e == 0) {
+        return dtw_warping_path_banded(from_s, from_l, to_s, to_l, from_i, to_i, length_i, settings);
+    }
+    idx_t wps_length = dtw_settings_wps_length(from_l, to_l, settings);
+    seq_t *wps = (seq_t *)malloc(wps_length * sizeof(seq_t));
+    if (wps == NULL) {
+        printf("ERROR: Cannot allocate memory for storing the cumulative cost matrix (wps)");
+        exit(1);
+    }
+    seq_t d;
+    if (settings->inner_dist == 1) {
+        d = dtw_warping_paths_ndim_euclidean(wps, from_s, from_l, to_s, to_l, true, true, true,                        ndim, settings);
+    } else {
+        d = dtw_warping_paths_ndim(wps, from_s, from_l, to_s, to_l, true, true, true,                        ndim, settings);
+        d = sqrt(d);
+    }
+    *length_i = dtw_best_path(wps, from_i, to_i, from_l, to_l, settings);
+    free(wps);
+    return d;
+}
+
+/*!
  Sample probabilistically warping path between two sequences.
  
  @return length of path
@@ -4063,6 +4885,13 @@ DTWWps dtw_wps_parts(idx_t l1, idx_t l2, DTWSettings * settings) {
         parts.ldiffr = 0;
         parts.ldiffc = parts.ldiff;
     }
+    if (dtw_settings_has_band(settings)) {
+        // Only store the columns that can be reached given the band
+        idx_t band_window = dtw_settings_band_window(l1, l2, settings);
+        if (parts.window == 0 || band_window < parts.window) {
+            parts.window = band_window;
+        }
+    }
     if (parts.window == 0) {
         parts.window = MAX(l1, l2);
         parts.width = l2 + 1;
@@ -4863,6 +5692,158 @@ DDPath dtw_wph_wp_sqeuc_typei(idx_t f_i0, idx_t f_il,
 }
 
 
+// MARK: WP Approx
+
+/*!
+ Project a warping path between two series that were halved in length to a band
+ for the series at full resolution and widen it with radius cells in all directions.
+ 
+ @param i1 Path indices for the first (halved) sequence, reverse ordered
+ @param i2 Path indices for the second (halved) sequence, reverse ordered
+ @param length Length of the path
+ @param l1 Length of the first sequence at full resolution
+ @param l2 Length of the second sequence at full resolution
+ @param radius Number of extra cells to add around the projected path
+ @param band Array of length 2*l1 to store for every row the first column and the
+    column after the last column (see the band field of DTWSettings)
+ */
+void dtw_band_from_path(idx_t *i1, idx_t *i2, idx_t length, idx_t l1, idx_t l2, idx_t radius,
+                        idx_t *band) {
+    idx_t i, k, r, cb, ce;
+    for (i=0; i<l1; i++) {
+        band[2 * i] = l2;
+        band[2 * i + 1] = 0;
+    }
+    for (k=0; k<length; k++) {
+        cb = 2 * i2[k];
+        ce = MIN(cb + 2, l2);
+        for (r=2*i1[k]; r<MIN(2*i1[k] + 2, l1); r++) {
+            if (cb < band[2 * r]) {
+                band[2 * r] = cb;
+            }
+            if (ce > band[2 * r + 1]) {
+                band[2 * r + 1] = ce;
+            }
+        }
+    }
+    // The path is monotone, thus the smallest begin in rows [i-radius, i+radius] is
+    // the one of row i-radius and the largest end is the one of row i+radius.
+    for (i=l1; i>0; i--) {
+        r = (i - 1 > radius) ? i - 1 - radius : 0;
+        band[2 * (i - 1)] = (band[2 * r] > radius) ? band[2 * r] - radius : 0;
+    }
+    for (i=0; i<l1; i++) {
+        r = MIN(i + radius, l1 - 1);
+        band[2 * i + 1] = MIN(band[2 * r + 1] + radius, l2);
+    }
+}
+
+/*!
+ Compute an approximate DTW and warping path with a multiresolution approach (FastDTW).
+ 
+ The series are halved in length by averaging pairs of values (PAA), the warping
+ path between the shorter series is computed recursively, projected to the original
+ resolution, widened with radius cells and used as band (see DTWSettings) for
+ `dtw_warping_path`. The number of cells that is computed is linear
+ in the length of the series. The settings are only applied at full resolution, the
+ window, psi and band settings should not be set.
+ 
+ Salvador, S., & Chan, P. (2007). FastDTW: Toward accurate dynamic time warping
+ in linear time and space. Intelligent Data Analysis, 11(5), 561-580.
+ 
+ @param s1 First sequence
+ @param l1 Length of first sequence
+ @param s2 Second sequence
+ @param l2 Length of second sequence
+ @param radius Number of cells around the projected path that are also explored
+ @param i1 Array of length l1+l2 to store the indices for the first sequence.
+    Reverse ordered. If NULL, only the distance is computed.
+ @param i2 Array of length l1+l2 to store the indices for the second sequence.
+    Reverse ordered.
+ @param length_i Stores resulting path length
+ @param settings Settings object
+ @return distance
+ */
+seq_t dtw_warping_path_approx(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, idx_t radius,
+                              idx_t *i1, idx_t *i2, idx_t *length_i,
+                              DTWSettings *settings) {
+    idx_t i, cl1, cl2, clength = 0;
+    seq_t d;
+    if (length_i != NULL) {
+        *length_i = 0;
+    }
+    if (l1 == 0 || l2 == 0) {
+        return INFINITY;
+    }
+    DTWSettings band_settings = *settings;
+    idx_t *band = NULL;
+    if (l1 > radius + 2 && l2 > radius + 2) {
+        cl1 = (l1 + 1) / 2;
+        cl2 = (l2 + 1) / 2;
+        seq_t *cs = (seq_t *)malloc(sizeof(seq_t) * (cl1 + cl2));
+        idx_t *ci = (idx_t *)malloc(sizeof(idx_t) * 2 * (cl1 + cl2));
+        band = (idx_t *)malloc(sizeof(idx_t) * 2 * l1);
+        if (!cs || !ci || !band) {
+            printf("Error: dtw_warping_path_approx - Cannot allocate memory (size=%zu)\n", cl1 + cl2);
+            free(cs);
+            free(ci);
+            free(band);
+            return INFINITY;
+        }
+        for (i=0; i<l1/2; i++) {
+            cs[i] = (s1[2*i] + s1[2*i + 1]) / 2;
+        }
+        if (l1 % 2 == 1) {
+            cs[cl1 - 1] = s1[l1 - 1];
+        }
+        for (i=0; i<l2/2; i++) {
+            cs[cl1 + i] = (s2[2*i] + s2[2*i + 1]) / 2;
+        }
+        if (l2 % 2 == 1) {
+            cs[cl1 + cl2 - 1] = s2[l2 - 1];
+        }
+        // Constraints are only meaningful at full resolution
+        DTWSettings coarse_settings = *settings;
+        coarse_settings.max_dist = 0;
+        coarse_settings.max_step = 0;
+        coarse_settings.max_length_diff = 0;
+        coarse_settings.use_pruning = false;
+        dtw_warping_path_approx(cs, cl1, &cs[cl1], cl2, radius,
+                                ci, &ci[cl1 + cl2], &clength, &coarse_settings);
+        if (clength > 0) {
+            dtw_band_from_path(ci, &ci[cl1 + cl2], clength, l1, l2, radius, band);
+            band_settings.band = band;
+            band_settings.band_length = l1;
+        }
+        free(cs);
+        free(ci);
+    }
+    // Also without path, because dtw_distance resets full rows and is thus quadratic
+    idx_t *pi = i1;
+    idx_t path_length = 0;
+    if (i1 == NULL) {
+        pi = (idx_t *)malloc(sizeof(idx_t) * 2 * (l1 + l2));
+        if (!pi) {
+            printf("Error: dtw_warping_path_approx - Cannot allocate memory (size=%zu)\n", 2 * (l1 + l2));
+            free(band);
+            return INFINITY;
+        }
+        i2 = &pi[l1 + l2];
+    }
+    d = dtw_warping_path(s1, l1, s2, l2, pi, i2, &path_length, &band_settings);
+    if (d == INFINITY) {
+        path_length = 0;
+    }
+    if (i1 == NULL) {
+        free(pi);
+    } else {
+        *length_i = path_length;
+    }
+    free(band);
+    return d;
+}
+
+
 // MARK: Bounds
 
 /*!
@@ -4905,155 +5886,523 @@ seq_t ub_euclidean_ndim_euclidean(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, int
 
 
 
+/* Inner distance used by the lower bounds (in the cost space). */
+static inline seq_t lb_cost(seq_t a, seq_t b, int inner_dist) {
+    if (inner_dist == 1) {
+        return fabs(a - b);
+    }
+    return (a - b) * (a - b);
+}
+
+/* Transform from the cost space to the distance space. */
+static inline seq_t lb_result(seq_t v, int inner_dist) {
+    if (inner_dist == 1) {
+        return v;
+    }
+    return sqrt(v);
+}
+
+/* Transform from the distance space to the cost space. */
+static inline seq_t lb_inner_val(seq_t v, int inner_dist) {
+    if (inner_dist == 1) {
+        return v;
+    }
+    return v * v;
+}
+
+
+/*!
+ Check whether the lower bounds are valid for the given settings.
+
+ Psi-relaxation allows to skip the beginning and end of the series, this
+ is not supported by the lower bounds. All other settings can only increase
+ the DTW distance.
+ */
+bool lb_is_valid(DTWSettings *settings) {
+    return (settings->psi_1b == 0 && settings->psi_1e == 0 &&
+            settings->psi_2b == 0 && settings->psi_2e == 0);
+}
+
+
 /*!
- Keogh lower bound for DTW.
+ Envelope of series s when compared to a series of length l_other.
+
+ The upper (lower) envelope at position i is the maximum (minimum) value of s
+ in the window around i that is allowed by the warping band.
+
+ The window slides monotonically over s, the minimum and maximum are thus
+ maintained with two monotonic queues. This requires O(l + l_other) operations,
+ independent of the window size.
+
+ Lemire, D. Streaming maximum-minimum filter using no more than three
+ comparisons per element. Nordic Journal of Computing, 13(4), 2006.
+
+ @param s Series to compute the envelope for
+ @param l Length of s
+ @param l_other Length of the series that will be compared with the envelope
+ @param settings DTW settings (window)
+ @param lower Array of length l_other to store the lower envelope
+ @param upper Array of length l_other to store the upper envelope
  */
-seq_t lb_keogh(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings) {
-    if (settings->inner_dist == 1) {
-        return lb_keogh_euclidean(s1, l1, s2, l2, settings);
-    }
+void lb_envelope(seq_t *s, idx_t l, idx_t l_other, DTWSettings *settings, seq_t *lower, seq_t *upper) {
     idx_t window = settings->window;
     if (window == 0) {
-        window = MAX(l1, l2);
+        window = MAX(l_other, l);
     }
-    idx_t imin, imax;
-    seq_t t = 0;
-    seq_t ui;
-    seq_t li;
-    seq_t ci;
+    idx_t i, j, imin, imax;
     idx_t imin_diff = window - 1;
-    if (l1 > l2) {
-        imin_diff += l1 - l2;
+    if (l_other > l) {
+        imin_diff += l_other - l;
     }
     idx_t imax_diff = window;
-    if (l2 > l1) {
-        imax_diff += l2 - l1;
+    if (l > l_other) {
+        imax_diff += l - l_other;
+    }
+    // Every index is added at most once, thus queues do not need to wrap around
+    idx_t *queues = (idx_t *)malloc(sizeof(idx_t) * 2 * l);
+    if (!queues) {
+        printf("Error: lb_envelope - Cannot allocate memory (size=%zu)\n", 2 * l);
+        // Trivial envelope, results in a lower bound of 0
+        for (i=0; i<l_other; i++) {
+            upper[i] = INFINITY;
+            lower[i] = -INFINITY;
+        }
+        return;
     }
-    for (idx_t i=0; i<l1; i++) {
+    idx_t *uq = queues;      // indices with decreasing values, front is the maximum
+    idx_t *lq = &queues[l];  // indices with increasing values, front is the minimum
+    idx_t uq_b = 0, uq_e = 0, lq_b = 0, lq_e = 0;
+    j = 0;
+    for (i=0; i<l_other; i++) {
         if (i > imin_diff) {
             imin = i - imin_diff;
         } else {
             imin = 0;
         }
         imax = i + imax_diff;
-        if (imax > l2) {
-            imax = l2;
+        if (imax > l) {
+            imax = l;
         }
-        ui = 0;
-        for (idx_t j=imin; j<imax; j++) {
-            if (s2[j] > ui) {
-                ui = s2[j];
+        for (; j<imax; j++) {
+            while (uq_e > uq_b && s[uq[uq_e - 1]] <= s[j]) {
+                uq_e--;
             }
-        }
-        li = INFINITY;
-        for (idx_t j=imin; j<imax; j++) {
-            if (s2[j] < li) {
-                li = s2[j];
+            uq[uq_e++] = j;
+            while (lq_e > lq_b && s[lq[lq_e - 1]] >= s[j]) {
+                lq_e--;
             }
+            lq[lq_e++] = j;
         }
-        ci = s1[i];
-        if (ci > ui) {
-            t += (ci - ui)*(ci - ui);
-        } else if (ci < li) {
-            t += (li - ci)*(li - ci);
+        while (uq_e > uq_b && uq[uq_b] < imin) {
+            uq_b++;
         }
+        while (lq_e > lq_b && lq[lq_b] < imin) {
+            lq_b++;
+        }
+        upper[i] = (uq_e > uq_b) ? s[uq[uq_b]] : -INFINITY;
+        lower[i] = (lq_e > lq_b) ? s[lq[lq_b]] : INFINITY;
     }
-    t = sqrt(t);
-    return t;
+    free(queues);
 }
 
 
 /*!
- Keogh lower bound for DTW.
+ Envelopes of all series in a matrix, used to avoid recomputing the envelope
+ of the same series for every pair in a distance matrix.
+
+ Only computed if the lower bounds will be used (use_lb and max_dist set).
+
+ @param matrix 2-dimensional array with series of equal length
+ @param nb_rows Number of series
+ @param nb_cols Length of the series (also the length of the other series)
+ @param settings DTW settings
+ @return Array of size nb_rows*2*nb_cols with for each row the lower envelope
+    followed by the upper envelope, or NULL. Should be freed by the caller.
  */
-seq_t lb_keogh_euclidean(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings) {
-    idx_t window = settings->window;
-    if (window == 0) {
-        window = MAX(l1, l2);
+seq_t* lb_envelopes_matrix(seq_t *matrix, idx_t nb_rows, idx_t nb_cols, DTWSettings *settings) {
+    if (!settings->use_lb || settings->max_dist == 0 || !lb_is_valid(settings)) {
+        return NULL;
     }
-    idx_t imin, imax;
-    seq_t t = 0;
-    seq_t ui;
-    seq_t li;
-    seq_t ci;
-    idx_t imin_diff = window - 1;
-    if (l1 > l2) {
-        imin_diff += l1 - l2;
+    seq_t *envs = (seq_t *)malloc(sizeof(seq_t) * nb_rows * 2 * nb_cols);
+    if (!envs) {
+        return NULL;
     }
-    idx_t imax_diff = window;
-    if (l2 > l1) {
-        imax_diff += l2 - l1;
+    for (idx_t r=0; r<nb_rows; r++) {
+        lb_envelope(&matrix[r*nb_cols], nb_cols, nb_cols, settings,
+                    &envs[r*2*nb_cols], &envs[r*2*nb_cols + nb_cols]);
     }
+    return envs;
+}
+
+
+/* Keogh lower bound in the cost space, stop early when larger than threshold. */
+static seq_t lb_keogh_envelope_cost(seq_t *s1, idx_t l1, seq_t *lower, seq_t *upper,
+                                    seq_t threshold, int inner_dist) {
+    seq_t t = 0;
+    seq_t ci;
     for (idx_t i=0; i<l1; i++) {
-        if (i > imin_diff) {
-            imin = i - imin_diff;
-        } else {
-            imin = 0;
-        }
-        imax = i + imax_diff;
-        if (imax > l2) {
-            imax = l2;
-        }
-        ui = 0;
-        for (idx_t j=imin; j<imax; j++) {
-            if (s2[j] > ui) {
-                ui = s2[j];
-            }
-        }
-        li = INFINITY;
-        for (idx_t j=imin; j<imax; j++) {
-            if (s2[j] < li) {
-                li = s2[j];
-            }
-        }
         ci = s1[i];
-        if (ci > ui) {
-            t += fabs(ci - ui);
-        } else if (ci < li) {
-            t += li - ci;
+        if (ci > upper[i]) {
+            t += lb_cost(ci, upper[i], inner_dist);
+        } else if (ci < lower[i]) {
+            t += lb_cost(ci, lower[i], inner_dist);
+        }
+        if (t > threshold) {
+            break;
         }
     }
     return t;
 }
 
 
-// MARK: Block
+/*!
+ Keogh lower bound for DTW given the envelope of the second series.
 
-/* Create settings struct with default values (all extras deactivated). */
-DTWBlock dtw_block_empty(void) {
-    DTWBlock b = {
-        .rb = 0,  // row-begin
-        .re = 0,  // row-end
-        .cb = 0,  // column-begin
-        .ce = 0,  // column-end
-        .triu = true // only fill upper triangular marix
-    };
-    return b;
+ @param s1 First series
+ @param l1 Length of s1
+ @param lower Lower envelope of the second series, see lb_envelope (length l1)
+ @param upper Upper envelope of the second series, see lb_envelope (length l1)
+ @param settings DTW settings
+ */
+seq_t lb_keogh_envelope(seq_t *s1, idx_t l1, seq_t *lower, seq_t *upper, DTWSettings *settings) {
+    if (!lb_is_valid(settings)) {
+        return 0;
+    }
+    dtw_stats_merge_lb(false);
+    return lb_result(lb_keogh_envelope_cost(s1, l1, lower, upper, INFINITY, settings->inner_dist),
+                     settings->inner_dist);
 }
 
 
-void dtw_block_print(DTWBlock *block) {
-    printf("DTWBlock {\n");
-    printf("  rb = %zu\n", block->rb);
-    printf("  re = %zu\n", block->re);
-    printf("  cb = %zu\n", block->cb);
-    printf("  ce = %zu\n", block->ce);
-    printf("  triu = %s\n", block->triu ? "true" : "false");
-    printf("}\n");
+/*!
+ Keogh lower bound for DTW.
+ */
+seq_t lb_keogh(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings) {
+    if (!lb_is_valid(settings)) {
+        return 0;
+    }
+    dtw_stats_merge_lb(false);
+    seq_t *env = (seq_t *)malloc(sizeof(seq_t) * 2 * l1);
+    if (!env) {
+        printf("Error: lb_keogh - Cannot allocate memory (size=%zu)\n", 2 * l1);
+        return 0;
+    }
+    lb_envelope(s2, l2, l1, settings, env, &env[l1]);
+    seq_t t = lb_keogh_envelope_cost(s1, l1, env, &env[l1], INFINITY, settings->inner_dist);
+    free(env);
+    return lb_result(t, settings->inner_dist);
 }
 
 
-bool dtw_block_is_valid(DTWBlock *block, idx_t nb_series_r, idx_t nb_series_c) {
-    if (block->rb >= block->re) {
-        printf("ERROR: Block row range is 0 or smaller\n");
-        return false;
+/*!
+ Keogh lower bound for DTW with the Euclidean inner distance.
+ */
+seq_t lb_keogh_euclidean(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings) {
+    DTWSettings s = *settings;
+    s.inner_dist = 1;
+    return lb_keogh(s1, l1, s2, l2, &s);
+}
+
+
+/*!
+ Cumulative Keogh lower bound, used by EAPrunedDTW.
+
+ Every warping path visits every row i at least once, thus the cost of row i is at
+ least the distance between s1[i] and the envelope of s2 at i.
+
+ @param cb Array of length l1 + 1, cb[i] is a lower bound (in the cost space) on the
+    cost of rows i, ..., l1-1 of any warping path. cb[l1] = 0.
+ @param buffer Array of length 2*l1 to store the envelope of s2
+ */
+void lb_keogh_cumulative(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings,
+                         seq_t *cb, seq_t *buffer) {
+    seq_t *lower = buffer;
+    seq_t *upper = &buffer[l1];
+    dtw_stats_merge_lb(false);
+    lb_envelope(s2, l2, l1, settings, lower, upper);
+    cb[l1] = 0;
+    for (idx_t i=l1; i-- > 0;) {
+        cb[i] = cb[i + 1];
+        if (s1[i] > upper[i]) {
+            cb[i] += lb_cost(s1[i], upper[i], settings->inner_dist);
+        } else if (s1[i] < lower[i]) {
+            cb[i] += lb_cost(s1[i], lower[i], settings->inner_dist);
+        }
     }
-    if (block->cb >= block->ce) {
-        printf("ERROR: Block row range is 0 or smaller\n");
-        return false;
+}
+
+
+/* Kim lower bound in the cost space (first and last points). */
+static seq_t lb_kim_cost(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, int inner_dist) {
+    if (l1 == 0 || l2 == 0) {
+        return 0;
     }
-    if (block->rb >= nb_series_r) {
-        printf("ERROR: Block rb exceeds number of series\n");
+    seq_t t = lb_cost(s1[0], s2[0], inner_dist);
+    if (l1 > 1 || l2 > 1) {
+        t += lb_cost(s1[l1 - 1], s2[l2 - 1], inner_dist);
+    }
+    return t;
+}
+
+
+/*!
+ Kim lower bound for DTW.
+
+ Every warping path starts by matching the first points and ends by matching the
+ last points of both series (LB_Kim_FL).
+
+ Kim, S. W., Park, S., & Chu, W. W. An index-based approach for similarity search
+ supporting time warping in large sequence databases. ICDE 2001.
+ */
+seq_t lb_kim(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings) {
+    if (!lb_is_valid(settings)) {
+        return 0;
+    }
+    dtw_stats_merge_lb(false);
+    return lb_result(lb_kim_cost(s1, l1, s2, l2, settings->inner_dist), settings->inner_dist);
+}
+
+
+/* Second term of LB_Improved: the Keogh bound of s2 with the envelope of the
+ projection of s1 on the envelope of s2 (lower, upper). Buffer needs l1 + 2*l2
+ elements. */
+static seq_t lb_improved_cost(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, seq_t *lower, seq_t *upper,
+                              seq_t threshold, DTWSettings *settings, seq_t *buffer) {
+    seq_t *h = buffer;
+    seq_t *lower_h = &buffer[l1];
+    seq_t *upper_h = &buffer[l1 + l2];
+    for (idx_t i=0; i<l1; i++) {
+        if (s1[i] > upper[i]) {
+            h[i] = upper[i];
+        } else if (s1[i] < lower[i]) {
+            h[i] = lower[i];
+        } else {
+            h[i] = s1[i];
+        }
+    }
+    lb_envelope(h, l1, l2, settings, lower_h, upper_h);
+    return lb_keogh_envelope_cost(s2, l2, lower_h, upper_h, threshold, settings->inner_dist);
+}
+
+
+/*!
+ Improved lower bound for DTW (LB_Improved) given the envelope of the second series.
+
+ @param s1 First series
+ @param l1 Length of s1
+ @param s2 Second series
+ @param l2 Length of s2
+ @param lower Lower envelope of s2, see lb_envelope (length l1)
+ @param upper Upper envelope of s2, see lb_envelope (length l1)
+ @param settings DTW settings
+ */
+seq_t lb_improved_envelope(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, seq_t *lower, seq_t *upper,
+                           DTWSettings *settings) {
+    if (!lb_is_valid(settings)) {
+        return 0;
+    }
+    dtw_stats_merge_lb(false);
+    seq_t *buffer = (seq_t *)malloc(sizeof(seq_t) * (l1 + 2*l2));
+    if (!buffer) {
+        printf("Error: lb_improved - Cannot allocate memory (size=%zu)\n", l1 + 2*l2);
+        return 0;
+    }
+    seq_t t = lb_keogh_envelope_cost(s1, l1, lower, upper, INFINITY, settings->inner_dist);
+    t += lb_improved_cost(s1, l1, s2, l2, lower, upper, INFINITY, settings, buffer);
+    free(buffer);
+    return lb_result(t, settings->inner_dist);
+}
+
+
+/*!
+ Improved lower bound for DTW (LB_Improved).
+
+ LB_Keogh(s1, s2) plus the LB_Keogh between s2 and the projection of s1 on
+ the envelope of s2. This bound is always at least as tight as LB_Keogh(s1, s2).
+
+ Lemire, D. Faster retrieval with a two-pass dynamic-time-warping lower bound.
+ Pattern Recognition, 42(9), 2009.
+ */
+seq_t lb_improved(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings) {
+    if (!lb_is_valid(settings)) {
+        return 0;
+    }
+    seq_t *env = (seq_t *)malloc(sizeof(seq_t) * 2 * l1);
+    if (!env) {
+        printf("Error: lb_improved - Cannot allocate memory (size=%zu)\n", 2 * l1);
+        return 0;
+    }
+    lb_envelope(s2, l2, l1, settings, env, &env[l1]);
+    seq_t t = lb_improved_envelope(s1, l1, s2, l2, env, &env[l1], settings);
+    free(env);
+    return t;
+}
+
+
+/* Cascade of lower bounds, see lb_cascade_envelope (not counted in dtw_stats). */
+static seq_t lb_cascade_bound(seq_t *s1, idx_t l1, seq_t *lower1, seq_t *upper1,
+                              seq_t *s2, idx_t l2, seq_t *lower2, seq_t *upper2,
+                              seq_t threshold, DTWSettings *settings) {
+    int inner_dist = settings->inner_dist;
+    seq_t threshold_cost = lb_inner_val(threshold, inner_dist);
+    seq_t lb, t;
+    // LB_Kim
+    lb = lb_kim_cost(s1, l1, s2, l2, inner_dist);
+    if (lb > threshold_cost) {
+        return lb_result(lb, inner_dist);
+    }
+    // Buffer: [envelope s2 (2*l1)][projection h (l1)][envelope s1 or h (2*l2)]
+    seq_t *buffer = (seq_t *)malloc(sizeof(seq_t) * (3*l1 + 2*l2));
+    if (!buffer) {
+        return lb_result(lb, inner_dist);
+    }
+    // LB_Keogh(s1, s2), the envelope of s2 is reused by LB_Improved
+    if (lower2 == NULL || upper2 == NULL) {
+        lower2 = buffer;
+        upper2 = &buffer[l1];
+        lb_envelope(s2, l2, l1, settings, lower2, upper2);
+    }
+    seq_t lb_keogh_12 = lb_keogh_envelope_cost(s1, l1, lower2, upper2, threshold_cost, inner_dist);
+    lb = MAX(lb, lb_keogh_12);
+    if (lb > threshold_cost) {
+        free(buffer);
+        return lb_result(lb, inner_dist);
+    }
+    // LB_Keogh(s2, s1)
+    if (lower1 == NULL || upper1 == NULL) {
+        lower1 = &buffer[3*l1];
+        upper1 = &buffer[3*l1 + l2];
+        lb_envelope(s1, l1, l2, settings, lower1, upper1);
+    }
+    t = lb_keogh_envelope_cost(s2, l2, lower1, upper1, threshold_cost, inner_dist);
+    lb = MAX(lb, t);
+    if (lb > threshold_cost) {
+        free(buffer);
+        return lb_result(lb, inner_dist);
+    }
+    // LB_Improved(s1, s2)
+    t = lb_keogh_12 + lb_improved_cost(s1, l1, s2, l2, lower2, upper2, threshold_cost - lb_keogh_12,
+                                       settings, &buffer[2*l1]);
+    lb = MAX(lb, t);
+    free(buffer);
+    return lb_result(lb, inner_dist);
+}
+
+
+/*!
+ Cascade of lower bounds for DTW.
+
+ The bounds are computed from cheap to expensive and the cascade stops as soon as
+ a bound is larger than the threshold:
+
+ 1. LB_Kim (first and last points)
+ 2. LB_Keogh(s1, s2)
+ 3. LB_Keogh(s2, s1)
+ 4. LB_Improved(s1, s2)
+
+ @param threshold Stop when a lower bound is larger than this value (in the
+    distance space, thus comparable to max_dist). Use INFINITY to compute all bounds.
+ @return The tightest lower bound that has been computed.
+ */
+seq_t lb_cascade(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, seq_t threshold, DTWSettings *settings) {
+    return lb_cascade_envelope(s1, l1, NULL, NULL, s2, l2, NULL, NULL, threshold, settings);
+}
+
+
+/*!
+ Cascade of lower bounds for DTW with precomputed envelopes.
+
+ @param s1 First series
+ @param l1 Length of s1
+ @param lower1 Lower envelope of s1 for a series of length l2 (see lb_envelope), or NULL
+ @param upper1 Upper envelope of s1 for a series of length l2, or NULL
+ @param s2 Second series
+ @param l2 Length of s2
+ @param lower2 Lower envelope of s2 for a series of length l1, or NULL
+ @param upper2 Upper envelope of s2 for a series of length l1, or NULL
+ @param threshold Stop when a lower bound is larger than this value
+ @param settings DTW settings
+ @see lb_cascade
+ */
+seq_t lb_cascade_envelope(seq_t *s1, idx_t l1, seq_t *lower1, seq_t *upper1,
+                          seq_t *s2, idx_t l2, seq_t *lower2, seq_t *upper2,
+                          seq_t threshold, DTWSettings *settings) {
+    if (!lb_is_valid(settings)) {
+        return 0;
+    }
+    dtw_stats_merge_lb(false);
+    return lb_cascade_bound(s1, l1, lower1, upper1, s2, l2, lower2, upper2, threshold, settings);
+}
+
+
+/*!
+ Check with the lower bound cascade whether the DTW distance is certainly larger
+ than settings->max_dist.
+
+ @return True if the DTW computation can be skipped.
+ */
+bool lb_cascade_prune(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings) {
+    return lb_cascade_prune_envelope(s1, l1, NULL, NULL, s2, l2, NULL, NULL, settings);
+}
+
+
+/*!
+ Same as lb_cascade_prune but with precomputed envelopes.
+
+ @see lb_cascade_envelope
+ */
+bool lb_cascade_prune_envelope(seq_t *s1, idx_t l1, seq_t *lower1, seq_t *upper1,
+                               seq_t *s2, idx_t l2, seq_t *lower2, seq_t *upper2,
+                               DTWSettings *settings) {
+    if (settings->max_dist == 0 || !lb_is_valid(settings)) {
+        return false;
+    }
+    // The tolerance avoids pruning a pair with distance max_dist because of rounding errors
+    seq_t threshold = settings->max_dist * (1 + SEQ_T_REL_TOL);
+    bool pruned = lb_cascade_bound(s1, l1, lower1, upper1, s2, l2, lower2, upper2,
+                                   threshold, settings) > threshold;
+    dtw_stats_merge_lb(pruned);
+    return pruned;
+}
+
+
+// MARK: Block
+
+/* Create settings struct with default values (all extras deactivated). */
+DTWBlock dtw_block_empty(void) {
+    DTWBlock b = {
+        .rb = 0,  // row-begin
+        .re = 0,  // row-end
+        .cb = 0,  // column-begin
+        .ce = 0,  // column-end
+        .triu = true // only fill upper triangular marix
+    };
+    return b;
+}
+
+
+void dtw_block_print(DTWBlock *block) {
+    printf("DTWBlock {\n");
+    printf("  rb = %zu\n", block->rb);
+    printf("  re = %zu\n", block->re);
+    printf("  cb = %zu\n", block->cb);
+    printf("  ce = %zu\n", block->ce);
+    printf("  triu = %s\n", block->triu ? "true" : "false");
+    printf("}\n");
+}
+
+
+bool dtw_block_is_valid(DTWBlock *block, idx_t nb_series_r, idx_t nb_series_c) {
+    if (block->rb >= block->re) {
+        printf("ERROR: Block row range is 0 or smaller\n");
+        return false;
+    }
+    if (block->cb >= block->ce) {
+        printf("ERROR: Block row range is 0 or smaller\n");
+        return false;
+    }
+    if (block->rb >= nb_series_r) {
+        printf("ERROR: Block rb exceeds number of series\n");
         return false;
     }
     if (block->re > nb_series_r) {
@@ -5072,6 +6421,303 @@ bool dtw_block_is_valid(DTWBlock *block, idx_t nb_series_r, idx_t nb_series_c) {
 }
 
 
+// MARK: Lanes
+
+/* Inter-pair SIMD: the DTW recurrence is computed for DTW_LANES pairs of
+ series of equal length at once. Series 1 is shared, the series 2 are
+ interleaved such that every cell of the dynamic programming matrix is a
+ vector of DTW_LANES independent values. The inner loop over the lanes has
+ no dependencies and is vectorized by the compiler. The instruction set is
+ chosen at runtime (if supported by the compiler), the default version is
+ portable C.
+*/
+
+#if defined(_OPENMP) && _OPENMP >= 201307
+#define DTW_LANES_SIMD _Pragma("omp simd")
+#else
+#define DTW_LANES_SIMD
+#endif
+
+#if defined(__GNUC__) && (defined(__x86_64__) || defined(__i386__))
+#define DTW_LANES_X86
+#define DTW_LANES_INLINE static inline __attribute__((always_inline))
+#elif defined(_MSC_VER)
+#define DTW_LANES_INLINE static __forceinline
+#else
+#define DTW_LANES_INLINE static inline
+#endif
+
+
+/*!
+Check whether the settings can be handled by the lanes kernel.
+
+The lanes kernel does not support psi-relaxation or a band (Itakura or per row) and only
+supports the squared Euclidean inner distance. The other settings are supported.
+Pruning is not performed per cell but the result is the same. Except for use_pruning
+together with max_step, the Euclidean upper bound then ignores max_step and can
+prune the best path, these settings are thus also handled by the pairwise kernel.
+*/
+bool dtw_distances_lanes_supported(DTWSettings *settings) {
+    return (settings->inner_dist == 0 &&
+            settings->psi_1b == 0 && settings->psi_1e == 0 &&
+            settings->psi_2b == 0 && settings->psi_2e == 0 &&
+            !(settings->use_pruning && settings->max_step != 0) &&
+            !dtw_settings_has_band(settings));
+}
+
+
+/*!
+Number of elements in the buffer used by the lanes kernel.
+
+@param l Length of the series
+@param settings DTW settings
+*/
+idx_t dtw_distances_lanes_buffer_length(idx_t l, DTWSettings *settings) {
+    idx_t window = settings->window;
+    if (window == 0) {
+        window = l;
+    }
+    idx_t length = MIN(l + 1, 2*window + 1);
+    return (l + 2*length + 2) * DTW_LANES;
+}
+
+
+DTW_LANES_INLINE void dtw_distance_lanes_kernel(seq_t *s1, seq_t *s2t, idx_t l, seq_t *buffer,
+                                                seq_t *result, idx_t nb, DTWSettings *settings) {
+    idx_t window = settings->window;
+    seq_t max_step = settings->max_step;
+    seq_t max_dist = settings->max_dist;
+    seq_t penalty_horizontal = settings->penalty_s2;
+    seq_t penalty_vertical = settings->penalty_s1;
+    idx_t i, j, k;
+
+    if (window == 0) {
+        window = l;
+    }
+    if (max_step == 0) {
+        max_step = INFINITY;
+    } else {
+        max_step = pow(max_step, 2);
+    }
+    // Cells are only pruned at the end, use_pruning does not change the result
+    // (not used together with max_step, see dtw_distances_lanes_supported).
+    // The tolerance avoids pruning the best path because of rounding errors, the
+    // order of the operations can differ from the pairwise kernel.
+    if (max_dist == 0) {
+        max_dist = INFINITY;
+    } else {
+        max_dist = pow(max_dist, 2) * (1 + SEQ_T_REL_TOL);
+    }
+    if (penalty_horizontal == 0 && penalty_vertical == 0 && settings->penalty != 0) {
+        penalty_horizontal = settings->penalty;
+        penalty_vertical = settings->penalty;
+    }
+    penalty_horizontal = pow(penalty_horizontal, 2);
+    penalty_vertical = pow(penalty_vertical, 2);
+    idx_t length = MIN(l + 1, 2*window + 1);
+    idx_t rowl = length * DTW_LANES;
+    seq_t *dtw = buffer;
+    seq_t *rowmin = &buffer[2 * rowl];
+    seq_t *prev;
+    seq_t *cur = dtw;
+    for (j=0; j<2*rowl; j++) {
+        dtw[j] = INFINITY;
+    }
+    for (k=0; k<DTW_LANES; k++) {
+        dtw[k] = 0;
+    }
+    idx_t skip = 0;
+    idx_t skipp = 0;
+    int i0 = 1;
+    int i1 = 0;
+    idx_t minj;
+    idx_t maxj;
+    idx_t window_1 = window - 1;
+    bool all_pruned;
+    // Only the nb used lanes are counted, not the unused lanes that repeat the last series.
+    // The pairs are counted by dtw_distances_lanes.
+    DTWStats stats = dtw_stats_default();
+    for (i=0; i<l; i++) {
+        maxj = (i - window_1) * (i > window_1);
+        minj = i + window;
+        if (minj > l) {
+            minj = l;
+        }
+        skipp = skip;
+        skip = maxj * (length != l + 1);
+        i0 = 1 - i0;
+        i1 = 1 - i1;
+        prev = &dtw[i0 * rowl];
+        cur = &dtw[i1 * rowl];
+        for (j=0; j<rowl; j++) {
+            cur[j] = INFINITY;
+        }
+        for (k=0; k<DTW_LANES; k++) {
+            rowmin[k] = INFINITY;
+        }
+        seq_t s1i = s1[i];
+        stats.cells += (minj - maxj) * nb;
+        for (j=maxj; j<minj; j++) {
+            seq_t *diag = &prev[(j - skipp) * DTW_LANES];
+            seq_t *left = &cur[(j - skip) * DTW_LANES];
+            seq_t *s2j = &s2t[j * DTW_LANES];
+            DTW_LANES_SIMD
+            for (k=0; k<DTW_LANES; k++) {
+                seq_t d = SEDIST(s1i, s2j[k]);
+                seq_t minv = diag[k];
+                seq_t tempv = diag[DTW_LANES + k] + penalty_horizontal;
+                minv = (tempv < minv) ? tempv : minv;
+                tempv = left[k] + penalty_vertical;
+                minv = (tempv < minv) ? tempv : minv;
+                tempv = (d > max_step) ? INFINITY : d + minv;
+                left[DTW_LANES + k] = tempv;
+                rowmin[k] = (tempv < rowmin[k]) ? tempv : rowmin[k];
+            }
+        }
+        // Stop if no lane can result in a distance below max_dist
+        all_pruned = true;
+        for (k=0; k<DTW_LANES; k++) {
+            if (rowmin[k] <= max_dist) {
+                all_pruned = false;
+            }
+        }
+        if (all_pruned) {
+            for (k=0; k<DTW_LANES; k++) {
+                result[k] = INFINITY;
+            }
+            stats.pairs_abandoned = nb;
+            stats.rows_abandoned = (l - 1 - i) * nb;
+            dtw_stats_merge(&stats);
+            return;
+        }
+    }
+    for (k=0; k<DTW_LANES; k++) {
+        result[k] = sqrt(cur[(l - skip) * DTW_LANES + k]);
+        if (settings->max_dist != 0 && result[k] > settings->max_dist * (1 + SEQ_T_REL_TOL)) {
+            result[k] = INFINITY;
+        }
+    }
+    dtw_stats_merge(&stats);
+}
+
+static void dtw_distance_lanes_default(seq_t *s1, seq_t *s2t, idx_t l, seq_t *buffer,
+                                       seq_t *result, idx_t nb, DTWSettings *settings) {
+    dtw_distance_lanes_kernel(s1, s2t, l, buffer, result, nb, settings);
+}
+
+#if defined(DTW_LANES_X86)
+__attribute__((target("avx2")))
+static void dtw_distance_lanes_avx2(seq_t *s1, seq_t *s2t, idx_t l, seq_t *buffer,
+                                    seq_t *result, idx_t nb, DTWSettings *settings) {
+    dtw_distance_lanes_kernel(s1, s2t, l, buffer, result, nb, settings);
+}
+
+__attribute__((target("avx512f")))
+static void dtw_distance_lanes_avx512(seq_t *s1, seq_t *s2t, idx_t l, seq_t *buffer,
+                                      seq_t *result, idx_t nb, DTWSettings *settings) {
+    dtw_distance_lanes_kernel(s1, s2t, l, buffer, result, nb, settings);
+}
+#endif
+
+
+/*!
+Select the lanes kernel for the instruction set supported by the CPU.
+*/
+DTWLanesFnPtr dtw_distance_lanes_select(void) {
+#if defined(DTW_LANES_X86)
+    __builtin_cpu_init();
+    if (__builtin_cpu_supports("avx512f")) {
+        return dtw_distance_lanes_avx512;
+    }
+    if (__builtin_cpu_supports("avx2")) {
+        return dtw_distance_lanes_avx2;
+    }
+#endif
+    return dtw_distance_lanes_default;
+}
+
+
+/*!
+Name of the instruction set used by the lanes kernel.
+*/
+const char* dtw_distance_lanes_isa(void) {
+    DTWLanesFnPtr fn = dtw_distance_lanes_select();
+#if defined(DTW_LANES_X86)
+    if (fn == dtw_distance_lanes_avx512) {
+        return "avx512f";
+    }
+    if (fn == dtw_distance_lanes_avx2) {
+        return "avx2";
+    }
+#endif
+    if (fn == dtw_distance_lanes_default) {
+        return "default";
+    }
+    return "unknown";
+}
+
+
+/*!
+Compute the DTW distances between one series and a range of series of the same length,
+DTW_LANES pairs at a time.
+
+@param s1 First series
+@param env1 Envelope of s1 (lower followed by upper, see lb_envelopes_matrix) or NULL
+@param matrix_c 2-dimensional array with series that are compared with s1
+@param envs_c Envelopes of the series in matrix_c (see lb_envelopes_matrix) or NULL
+@param nb_cols Length of s1 and of all series in matrix_c
+@param cb First series in matrix_c
+@param ce Last series (exclusive) in matrix_c
+@param output Array to store ce - cb distances
+@param buffer Array of length dtw_distances_lanes_buffer_length(nb_cols, settings)
+@param fn Lanes kernel, see dtw_distance_lanes_select
+@param settings DTW settings
+*/
+void dtw_distances_lanes(seq_t *s1, seq_t *env1, seq_t *matrix_c, seq_t *envs_c, idx_t nb_cols, idx_t cb, idx_t ce,
+                         seq_t *output, seq_t *buffer, DTWLanesFnPtr fn, DTWSettings *settings) {
+    idx_t c, j, k, nb;
+    idx_t cs[DTW_LANES];
+    seq_t *s2t = buffer;
+    seq_t *result = &buffer[nb_cols * DTW_LANES];
+    seq_t *dtw = &buffer[(nb_cols + 1) * DTW_LANES];
+    c = cb;
+    while (c < ce) {
+        // Select the next pairs that are not pruned by the lower bounds
+        nb = 0;
+        for (; c<ce && nb<DTW_LANES; c++) {
+            if (settings->use_lb && lb_cascade_prune_envelope(
+                    s1, nb_cols, env1, (env1 == NULL) ? NULL : &env1[nb_cols],
+                    &matrix_c[c*nb_cols], nb_cols,
+                    (envs_c == NULL) ? NULL : &envs_c[c*2*nb_cols],
+                    (envs_c == NULL) ? NULL : &envs_c[c*2*nb_cols + nb_cols], settings)) {
+                output[c - cb] = INFINITY;
+            } else {
+                cs[nb] = c;
+                nb++;
+            }
+        }
+        if (nb == 0) {
+            break;
+        }
+        // Interleave series, unused lanes repeat the last series
+        for (j=0; j<nb_cols; j++) {
+            for (k=0; k<DTW_LANES; k++) {
+                s2t[j*DTW_LANES + k] = matrix_c[cs[MIN(k, nb - 1)]*nb_cols + j];
+            }
+        }
+        fn(s1, s2t, nb_cols, dtw, result, nb, settings);
+        if (dtw_stats_enabled) {
+            DTWStats stats = dtw_stats_default();
+            stats.pairs = nb;
+            dtw_stats_merge(&stats);
+        }
+        for (k=0; k<nb; k++) {
+            output[cs[k] - cb] = result[k];
+        }
+    }
+}
+
+
 // MARK: Distance Matrix
 
 
@@ -5107,6 +6753,9 @@ idx_t dtw_distances_ptrs(seq_t **ptrs, idx_t nb_ptrs, idx_t* lengths,
 
     i = 0;
     for (r=block->rb; r<block->re; r++) {
+        if (dtw_control_stopped(settings->control)) {
+            break;
+        }
         if (block->triu && r + 1 > block->cb) {
             cb = r+1;
         } else {
@@ -5119,8 +6768,9 @@ idx_t dtw_distances_ptrs(seq_t **ptrs, idx_t nb_ptrs, idx_t* lengths,
             output[i] = value;
             i += 1;
         }
+        dtw_control_update(settings->control, (cb < block->ce) ? block->ce - cb : 0);
     }
-    assert(length == i);
+    assert(length == i || dtw_control_stopped(settings->control));
     return length;
 }
 
@@ -5143,6 +6793,9 @@ idx_t dtw_distances_matrix(seq_t *matrix, idx_t nb_rows, idx_t nb_cols,
     idx_t length;
     idx_t i;
     seq_t value;
+    seq_t *buffer = NULL;
+    DTWLanesFnPtr fn = NULL;
+    seq_t *envs = NULL;
 
     length = dtw_distances_length(block, nb_rows, nb_rows);
     if (length == 0) {
@@ -5157,13 +6810,32 @@ idx_t dtw_distances_matrix(seq_t *matrix, idx_t nb_rows, idx_t nb_cols,
         block->ce = nb_rows;
     }
 
+    if (dtw_distances_lanes_supported(settings)) {
+        buffer = (seq_t *)malloc(sizeof(seq_t) * dtw_distances_lanes_buffer_length(nb_cols, settings));
+        if (buffer) {
+            fn = dtw_distance_lanes_select();
+            envs = lb_envelopes_matrix(matrix, nb_rows, nb_cols, settings);
+        }
+    }
+
     i = 0;
     for (r=block->rb; r<block->re; r++) {
+        if (dtw_control_stopped(settings->control)) {
+            break;
+        }
         if (block->triu && r + 1 > block->cb) {
             cb = r+1;
         } else {
             cb = block->cb;
         }
+        if (buffer && cb < block->ce) {
+            dtw_distances_lanes(&matrix[r*nb_cols], (envs == NULL) ? NULL : &envs[r*2*nb_cols],
+                                matrix, envs, nb_cols, cb, block->ce,
+                                &output[i], buffer, fn, settings);
+            i += block->ce - cb;
+            dtw_control_update(settings->control, block->ce - cb);
+            continue;
+        }
         for (c=cb; c<block->ce; c++) {
             value = dtw_distance(&matrix[r*nb_cols], nb_cols,
                                  &matrix[c*nb_cols], nb_cols, settings);
@@ -5171,8 +6843,11 @@ idx_t dtw_distances_matrix(seq_t *matrix, idx_t nb_rows, idx_t nb_cols,
             output[i] = value;
             i += 1;
         }
+        dtw_control_update(settings->control, (cb < block->ce) ? block->ce - cb : 0);
     }
-    assert(length == i);
+    free(buffer);
+    free(envs);
+    assert(length == i || dtw_control_stopped(settings->control));
     return length;
 }
 
@@ -5212,6 +6887,9 @@ idx_t dtw_distances_ndim_matrix(seq_t *matrix, idx_t nb_rows, idx_t nb_cols, int
 
     i = 0;
     for (r=block->rb; r<block->re; r++) {
+        if (dtw_control_stopped(settings->control)) {
+            break;
+        }
         if (block->triu && r + 1 > block->cb) {
             cb = r+1;
         } else {
@@ -5225,8 +6903,9 @@ idx_t dtw_distances_ndim_matrix(seq_t *matrix, idx_t nb_rows, idx_t nb_cols, int
             output[i] = value;
             i += 1;
         }
+        dtw_control_update(settings->control, (cb < block->ce) ? block->ce - cb : 0);
     }
-    assert(length == i);
+    assert(length == i || dtw_control_stopped(settings->control));
     return length;
 }
 
@@ -5264,6 +6943,9 @@ idx_t dtw_distances_ndim_ptrs(seq_t **ptrs, idx_t nb_ptrs, idx_t* lengths, int n
 
     i = 0;
     for (r=block->rb; r<block->re; r++) {
+        if (dtw_control_stopped(settings->control)) {
+            break;
+        }
         if (block->triu && r + 1 > block->cb) {
             cb = r+1;
         } else {
@@ -5277,8 +6959,9 @@ idx_t dtw_distances_ndim_ptrs(seq_t **ptrs, idx_t nb_ptrs, idx_t* lengths, int n
             output[i] = value;
             i += 1;
         }
+        dtw_control_update(settings->control, (cb < block->ce) ? block->ce - cb : 0);
     }
-    assert(length == i);
+    assert(length == i || dtw_control_stopped(settings->control));
     return length;
 }
 
@@ -5297,6 +6980,10 @@ idx_t dtw_distances_matrices(seq_t *matrix_r, idx_t nb_rows_r, idx_t nb_cols_r,
     idx_t length;
     idx_t i;
     seq_t value;
+    seq_t *buffer = NULL;
+    DTWLanesFnPtr fn = NULL;
+    seq_t *envs_r = NULL;
+    seq_t *envs_c = NULL;
 
     length = dtw_distances_length(block, nb_rows_r, nb_rows_c);
     if (length == 0) {
@@ -5311,6 +6998,15 @@ idx_t dtw_distances_matrices(seq_t *matrix_r, idx_t nb_rows_r, idx_t nb_cols_r,
         block->ce = nb_rows_c;
     }
 
+    if (nb_cols_r == nb_cols_c && dtw_distances_lanes_supported(settings)) {
+        buffer = (seq_t *)malloc(sizeof(seq_t) * dtw_distances_lanes_buffer_length(nb_cols_r, settings));
+        if (buffer) {
+            fn = dtw_distance_lanes_select();
+            envs_r = lb_envelopes_matrix(matrix_r, nb_rows_r, nb_cols_r, settings);
+            envs_c = lb_envelopes_matrix(matrix_c, nb_rows_c, nb_cols_c, settings);
+        }
+    }
+
     i = 0;
     for (r=block->rb; r<block->re; r++) {
         if (block->triu && r + 1 > block->cb) {
@@ -5318,6 +7014,13 @@ idx_t dtw_distances_matrices(seq_t *matrix_r, idx_t nb_rows_r, idx_t nb_cols_r,
         } else {
             cb = block->cb;
         }
+        if (buffer && cb < block->ce) {
+            dtw_distances_lanes(&matrix_r[r*nb_cols_r], (envs_r == NULL) ? NULL : &envs_r[r*2*nb_cols_r],
+                                matrix_c, envs_c, nb_cols_r, cb, block->ce,
+                                &output[i], buffer, fn, settings);
+            i += block->ce - cb;
+            continue;
+        }
         for (c=cb; c<block->ce; c++) {
             value = dtw_distance(&matrix_r[r*nb_cols_r], nb_cols_r,
                                  &matrix_c[c*nb_cols_c], nb_cols_c, settings);
@@ -5326,6 +7029,9 @@ idx_t dtw_distances_matrices(seq_t *matrix_r, idx_t nb_rows_r, idx_t nb_cols_r,
             i += 1;
         }
     }
+    free(buffer);
+    free(envs_r);
+    free(envs_c);
     assert(length == i);
     return length;
 }
@@ -5380,6 +7086,106 @@ idx_t dtw_distances_ndim_matrices(seq_t *matrix_r, idx_t nb_rows_r, idx_t nb_col
 }
 
 
+/*!
+Distance matrix for DTW between two lists of pointers to arrays (e.g. to
+compare a set of series with another set of series).
+
+@param ptrs_r Pointers to arrays for the rows.  The arrays are expected to be 1-dimensional.
+@param nb_ptrs_r Length of ptrs_r array
+@param lengths_r Array of length nb_ptrs_r with all lengths of the arrays in ptrs_r.
+@param ptrs_c Pointers to arrays for the columns.
+@param nb_ptrs_c Length of ptrs_c array
+@param lengths_c Array of length nb_ptrs_c with all lengths of the arrays in ptrs_c.
+@param output Array to store all outputs (should be nb_ptrs_r*nb_ptrs_c if block->triu is false)
+@param block Restrict to a certain block of combinations of series.
+@param settings DTW settings
+*/
+idx_t dtw_distances_ptrs_ptrs(seq_t **ptrs_r, idx_t nb_ptrs_r, idx_t* lengths_r,
+                              seq_t **ptrs_c, idx_t nb_ptrs_c, idx_t* lengths_c,
+                              seq_t* output, DTWBlock* block, DTWSettings* settings) {
+    idx_t r, c, cb;
+    idx_t length;
+    idx_t i;
+    seq_t value;
+
+    length = dtw_distances_length(block, nb_ptrs_r, nb_ptrs_c);
+    if (length == 0) {
+        return 0;
+    }
+
+    // Correct block
+    if (block->re == 0) {
+        block->re = nb_ptrs_r;
+    }
+    if (block->ce == 0) {
+        block->ce = nb_ptrs_c;
+    }
+
+    i = 0;
+    for (r=block->rb; r<block->re; r++) {
+        if (block->triu && r + 1 > block->cb) {
+            cb = r+1;
+        } else {
+            cb = block->cb;
+        }
+        for (c=cb; c<block->ce; c++) {
+            value = dtw_distance(ptrs_r[r], lengths_r[r],
+                                 ptrs_c[c], lengths_c[c], settings);
+            output[i] = value;
+            i += 1;
+        }
+    }
+    assert(length == i);
+    return length;
+}
+
+
+/*!
+Distance matrix for n-dimensional DTW between two lists of pointers to arrays.
+
+@see dtw_distances_ptrs_ptrs
+*/
+idx_t dtw_distances_ndim_ptrs_ptrs(seq_t **ptrs_r, idx_t nb_ptrs_r, idx_t* lengths_r,
+                                   seq_t **ptrs_c, idx_t nb_ptrs_c, idx_t* lengths_c, int ndim,
+                                   seq_t* output, DTWBlock* block, DTWSettings* settings) {
+    idx_t r, c, cb;
+    idx_t length;
+    idx_t i;
+    seq_t value;
+
+    length = dtw_distances_length(block, nb_ptrs_r, nb_ptrs_c);
+    if (length == 0) {
+        return 0;
+    }
+
+    // Correct block
+    if (block->re == 0) {
+        block->re = nb_ptrs_r;
+    }
+    if (block->ce == 0) {
+        block->ce = nb_ptrs_c;
+    }
+
+    i = 0;
+    for (r=block->rb; r<block->re; r++) {
+        if (block->triu && r + 1 > block->cb) {
+            cb = r+1;
+        } else {
+            cb = block->cb;
+        }
+        for (c=cb; c<block->ce; c++) {
+            value = dtw_distance_ndim(ptrs_r[r], lengths_r[r],
+                                      ptrs_c[c], lengths_c[c],
+                                      ndim, settings);
+            output[i] = value;
+            i += 1;
+        }
+    }
+    assert(length == i);
+    return length;
+}
+
+
 idx_t dtw_distances_length(DTWBlock *block, idx_t nb_series_r, idx_t nb_series_c) {
     // Note: int is usually 32-bit even on 64-bit systems
     idx_t ir;
@@ -5469,6 +7275,528 @@ idx_t dtw_distances_length(DTWBlock *block, idx_t nb_series_r, idx_t nb_series_c
     return length;
 }
 
+// MARK: Sparse
+
+DTWSparse dtw_sparse_empty(void) {
+    DTWSparse sparse = {
+        .rows = NULL,
+        .cols = NULL,
+        .values = NULL,
+        .length = 0,
+        .capacity = 0
+    };
+    return sparse;
+}
+
+
+void dtw_sparse_free(DTWSparse *sparse) {
+    free(sparse->rows);
+    free(sparse->cols);
+    free(sparse->values);
+    *sparse = dtw_sparse_empty();
+}
+
+
+/*!
+ Make sure that the sparse structure can store at least the given number of distances.
+
+ @return false if the memory cannot be allocated (the already stored distances are kept).
+ */
+bool dtw_sparse_reserve(DTWSparse *sparse, idx_t capacity) {
+    idx_t *rows, *cols;
+    seq_t *values;
+    if (capacity <= sparse->capacity) {
+        return true;
+    }
+    rows = (idx_t *)realloc(sparse->rows, sizeof(idx_t) * capacity);
+    if (!rows) {
+        return false;
+    }
+    sparse->rows = rows;
+    cols = (idx_t *)realloc(sparse->cols, sizeof(idx_t) * capacity);
+    if (!cols) {
+        return false;
+    }
+    sparse->cols = cols;
+    values = (seq_t *)realloc(sparse->values, sizeof(seq_t) * capacity);
+    if (!values) {
+        return false;
+    }
+    sparse->values = values;
+    sparse->capacity = capacity;
+    return true;
+}
+
+
+/*!
+ Add a distance to the sparse structure. The arrays grow geometrically.
+
+ @return false if the memory cannot be allocated.
+ */
+bool dtw_sparse_append(DTWSparse *sparse, idx_t r, idx_t c, seq_t value) {
+    if (sparse->length == sparse->capacity) {
+        if (!dtw_sparse_reserve(sparse, (sparse->capacity == 0) ? 1024 : 2 * sparse->capacity)) {
+            return false;
+        }
+    }
+    sparse->rows[sparse->length] = r;
+    sparse->cols[sparse->length] = c;
+    sparse->values[sparse->length] = value;
+    sparse->length += 1;
+    return true;
+}
+
+
+/*!
+ Add all distances in other to the sparse structure.
+
+ @return false if the memory cannot be allocated.
+ */
+bool dtw_sparse_extend(DTWSparse *sparse, DTWSparse *other) {
+    if (other->length == 0) {
+        return true;
+    }
+    if (!dtw_sparse_reserve(sparse, sparse->length + other->length)) {
+        return false;
+    }
+    memcpy(&sparse->rows[sparse->length], other->rows, sizeof(idx_t) * other->length);
+    memcpy(&sparse->cols[sparse->length], other->cols, sizeof(idx_t) * other->length);
+    memcpy(&sparse->values[sparse->length], other->values, sizeof(seq_t) * other->length);
+    sparse->length += other->length;
+    return true;
+}
+
+
+/*!
+Distance matrix where only the distances that are not infinity are stored.
+
+This is useful in combination with max_dist, all distances larger than max_dist
+are not stored. The memory that is used thus depends on the number of neighbors
+that are closer than max_dist instead of on the number of combinations.
+The distances are stored in row-major order.
+
+@param ptrs Pointers to arrays.  The arrays are expected to be C contiguous.
+@param nb_ptrs Length of ptrs array
+@param lengths Array of length nb_ptrs with all lengths of the arrays in ptrs.
+@param ndim Number of dimensions (if larger than 1, n-dimensional DTW is used)
+@param output Sparse structure to add the distances to
+@param block Restrict to a certain block of combinations of series.
+@param settings DTW settings
+@return Number of stored distances, -1 if memory could not be allocated.
+*/
+idx_t dtw_distances_sparse_ptrs(seq_t **ptrs, idx_t nb_ptrs, idx_t* lengths, int ndim,
+                                DTWSparse* output, DTWBlock* block, DTWSettings* settings) {
+    idx_t r, c, cb;
+    seq_t value;
+
+    if (dtw_distances_length(block, nb_ptrs, nb_ptrs) == 0) {
+        return 0;
+    }
+
+    // Correct block
+    if (block->re == 0) {
+        block->re = nb_ptrs;
+    }
+    if (block->ce == 0) {
+        block->ce = nb_ptrs;
+    }
+
+    for (r=block->rb; r<block->re; r++) {
+        if (block->triu && r + 1 > block->cb) {
+            cb = r+1;
+        } else {
+            cb = block->cb;
+        }
+        for (c=cb; c<block->ce; c++) {
+            if (ndim == 1) {
+                value = dtw_distance(ptrs[r], lengths[r], ptrs[c], lengths[c], settings);
+            } else {
+                value = dtw_distance_ndim(ptrs[r], lengths[r], ptrs[c], lengths[c], ndim, settings);
+            }
+            if (value < INFINITY && !dtw_sparse_append(output, r, c, value)) {
+                return -1;
+            }
+        }
+    }
+    return output->length;
+}
+
+// MARK: Query
+
+/*!
+ Insert a distance in a sorted buffer with the k best (smallest) distances.
+ 
+ @param kbest Buffer of length k, sorted in ascending order
+ @param k Length of the buffer
+ @param nb_kbest Number of values already in the buffer, will be updated
+ @param value Distance to insert
+ @return The k-th best distance if the buffer is full, INFINITY otherwise.
+ */
+seq_t dtw_kbest_insert(seq_t *kbest, idx_t k, idx_t *nb_kbest, seq_t value) {
+    idx_t i;
+    if (*nb_kbest < k) {
+        i = *nb_kbest;
+        *nb_kbest += 1;
+    } else if (value < kbest[k - 1]) {
+        i = k - 1;
+    } else {
+        return kbest[k - 1];
+    }
+    while (i > 0 && kbest[i - 1] > value) {
+        kbest[i] = kbest[i - 1];
+        i--;
+    }
+    kbest[i] = value;
+    if (*nb_kbest < k) {
+        return INFINITY;
+    }
+    return kbest[k - 1];
+}
+
+/*!
+ Settings to compare a query with a series when the k-th best distance found so far
+ is known. A comparison that exceeds this threshold cannot be in the top-k and can
+ be abandoned early.
+ 
+ @param settings Settings as given by the user
+ @param threshold Current k-th best distance (INFINITY if not known yet)
+ @return Copy of the settings with max_dist tightened to the threshold.
+ */
+DTWSettings dtw_settings_threshold(DTWSettings *settings, seq_t threshold) {
+    DTWSettings s = *settings;
+    if (threshold == INFINITY || threshold <= 0) {
+        return s;
+    }
+    if (s.max_dist == 0 || threshold < s.max_dist) {
+        s.max_dist = threshold;
+        // The threshold is at least as tight as the Euclidean upper bound
+        s.use_pruning = false;
+    }
+    return s;
+}
+
+/*!
+ Distances between one query and a set of series.
+ 
+ Series are given either as an array of pointers (ptrs and lengths) or as
+ a matrix (matrix and nb_cols).
+ 
+ @see dtw_distances_query_ptrs
+ */
+idx_t dtw_distances_query(seq_t *query, idx_t query_length,
+                          seq_t **ptrs, idx_t *lengths,
+                          seq_t *matrix, idx_t nb_cols,
+                          idx_t nb_series, int ndim, bool use_ndim,
+                          seq_t *output, idx_t k, DTWSettings *settings) {
+    idx_t i;
+    idx_t nb_kbest = 0;
+    seq_t threshold = INFINITY;
+    seq_t *kbest = NULL;
+    seq_t *s;
+    idx_t l;
+    DTWSettings lsettings = *settings;
+    seq_t *env_q = NULL;
+    
+    if (settings->use_lb && lb_is_valid(settings) && !use_ndim && matrix != NULL) {
+        // The envelope of the query is the same for all comparisons
+        env_q = (seq_t *)malloc(sizeof(seq_t) * 2 * nb_cols);
+        if (env_q) {
+            lb_envelope(query, query_length, nb_cols, settings, env_q, &env_q[nb_cols]);
+        }
+    }
+    if (k > 0 && k < nb_series) {
+        // If allocation fails, all distances are computed without pruning
+        kbest = (seq_t *)malloc(sizeof(seq_t) * k);
+    }
+    for (i=0; i<nb_series; i++) {
+        if (ptrs != NULL) {
+            s = ptrs[i];
+            l = lengths[i];
+        } else {
+            s = &matrix[i*nb_cols*ndim];
+            l = nb_cols;
+        }
+        if (kbest != NULL) {
+            lsettings = dtw_settings_threshold(settings, threshold);
+        }
+        if (use_ndim) {
+            output[i] = dtw_distance_ndim(query, query_length, s, l, ndim, &lsettings);
+        } else if (env_q != NULL) {
+            output[i] = dtw_distance_envelope(query, query_length, env_q, &env_q[nb_cols], s, l, &lsettings);
+        } else {
+            output[i] = dtw_distance(query, query_length, s, l, &lsettings);
+        }
+        if (kbest != NULL) {
+            threshold = dtw_kbest_insert(kbest, k, &nb_kbest, output[i]);
+        }
+    }
+    free(kbest);
+    free(env_q);
+    return nb_series;
+}
+
+/*!
+ Distances between one query and a list of series (one-vs-many).
+ 
+ If k > 0, the k-th best distance found so far is used as max_dist for the
+ remaining comparisons. Series that cannot be among the k nearest series are
+ then abandoned early and their distance is set to INFINITY. The k smallest
+ values in output are always exact.
+ 
+ @param query Query series
+ @param query_length Length of query
+ @param ptrs Pointers to arrays.  The arrays are expected to be 1-dimensional.
+ @param nb_ptrs Length of ptrs array
+ @param lengths Array of length nb_ptrs with all lengths of the arrays in ptrs.
+ @param output Array to store all outputs (should be of length nb_ptrs)
+ @param k Number of nearest series that are needed (0 for all distances)
+ @param settings Settings for distance functions
+ @return Length of output
+ */
+idx_t dtw_distances_query_ptrs(seq_t *query, idx_t query_length,
+                               seq_t **ptrs, idx_t nb_ptrs, idx_t *lengths,
+                               seq_t *output, idx_t k, DTWSettings *settings) {
+    return dtw_distances_query(query, query_length, ptrs, lengths, NULL, 0,
+                               nb_ptrs, 1, false, output, k, settings);
+}
+
+/*!
+ Distances between one query and all rows in a matrix (one-vs-many).
+ 
+ @see dtw_distances_query_ptrs
+ */
+idx_t dtw_distances_query_matrix(seq_t *query, idx_t query_length,
+                                 seq_t *matrix, idx_t nb_rows, idx_t nb_cols,
+                                 seq_t *output, idx_t k, DTWSettings *settings) {
+    return dtw_distances_query(query, query_length, NULL, NULL, matrix, nb_cols,
+                               nb_rows, 1, false, output, k, settings);
+}
+
+/*!
+ Distances between one n-dimensional query and a list of series (one-vs-many).
+ 
+ @see dtw_distances_query_ptrs
+ */
+idx_t dtw_distances_query_ndim_ptrs(seq_t *query, idx_t query_length,
+                                    seq_t **ptrs, idx_t nb_ptrs, idx_t *lengths, int ndim,
+                                    seq_t *output, idx_t k, DTWSettings *settings) {
+    return dtw_distances_query(query, query_length, ptrs, lengths, NULL, 0,
+                               nb_ptrs, ndim, true, output, k, settings);
+}
+
+/*!
+ Distances between one n-dimensional query and all rows in a 3-dimensional array (one-vs-many).
+ 
+ @see dtw_distances_query_ptrs
+ */
+idx_t dtw_distances_query_ndim_matrix(seq_t *query, idx_t query_length,
+                                      seq_t *matrix, idx_t nb_rows, idx_t nb_cols, int ndim,
+                                      seq_t *output, idx_t k, DTWSettings *settings) {
+    return dtw_distances_query(query, query_length, NULL, NULL, matrix, nb_cols,
+                               nb_rows, ndim, true, output, k, settings);
+}
+
+/*!
+ Insert a distance and the corresponding index in the sorted buffers with the
+ k best (smallest) distances.
+
+ @see dtw_kbest_insert
+ */
+seq_t dtw_kbest_insert_idx(seq_t *kbest, idx_t *kbest_idx, idx_t k, idx_t *nb_kbest, seq_t value, idx_t idx) {
+    idx_t i;
+    if (*nb_kbest < k) {
+        i = *nb_kbest;
+        *nb_kbest += 1;
+    } else if (value < kbest[k - 1]) {
+        i = k - 1;
+    } else {
+        return kbest[k - 1];
+    }
+    while (i > 0 && kbest[i - 1] > value) {
+        kbest[i] = kbest[i - 1];
+        kbest_idx[i] = kbest_idx[i - 1];
+        i--;
+    }
+    kbest[i] = value;
+    kbest_idx[i] = idx;
+    if (*nb_kbest < k) {
+        return INFINITY;
+    }
+    return kbest[k - 1];
+}
+
+/*!
+ The k-th best distance of a row in the kNN graph (INFINITY if less than k neighbors are known).
+ */
+seq_t dtw_knn_threshold(seq_t *distances, idx_t *nb_kbest, idx_t k, idx_t r) {
+    if (nb_kbest[r] < k) {
+        return INFINITY;
+    }
+    return distances[r*k + k - 1];
+}
+
+/*!
+ Check whether the kNN graph can use the lanes kernel (series of equal length in a matrix).
+ */
+bool dtw_knn_graph_lanes_supported(seq_t *matrix, int ndim, DTWSettings *settings) {
+    return (matrix != NULL && ndim == 1 && dtw_distances_lanes_supported(settings));
+}
+
+/*!
+ Envelopes of all series in a matrix for the kNN graph (or NULL if use_lb is not set).
+ The max_dist is only known during the computation, thus the envelopes are also
+ computed if max_dist is not set.
+
+ @see lb_envelopes_matrix
+ */
+seq_t* dtw_knn_graph_envelopes(seq_t *matrix, idx_t nb_rows, idx_t nb_cols, DTWSettings *settings) {
+    DTWSettings esettings = *settings;
+    if (esettings.max_dist == 0) {
+        esettings.max_dist = INFINITY;
+    }
+    return lb_envelopes_matrix(matrix, nb_rows, nb_cols, &esettings);
+}
+
+/*!
+ Distances between series r and the series cb to ce (exclusive) for the kNN graph.
+
+ Series are given either as an array of pointers (ptrs and lengths) or as
+ a matrix (matrix and nb_cols). If buffer is given, the lanes kernel is used
+ (see dtw_knn_graph_lanes_supported).
+
+ @param output Array to store ce - cb distances
+ */
+void dtw_knn_graph_distances(seq_t **ptrs, idx_t *lengths, seq_t *matrix, idx_t nb_cols, int ndim,
+                             seq_t *envs, seq_t *buffer, DTWLanesFnPtr fn,
+                             idx_t r, idx_t cb, idx_t ce, seq_t *output, DTWSettings *settings) {
+    idx_t c;
+    if (buffer != NULL) {
+        dtw_distances_lanes(&matrix[r*nb_cols], (envs == NULL) ? NULL : &envs[r*2*nb_cols],
+                            matrix, envs, nb_cols, cb, ce, output, buffer, fn, settings);
+        return;
+    }
+    for (c=cb; c<ce; c++) {
+        if (ptrs != NULL && ndim == 1) {
+            output[c - cb] = dtw_distance(ptrs[r], lengths[r], ptrs[c], lengths[c], settings);
+        } else if (ptrs != NULL) {
+            output[c - cb] = dtw_distance_ndim(ptrs[r], lengths[r], ptrs[c], lengths[c], ndim, settings);
+        } else if (ndim == 1) {
+            output[c - cb] = dtw_distance(&matrix[r*nb_cols], nb_cols, &matrix[c*nb_cols], nb_cols, settings);
+        } else {
+            output[c - cb] = dtw_distance_ndim(&matrix[r*nb_cols*ndim], nb_cols,
+                                               &matrix[c*nb_cols*ndim], nb_cols, ndim, settings);
+        }
+    }
+}
+
+/*!
+ Exact k-nearest-neighbor graph of a set of series.
+
+ Every pair is compared only once and the distance is inserted in the k best
+ distances of both series. A comparison is abandoned as soon as it cannot be
+ among the k nearest neighbors of either series. The largest of both k-th best
+ distances found so far is thus used as max_dist (and for the lower bounds if
+ use_lb is set). For series of equal length, DTW_LANES pairs are compared at
+ once with the lanes kernel (the largest k-th best distance of all series in
+ the lanes is then used).
+
+ Series are given either as an array of pointers (ptrs and lengths) or as
+ a matrix (matrix and nb_cols).
+
+ @param nb_series Number of series
+ @param ndim Number of dimensions (if larger than 1, n-dimensional DTW is used)
+ @param k Number of neighbors
+ @param indices Array of size nb_series*k to store for every series the indices of
+    its nearest series, sorted by distance. The index is -1 if less than k neighbors
+    are found (e.g. because of max_dist).
+ @param distances Array of size nb_series*k to store the corresponding distances
+    (INFINITY if there is no neighbor).
+ @param settings DTW settings
+ @return nb_series, or -1 if memory could not be allocated.
+ */
+idx_t dtw_knn_graph(seq_t **ptrs, idx_t *lengths, seq_t *matrix, idx_t nb_cols,
+                    idx_t nb_series, int ndim, idx_t k,
+                    idx_t *indices, seq_t *distances, DTWSettings *settings) {
+    idx_t r, c, cb, ce, i;
+    idx_t step = 1;
+    idx_t *nb_kbest;
+    seq_t threshold;
+    seq_t values[DTW_LANES];
+    seq_t *buffer = NULL;
+    seq_t *envs = NULL;
+    DTWLanesFnPtr fn = NULL;
+    DTWSettings lsettings;
+
+    for (i=0; i<nb_series*k; i++) {
+        indices[i] = -1;
+        distances[i] = INFINITY;
+    }
+    if (k <= 0) {
+        return nb_series;
+    }
+    nb_kbest = (idx_t *)calloc(nb_series, sizeof(idx_t));
+    if (!nb_kbest) {
+        return -1;
+    }
+    if (dtw_knn_graph_lanes_supported(matrix, ndim, settings)) {
+        buffer = (seq_t *)malloc(sizeof(seq_t) * dtw_distances_lanes_buffer_length(nb_cols, settings));
+        if (buffer) {
+            fn = dtw_distance_lanes_select();
+            envs = dtw_knn_graph_envelopes(matrix, nb_series, nb_cols, settings);
+            step = DTW_LANES;
+        }
+    }
+
+    for (r=0; r<nb_series; r++) {
+        for (cb=r+1; cb<nb_series; cb+=step) {
+            ce = MIN(cb + step, nb_series);
+            threshold = dtw_knn_threshold(distances, nb_kbest, k, r);
+            for (c=cb; c<ce; c++) {
+                threshold = MAX(threshold, dtw_knn_threshold(distances, nb_kbest, k, c));
+            }
+            lsettings = dtw_settings_threshold(settings, threshold);
+            dtw_knn_graph_distances(ptrs, lengths, matrix, nb_cols, ndim, envs, buffer, fn,
+                                    r, cb, ce, values, &lsettings);
+            for (c=cb; c<ce; c++) {
+                if (values[c - cb] < INFINITY) {
+                    dtw_kbest_insert_idx(&distances[r*k], &indices[r*k], k, &nb_kbest[r], values[c - cb], c);
+                    dtw_kbest_insert_idx(&distances[c*k], &indices[c*k], k, &nb_kbest[c], values[c - cb], r);
+                }
+            }
+        }
+    }
+    free(buffer);
+    free(envs);
+    free(nb_kbest);
+    return nb_series;
+}
+
+/*!
+ Exact k-nearest-neighbor graph of a list of series.
+
+ @param ptrs Pointers to arrays.  The arrays are expected to be C contiguous.
+ @param nb_ptrs Length of ptrs array
+ @param lengths Array of length nb_ptrs with all lengths of the arrays in ptrs.
+ @see dtw_knn_graph
+ */
+idx_t dtw_knn_graph_ptrs(seq_t **ptrs, idx_t nb_ptrs, idx_t *lengths, int ndim, idx_t k,
+                         idx_t *indices, seq_t *distances, DTWSettings *settings) {
+    return dtw_knn_graph(ptrs, lengths, NULL, 0, nb_ptrs, ndim, k, indices, distances, settings);
+}
+
+/*!
+ Exact k-nearest-neighbor graph of all rows in a matrix.
+
+ @param matrix 2-dimensional (or 3-dimensional if ndim > 1) array with series of equal length
+ @param nb_rows Number of series
+ @param nb_cols Length of the series
+ @see dtw_knn_graph
+ */
+idx_t dtw_knn_graph_matrix(seq_t *matrix, idx_t nb_rows, idx_t nb_cols, int ndim, idx_t k,
+                           idx_t *indices, seq_t *distances, DTWSettings *settings) {
+    return dtw_knn_graph(NULL, NULL, matrix, nb_cols, nb_rows, ndim, k, indices, distances, settings);
+}
+
 // MARK: DBA
 
 /*!
@@ -41,6 +41,54 @@ static volatile int keepRunning = 1;
 //const int kSlantedBand = 1;
 
 
+/**
+Progress and cancellation of a distance matrix computation.
+
+@field done : Number of distances that are computed (updated by all threads). This counter
+       is not reset, such that it can count over multiple calls.
+@field total : Number of distances to compute (only informative, set by the caller).
+@field stop : Set to a non-zero value to stop the computation. The distances that
+       are not yet computed are not written to the output.
+@field callback : Function that is called after every row of the distance matrix, only by the
+       thread that started the computation. If it returns a non-zero value, stop is set to this value.
+       NULL if not used.
+@field callback_data : Pointer that is passed unchanged to be used by the callback.
+ */
+typedef struct DTWControl_s DTWControl;
+typedef int (*DTWControlFnPtr)(DTWControl *control);
+struct DTWControl_s {
+    idx_t done;
+    idx_t total;
+    volatile int stop;
+    DTWControlFnPtr callback;
+    void *callback_data;
+};
+
+
+/**
+Counters of the work done by the DTW kernels (see dtw_stats_enable).
+
+@field pairs : Number of DTW computations (pairs of series).
+@field cells : Number of cells in the DTW matrix that are computed.
+@field rows_abandoned : Number of rows that are skipped by early abandoning (EAPrunedDTW).
+@field pairs_abandoned : Number of pairs for which the DTW computation is abandoned early.
+@field pairs_pruned : Number of pairs that are skipped because a lower bound is larger than max_dist.
+@field lbs : Number of lower bound computations.
+ */
+struct DTWStats_s {
+    idx_t pairs;
+    idx_t cells;
+    idx_t rows_abandoned;
+    idx_t pairs_abandoned;
+    idx_t pairs_pruned;
+    idx_t lbs;
+};
+typedef struct DTWStats_s DTWStats;
+
+extern DTWStats dtw_stats;
+extern bool dtw_stats_enabled;
+
+
 /**
 Settings for DTW operations:
  
@@ -57,6 +105,19 @@ Settings for DTW operations:
        and/or end of both sequences.
 @field use_pruning : Compute Euclidean distance first to set max_dist (current value in
        max_dist is ignored).
+@field use_lb : Use the lower bound cascade (see lb_cascade) to skip the DTW computation
+       if the distance is certainly larger than max_dist.
+@field use_eapruning : Use EAPrunedDTW, abandon as soon as all cells in a row exceed max_dist
+       and tighten max_dist for every row with a lower bound on the remaining rows.
+@field itakura_slope : If larger than zero, restrict the warping paths to an Itakura parallelogram
+       with this maximal slope (should be at least 1, relative to the diagonal).
+@field band : Array with, for every row ri of the warping paths matrix, the range of columns
+       [band[2*ri], band[2*ri+1]) that can be used. NULL if not used.
+@field band_length : Number of rows in band, rows from band_length onwards are not restricted.
+@field control : Progress and cancellation for distance matrices (see DTWControl). NULL if not used.
+@field schedule : Order of the work in the parallel distance matrix functions for series of
+       different lengths. 0 = rows with guided scheduling, 1 = parts of rows ordered by
+       their estimated cost (longest first) with dynamic scheduling.
  */
 struct DTWSettings_s {
     idx_t window;
@@ -73,7 +134,13 @@ seq_t max_dist;
     bool use_pruning;
     int inner_dist; // 0=squared euclidean, 1=euclidean
     int window_type; // 0=band around two diagonals, 1=band around slanted diagonal
-    
+    bool use_lb;
+    bool use_eapruning;
+    seq_t itakura_slope;
+    idx_t *band;
+    idx_t band_length;
+    DTWControl *control;
+    int schedule; // 0=rows, 1=cost
 };
 typedef struct DTWSettings_s DTWSettings;
 
@@ -94,6 +161,25 @@ struct DTWBlock_s {
 };
 typedef struct DTWBlock_s DTWBlock;
 
+/**
+ Distances that are stored as (row, column, value) triplets. Only the distances
+ that are not infinity are stored (e.g. because they are larger than max_dist).
+
+ @field rows Row indices
+ @field cols Column indices
+ @field values Distances
+ @field length Number of stored distances
+ @field capacity Number of distances that fit in the allocated arrays
+ */
+struct DTWSparse_s {
+    idx_t *rows;
+    idx_t *cols;
+    seq_t *values;
+    idx_t length;
+    idx_t capacity;
+};
+typedef struct DTWSparse_s DTWSparse;
+
 struct DTWWps_s {
     idx_t ldiff;
     idx_t ldiffr;
@@ -121,12 +207,36 @@ idx_t       dtw_settings_wps_length(idx_t l1, idx_t l2, DTWSettings *settings);
 idx_t       dtw_settings_wps_width(idx_t l1, idx_t l2, DTWSettings *settings);
 void        dtw_settings_set_psi(idx_t psi, DTWSettings *settings);
 void        dtw_settings_print(DTWSettings *settings);
+bool        dtw_settings_has_band(DTWSettings *settings);
+void        dtw_itakura_row(idx_t ri, idx_t l1, idx_t l2, seq_t slope, idx_t *cb, idx_t *ce);
+void        dtw_settings_band_row(idx_t ri, idx_t l1, idx_t l2, DTWSettings *settings, idx_t *cb, idx_t *ce);
+bool        dtw_settings_band_has_euclidean(idx_t l1, idx_t l2, DTWSettings *settings);
+idx_t       dtw_settings_band_window(idx_t l1, idx_t l2, DTWSettings *settings);
+
+// Control
+DTWControl  dtw_control_default(void);
+bool        dtw_control_stopped(DTWControl *control);
+void        dtw_control_callback(DTWControl *control);
+void        dtw_control_update(DTWControl *control, idx_t nb);
+
+// Stats
+DTWStats    dtw_stats_default(void);
+void        dtw_stats_enable(bool enable);
+void        dtw_stats_reset(void);
+void        dtw_stats_merge(DTWStats *stats);
 
 // DTW
 typedef seq_t (*DTWFnPtr)(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings);
 
 seq_t dtw_distance(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings);
+seq_t dtw_distance_strided(seq_t *s1, idx_t l1, idx_t stride1, seq_t *s2, idx_t l2, idx_t stride2,
+                           DTWSettings *settings);
+seq_t dtw_distance_envelope(seq_t *s1, idx_t l1, seq_t *lower1, seq_t *upper1,
+                            seq_t *s2, idx_t l2, DTWSettings *settings);
 seq_t dtw_distance_ndim(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, int ndim, DTWSettings *settings);
+seq_t dtw_distance_ndim_strided(seq_t *s1, idx_t l1, idx_t stride1, idx_t dstride1,
+                                seq_t *s2, idx_t l2, idx_t stride2, idx_t dstride2,
+                                int ndim, DTWSettings *settings);
 seq_t dtw_distance_euclidean(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings);
 seq_t dtw_distance_ndim_euclidean(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, int ndim, DTWSettings *settings);
 
@@ -198,6 +308,13 @@ seq_t dtw_warping_paths_full_ndim_twice(seq_t *wps, seq_t *s1, idx_t l1, seq_t *
                                         bool return_dtw, bool keep_int_repr, bool psi_neg,
                                         int ndim, DTWSettings *settings);
 
+// WP Approx
+void  dtw_band_from_path(idx_t *i1, idx_t *i2, idx_t length, idx_t l1, idx_t l2, idx_t radius,
+                         idx_t *band);
+seq_t dtw_warping_path_approx(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, idx_t radius,
+                              idx_t *i1, idx_t *i2, idx_t *length_i,
+                              DTWSettings *settings);
+
 // Bound
 seq_t ub_euclidean(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2);
 seq_t ub_euclidean_ndim(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, int ndim);
@@ -205,12 +322,42 @@ seq_t ub_euclidean_euclidean(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2);
 seq_t ub_euclidean_ndim_euclidean(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, int ndim);
 seq_t lb_keogh(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings);
 seq_t lb_keogh_euclidean(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings);
+bool  lb_is_valid(DTWSettings *settings);
+void  lb_envelope(seq_t *s, idx_t l, idx_t l_other, DTWSettings *settings, seq_t *lower, seq_t *upper);
+seq_t* lb_envelopes_matrix(seq_t *matrix, idx_t nb_rows, idx_t nb_cols, DTWSettings *settings);
+seq_t lb_keogh_envelope(seq_t *s1, idx_t l1, seq_t *lower, seq_t *upper, DTWSettings *settings);
+void  lb_keogh_cumulative(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings,
+                          seq_t *cb, seq_t *buffer);
+seq_t lb_kim(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings);
+seq_t lb_improved(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings);
+seq_t lb_improved_envelope(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, seq_t *lower, seq_t *upper,
+                           DTWSettings *settings);
+seq_t lb_cascade(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, seq_t threshold, DTWSettings *settings);
+seq_t lb_cascade_envelope(seq_t *s1, idx_t l1, seq_t *lower1, seq_t *upper1,
+                          seq_t *s2, idx_t l2, seq_t *lower2, seq_t *upper2,
+                          seq_t threshold, DTWSettings *settings);
+bool  lb_cascade_prune(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings);
+bool  lb_cascade_prune_envelope(seq_t *s1, idx_t l1, seq_t *lower1, seq_t *upper1,
+                               seq_t *s2, idx_t l2, seq_t *lower2, seq_t *upper2,
+                               DTWSettings *settings);
 
 // Block
 DTWBlock dtw_block_empty(void);
 void     dtw_block_print(DTWBlock *block);
 bool     dtw_block_is_valid(DTWBlock *block, idx_t nb_series_r, idx_t nb_series_c);
 
+// Lanes
+#define DTW_LANES 8
+typedef void (*DTWLanesFnPtr)(seq_t *s1, seq_t *s2t, idx_t l, seq_t *buffer, seq_t *result, idx_t nb,
+                              DTWSettings *settings);
+
+bool          dtw_distances_lanes_supported(DTWSettings *settings);
+idx_t         dtw_distances_lanes_buffer_length(idx_t l, DTWSettings *settings);
+DTWLanesFnPtr dtw_distance_lanes_select(void);
+const char*   dtw_distance_lanes_isa(void);
+void          dtw_distances_lanes(seq_t *s1, seq_t *env1, seq_t *matrix_c, seq_t *envs_c,
+                                  idx_t nb_cols, idx_t cb, idx_t ce, seq_t *output, seq_t *buffer, DTWLanesFnPtr fn, DTWSettings *settings);
+
 // Distance matrix
 idx_t dtw_distances_ptrs(seq_t **ptrs, idx_t nb_ptrs, idx_t* lengths, seq_t* output,
                           DTWBlock* block, DTWSettings* settings);
@@ -226,8 +373,58 @@ idx_t dtw_distances_matrices(seq_t *matrix_r, idx_t nb_rows_r, idx_t nb_cols_r,
 idx_t dtw_distances_ndim_matrices(seq_t *matrix_r, idx_t nb_rows_r, idx_t nb_cols_r,
                                   seq_t *matrix_c, idx_t nb_rows_c, idx_t nb_cols_c, int ndim,
                                   seq_t* output, DTWBlock* block, DTWSettings* settings);
+idx_t dtw_distances_ptrs_ptrs(seq_t **ptrs_r, idx_t nb_ptrs_r, idx_t* lengths_r,
+                              seq_t **ptrs_c, idx_t nb_ptrs_c, idx_t* lengths_c,
+                              seq_t* output, DTWBlock* block, DTWSettings* settings);
+idx_t dtw_distances_ndim_ptrs_ptrs(seq_t **ptrs_r, idx_t nb_ptrs_r, idx_t* lengths_r,
+                                   seq_t **ptrs_c, idx_t nb_ptrs_c, idx_t* lengths_c, int ndim,
+                                   seq_t* output, DTWBlock* block, DTWSettings* settings);
 idx_t dtw_distances_length(DTWBlock *block, idx_t nb_series_r, idx_t nb_series_c);
 
+// Sparse distance matrix
+DTWSparse dtw_sparse_empty(void);
+void      dtw_sparse_free(DTWSparse *sparse);
+bool      dtw_sparse_reserve(DTWSparse *sparse, idx_t capacity);
+bool      dtw_sparse_append(DTWSparse *sparse, idx_t r, idx_t c, seq_t value);
+bool      dtw_sparse_extend(DTWSparse *sparse, DTWSparse *other);
+idx_t     dtw_distances_sparse_ptrs(seq_t **ptrs, idx_t nb_ptrs, idx_t* lengths, int ndim,
+                                    DTWSparse* output, DTWBlock* block, DTWSettings* settings);
+
+// Query
+seq_t dtw_kbest_insert(seq_t *kbest, idx_t k, idx_t *nb_kbest, seq_t value);
+DTWSettings dtw_settings_threshold(DTWSettings *settings, seq_t threshold);
+idx_t dtw_distances_query(seq_t *query, idx_t query_length,
+                          seq_t **ptrs, idx_t *lengths,
+                          seq_t *matrix, idx_t nb_cols,
+                          idx_t nb_series, int ndim, bool use_ndim,
+                          seq_t *output, idx_t k, DTWSettings *settings);
+idx_t dtw_distances_query_ptrs(seq_t *query, idx_t query_length,
+                               seq_t **ptrs, idx_t nb_ptrs, idx_t *lengths,
+                               seq_t *output, idx_t k, DTWSettings *settings);
+idx_t dtw_distances_query_matrix(seq_t *query, idx_t query_length,
+                                 seq_t *matrix, idx_t nb_rows, idx_t nb_cols,
+                                 seq_t *output, idx_t k, DTWSettings *settings);
+idx_t dtw_distances_query_ndim_ptrs(seq_t *query, idx_t query_length,
+                                    seq_t **ptrs, idx_t nb_ptrs, idx_t *lengths, int ndim,
+                                    seq_t *output, idx_t k, DTWSettings *settings);
+idx_t dtw_distances_query_ndim_matrix(seq_t *query, idx_t query_length,
+                                      seq_t *matrix, idx_t nb_rows, idx_t nb_cols, int ndim,
+                                      seq_t *output, idx_t k, DTWSettings *settings);
+seq_t dtw_kbest_insert_idx(seq_t *kbest, idx_t *kbest_idx, idx_t k, idx_t *nb_kbest, seq_t value, idx_t idx);
+seq_t dtw_knn_threshold(seq_t *distances, idx_t *nb_kbest, idx_t k, idx_t r);
+bool  dtw_knn_graph_lanes_supported(seq_t *matrix, int ndim, DTWSettings *settings);
+seq_t* dtw_knn_graph_envelopes(seq_t *matrix, idx_t nb_rows, idx_t nb_cols, DTWSettings *settings);
+void  dtw_knn_graph_distances(seq_t **ptrs, idx_t *lengths, seq_t *matrix, idx_t nb_cols, int ndim,
+                              seq_t *envs, seq_t *buffer, DTWLanesFnPtr fn,
+                              idx_t r, idx_t cb, idx_t ce, seq_t *output, DTWSettings *settings);
+idx_t dtw_knn_graph(seq_t **ptrs, idx_t *lengths, seq_t *matrix, idx_t nb_cols,
+                    idx_t nb_series, int ndim, idx_t k,
+                    idx_t *indices, seq_t *distances, DTWSettings *settings);
+idx_t dtw_knn_graph_ptrs(seq_t **ptrs, idx_t nb_ptrs, idx_t *lengths, int ndim, idx_t k,
+                         idx_t *indices, seq_t *distances, DTWSettings *settings);
+idx_t dtw_knn_graph_matrix(seq_t *matrix, idx_t nb_rows, idx_t nb_cols, int ndim, idx_t k,
+                           idx_t *indices, seq_t *distances, DTWSettings *settings);
+
 // DBA
 void dtw_dba_ptrs(seq_t **ptrs, idx_t nb_ptrs, idx_t* lengths,
                   seq_t *c, idx_t t, ba_t *mask, int prob_samples, int ndim,
@@ -17,7 +17,26 @@
 
 #include "dd_dtw.h"
 
+/**
+ Part of a row in a distance matrix, see dtw_schedule_ptrs.
+
+ @field r_i Row index in the block
+ @field cb Column begin
+ @field ce Column end (exclusive)
+ @field cost Estimated cost of the DTW computations
+ */
+typedef struct {
+    idx_t r_i;
+    idx_t cb;
+    idx_t ce;
+    double cost;
+} DTWScheduleItem;
+
 bool is_openmp_supported(void);
+void dtw_control_update_parallel(DTWControl *control, idx_t nb);
+double dtw_schedule_pair_cost(idx_t l1, idx_t l2, DTWSettings *settings);
+idx_t dtw_schedule_ptrs(idx_t *lengths, DTWBlock *block, idx_t *cbs, idx_t nb_parts,
+                        DTWScheduleItem **items, DTWSettings *settings);
 int    dtw_distances_prepare(DTWBlock *block, idx_t nb_series_r, idx_t nb_series_c, 
                              idx_t **cbs, idx_t **rls, idx_t *length, DTWSettings *settings);
 idx_t dtw_distances_ptrs_parallel(seq_t **ptrs, idx_t nb_ptrs, idx_t* lengths,
@@ -35,5 +54,38 @@ idx_t dtw_distances_ndim_matrices_parallel(seq_t *matrix_r, idx_t nb_rows_r, idx
                           seq_t *matrix_c, idx_t nb_rows_c, idx_t nb_cols_c, int ndim,
                                            seq_t* output, DTWBlock* block, DTWSettings* settings);
 
+idx_t dtw_distances_ptrs_ptrs_parallel(seq_t **ptrs_r, idx_t nb_ptrs_r, idx_t* lengths_r,
+                                       seq_t **ptrs_c, idx_t nb_ptrs_c, idx_t* lengths_c,
+                                       seq_t* output, DTWBlock* block, DTWSettings* settings);
+idx_t dtw_distances_ndim_ptrs_ptrs_parallel(seq_t **ptrs_r, idx_t nb_ptrs_r, idx_t* lengths_r,
+                                            seq_t **ptrs_c, idx_t nb_ptrs_c, idx_t* lengths_c, int ndim,
+                                            seq_t* output, DTWBlock* block, DTWSettings* settings);
+idx_t dtw_distances_sparse_ptrs_parallel(seq_t **ptrs, idx_t nb_ptrs, idx_t* lengths, int ndim,
+                                         DTWSparse* output, DTWBlock* block, DTWSettings* settings);
+idx_t dtw_knn_graph_parallel(seq_t **ptrs, idx_t *lengths, seq_t *matrix, idx_t nb_cols,
+                             idx_t nb_series, int ndim, idx_t k,
+                             idx_t *indices, seq_t *distances, DTWSettings *settings);
+idx_t dtw_knn_graph_ptrs_parallel(seq_t **ptrs, idx_t nb_ptrs, idx_t *lengths, int ndim, idx_t k,
+                                  idx_t *indices, seq_t *distances, DTWSettings *settings);
+idx_t dtw_knn_graph_matrix_parallel(seq_t *matrix, idx_t nb_rows, idx_t nb_cols, int ndim, idx_t k,
+                                    idx_t *indices, seq_t *distances, DTWSettings *settings);
+idx_t dtw_distances_query_parallel(seq_t *query, idx_t query_length,
+                                   seq_t **ptrs, idx_t *lengths,
+                                   seq_t *matrix, idx_t nb_cols,
+                                   idx_t nb_series, int ndim, bool use_ndim,
+                                   seq_t *output, idx_t k, DTWSettings *settings);
+idx_t dtw_distances_query_ptrs_parallel(seq_t *query, idx_t query_length,
+                                        seq_t **ptrs, idx_t nb_ptrs, idx_t *lengths,
+                                        seq_t *output, idx_t k, DTWSettings *settings);
+idx_t dtw_distances_query_matrix_parallel(seq_t *query, idx_t query_length,
+                                          seq_t *matrix, idx_t nb_rows, idx_t nb_cols,
+                                          seq_t *output, idx_t k, DTWSettings *settings);
+idx_t dtw_distances_query_ndim_ptrs_parallel(seq_t *query, idx_t query_length,
+                                             seq_t **ptrs, idx_t nb_ptrs, idx_t *lengths, int ndim,
+                                             seq_t *output, idx_t k, DTWSettings *settings);
+idx_t dtw_distances_query_ndim_matrix_parallel(seq_t *query, idx_t query_length,
+                                               seq_t *matrix, idx_t nb_rows, idx_t nb_cols, int ndim,
+                                               seq_t *output, idx_t k, DTWSettings *settings);
+
 
 #endif /* dtw_openmp_h */
@@ -16,8 +16,18 @@
 #include <assert.h>
 
 
-/* The sequence type type can be customized by changing the typedef. */
-typedef double seq_t;
+/* The sequence type type can be customized by changing the typedef.
+   Defining DTAI_SEQ_T_FLOAT compiles the library for single precision (float32)
+   values. The format is the Python buffer/array type code of seq_t. */
+#if defined(DTAI_SEQ_T_FLOAT)
+typedef float seq_t;
+#define SEQ_T_FORMAT "f"
+#define SEQ_T_REL_TOL 1e-5
+#else
+typedef double seq_t;  // default seq_t
+#define SEQ_T_FORMAT "d"  // default seq_t format
+#define SEQ_T_REL_TOL 1e-9  // relative tolerance for values computed in a different order
+#endif
 
 /*! The index type
  
@@ -0,0 +1,15 @@
+/*!
+@file dd_globals_f32.c
+@brief DTAIDistance.globals for single precision (float32) sequences
+
+Compiles dd_globals.c with seq_t defined as float. A separate file is used such
+that the object files for both precisions do not overwrite each other.
+
+@author Wannes Meert
+@copyright Copyright © 2025 Wannes Meert. Apache License, Version 2.0, see LICENSE for details.
+*/
+
+#ifndef DTAI_SEQ_T_FLOAT
+#define DTAI_SEQ_T_FLOAT
+#endif
+#include "dd_globals.c"
@@ -3,7 +3,9 @@
 @brief DTAIDistance.dtw
 
 @author Wannes Meert
+@author Johan Nygaard Vinther (Added asymmetric penalties for expanding/compressing series)
 @copyright Copyright © 2020 Wannes Meert. Apache License, Version 2.0, see LICENSE for details.
+@copyright Copyright © 2026 Johan Nygaard Vinther. Apache License, Version 2.0, see LICENSE for details.
 */
 #include "dd_dtw.h"
 
@@ -22,13 +24,22 @@ DTWSettings dtw_settings_default(void) {
         .max_step = 0,
         .max_length_diff = 0,
         .penalty = 0,
+        .penalty_s1 = 0,
+        .penalty_s2 = 0,
         .psi_1b = 0,
         .psi_1e = 0,
         .psi_2b = 0,
         .psi_2e = 0,
         .use_pruning = false,
         .inner_dist = 0,  // 0: squared euclidean, 1: euclidean
-        .window_type = 0
+        .window_type = 0,
+        .use_lb = false,
+        .use_eapruning = false,
+        .itakura_slope = 0,
+        .band = NULL,
+        .band_length = 0,
+        .control = NULL,
+        .schedule = 0
     };
     return s;
 }
@@ -51,6 +62,109 @@ void dtw_settings_set_psi(idx_t psi, DTWSettings *settings) {
     settings->psi_2e = psi;
 }
 
+/* True if the settings restrict the warping paths with an Itakura parallelogram or a custom band. */
+bool dtw_settings_has_band(DTWSettings *settings) {
+    return settings->itakura_slope > 0 || settings->band != NULL;
+}
+
+/* Columns [cb, ce) of row ri that are within the Itakura parallelogram, without connecting rows. */
+void dtw_itakura_row(idx_t ri, idx_t l1, idx_t l2, seq_t slope, idx_t *cb, idx_t *ce) {
+    if (l1 <= 1 || l2 <= 1) {
+        *cb = 0;
+        *ce = l2;
+        return;
+    }
+    if (slope < 1) {
+        slope = 1;
+    }
+    double a = (double)(l2 - 1) / (double)(l1 - 1);  // slope of the diagonal
+    double diag = ri * a;
+    double lower = MAX(diag / slope, (l2 - 1) - slope * a * (l1 - 1 - ri));
+    double upper = MIN(diag * slope, (l2 - 1) - a * (l1 - 1 - ri) / slope);
+    // Always include the diagonal such that no row is empty
+    lower = MIN(lower, floor(diag));
+    upper = MAX(upper, ceil(diag));
+    *cb = MAX(0, (idx_t)ceil(lower - 1e-9));
+    *ce = MIN(l2, (idx_t)floor(upper + 1e-9) + 1);
+}
+
+/*!
+ Columns that can be used in row ri of the warping paths matrix given the Itakura
+ parallelogram and custom band in the settings.
+ 
+ @param ri Row index
+ @param l1 Length of first series (number of rows)
+ @param l2 Length of second series (number of columns)
+ @param settings Settings object
+ @param cb Stores the first column
+ @param ce Stores the column after the last column
+ */
+void dtw_settings_band_row(idx_t ri, idx_t l1, idx_t l2, DTWSettings *settings, idx_t *cb, idx_t *ce) {
+    idx_t b, e, bn, en;
+    *cb = 0;
+    *ce = l2;
+    if (settings->itakura_slope > 0) {
+        dtw_itakura_row(ri, l1, l2, settings->itakura_slope, &b, &e);
+        if (ri + 1 < l1) {
+            // Connect to the next row (the diagonal can be steeper than one)
+            dtw_itakura_row(ri + 1, l1, l2, settings->itakura_slope, &bn, &en);
+            e = MAX(e, bn);
+        }
+        *cb = b;
+        *ce = e;
+    }
+    if (settings->band != NULL && ri < settings->band_length) {
+        *cb = MAX(*cb, settings->band[2 * ri]);
+        *ce = MIN(*ce, settings->band[2 * ri + 1]);
+    }
+}
+
+/*!
+ Check whether the path used by the Euclidean distance (see ub_euclidean) is within the
+ Itakura parallelogram and custom band. Only then it is an upper bound that can be
+ used for pruning (use_pruning).
+ */
+bool dtw_settings_band_has_euclidean(idx_t l1, idx_t l2, DTWSettings *settings) {
+    idx_t ri, cb, ce;
+    if (!dtw_settings_has_band(settings)) {
+        return true;
+    }
+    for (ri=0; ri<l1; ri++) {
+        dtw_settings_band_row(ri, l1, l2, settings, &cb, &ce);
+        if (cb > MIN(ri, l2 - 1) || ce <= MIN(ri, l2 - 1)) {
+            return false;
+        }
+    }
+    // The last element of s1 is compared to the remaining elements of s2
+    return ce == l2;
+}
+
+/*!
+ Smallest window (see DTWSettings) that includes all cells of the Itakura parallelogram and
+ custom band. Used to reduce the width of the compact warping paths matrix.
+ 
+ @return Window, or zero if no band is used
+ */
+idx_t dtw_settings_band_window(idx_t l1, idx_t l2, DTWSettings *settings) {
+    idx_t ri, cb, ce;
+    idx_t window = 1;
+    idx_t dl = (l1 > l2) ? l1 - l2 : 0;
+    idx_t dc = (l2 > l1) ? l2 - l1 : 0;
+    if (!dtw_settings_has_band(settings)) {
+        return 0;
+    }
+    for (ri=0; ri<l1; ri++) {
+        dtw_settings_band_row(ri, l1, l2, settings, &cb, &ce);
+        if (cb >= ce) {
+            continue;
+        }
+        // Window includes columns ri - dl - window + 1 <= ci < ri + dc + window
+        window = MAX(window, ri - dl - cb + 1);
+        window = MAX(window, ce - ri - dc);
+    }
+    return window;
+}
+
 void dtw_settings_print(DTWSettings *settings) {
     printf("DTWSettings {\n");
     printf("  window = %zu\n", settings->window);
@@ -63,15 +177,225 @@ void dtw_settings_print(DTWSettings *settings) {
     printf("  use_pruning = %d\n", settings->use_pruning);
     printf("  inner_dist = %d\n", settings->inner_dist);
     printf("  window_type = %d\n", settings->window_type);
+    printf("  use_lb = %d\n", settings->use_lb);
+    printf("  use_eapruning = %d\n", settings->use_eapruning);
+    printf("  itakura_slope = %f\n", settings->itakura_slope);
+    printf("  band_length = %zu\n", settings->band_length);
+    printf("  schedule = %d\n", settings->schedule);
     printf("}\n");
 }
 
+// MARK: Control
+
+DTWControl dtw_control_default(void) {
+    DTWControl c = {
+        .done = 0,
+        .total = 0,
+        .stop = 0,
+        .callback = NULL,
+        .callback_data = NULL
+    };
+    return c;
+}
+
+/*!
+ Whether the computation should stop.
+ */
+bool dtw_control_stopped(DTWControl *control) {
+    return control != NULL && control->stop != 0;
+}
+
+/*!
+ Call the callback function and stop if it returns a non-zero value.
+ Should only be called by the thread that started the computation.
+ */
+void dtw_control_callback(DTWControl *control) {
+    int stop;
+    if (control == NULL || control->callback == NULL || control->stop != 0) {
+        return;
+    }
+    stop = control->callback(control);
+    if (stop != 0) {
+        control->stop = stop;
+    }
+}
+
+/*!
+ Register that nb distances are computed (single thread).
+ 
+ @see dtw_control_update_parallel for the parallel version.
+ */
+void dtw_control_update(DTWControl *control, idx_t nb) {
+    if (control == NULL) {
+        return;
+    }
+    control->done += nb;
+    dtw_control_callback(control);
+}
+
+
+// MARK: Stats
+
+DTWStats dtw_stats = {0, 0, 0, 0, 0, 0};
+bool dtw_stats_enabled = false;
+
+DTWStats dtw_stats_default(void) {
+    DTWStats s = {
+        .pairs = 0,
+        .cells = 0,
+        .rows_abandoned = 0,
+        .pairs_abandoned = 0,
+        .pairs_pruned = 0,
+        .lbs = 0
+    };
+    return s;
+}
+
+/*!
+ Start or stop counting the work done by the DTW kernels in the global dtw_stats.
+ */
+void dtw_stats_enable(bool enable) {
+    dtw_stats_enabled = enable;
+}
+
+void dtw_stats_reset(void) {
+    dtw_stats = dtw_stats_default();
+}
+
+/*!
+ Add the counters of one computation to the global dtw_stats.
+
+ The kernels count in a local struct and merge at the end, such that threads
+ only synchronize once per computation. Does nothing if the stats are not enabled.
+ */
+/* Atomic add, also when compiled without OpenMP (e.g. for the threads of Python). */
+static void dtw_stats_atomic_add(idx_t *counter, idx_t value) {
+#if defined(_OPENMP)
+    #pragma omp atomic
+    *counter += value;
+#elif defined(__GNUC__) || defined(__clang__)
+    __atomic_fetch_add(counter, value, __ATOMIC_RELAXED);
+#else
+    *counter += value;
+#endif
+}
+
+void dtw_stats_merge(DTWStats *stats) {
+    if (!dtw_stats_enabled) {
+        return;
+    }
+    dtw_stats_atomic_add(&dtw_stats.pairs, stats->pairs);
+    dtw_stats_atomic_add(&dtw_stats.cells, stats->cells);
+    dtw_stats_atomic_add(&dtw_stats.rows_abandoned, stats->rows_abandoned);
+    dtw_stats_atomic_add(&dtw_stats.pairs_abandoned, stats->pairs_abandoned);
+    dtw_stats_atomic_add(&dtw_stats.pairs_pruned, stats->pairs_pruned);
+    dtw_stats_atomic_add(&dtw_stats.lbs, stats->lbs);
+}
+
+/* Count a lower bound computation and whether it pruned a pair. */
+static void dtw_stats_merge_lb(bool pruned) {
+    if (!dtw_stats_enabled) {
+        return;
+    }
+    DTWStats stats = dtw_stats_default();
+    stats.lbs = 1;
+    stats.pairs_pruned = pruned;
+    dtw_stats_merge(&stats);
+}
+
+
 // MARK: DTW
 
+
+/* Copy a strided series to a new contiguous array (the caller frees it). */
+static seq_t *dtw_gather(seq_t *s, idx_t l, idx_t stride, int ndim, idx_t dstride) {
+    seq_t *out = (seq_t *)malloc(sizeof(seq_t) * MAX(1, l * ndim));
+    if (!out) {
+        printf("Error: dtw_gather - Cannot allocate memory (size=%zu)\n", l * ndim);
+        return NULL;
+    }
+    for (idx_t i=0; i<l; i++) {
+        for (int d=0; d<ndim; d++) {
+            out[i * ndim + d] = s[i * stride + d * dstride];
+        }
+    }
+    return out;
+}
+
+
+/* Euclidean upper bound for strided n-dimensional series, see euclidean_distance_ndim. */
+static seq_t ub_euclidean_ndim_strided(seq_t *s1, idx_t l1, idx_t stride1, idx_t dstride1,
+                                       seq_t *s2, idx_t l2, idx_t stride2, idx_t dstride2, int ndim) {
+    seq_t ub = 0;
+    seq_t d;
+    // If the two series differ in length, the last element of the shortest series
+    // is compared to the remaining elements in the longer series
+    for (idx_t i=0; i<MAX(l1, l2); i++) {
+        idx_t i1 = MIN(i, l1 - 1) * stride1;
+        idx_t i2 = MIN(i, l2 - 1) * stride2;
+        d = 0;
+        for (int k=0; k<ndim; k++) {
+            d += SEDIST(s1[i1 + k * dstride1], s2[i2 + k * dstride2]);
+        }
+        ub += d;
+    }
+    return sqrt(ub);
+}
+
+
+/* Euclidean upper bound for strided series, see euclidean_distance. */
+static seq_t ub_euclidean_strided(seq_t *s1, idx_t l1, idx_t stride1,
+                                  seq_t *s2, idx_t l2, idx_t stride2) {
+    idx_t n = MIN(l1, l2);
+    seq_t ub = 0;
+    for (idx_t i=0; i<n; i++) {
+        ub += SEDIST(s1[i * stride1], s2[i * stride2]);
+    }
+    if (l1 > l2) {
+        for (idx_t i=n; i<l1; i++) {
+            ub += SEDIST(s1[i * stride1], s2[(n - 1) * stride2]);
+        }
+    } else if (l1 < l2) {
+        for (idx_t i=n; i<l2; i++) {
+            ub += SEDIST(s1[(n - 1) * stride1], s2[i * stride2]);
+        }
+    }
+    return sqrt(ub);
+}
+
 {% set suffix = '' %}
 {% set inner_dist = 'squaredeuclidean' %}
 {%- include 'dtw_distance.jinja.c' %}
 
+
+/*!
+Compute the DTW between two series, the lower bound cascade (if use_lb is set)
+uses the precomputed envelope of the first series.
+
+@param s1 First sequence
+@param l1 Length of first sequence
+@param lower1 Lower envelope of s1 for a series of length l2 (see lb_envelope)
+@param upper1 Upper envelope of s1 for a series of length l2
+@param s2 Second sequence
+@param l2 Length of second sequence
+@param settings A DTWSettings struct with options for the DTW algorithm.
+
+@see dtw_distance
+*/
+seq_t dtw_distance_envelope(seq_t *s1, idx_t l1, seq_t *lower1, seq_t *upper1,
+                            seq_t *s2, idx_t l2, DTWSettings *settings) {
+    if (!settings->use_lb) {
+        return dtw_distance(s1, l1, s2, l2, settings);
+    }
+    if (lb_cascade_prune_envelope(s1, l1, lower1, upper1, s2, l2, NULL, NULL, settings)) {
+        return INFINITY;
+    }
+    DTWSettings s = *settings;
+    s.use_lb = false;
+    return dtw_distance(s1, l1, s2, l2, &s);
+}
+
+
 {% set suffix = '_ndim' %}
 {% set inner_dist = 'squaredeuclidean' %}
 {%- include 'dtw_distance.jinja.c' %}
@@ -868,6 +1192,205 @@ idx_t dtw_best_path_prob(seq_t *wps, idx_t *i1, idx_t *i2, idx_t l1, idx_t l2, s
     return i;
 }
 
+/*!
+ Compute DTW and the warping path between two sequences when a custom band is used.
+ 
+ Only the cells in the band (intersected with the window and Itakura parallelogram)
+ are stored, thus memory is linear in the number of cells in the band instead of in
+ the width of the band around the diagonal. Used by `dtw_warping_path` when the
+ settings contain a band and no psi-relaxation. Rows are allowed to be
+ disconnected or empty, the distance is then infinity.
+ 
+ @param s1 First sequence
+ @param l1 Length of first sequence
+ @param s2 Second sequence
+ @param l2 Length of second sequence
+ @param i1 Stores the warping path indices for the first sequence, reverse ordered
+ @param i2 Stores the warping path indices for the second sequence, reverse ordered
+ @param length_i Stores resulting path length, zero if the distance is infinity
+ @param settings Settings object
+ @return distance
+ */
+static seq_t dtw_warping_path_banded(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2,
+                                     idx_t *i1, idx_t *i2, idx_t *length_i,
+                                     DTWSettings *settings) {
+    idx_t i, j, k, idx, idxp, cb, ce;
+    seq_t d, minv, tempv, minrow, diagv, upv, leftv;
+    bool euclidean = (settings->inner_dist == 1);
+    idx_t window = settings->window;
+    seq_t max_step = settings->max_step;
+    seq_t max_dist = settings->max_dist;
+    seq_t penalty_horizontal = settings->penalty_s2;  // vertical move in matrix (down) = expanding s2
+    seq_t penalty_vertical = settings->penalty_s1;    // horizontal move in matrix (right) = expanding s1
+    idx_t ldiff = (l1 > l2) ? l1 - l2 : l2 - l1;
+    idx_t dl = (l1 > l2) ? ldiff : 0;
+    
+    *length_i = 0;
+    if (settings->max_length_diff != 0 && ldiff > settings->max_length_diff) {
+        return INFINITY;
+    }
+    if (window == 0) {
+        window = MAX(l1, l2);
+    }
+    idx_t dl_window = dl + window - 1;
+    idx_t ldiff_window = window + ((l2 > l1) ? ldiff : 0);
+    if (settings->use_pruning && dtw_settings_band_has_euclidean(l1, l2, settings)) {
+        if (euclidean) {
+            max_dist = ub_euclidean_euclidean(s1, l1, s2, l2);
+        } else {
+            max_dist = ub_euclidean(s1, l1, s2, l2);
+        }
+    } else if (max_dist == 0) {
+        max_dist = INFINITY;
+    }
+    if (max_step == 0) {
+        max_step = INFINITY;
+    }
+    // For backward compatibility: if asymmetric penalties are not set, use symmetric penalty
+    if (penalty_horizontal == 0 && penalty_vertical == 0 && settings->penalty != 0) {
+        penalty_horizontal = settings->penalty;
+        penalty_vertical = settings->penalty;
+    }
+    if (!euclidean) {
+        max_dist = pow(max_dist, 2);
+        max_step = pow(max_step, 2);
+        penalty_horizontal = pow(penalty_horizontal, 2);
+        penalty_vertical = pow(penalty_vertical, 2);
+    }
+    // The tolerance avoids pruning the best path because of rounding errors
+    seq_t max_dist_row = max_dist * (1 + SEQ_T_REL_TOL);
+    
+    // Row i contains the columns band[2*i] <= j < band[2*i+1] and is stored from offsets[i]
+    idx_t *band = (idx_t *)malloc(sizeof(idx_t) * (3 * l1 + 1));
+    if (!band) {
+        printf("Error: dtw_warping_path_banded - Cannot allocate memory (size=%zu)\n", 3 * l1 + 1);
+        return INFINITY;
+    }
+    idx_t *offsets = &band[2 * l1];
+    offsets[0] = 0;
+    for (i=0; i<l1; i++) {
+        dtw_settings_band_row(i, l1, l2, settings, &cb, &ce);
+        cb = MAX(cb, (i > dl_window) ? i - dl_window : 0);
+        ce = MIN(ce, i + ldiff_window);
+        if (ce < cb) {
+            ce = cb;
+        }
+        band[2 * i] = cb;
+        band[2 * i + 1] = ce;
+        offsets[i + 1] = offsets[i] + (ce - cb);
+    }
+    seq_t *cost = (seq_t *)malloc(sizeof(seq_t) * MAX(offsets[l1], 1));
+    if (!cost) {
+        printf("Error: dtw_warping_path_banded - Cannot allocate memory (size=%zu)\n", offsets[l1]);
+        free(band);
+        return INFINITY;
+    }
+    
+    seq_t result = INFINITY;
+    bool abandoned = false;
+    for (i=0; i<l1; i++) {
+        minrow = INFINITY;
+        for (j=band[2 * i]; j<band[2 * i + 1]; j++) {
+            idx = offsets[i] + j - band[2 * i];
+            if (euclidean) {
+                d = fabs(s1[i] - s2[j]);
+            } else {
+                d = SEDIST(s1[i], s2[j]);
+            }
+            if (d > max_step) {
+                cost[idx] = INFINITY;
+                continue;
+            }
+            if (i == 0 && j == 0) {
+                minv = 0;
+            } else {
+                minv = INFINITY;
+            }
+            if (i > 0) {
+                idxp = offsets[i - 1] - band[2 * (i - 1)];
+                if (j > band[2 * (i - 1)] && j - 1 < band[2 * (i - 1) + 1]) {
+                    minv = cost[idxp + j - 1];
+                }
+                if (j >= band[2 * (i - 1)] && j < band[2 * (i - 1) + 1]) {
+                    tempv = cost[idxp + j] + penalty_horizontal;
+                    if (tempv < minv) {
+                        minv = tempv;
+                    }
+                }
+            }
+            if (j > band[2 * i]) {
+                tempv = cost[idx - 1] + penalty_vertical;
+                if (tempv < minv) {
+                    minv = tempv;
+                }
+            }
+            cost[idx] = d + minv;
+            if (cost[idx] < minrow) {
+                minrow = cost[idx];
+            }
+        }
+        if (minrow == INFINITY || minrow > max_dist_row) {
+            // All paths through this row are too long
+            abandoned = true;
+            break;
+        }
+    }
+    if (!abandoned && band[2 * l1 - 1] == l2) {
+        result = cost[offsets[l1] - 1];
+    }
+    if (result > max_dist_row) {
+        result = INFINITY;
+    }
+    
+    if (result != INFINITY) {
+        i = l1 - 1;
+        j = l2 - 1;
+        k = 0;
+        while (true) {
+            i1[k] = i;
+            i2[k] = j;
+            k++;
+            if (i == 0 && j == 0) {
+                break;
+            }
+            diagv = INFINITY;
+            upv = INFINITY;
+            leftv = INFINITY;
+            if (i > 0) {
+                idxp = offsets[i - 1] - band[2 * (i - 1)];
+                if (j > band[2 * (i - 1)] && j - 1 < band[2 * (i - 1) + 1]) {
+                    diagv = cost[idxp + j - 1];
+                }
+                if (j >= band[2 * (i - 1)] && j < band[2 * (i - 1) + 1]) {
+                    upv = cost[idxp + j] + penalty_horizontal;
+                }
+            }
+            if (j > band[2 * i]) {
+                leftv = cost[offsets[i] + j - band[2 * i] - 1] + penalty_vertical;
+            }
+            if (diagv <= upv && diagv <= leftv) {
+                i--;
+                j--;
+            } else if (upv <= leftv) {
+                i--;
+            } else {
+                j--;
+            }
+        }
+        *length_i = k;
+    }
+    free(cost);
+    free(band);
+    if (!euclidean) {
+        result = sqrt(result);
+    }
+    if (settings->max_dist != 0 && result > settings->max_dist) {
+        result = INFINITY;
+        *length_i = 0;
+    }
+    return result;
+}
+
 /*!
  Compute warping path between two sequences.
  
@@ -886,6 +1409,10 @@ seq_t dtw_warping_path(seq_t *from_s, idx_t from_l, seq_t* to_s, idx_t to_l, idx
 }
 
 seq_t dtw_warping_path_ndim(seq_t *from_s, idx_t from_l, seq_t* to_s, idx_t to_l, idx_t *from_i, idx_t *to_i, idx_t * length_i, int ndim, DTWSettings * settings) {
+    if (ndim == 1 && settings->band != NULL && from_l > 0 && to_l > 0 &&
+        settings->psi_1b == 0 && settings->psi_1e == 0 && settings->psi_2b == 0 && settings->psi_2e == 0) {
+        return dtw_warping_path_banded(from_s, from_l, to_s, to_l, from_i, to_i, length_i, settings);
+    }
     idx_t wps_length = dtw_settings_wps_length(from_l, to_l, settings);
     seq_t *wps = (seq_t *)malloc(wps_length * sizeof(seq_t));
     if (wps == NULL) {
@@ -925,8 +1452,23 @@ DTWWps dtw_wps_parts(idx_t l1, idx_t l2, DTWSettings * settings) {
     parts.window = settings->window;
     parts.max_step = settings->max_step;
     parts.penalty = settings->penalty;
+    parts.penalty_s1 = settings->penalty_s1;
+    parts.penalty_s2 = settings->penalty_s2;
+    
+    // For backward compatibility: if asymmetric penalties are not set, use symmetric penalty
+    if (parts.penalty_s1 == 0 && parts.penalty_s2 == 0 && parts.penalty != 0) {
+        parts.penalty_s1 = parts.penalty;
+        parts.penalty_s2 = parts.penalty;
+    }
+    
     if (settings->inner_dist == 0) {
         parts.penalty = pow(settings->penalty, 2);
+        if (parts.penalty_s1 != 0) {
+            parts.penalty_s1 = pow(parts.penalty_s1, 2);
+        }
+        if (parts.penalty_s2 != 0) {
+            parts.penalty_s2 = pow(parts.penalty_s2, 2);
+        }
     }
     if (parts.max_step == 0) {
         parts.max_step = INFINITY;
@@ -961,6 +1503,13 @@ DTWWps dtw_wps_parts(idx_t l1, idx_t l2, DTWSettings * settings) {
         parts.ldiffr = 0;
         parts.ldiffc = parts.ldiff;
     }
+    if (dtw_settings_has_band(settings)) {
+        // Only store the columns that can be reached given the band
+        idx_t band_window = dtw_settings_band_window(l1, l2, settings);
+        if (parts.window == 0 || band_window < parts.window) {
+            parts.window = band_window;
+        }
+    }
     if (parts.window == 0) {
         parts.window = MAX(l1, l2);
         parts.width = l2 + 1;
@@ -1037,6 +1586,14 @@ seq_t dtw_warping_paths_full_ndim_twice(seq_t *wps,
     const idx_t inf_rows = 1;
     idx_t width = l2 + inf_cols;
     const seq_t penalty = settings->penalty;
+    seq_t penalty_horizontal = settings->penalty_s2;  // vertical move in matrix (down) = expanding s2
+    seq_t penalty_vertical = settings->penalty_s1;    // horizontal move in matrix (right) = expanding s1
+    
+    // For backward compatibility: if asymmetric penalties are not set, use symmetric penalty
+    if (penalty_horizontal == 0 && penalty_vertical == 0 && penalty != 0) {
+        penalty_horizontal = penalty;
+        penalty_vertical = penalty;
+    }
 
     idx_t ri, ci, wpsi;
     seq_t d;
@@ -1093,9 +1650,9 @@ seq_t dtw_warping_paths_full_ndim_twice(seq_t *wps,
                 d += SEDIST(s1[ri_idx + d_i], s2[ci_idx + d_i]);
             }
             // Steps: typeI (0, 1), (1, 1), (1, 0)
-            values[0] = wps[ri_width  + wpsi - 1] + penalty;  // left
-            values[1] = wps[ri_widthp + wpsi - 1];            // diagonal
-            values[2] = wps[ri_widthp + wpsi]     + penalty;  // up
+            values[0] = wps[ri_width  + wpsi - 1] + penalty_horizontal;  // left (horizontal)
+            values[1] = wps[ri_widthp + wpsi - 1];                        // diagonal
+            values[2] = wps[ri_widthp + wpsi]     + penalty_vertical;    // up (vertical)
             if (values[0] <= values[1] && values[0] <= values[2]) {
                 values_idx = 0;
             } else if (values[1] <= values[2]) {
@@ -1157,6 +1714,158 @@ seq_t dtw_warping_paths_full_ndim_twice(seq_t *wps,
 {%- include 'dtw_dtwh.jinja.c' %}
 
 
+// MARK: WP Approx
+
+/*!
+ Project a warping path between two series that were halved in length to a band
+ for the series at full resolution and widen it with radius cells in all directions.
+ 
+ @param i1 Path indices for the first (halved) sequence, reverse ordered
+ @param i2 Path indices for the second (halved) sequence, reverse ordered
+ @param length Length of the path
+ @param l1 Length of the first sequence at full resolution
+ @param l2 Length of the second sequence at full resolution
+ @param radius Number of extra cells to add around the projected path
+ @param band Array of length 2*l1 to store for every row the first column and the
+    column after the last column (see the band field of DTWSettings)
+ */
+void dtw_band_from_path(idx_t *i1, idx_t *i2, idx_t length, idx_t l1, idx_t l2, idx_t radius,
+                        idx_t *band) {
+    idx_t i, k, r, cb, ce;
+    for (i=0; i<l1; i++) {
+        band[2 * i] = l2;
+        band[2 * i + 1] = 0;
+    }
+    for (k=0; k<length; k++) {
+        cb = 2 * i2[k];
+        ce = MIN(cb + 2, l2);
+        for (r=2*i1[k]; r<MIN(2*i1[k] + 2, l1); r++) {
+            if (cb < band[2 * r]) {
+                band[2 * r] = cb;
+            }
+            if (ce > band[2 * r + 1]) {
+                band[2 * r + 1] = ce;
+            }
+        }
+    }
+    // The path is monotone, thus the smallest begin in rows [i-radius, i+radius] is
+    // the one of row i-radius and the largest end is the one of row i+radius.
+    for (i=l1; i>0; i--) {
+        r = (i - 1 > radius) ? i - 1 - radius : 0;
+        band[2 * (i - 1)] = (band[2 * r] > radius) ? band[2 * r] - radius : 0;
+    }
+    for (i=0; i<l1; i++) {
+        r = MIN(i + radius, l1 - 1);
+        band[2 * i + 1] = MIN(band[2 * r + 1] + radius, l2);
+    }
+}
+
+/*!
+ Compute an approximate DTW and warping path with a multiresolution approach (FastDTW).
+ 
+ The series are halved in length by averaging pairs of values (PAA), the warping
+ path between the shorter series is computed recursively, projected to the original
+ resolution, widened with radius cells and used as band (see DTWSettings) for
+ `dtw_warping_path`. The number of cells that is computed is linear
+ in the length of the series. The settings are only applied at full resolution, the
+ window, psi and band settings should not be set.
+ 
+ Salvador, S., & Chan, P. (2007). FastDTW: Toward accurate dynamic time warping
+ in linear time and space. Intelligent Data Analysis, 11(5), 561-580.
+ 
+ @param s1 First sequence
+ @param l1 Length of first sequence
+ @param s2 Second sequence
+ @param l2 Length of second sequence
+ @param radius Number of cells around the projected path that are also explored
+ @param i1 Array of length l1+l2 to store the indices for the first sequence.
+    Reverse ordered. If NULL, only the distance is computed.
+ @param i2 Array of length l1+l2 to store the indices for the second sequence.
+    Reverse ordered.
+ @param length_i Stores resulting path length
+ @param settings Settings object
+ @return distance
+ */
+seq_t dtw_warping_path_approx(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, idx_t radius,
+                              idx_t *i1, idx_t *i2, idx_t *length_i,
+                              DTWSettings *settings) {
+    idx_t i, cl1, cl2, clength = 0;
+    seq_t d;
+    if (length_i != NULL) {
+        *length_i = 0;
+    }
+    if (l1 == 0 || l2 == 0) {
+        return INFINITY;
+    }
+    DTWSettings band_settings = *settings;
+    idx_t *band = NULL;
+    if (l1 > radius + 2 && l2 > radius + 2) {
+        cl1 = (l1 + 1) / 2;
+        cl2 = (l2 + 1) / 2;
+        seq_t *cs = (seq_t *)malloc(sizeof(seq_t) * (cl1 + cl2));
+        idx_t *ci = (idx_t *)malloc(sizeof(idx_t) * 2 * (cl1 + cl2));
+        band = (idx_t *)malloc(sizeof(idx_t) * 2 * l1);
+        if (!cs || !ci || !band) {
+            printf("Error: dtw_warping_path_approx - Cannot allocate memory (size=%zu)\n", cl1 + cl2);
+            free(cs);
+            free(ci);
+            free(band);
+            return INFINITY;
+        }
+        for (i=0; i<l1/2; i++) {
+            cs[i] = (s1[2*i] + s1[2*i + 1]) / 2;
+        }
+        if (l1 % 2 == 1) {
+            cs[cl1 - 1] = s1[l1 - 1];
+        }
+        for (i=0; i<l2/2; i++) {
+            cs[cl1 + i] = (s2[2*i] + s2[2*i + 1]) / 2;
+        }
+        if (l2 % 2 == 1) {
+            cs[cl1 + cl2 - 1] = s2[l2 - 1];
+        }
+        // Constraints are only meaningful at full resolution
+        DTWSettings coarse_settings = *settings;
+        coarse_settings.max_dist = 0;
+        coarse_settings.max_step = 0;
+        coarse_settings.max_length_diff = 0;
+        coarse_settings.use_pruning = false;
+        dtw_warping_path_approx(cs, cl1, &cs[cl1], cl2, radius,
+                                ci, &ci[cl1 + cl2], &clength, &coarse_settings);
+        if (clength > 0) {
+            dtw_band_from_path(ci, &ci[cl1 + cl2], clength, l1, l2, radius, band);
+            band_settings.band = band;
+            band_settings.band_length = l1;
+        }
+        free(cs);
+        free(ci);
+    }
+    // Also without path, because dtw_distance resets full rows and is thus quadratic
+    idx_t *pi = i1;
+    idx_t path_length = 0;
+    if (i1 == NULL) {
+        pi = (idx_t *)malloc(sizeof(idx_t) * 2 * (l1 + l2));
+        if (!pi) {
+            printf("Error: dtw_warping_path_approx - Cannot allocate memory (size=%zu)\n", 2 * (l1 + l2));
+            free(band);
+            return INFINITY;
+        }
+        i2 = &pi[l1 + l2];
+    }
+    d = dtw_warping_path(s1, l1, s2, l2, pi, i2, &path_length, &band_settings);
+    if (d == INFINITY) {
+        path_length = 0;
+    }
+    if (i1 == NULL) {
+        free(pi);
+    } else {
+        *length_i = path_length;
+    }
+    free(band);
+    return d;
+}
+
+
 // MARK: Bounds
 
 /*!
@@ -1198,73 +1907,820 @@ seq_t ub_euclidean_ndim_euclidean(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, int
 }
 
 
-{% set inner_dist = 'squaredeuclidean' %}
-{%- include 'lb_keogh.jinja.c' %}
-
-{% set inner_dist = 'euclidean' %}
-{%- include 'lb_keogh.jinja.c' %}
-
-
-// MARK: Block
 
-/* Create settings struct with default values (all extras deactivated). */
-DTWBlock dtw_block_empty(void) {
-    DTWBlock b = {
-        .rb = 0,  // row-begin
-        .re = 0,  // row-end
-        .cb = 0,  // column-begin
-        .ce = 0,  // column-end
-        .triu = true // only fill upper triangular marix
-    };
-    return b;
+/* Inner distance used by the lower bounds (in the cost space). */
+static inline seq_t lb_cost(seq_t a, seq_t b, int inner_dist) {
+    if (inner_dist == 1) {
+        return fabs(a - b);
+    }
+    return (a - b) * (a - b);
 }
 
+/* Transform from the cost space to the distance space. */
+static inline seq_t lb_result(seq_t v, int inner_dist) {
+    if (inner_dist == 1) {
+        return v;
+    }
+    return sqrt(v);
+}
 
-void dtw_block_print(DTWBlock *block) {
-    printf("DTWBlock {\n");
-    printf("  rb = %zu\n", block->rb);
-    printf("  re = %zu\n", block->re);
-    printf("  cb = %zu\n", block->cb);
-    printf("  ce = %zu\n", block->ce);
-    printf("  triu = %s\n", block->triu ? "true" : "false");
-    printf("}\n");
+/* Transform from the distance space to the cost space. */
+static inline seq_t lb_inner_val(seq_t v, int inner_dist) {
+    if (inner_dist == 1) {
+        return v;
+    }
+    return v * v;
 }
 
 
-bool dtw_block_is_valid(DTWBlock *block, idx_t nb_series_r, idx_t nb_series_c) {
-    if (block->rb >= block->re) {
-        printf("ERROR: Block row range is 0 or smaller\n");
-        return false;
-    }
-    if (block->cb >= block->ce) {
-        printf("ERROR: Block row range is 0 or smaller\n");
-        return false;
-    }
-    if (block->rb >= nb_series_r) {
-        printf("ERROR: Block rb exceeds number of series\n");
-        return false;
-    }
-    if (block->re > nb_series_r) {
-        printf("ERROR: Block re exceeds number of series\n");
-        return false;
-    }
-    if (block->cb >= nb_series_c) {
-        printf("ERROR: Block cb exceeds number of series\n");
-        return false;
-    }
-    if (block->ce > nb_series_c) {
-        printf("ERROR: Block ce exceeds number of series\n");
-        return false;
-    }
-    return true;
+/*!
+ Check whether the lower bounds are valid for the given settings.
+
+ Psi-relaxation allows to skip the beginning and end of the series, this
+ is not supported by the lower bounds. All other settings can only increase
+ the DTW distance.
+ */
+bool lb_is_valid(DTWSettings *settings) {
+    return (settings->psi_1b == 0 && settings->psi_1e == 0 &&
+            settings->psi_2b == 0 && settings->psi_2e == 0);
 }
 
 
-// MARK: Distance Matrix
+/*!
+ Envelope of series s when compared to a series of length l_other.
 
+ The upper (lower) envelope at position i is the maximum (minimum) value of s
+ in the window around i that is allowed by the warping band.
 
-{% set suffix = 'ptrs' %}
-{%- include 'dtw_distances.jinja.c' %}
+ The window slides monotonically over s, the minimum and maximum are thus
+ maintained with two monotonic queues. This requires O(l + l_other) operations,
+ independent of the window size.
+
+ Lemire, D. Streaming maximum-minimum filter using no more than three
+ comparisons per element. Nordic Journal of Computing, 13(4), 2006.
+
+ @param s Series to compute the envelope for
+ @param l Length of s
+ @param l_other Length of the series that will be compared with the envelope
+ @param settings DTW settings (window)
+ @param lower Array of length l_other to store the lower envelope
+ @param upper Array of length l_other to store the upper envelope
+ */
+void lb_envelope(seq_t *s, idx_t l, idx_t l_other, DTWSettings *settings, seq_t *lower, seq_t *upper) {
+    idx_t window = settings->window;
+    if (window == 0) {
+        window = MAX(l_other, l);
+    }
+    idx_t i, j, imin, imax;
+    idx_t imin_diff = window - 1;
+    if (l_other > l) {
+        imin_diff += l_other - l;
+    }
+    idx_t imax_diff = window;
+    if (l > l_other) {
+        imax_diff += l - l_other;
+    }
+    // Every index is added at most once, thus queues do not need to wrap around
+    idx_t *queues = (idx_t *)malloc(sizeof(idx_t) * 2 * l);
+    if (!queues) {
+        printf("Error: lb_envelope - Cannot allocate memory (size=%zu)\n", 2 * l);
+        // Trivial envelope, results in a lower bound of 0
+        for (i=0; i<l_other; i++) {
+            upper[i] = INFINITY;
+            lower[i] = -INFINITY;
+        }
+        return;
+    }
+    idx_t *uq = queues;      // indices with decreasing values, front is the maximum
+    idx_t *lq = &queues[l];  // indices with increasing values, front is the minimum
+    idx_t uq_b = 0, uq_e = 0, lq_b = 0, lq_e = 0;
+    j = 0;
+    for (i=0; i<l_other; i++) {
+        if (i > imin_diff) {
+            imin = i - imin_diff;
+        } else {
+            imin = 0;
+        }
+        imax = i + imax_diff;
+        if (imax > l) {
+            imax = l;
+        }
+        for (; j<imax; j++) {
+            while (uq_e > uq_b && s[uq[uq_e - 1]] <= s[j]) {
+                uq_e--;
+            }
+            uq[uq_e++] = j;
+            while (lq_e > lq_b && s[lq[lq_e - 1]] >= s[j]) {
+                lq_e--;
+            }
+            lq[lq_e++] = j;
+        }
+        while (uq_e > uq_b && uq[uq_b] < imin) {
+            uq_b++;
+        }
+        while (lq_e > lq_b && lq[lq_b] < imin) {
+            lq_b++;
+        }
+        upper[i] = (uq_e > uq_b) ? s[uq[uq_b]] : -INFINITY;
+        lower[i] = (lq_e > lq_b) ? s[lq[lq_b]] : INFINITY;
+    }
+    free(queues);
+}
+
+
+/*!
+ Envelopes of all series in a matrix, used to avoid recomputing the envelope
+ of the same series for every pair in a distance matrix.
+
+ Only computed if the lower bounds will be used (use_lb and max_dist set).
+
+ @param matrix 2-dimensional array with series of equal length
+ @param nb_rows Number of series
+ @param nb_cols Length of the series (also the length of the other series)
+ @param settings DTW settings
+ @return Array of size nb_rows*2*nb_cols with for each row the lower envelope
+    followed by the upper envelope, or NULL. Should be freed by the caller.
+ */
+seq_t* lb_envelopes_matrix(seq_t *matrix, idx_t nb_rows, idx_t nb_cols, DTWSettings *settings) {
+    if (!settings->use_lb || settings->max_dist == 0 || !lb_is_valid(settings)) {
+        return NULL;
+    }
+    seq_t *envs = (seq_t *)malloc(sizeof(seq_t) * nb_rows * 2 * nb_cols);
+    if (!envs) {
+        return NULL;
+    }
+    for (idx_t r=0; r<nb_rows; r++) {
+        lb_envelope(&matrix[r*nb_cols], nb_cols, nb_cols, settings,
+                    &envs[r*2*nb_cols], &envs[r*2*nb_cols + nb_cols]);
+    }
+    return envs;
+}
+
+
+/* Keogh lower bound in the cost space, stop early when larger than threshold. */
+static seq_t lb_keogh_envelope_cost(seq_t *s1, idx_t l1, seq_t *lower, seq_t *upper,
+                                    seq_t threshold, int inner_dist) {
+    seq_t t = 0;
+    seq_t ci;
+    for (idx_t i=0; i<l1; i++) {
+        ci = s1[i];
+        if (ci > upper[i]) {
+            t += lb_cost(ci, upper[i], inner_dist);
+        } else if (ci < lower[i]) {
+            t += lb_cost(ci, lower[i], inner_dist);
+        }
+        if (t > threshold) {
+            break;
+        }
+    }
+    return t;
+}
+
+
+/*!
+ Keogh lower bound for DTW given the envelope of the second series.
+
+ @param s1 First series
+ @param l1 Length of s1
+ @param lower Lower envelope of the second series, see lb_envelope (length l1)
+ @param upper Upper envelope of the second series, see lb_envelope (length l1)
+ @param settings DTW settings
+ */
+seq_t lb_keogh_envelope(seq_t *s1, idx_t l1, seq_t *lower, seq_t *upper, DTWSettings *settings) {
+    if (!lb_is_valid(settings)) {
+        return 0;
+    }
+    dtw_stats_merge_lb(false);
+    return lb_result(lb_keogh_envelope_cost(s1, l1, lower, upper, INFINITY, settings->inner_dist),
+                     settings->inner_dist);
+}
+
+{% set inner_dist = 'squaredeuclidean' %}
+{%- include 'lb_keogh.jinja.c' %}
+
+{% set inner_dist = 'euclidean' %}
+{%- include 'lb_keogh.jinja.c' %}
+
+
+/*!
+ Cumulative Keogh lower bound, used by EAPrunedDTW.
+
+ Every warping path visits every row i at least once, thus the cost of row i is at
+ least the distance between s1[i] and the envelope of s2 at i.
+
+ @param cb Array of length l1 + 1, cb[i] is a lower bound (in the cost space) on the
+    cost of rows i, ..., l1-1 of any warping path. cb[l1] = 0.
+ @param buffer Array of length 2*l1 to store the envelope of s2
+ */
+void lb_keogh_cumulative(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings,
+                         seq_t *cb, seq_t *buffer) {
+    seq_t *lower = buffer;
+    seq_t *upper = &buffer[l1];
+    dtw_stats_merge_lb(false);
+    lb_envelope(s2, l2, l1, settings, lower, upper);
+    cb[l1] = 0;
+    for (idx_t i=l1; i-- > 0;) {
+        cb[i] = cb[i + 1];
+        if (s1[i] > upper[i]) {
+            cb[i] += lb_cost(s1[i], upper[i], settings->inner_dist);
+        } else if (s1[i] < lower[i]) {
+            cb[i] += lb_cost(s1[i], lower[i], settings->inner_dist);
+        }
+    }
+}
+
+
+/* Kim lower bound in the cost space (first and last points). */
+static seq_t lb_kim_cost(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, int inner_dist) {
+    if (l1 == 0 || l2 == 0) {
+        return 0;
+    }
+    seq_t t = lb_cost(s1[0], s2[0], inner_dist);
+    if (l1 > 1 || l2 > 1) {
+        t += lb_cost(s1[l1 - 1], s2[l2 - 1], inner_dist);
+    }
+    return t;
+}
+
+
+/*!
+ Kim lower bound for DTW.
+
+ Every warping path starts by matching the first points and ends by matching the
+ last points of both series (LB_Kim_FL).
+
+ Kim, S. W., Park, S., & Chu, W. W. An index-based approach for similarity search
+ supporting time warping in large sequence databases. ICDE 2001.
+ */
+seq_t lb_kim(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings) {
+    if (!lb_is_valid(settings)) {
+        return 0;
+    }
+    dtw_stats_merge_lb(false);
+    return lb_result(lb_kim_cost(s1, l1, s2, l2, settings->inner_dist), settings->inner_dist);
+}
+
+
+/* Second term of LB_Improved: the Keogh bound of s2 with the envelope of the
+ projection of s1 on the envelope of s2 (lower, upper). Buffer needs l1 + 2*l2
+ elements. */
+static seq_t lb_improved_cost(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, seq_t *lower, seq_t *upper,
+                              seq_t threshold, DTWSettings *settings, seq_t *buffer) {
+    seq_t *h = buffer;
+    seq_t *lower_h = &buffer[l1];
+    seq_t *upper_h = &buffer[l1 + l2];
+    for (idx_t i=0; i<l1; i++) {
+        if (s1[i] > upper[i]) {
+            h[i] = upper[i];
+        } else if (s1[i] < lower[i]) {
+            h[i] = lower[i];
+        } else {
+            h[i] = s1[i];
+        }
+    }
+    lb_envelope(h, l1, l2, settings, lower_h, upper_h);
+    return lb_keogh_envelope_cost(s2, l2, lower_h, upper_h, threshold, settings->inner_dist);
+}
+
+
+/*!
+ Improved lower bound for DTW (LB_Improved) given the envelope of the second series.
+
+ @param s1 First series
+ @param l1 Length of s1
+ @param s2 Second series
+ @param l2 Length of s2
+ @param lower Lower envelope of s2, see lb_envelope (length l1)
+ @param upper Upper envelope of s2, see lb_envelope (length l1)
+ @param settings DTW settings
+ */
+seq_t lb_improved_envelope(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, seq_t *lower, seq_t *upper,
+                           DTWSettings *settings) {
+    if (!lb_is_valid(settings)) {
+        return 0;
+    }
+    dtw_stats_merge_lb(false);
+    seq_t *buffer = (seq_t *)malloc(sizeof(seq_t) * (l1 + 2*l2));
+    if (!buffer) {
+        printf("Error: lb_improved - Cannot allocate memory (size=%zu)\n", l1 + 2*l2);
+        return 0;
+    }
+    seq_t t = lb_keogh_envelope_cost(s1, l1, lower, upper, INFINITY, settings->inner_dist);
+    t += lb_improved_cost(s1, l1, s2, l2, lower, upper, INFINITY, settings, buffer);
+    free(buffer);
+    return lb_result(t, settings->inner_dist);
+}
+
+
+/*!
+ Improved lower bound for DTW (LB_Improved).
+
+ LB_Keogh(s1, s2) plus the LB_Keogh between s2 and the projection of s1 on
+ the envelope of s2. This bound is always at least as tight as LB_Keogh(s1, s2).
+
+ Lemire, D. Faster retrieval with a two-pass dynamic-time-warping lower bound.
+ Pattern Recognition, 42(9), 2009.
+ */
+seq_t lb_improved(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings) {
+    if (!lb_is_valid(settings)) {
+        return 0;
+    }
+    seq_t *env = (seq_t *)malloc(sizeof(seq_t) * 2 * l1);
+    if (!env) {
+        printf("Error: lb_improved - Cannot allocate memory (size=%zu)\n", 2 * l1);
+        return 0;
+    }
+    lb_envelope(s2, l2, l1, settings, env, &env[l1]);
+    seq_t t = lb_improved_envelope(s1, l1, s2, l2, env, &env[l1], settings);
+    free(env);
+    return t;
+}
+
+
+/* Cascade of lower bounds, see lb_cascade_envelope (not counted in dtw_stats). */
+static seq_t lb_cascade_bound(seq_t *s1, idx_t l1, seq_t *lower1, seq_t *upper1,
+                              seq_t *s2, idx_t l2, seq_t *lower2, seq_t *upper2,
+                              seq_t threshold, DTWSettings *settings) {
+    int inner_dist = settings->inner_dist;
+    seq_t threshold_cost = lb_inner_val(threshold, inner_dist);
+    seq_t lb, t;
+    // LB_Kim
+    lb = lb_kim_cost(s1, l1, s2, l2, inner_dist);
+    if (lb > threshold_cost) {
+        return lb_result(lb, inner_dist);
+    }
+    // Buffer: [envelope s2 (2*l1)][projection h (l1)][envelope s1 or h (2*l2)]
+    seq_t *buffer = (seq_t *)malloc(sizeof(seq_t) * (3*l1 + 2*l2));
+    if (!buffer) {
+        return lb_result(lb, inner_dist);
+    }
+    // LB_Keogh(s1, s2), the envelope of s2 is reused by LB_Improved
+    if (lower2 == NULL || upper2 == NULL) {
+        lower2 = buffer;
+        upper2 = &buffer[l1];
+        lb_envelope(s2, l2, l1, settings, lower2, upper2);
+    }
+    seq_t lb_keogh_12 = lb_keogh_envelope_cost(s1, l1, lower2, upper2, threshold_cost, inner_dist);
+    lb = MAX(lb, lb_keogh_12);
+    if (lb > threshold_cost) {
+        free(buffer);
+        return lb_result(lb, inner_dist);
+    }
+    // LB_Keogh(s2, s1)
+    if (lower1 == NULL || upper1 == NULL) {
+        lower1 = &buffer[3*l1];
+        upper1 = &buffer[3*l1 + l2];
+        lb_envelope(s1, l1, l2, settings, lower1, upper1);
+    }
+    t = lb_keogh_envelope_cost(s2, l2, lower1, upper1, threshold_cost, inner_dist);
+    lb = MAX(lb, t);
+    if (lb > threshold_cost) {
+        free(buffer);
+        return lb_result(lb, inner_dist);
+    }
+    // LB_Improved(s1, s2)
+    t = lb_keogh_12 + lb_improved_cost(s1, l1, s2, l2, lower2, upper2, threshold_cost - lb_keogh_12,
+                                       settings, &buffer[2*l1]);
+    lb = MAX(lb, t);
+    free(buffer);
+    return lb_result(lb, inner_dist);
+}
+
+
+/*!
+ Cascade of lower bounds for DTW.
+
+ The bounds are computed from cheap to expensive and the cascade stops as soon as
+ a bound is larger than the threshold:
+
+ 1. LB_Kim (first and last points)
+ 2. LB_Keogh(s1, s2)
+ 3. LB_Keogh(s2, s1)
+ 4. LB_Improved(s1, s2)
+
+ @param threshold Stop when a lower bound is larger than this value (in the
+    distance space, thus comparable to max_dist). Use INFINITY to compute all bounds.
+ @return The tightest lower bound that has been computed.
+ */
+seq_t lb_cascade(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, seq_t threshold, DTWSettings *settings) {
+    return lb_cascade_envelope(s1, l1, NULL, NULL, s2, l2, NULL, NULL, threshold, settings);
+}
+
+
+/*!
+ Cascade of lower bounds for DTW with precomputed envelopes.
+
+ @param s1 First series
+ @param l1 Length of s1
+ @param lower1 Lower envelope of s1 for a series of length l2 (see lb_envelope), or NULL
+ @param upper1 Upper envelope of s1 for a series of length l2, or NULL
+ @param s2 Second series
+ @param l2 Length of s2
+ @param lower2 Lower envelope of s2 for a series of length l1, or NULL
+ @param upper2 Upper envelope of s2 for a series of length l1, or NULL
+ @param threshold Stop when a lower bound is larger than this value
+ @param settings DTW settings
+ @see lb_cascade
+ */
+seq_t lb_cascade_envelope(seq_t *s1, idx_t l1, seq_t *lower1, seq_t *upper1,
+                          seq_t *s2, idx_t l2, seq_t *lower2, seq_t *upper2,
+                          seq_t threshold, DTWSettings *settings) {
+    if (!lb_is_valid(settings)) {
+        return 0;
+    }
+    dtw_stats_merge_lb(false);
+    return lb_cascade_bound(s1, l1, lower1, upper1, s2, l2, lower2, upper2, threshold, settings);
+}
+
+
+/*!
+ Check with the lower bound cascade whether the DTW distance is certainly larger
+ than settings->max_dist.
+
+ @return True if the DTW computation can be skipped.
+ */
+bool lb_cascade_prune(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings) {
+    return lb_cascade_prune_envelope(s1, l1, NULL, NULL, s2, l2, NULL, NULL, settings);
+}
+
+
+/*!
+ Same as lb_cascade_prune but with precomputed envelopes.
+
+ @see lb_cascade_envelope
+ */
+bool lb_cascade_prune_envelope(seq_t *s1, idx_t l1, seq_t *lower1, seq_t *upper1,
+                               seq_t *s2, idx_t l2, seq_t *lower2, seq_t *upper2,
+                               DTWSettings *settings) {
+    if (settings->max_dist == 0 || !lb_is_valid(settings)) {
+        return false;
+    }
+    // The tolerance avoids pruning a pair with distance max_dist because of rounding errors
+    seq_t threshold = settings->max_dist * (1 + SEQ_T_REL_TOL);
+    bool pruned = lb_cascade_bound(s1, l1, lower1, upper1, s2, l2, lower2, upper2,
+                                   threshold, settings) > threshold;
+    dtw_stats_merge_lb(pruned);
+    return pruned;
+}
+
+
+// MARK: Block
+
+/* Create settings struct with default values (all extras deactivated). */
+DTWBlock dtw_block_empty(void) {
+    DTWBlock b = {
+        .rb = 0,  // row-begin
+        .re = 0,  // row-end
+        .cb = 0,  // column-begin
+        .ce = 0,  // column-end
+        .triu = true // only fill upper triangular marix
+    };
+    return b;
+}
+
+
+void dtw_block_print(DTWBlock *block) {
+    printf("DTWBlock {\n");
+    printf("  rb = %zu\n", block->rb);
+    printf("  re = %zu\n", block->re);
+    printf("  cb = %zu\n", block->cb);
+    printf("  ce = %zu\n", block->ce);
+    printf("  triu = %s\n", block->triu ? "true" : "false");
+    printf("}\n");
+}
+
+
+bool dtw_block_is_valid(DTWBlock *block, idx_t nb_series_r, idx_t nb_series_c) {
+    if (block->rb >= block->re) {
+        printf("ERROR: Block row range is 0 or smaller\n");
+        return false;
+    }
+    if (block->cb >= block->ce) {
+        printf("ERROR: Block row range is 0 or smaller\n");
+        return false;
+    }
+    if (block->rb >= nb_series_r) {
+        printf("ERROR: Block rb exceeds number of series\n");
+        return false;
+    }
+    if (block->re > nb_series_r) {
+        printf("ERROR: Block re exceeds number of series\n");
+        return false;
+    }
+    if (block->cb >= nb_series_c) {
+        printf("ERROR: Block cb exceeds number of series\n");
+        return false;
+    }
+    if (block->ce > nb_series_c) {
+        printf("ERROR: Block ce exceeds number of series\n");
+        return false;
+    }
+    return true;
+}
+
+
+// MARK: Lanes
+
+/* Inter-pair SIMD: the DTW recurrence is computed for DTW_LANES pairs of
+ series of equal length at once. Series 1 is shared, the series 2 are
+ interleaved such that every cell of the dynamic programming matrix is a
+ vector of DTW_LANES independent values. The inner loop over the lanes has
+ no dependencies and is vectorized by the compiler. The instruction set is
+ chosen at runtime (if supported by the compiler), the default version is
+ portable C.
+*/
+
+#if defined(_OPENMP) && _OPENMP >= 201307
+#define DTW_LANES_SIMD _Pragma("omp simd")
+#else
+#define DTW_LANES_SIMD
+#endif
+
+#if defined(__GNUC__) && (defined(__x86_64__) || defined(__i386__))
+#define DTW_LANES_X86
+#define DTW_LANES_INLINE static inline __attribute__((always_inline))
+#elif defined(_MSC_VER)
+#define DTW_LANES_INLINE static __forceinline
+#else
+#define DTW_LANES_INLINE static inline
+#endif
+
+
+/*!
+Check whether the settings can be handled by the lanes kernel.
+
+The lanes kernel does not support psi-relaxation or a band (Itakura or per row) and only
+supports the squared Euclidean inner distance. The other settings are supported.
+Pruning is not performed per cell but the result is the same. Except for use_pruning
+together with max_step, the Euclidean upper bound then ignores max_step and can
+prune the best path, these settings are thus also handled by the pairwise kernel.
+*/
+bool dtw_distances_lanes_supported(DTWSettings *settings) {
+    return (settings->inner_dist == 0 &&
+            settings->psi_1b == 0 && settings->psi_1e == 0 &&
+            settings->psi_2b == 0 && settings->psi_2e == 0 &&
+            !(settings->use_pruning && settings->max_step != 0) &&
+            !dtw_settings_has_band(settings));
+}
+
+
+/*!
+Number of elements in the buffer used by the lanes kernel.
+
+@param l Length of the series
+@param settings DTW settings
+*/
+idx_t dtw_distances_lanes_buffer_length(idx_t l, DTWSettings *settings) {
+    idx_t window = settings->window;
+    if (window == 0) {
+        window = l;
+    }
+    idx_t length = MIN(l + 1, 2*window + 1);
+    return (l + 2*length + 2) * DTW_LANES;
+}
+
+
+DTW_LANES_INLINE void dtw_distance_lanes_kernel(seq_t *s1, seq_t *s2t, idx_t l, seq_t *buffer,
+                                                seq_t *result, idx_t nb, DTWSettings *settings) {
+    idx_t window = settings->window;
+    seq_t max_step = settings->max_step;
+    seq_t max_dist = settings->max_dist;
+    seq_t penalty_horizontal = settings->penalty_s2;
+    seq_t penalty_vertical = settings->penalty_s1;
+    idx_t i, j, k;
+
+    if (window == 0) {
+        window = l;
+    }
+    if (max_step == 0) {
+        max_step = INFINITY;
+    } else {
+        max_step = pow(max_step, 2);
+    }
+    // Cells are only pruned at the end, use_pruning does not change the result
+    // (not used together with max_step, see dtw_distances_lanes_supported).
+    // The tolerance avoids pruning the best path because of rounding errors, the
+    // order of the operations can differ from the pairwise kernel.
+    if (max_dist == 0) {
+        max_dist = INFINITY;
+    } else {
+        max_dist = pow(max_dist, 2) * (1 + SEQ_T_REL_TOL);
+    }
+    if (penalty_horizontal == 0 && penalty_vertical == 0 && settings->penalty != 0) {
+        penalty_horizontal = settings->penalty;
+        penalty_vertical = settings->penalty;
+    }
+    penalty_horizontal = pow(penalty_horizontal, 2);
+    penalty_vertical = pow(penalty_vertical, 2);
+    idx_t length = MIN(l + 1, 2*window + 1);
+    idx_t rowl = length * DTW_LANES;
+    seq_t *dtw = buffer;
+    seq_t *rowmin = &buffer[2 * rowl];
+    seq_t *prev;
+    seq_t *cur = dtw;
+    for (j=0; j<2*rowl; j++) {
+        dtw[j] = INFINITY;
+    }
+    for (k=0; k<DTW_LANES; k++) {
+        dtw[k] = 0;
+    }
+    idx_t skip = 0;
+    idx_t skipp = 0;
+    int i0 = 1;
+    int i1 = 0;
+    idx_t minj;
+    idx_t maxj;
+    idx_t window_1 = window - 1;
+    bool all_pruned;
+    // Only the nb used lanes are counted, not the unused lanes that repeat the last series.
+    // The pairs are counted by dtw_distances_lanes.
+    DTWStats stats = dtw_stats_default();
+    for (i=0; i<l; i++) {
+        maxj = (i - window_1) * (i > window_1);
+        minj = i + window;
+        if (minj > l) {
+            minj = l;
+        }
+        skipp = skip;
+        skip = maxj * (length != l + 1);
+        i0 = 1 - i0;
+        i1 = 1 - i1;
+        prev = &dtw[i0 * rowl];
+        cur = &dtw[i1 * rowl];
+        for (j=0; j<rowl; j++) {
+            cur[j] = INFINITY;
+        }
+        for (k=0; k<DTW_LANES; k++) {
+            rowmin[k] = INFINITY;
+        }
+        seq_t s1i = s1[i];
+        stats.cells += (minj - maxj) * nb;
+        for (j=maxj; j<minj; j++) {
+            seq_t *diag = &prev[(j - skipp) * DTW_LANES];
+            seq_t *left = &cur[(j - skip) * DTW_LANES];
+            seq_t *s2j = &s2t[j * DTW_LANES];
+            DTW_LANES_SIMD
+            for (k=0; k<DTW_LANES; k++) {
+                seq_t d = SEDIST(s1i, s2j[k]);
+                seq_t minv = diag[k];
+                seq_t tempv = diag[DTW_LANES + k] + penalty_horizontal;
+                minv = (tempv < minv) ? tempv : minv;
+                tempv = left[k] + penalty_vertical;
+                minv = (tempv < minv) ? tempv : minv;
+                tempv = (d > max_step) ? INFINITY : d + minv;
+                left[DTW_LANES + k] = tempv;
+                rowmin[k] = (tempv < rowmin[k]) ? tempv : rowmin[k];
+            }
+        }
+        // Stop if no lane can result in a distance below max_dist
+        all_pruned = true;
+        for (k=0; k<DTW_LANES; k++) {
+            if (rowmin[k] <= max_dist) {
+                all_pruned = false;
+            }
+        }
+        if (all_pruned) {
+            for (k=0; k<DTW_LANES; k++) {
+                result[k] = INFINITY;
+            }
+            stats.pairs_abandoned = nb;
+            stats.rows_abandoned = (l - 1 - i) * nb;
+            dtw_stats_merge(&stats);
+            return;
+        }
+    }
+    for (k=0; k<DTW_LANES; k++) {
+        result[k] = sqrt(cur[(l - skip) * DTW_LANES + k]);
+        if (settings->max_dist != 0 && result[k] > settings->max_dist * (1 + SEQ_T_REL_TOL)) {
+            result[k] = INFINITY;
+        }
+    }
+    dtw_stats_merge(&stats);
+}
+
+static void dtw_distance_lanes_default(seq_t *s1, seq_t *s2t, idx_t l, seq_t *buffer,
+                                       seq_t *result, idx_t nb, DTWSettings *settings) {
+    dtw_distance_lanes_kernel(s1, s2t, l, buffer, result, nb, settings);
+}
+
+#if defined(DTW_LANES_X86)
+__attribute__((target("avx2")))
+static void dtw_distance_lanes_avx2(seq_t *s1, seq_t *s2t, idx_t l, seq_t *buffer,
+                                    seq_t *result, idx_t nb, DTWSettings *settings) {
+    dtw_distance_lanes_kernel(s1, s2t, l, buffer, result, nb, settings);
+}
+
+__attribute__((target("avx512f")))
+static void dtw_distance_lanes_avx512(seq_t *s1, seq_t *s2t, idx_t l, seq_t *buffer,
+                                      seq_t *result, idx_t nb, DTWSettings *settings) {
+    dtw_distance_lanes_kernel(s1, s2t, l, buffer, result, nb, settings);
+}
+#endif
+
+
+/*!
+Select the lanes kernel for the instruction set supported by the CPU.
+*/
+DTWLanesFnPtr dtw_distance_lanes_select(void) {
+#if defined(DTW_LANES_X86)
+    __builtin_cpu_init();
+    if (__builtin_cpu_supports("avx512f")) {
+        return dtw_distance_lanes_avx512;
+    }
+    if (__builtin_cpu_supports("avx2")) {
+        return dtw_distance_lanes_avx2;
+    }
+#endif
+    return dtw_distance_lanes_default;
+}
+
+
+/*!
+Name of the instruction set used by the lanes kernel.
+*/
+const char* dtw_distance_lanes_isa(void) {
+    DTWLanesFnPtr fn = dtw_distance_lanes_select();
+#if defined(DTW_LANES_X86)
+    if (fn == dtw_distance_lanes_avx512) {
+        return "avx512f";
+    }
+    if (fn == dtw_distance_lanes_avx2) {
+        return "avx2";
+    }
+#endif
+    if (fn == dtw_distance_lanes_default) {
+        return "default";
+    }
+    return "unknown";
+}
+
+
+/*!
+Compute the DTW distances between one series and a range of series of the same length,
+DTW_LANES pairs at a time.
+
+@param s1 First series
+@param env1 Envelope of s1 (lower followed by upper, see lb_envelopes_matrix) or NULL
+@param matrix_c 2-dimensional array with series that are compared with s1
+@param envs_c Envelopes of the series in matrix_c (see lb_envelopes_matrix) or NULL
+@param nb_cols Length of s1 and of all series in matrix_c
+@param cb First series in matrix_c
+@param ce Last series (exclusive) in matrix_c
+@param output Array to store ce - cb distances
+@param buffer Array of length dtw_distances_lanes_buffer_length(nb_cols, settings)
+@param fn Lanes kernel, see dtw_distance_lanes_select
+@param settings DTW settings
+*/
+void dtw_distances_lanes(seq_t *s1, seq_t *env1, seq_t *matrix_c, seq_t *envs_c, idx_t nb_cols, idx_t cb, idx_t ce,
+                         seq_t *output, seq_t *buffer, DTWLanesFnPtr fn, DTWSettings *settings) {
+    idx_t c, j, k, nb;
+    idx_t cs[DTW_LANES];
+    seq_t *s2t = buffer;
+    seq_t *result = &buffer[nb_cols * DTW_LANES];
+    seq_t *dtw = &buffer[(nb_cols + 1) * DTW_LANES];
+    c = cb;
+    while (c < ce) {
+        // Select the next pairs that are not pruned by the lower bounds
+        nb = 0;
+        for (; c<ce && nb<DTW_LANES; c++) {
+            if (settings->use_lb && lb_cascade_prune_envelope(
+                    s1, nb_cols, env1, (env1 == NULL) ? NULL : &env1[nb_cols],
+                    &matrix_c[c*nb_cols], nb_cols,
+                    (envs_c == NULL) ? NULL : &envs_c[c*2*nb_cols],
+                    (envs_c == NULL) ? NULL : &envs_c[c*2*nb_cols + nb_cols], settings)) {
+                output[c - cb] = INFINITY;
+            } else {
+                cs[nb] = c;
+                nb++;
+            }
+        }
+        if (nb == 0) {
+            break;
+        }
+        // Interleave series, unused lanes repeat the last series
+        for (j=0; j<nb_cols; j++) {
+            for (k=0; k<DTW_LANES; k++) {
+                s2t[j*DTW_LANES + k] = matrix_c[cs[MIN(k, nb - 1)]*nb_cols + j];
+            }
+        }
+        fn(s1, s2t, nb_cols, dtw, result, nb, settings);
+        if (dtw_stats_enabled) {
+            DTWStats stats = dtw_stats_default();
+            stats.pairs = nb;
+            dtw_stats_merge(&stats);
+        }
+        for (k=0; k<nb; k++) {
+            output[cs[k] - cb] = result[k];
+        }
+    }
+}
+
+
+// MARK: Distance Matrix
+
+
+{% set suffix = 'ptrs' %}
+{%- include 'dtw_distances.jinja.c' %}
 
 {% set suffix = 'matrix' %}
 {%- include 'dtw_distances.jinja.c' %}
@@ -1281,6 +2737,106 @@ bool dtw_block_is_valid(DTWBlock *block, idx_t nb_series_r, idx_t nb_series_c) {
 {% set suffix = 'ndim_matrices' %}
 {%- include 'dtw_distances.jinja.c' %}
 
+/*!
+Distance matrix for DTW between two lists of pointers to arrays (e.g. to
+compare a set of series with another set of series).
+
+@param ptrs_r Pointers to arrays for the rows.  The arrays are expected to be 1-dimensional.
+@param nb_ptrs_r Length of ptrs_r array
+@param lengths_r Array of length nb_ptrs_r with all lengths of the arrays in ptrs_r.
+@param ptrs_c Pointers to arrays for the columns.
+@param nb_ptrs_c Length of ptrs_c array
+@param lengths_c Array of length nb_ptrs_c with all lengths of the arrays in ptrs_c.
+@param output Array to store all outputs (should be nb_ptrs_r*nb_ptrs_c if block->triu is false)
+@param block Restrict to a certain block of combinations of series.
+@param settings DTW settings
+*/
+idx_t dtw_distances_ptrs_ptrs(seq_t **ptrs_r, idx_t nb_ptrs_r, idx_t* lengths_r,
+                              seq_t **ptrs_c, idx_t nb_ptrs_c, idx_t* lengths_c,
+                              seq_t* output, DTWBlock* block, DTWSettings* settings) {
+    idx_t r, c, cb;
+    idx_t length;
+    idx_t i;
+    seq_t value;
+
+    length = dtw_distances_length(block, nb_ptrs_r, nb_ptrs_c);
+    if (length == 0) {
+        return 0;
+    }
+
+    // Correct block
+    if (block->re == 0) {
+        block->re = nb_ptrs_r;
+    }
+    if (block->ce == 0) {
+        block->ce = nb_ptrs_c;
+    }
+
+    i = 0;
+    for (r=block->rb; r<block->re; r++) {
+        if (block->triu && r + 1 > block->cb) {
+            cb = r+1;
+        } else {
+            cb = block->cb;
+        }
+        for (c=cb; c<block->ce; c++) {
+            value = dtw_distance(ptrs_r[r], lengths_r[r],
+                                 ptrs_c[c], lengths_c[c], settings);
+            output[i] = value;
+            i += 1;
+        }
+    }
+    assert(length == i);
+    return length;
+}
+
+
+/*!
+Distance matrix for n-dimensional DTW between two lists of pointers to arrays.
+
+@see dtw_distances_ptrs_ptrs
+*/
+idx_t dtw_distances_ndim_ptrs_ptrs(seq_t **ptrs_r, idx_t nb_ptrs_r, idx_t* lengths_r,
+                                   seq_t **ptrs_c, idx_t nb_ptrs_c, idx_t* lengths_c, int ndim,
+                                   seq_t* output, DTWBlock* block, DTWSettings* settings) {
+    idx_t r, c, cb;
+    idx_t length;
+    idx_t i;
+    seq_t value;
+
+    length = dtw_distances_length(block, nb_ptrs_r, nb_ptrs_c);
+    if (length == 0) {
+        return 0;
+    }
+
+    // Correct block
+    if (block->re == 0) {
+        block->re = nb_ptrs_r;
+    }
+    if (block->ce == 0) {
+        block->ce = nb_ptrs_c;
+    }
+
+    i = 0;
+    for (r=block->rb; r<block->re; r++) {
+        if (block->triu && r + 1 > block->cb) {
+            cb = r+1;
+        } else {
+            cb = block->cb;
+        }
+        for (c=cb; c<block->ce; c++) {
+            value = dtw_distance_ndim(ptrs_r[r], lengths_r[r],
+                                      ptrs_c[c], lengths_c[c],
+                                      ndim, settings);
+            output[i] = value;
+            i += 1;
+        }
+    }
+    assert(length == i);
+    return length;
+}
+
+
 idx_t dtw_distances_length(DTWBlock *block, idx_t nb_series_r, idx_t nb_series_c) {
     // Note: int is usually 32-bit even on 64-bit systems
     idx_t ir;
@@ -1372,6 +2928,528 @@ idx_t dtw_distances_length(DTWBlock *block, idx_t nb_series_r, idx_t nb_series_c
     return length;
 }
 
+// MARK: Sparse
+
+DTWSparse dtw_sparse_empty(void) {
+    DTWSparse sparse = {
+        .rows = NULL,
+        .cols = NULL,
+        .values = NULL,
+        .length = 0,
+        .capacity = 0
+    };
+    return sparse;
+}
+
+
+void dtw_sparse_free(DTWSparse *sparse) {
+    free(sparse->rows);
+    free(sparse->cols);
+    free(sparse->values);
+    *sparse = dtw_sparse_empty();
+}
+
+
+/*!
+ Make sure that the sparse structure can store at least the given number of distances.
+
+ @return false if the memory cannot be allocated (the already stored distances are kept).
+ */
+bool dtw_sparse_reserve(DTWSparse *sparse, idx_t capacity) {
+    idx_t *rows, *cols;
+    seq_t *values;
+    if (capacity <= sparse->capacity) {
+        return true;
+    }
+    rows = (idx_t *)realloc(sparse->rows, sizeof(idx_t) * capacity);
+    if (!rows) {
+        return false;
+    }
+    sparse->rows = rows;
+    cols = (idx_t *)realloc(sparse->cols, sizeof(idx_t) * capacity);
+    if (!cols) {
+        return false;
+    }
+    sparse->cols = cols;
+    values = (seq_t *)realloc(sparse->values, sizeof(seq_t) * capacity);
+    if (!values) {
+        return false;
+    }
+    sparse->values = values;
+    sparse->capacity = capacity;
+    return true;
+}
+
+
+/*!
+ Add a distance to the sparse structure. The arrays grow geometrically.
+
+ @return false if the memory cannot be allocated.
+ */
+bool dtw_sparse_append(DTWSparse *sparse, idx_t r, idx_t c, seq_t value) {
+    if (sparse->length == sparse->capacity) {
+        if (!dtw_sparse_reserve(sparse, (sparse->capacity == 0) ? 1024 : 2 * sparse->capacity)) {
+            return false;
+        }
+    }
+    sparse->rows[sparse->length] = r;
+    sparse->cols[sparse->length] = c;
+    sparse->values[sparse->length] = value;
+    sparse->length += 1;
+    return true;
+}
+
+
+/*!
+ Add all distances in other to the sparse structure.
+
+ @return false if the memory cannot be allocated.
+ */
+bool dtw_sparse_extend(DTWSparse *sparse, DTWSparse *other) {
+    if (other->length == 0) {
+        return true;
+    }
+    if (!dtw_sparse_reserve(sparse, sparse->length + other->length)) {
+        return false;
+    }
+    memcpy(&sparse->rows[sparse->length], other->rows, sizeof(idx_t) * other->length);
+    memcpy(&sparse->cols[sparse->length], other->cols, sizeof(idx_t) * other->length);
+    memcpy(&sparse->values[sparse->length], other->values, sizeof(seq_t) * other->length);
+    sparse->length += other->length;
+    return true;
+}
+
+
+/*!
+Distance matrix where only the distances that are not infinity are stored.
+
+This is useful in combination with max_dist, all distances larger than max_dist
+are not stored. The memory that is used thus depends on the number of neighbors
+that are closer than max_dist instead of on the number of combinations.
+The distances are stored in row-major order.
+
+@param ptrs Pointers to arrays.  The arrays are expected to be C contiguous.
+@param nb_ptrs Length of ptrs array
+@param lengths Array of length nb_ptrs with all lengths of the arrays in ptrs.
+@param ndim Number of dimensions (if larger than 1, n-dimensional DTW is used)
+@param output Sparse structure to add the distances to
+@param block Restrict to a certain block of combinations of series.
+@param settings DTW settings
+@return Number of stored distances, -1 if memory could not be allocated.
+*/
+idx_t dtw_distances_sparse_ptrs(seq_t **ptrs, idx_t nb_ptrs, idx_t* lengths, int ndim,
+                                DTWSparse* output, DTWBlock* block, DTWSettings* settings) {
+    idx_t r, c, cb;
+    seq_t value;
+
+    if (dtw_distances_length(block, nb_ptrs, nb_ptrs) == 0) {
+        return 0;
+    }
+
+    // Correct block
+    if (block->re == 0) {
+        block->re = nb_ptrs;
+    }
+    if (block->ce == 0) {
+        block->ce = nb_ptrs;
+    }
+
+    for (r=block->rb; r<block->re; r++) {
+        if (block->triu && r + 1 > block->cb) {
+            cb = r+1;
+        } else {
+            cb = block->cb;
+        }
+        for (c=cb; c<block->ce; c++) {
+            if (ndim == 1) {
+                value = dtw_distance(ptrs[r], lengths[r], ptrs[c], lengths[c], settings);
+            } else {
+                value = dtw_distance_ndim(ptrs[r], lengths[r], ptrs[c], lengths[c], ndim, settings);
+            }
+            if (value < INFINITY && !dtw_sparse_append(output, r, c, value)) {
+                return -1;
+            }
+        }
+    }
+    return output->length;
+}
+
+// MARK: Query
+
+/*!
+ Insert a distance in a sorted buffer with the k best (smallest) distances.
+ 
+ @param kbest Buffer of length k, sorted in ascending order
+ @param k Length of the buffer
+ @param nb_kbest Number of values already in the buffer, will be updated
+ @param value Distance to insert
+ @return The k-th best distance if the buffer is full, INFINITY otherwise.
+ */
+seq_t dtw_kbest_insert(seq_t *kbest, idx_t k, idx_t *nb_kbest, seq_t value) {
+    idx_t i;
+    if (*nb_kbest < k) {
+        i = *nb_kbest;
+        *nb_kbest += 1;
+    } else if (value < kbest[k - 1]) {
+        i = k - 1;
+    } else {
+        return kbest[k - 1];
+    }
+    while (i > 0 && kbest[i - 1] > value) {
+        kbest[i] = kbest[i - 1];
+        i--;
+    }
+    kbest[i] = value;
+    if (*nb_kbest < k) {
+        return INFINITY;
+    }
+    return kbest[k - 1];
+}
+
+/*!
+ Settings to compare a query with a series when the k-th best distance found so far
+ is known. A comparison that exceeds this threshold cannot be in the top-k and can
+ be abandoned early.
+ 
+ @param settings Settings as given by the user
+ @param threshold Current k-th best distance (INFINITY if not known yet)
+ @return Copy of the settings with max_dist tightened to the threshold.
+ */
+DTWSettings dtw_settings_threshold(DTWSettings *settings, seq_t threshold) {
+    DTWSettings s = *settings;
+    if (threshold == INFINITY || threshold <= 0) {
+        return s;
+    }
+    if (s.max_dist == 0 || threshold < s.max_dist) {
+        s.max_dist = threshold;
+        // The threshold is at least as tight as the Euclidean upper bound
+        s.use_pruning = false;
+    }
+    return s;
+}
+
+/*!
+ Distances between one query and a set of series.
+ 
+ Series are given either as an array of pointers (ptrs and lengths) or as
+ a matrix (matrix and nb_cols).
+ 
+ @see dtw_distances_query_ptrs
+ */
+idx_t dtw_distances_query(seq_t *query, idx_t query_length,
+                          seq_t **ptrs, idx_t *lengths,
+                          seq_t *matrix, idx_t nb_cols,
+                          idx_t nb_series, int ndim, bool use_ndim,
+                          seq_t *output, idx_t k, DTWSettings *settings) {
+    idx_t i;
+    idx_t nb_kbest = 0;
+    seq_t threshold = INFINITY;
+    seq_t *kbest = NULL;
+    seq_t *s;
+    idx_t l;
+    DTWSettings lsettings = *settings;
+    seq_t *env_q = NULL;
+    
+    if (settings->use_lb && lb_is_valid(settings) && !use_ndim && matrix != NULL) {
+        // The envelope of the query is the same for all comparisons
+        env_q = (seq_t *)malloc(sizeof(seq_t) * 2 * nb_cols);
+        if (env_q) {
+            lb_envelope(query, query_length, nb_cols, settings, env_q, &env_q[nb_cols]);
+        }
+    }
+    if (k > 0 && k < nb_series) {
+        // If allocation fails, all distances are computed without pruning
+        kbest = (seq_t *)malloc(sizeof(seq_t) * k);
+    }
+    for (i=0; i<nb_series; i++) {
+        if (ptrs != NULL) {
+            s = ptrs[i];
+            l = lengths[i];
+        } else {
+            s = &matrix[i*nb_cols*ndim];
+            l = nb_cols;
+        }
+        if (kbest != NULL) {
+            lsettings = dtw_settings_threshold(settings, threshold);
+        }
+        if (use_ndim) {
+            output[i] = dtw_distance_ndim(query, query_length, s, l, ndim, &lsettings);
+        } else if (env_q != NULL) {
+            output[i] = dtw_distance_envelope(query, query_length, env_q, &env_q[nb_cols], s, l, &lsettings);
+        } else {
+            output[i] = dtw_distance(query, query_length, s, l, &lsettings);
+        }
+        if (kbest != NULL) {
+            threshold = dtw_kbest_insert(kbest, k, &nb_kbest, output[i]);
+        }
+    }
+    free(kbest);
+    free(env_q);
+    return nb_series;
+}
+
+/*!
+ Distances between one query and a list of series (one-vs-many).
+ 
+ If k > 0, the k-th best distance found so far is used as max_dist for the
+ remaining comparisons. Series that cannot be among the k nearest series are
+ then abandoned early and their distance is set to INFINITY. The k smallest
+ values in output are always exact.
+ 
+ @param query Query series
+ @param query_length Length of query
+ @param ptrs Pointers to arrays.  The arrays are expected to be 1-dimensional.
+ @param nb_ptrs Length of ptrs array
+ @param lengths Array of length nb_ptrs with all lengths of the arrays in ptrs.
+ @param output Array to store all outputs (should be of length nb_ptrs)
+ @param k Number of nearest series that are needed (0 for all distances)
+ @param settings Settings for distance functions
+ @return Length of output
+ */
+idx_t dtw_distances_query_ptrs(seq_t *query, idx_t query_length,
+                               seq_t **ptrs, idx_t nb_ptrs, idx_t *lengths,
+                               seq_t *output, idx_t k, DTWSettings *settings) {
+    return dtw_distances_query(query, query_length, ptrs, lengths, NULL, 0,
+                               nb_ptrs, 1, false, output, k, settings);
+}
+
+/*!
+ Distances between one query and all rows in a matrix (one-vs-many).
+ 
+ @see dtw_distances_query_ptrs
+ */
+idx_t dtw_distances_query_matrix(seq_t *query, idx_t query_length,
+                                 seq_t *matrix, idx_t nb_rows, idx_t nb_cols,
+                                 seq_t *output, idx_t k, DTWSettings *settings) {
+    return dtw_distances_query(query, query_length, NULL, NULL, matrix, nb_cols,
+                               nb_rows, 1, false, output, k, settings);
+}
+
+/*!
+ Distances between one n-dimensional query and a list of series (one-vs-many).
+ 
+ @see dtw_distances_query_ptrs
+ */
+idx_t dtw_distances_query_ndim_ptrs(seq_t *query, idx_t query_length,
+                                    seq_t **ptrs, idx_t nb_ptrs, idx_t *lengths, int ndim,
+                                    seq_t *output, idx_t k, DTWSettings *settings) {
+    return dtw_distances_query(query, query_length, ptrs, lengths, NULL, 0,
+                               nb_ptrs, ndim, true, output, k, settings);
+}
+
+/*!
+ Distances between one n-dimensional query and all rows in a 3-dimensional array (one-vs-many).
+ 
+ @see dtw_distances_query_ptrs
+ */
+idx_t dtw_distances_query_ndim_matrix(seq_t *query, idx_t query_length,
+                                      seq_t *matrix, idx_t nb_rows, idx_t nb_cols, int ndim,
+                                      seq_t *output, idx_t k, DTWSettings *settings) {
+    return dtw_distances_query(query, query_length, NULL, NULL, matrix, nb_cols,
+                               nb_rows, ndim, true, output, k, settings);
+}
+
+/*!
+ Insert a distance and the corresponding index in the sorted buffers with the
+ k best (smallest) distances.
+
+ @see dtw_kbest_insert
+ */
+seq_t dtw_kbest_insert_idx(seq_t *kbest, idx_t *kbest_idx, idx_t k, idx_t *nb_kbest, seq_t value, idx_t idx) {
+    idx_t i;
+    if (*nb_kbest < k) {
+        i = *nb_kbest;
+        *nb_kbest += 1;
+    } else if (value < kbest[k - 1]) {
+        i = k - 1;
+    } else {
+        return kbest[k - 1];
+    }
+    while (i > 0 && kbest[i - 1] > value) {
+        kbest[i] = kbest[i - 1];
+        kbest_idx[i] = kbest_idx[i - 1];
+        i--;
+    }
+    kbest[i] = value;
+    kbest_idx[i] = idx;
+    if (*nb_kbest < k) {
+        return INFINITY;
+    }
+    return kbest[k - 1];
+}
+
+/*!
+ The k-th best distance of a row in the kNN graph (INFINITY if less than k neighbors are known).
+ */
+seq_t dtw_knn_threshold(seq_t *distances, idx_t *nb_kbest, idx_t k, idx_t r) {
+    if (nb_kbest[r] < k) {
+        return INFINITY;
+    }
+    return distances[r*k + k - 1];
+}
+
+/*!
+ Check whether the kNN graph can use the lanes kernel (series of equal length in a matrix).
+ */
+bool dtw_knn_graph_lanes_supported(seq_t *matrix, int ndim, DTWSettings *settings) {
+    return (matrix != NULL && ndim == 1 && dtw_distances_lanes_supported(settings));
+}
+
+/*!
+ Envelopes of all series in a matrix for the kNN graph (or NULL if use_lb is not set).
+ The max_dist is only known during the computation, thus the envelopes are also
+ computed if max_dist is not set.
+
+ @see lb_envelopes_matrix
+ */
+seq_t* dtw_knn_graph_envelopes(seq_t *matrix, idx_t nb_rows, idx_t nb_cols, DTWSettings *settings) {
+    DTWSettings esettings = *settings;
+    if (esettings.max_dist == 0) {
+        esettings.max_dist = INFINITY;
+    }
+    return lb_envelopes_matrix(matrix, nb_rows, nb_cols, &esettings);
+}
+
+/*!
+ Distances between series r and the series cb to ce (exclusive) for the kNN graph.
+
+ Series are given either as an array of pointers (ptrs and lengths) or as
+ a matrix (matrix and nb_cols). If buffer is given, the lanes kernel is used
+ (see dtw_knn_graph_lanes_supported).
+
+ @param output Array to store ce - cb distances
+ */
+void dtw_knn_graph_distances(seq_t **ptrs, idx_t *lengths, seq_t *matrix, idx_t nb_cols, int ndim,
+                             seq_t *envs, seq_t *buffer, DTWLanesFnPtr fn,
+                             idx_t r, idx_t cb, idx_t ce, seq_t *output, DTWSettings *settings) {
+    idx_t c;
+    if (buffer != NULL) {
+        dtw_distances_lanes(&matrix[r*nb_cols], (envs == NULL) ? NULL : &envs[r*2*nb_cols],
+                            matrix, envs, nb_cols, cb, ce, output, buffer, fn, settings);
+        return;
+    }
+    for (c=cb; c<ce; c++) {
+        if (ptrs != NULL && ndim == 1) {
+            output[c - cb] = dtw_distance(ptrs[r], lengths[r], ptrs[c], lengths[c], settings);
+        } else if (ptrs != NULL) {
+            output[c - cb] = dtw_distance_ndim(ptrs[r], lengths[r], ptrs[c], lengths[c], ndim, settings);
+        } else if (ndim == 1) {
+            output[c - cb] = dtw_distance(&matrix[r*nb_cols], nb_cols, &matrix[c*nb_cols], nb_cols, settings);
+        } else {
+            output[c - cb] = dtw_distance_ndim(&matrix[r*nb_cols*ndim], nb_cols,
+                                               &matrix[c*nb_cols*ndim], nb_cols, ndim, settings);
+        }
+    }
+}
+
+/*!
+ Exact k-nearest-neighbor graph of a set of series.
+
+ Every pair is compared only once and the distance is inserted in the k best
+ distances of both series. A comparison is abandoned as soon as it cannot be
+ among the k nearest neighbors of either series. The largest of both k-th best
+ distances found so far is thus used as max_dist (and for the lower bounds if
+ use_lb is set). For series of equal length, DTW_LANES pairs are compared at
+ once with the lanes kernel (the largest k-th best distance of all series in
+ the lanes is then used).
+
+ Series are given either as an array of pointers (ptrs and lengths) or as
+ a matrix (matrix and nb_cols).
+
+ @param nb_series Number of series
+ @param ndim Number of dimensions (if larger than 1, n-dimensional DTW is used)
+ @param k Number of neighbors
+ @param indices Array of size nb_series*k to store for every series the indices of
+    its nearest series, sorted by distance. The index is -1 if less than k neighbors
+    are found (e.g. because of max_dist).
+ @param distances Array of size nb_series*k to store the corresponding distances
+    (INFINITY if there is no neighbor).
+ @param settings DTW settings
+ @return nb_series, or -1 if memory could not be allocated.
+ */
+idx_t dtw_knn_graph(seq_t **ptrs, idx_t *lengths, seq_t *matrix, idx_t nb_cols,
+                    idx_t nb_series, int ndim, idx_t k,
+                    idx_t *indices, seq_t *distances, DTWSettings *settings) {
+    idx_t r, c, cb, ce, i;
+    idx_t step = 1;
+    idx_t *nb_kbest;
+    seq_t threshold;
+    seq_t values[DTW_LANES];
+    seq_t *buffer = NULL;
+    seq_t *envs = NULL;
+    DTWLanesFnPtr fn = NULL;
+    DTWSettings lsettings;
+
+    for (i=0; i<nb_series*k; i++) {
+        indices[i] = -1;
+        distances[i] = INFINITY;
+    }
+    if (k <= 0) {
+        return nb_series;
+    }
+    nb_kbest = (idx_t *)calloc(nb_series, sizeof(idx_t));
+    if (!nb_kbest) {
+        return -1;
+    }
+    if (dtw_knn_graph_lanes_supported(matrix, ndim, settings)) {
+        buffer = (seq_t *)malloc(sizeof(seq_t) * dtw_distances_lanes_buffer_length(nb_cols, settings));
+        if (buffer) {
+            fn = dtw_distance_lanes_select();
+            envs = dtw_knn_graph_envelopes(matrix, nb_series, nb_cols, settings);
+            step = DTW_LANES;
+        }
+    }
+
+    for (r=0; r<nb_series; r++) {
+        for (cb=r+1; cb<nb_series; cb+=step) {
+            ce = MIN(cb + step, nb_series);
+            threshold = dtw_knn_threshold(distances, nb_kbest, k, r);
+            for (c=cb; c<ce; c++) {
+                threshold = MAX(threshold, dtw_knn_threshold(distances, nb_kbest, k, c));
+            }
+            lsettings = dtw_settings_threshold(settings, threshold);
+            dtw_knn_graph_distances(ptrs, lengths, matrix, nb_cols, ndim, envs, buffer, fn,
+                                    r, cb, ce, values, &lsettings);
+            for (c=cb; c<ce; c++) {
+                if (values[c - cb] < INFINITY) {
+                    dtw_kbest_insert_idx(&distances[r*k], &indices[r*k], k, &nb_kbest[r], values[c - cb], c);
+                    dtw_kbest_insert_idx(&distances[c*k], &indices[c*k], k, &nb_kbest[c], values[c - cb], r);
+                }
+            }
+        }
+    }
+    free(buffer);
+    free(envs);
+    free(nb_kbest);
+    return nb_series;
+}
+
+/*!
+ Exact k-nearest-neighbor graph of a list of series.
+
+ @param ptrs Pointers to arrays.  The arrays are expected to be C contiguous.
+ @param nb_ptrs Length of ptrs array
+ @param lengths Array of length nb_ptrs with all lengths of the arrays in ptrs.
+ @see dtw_knn_graph
+ */
+idx_t dtw_knn_graph_ptrs(seq_t **ptrs, idx_t nb_ptrs, idx_t *lengths, int ndim, idx_t k,
+                         idx_t *indices, seq_t *distances, DTWSettings *settings) {
+    return dtw_knn_graph(ptrs, lengths, NULL, 0, nb_ptrs, ndim, k, indices, distances, settings);
+}
+
+/*!
+ Exact k-nearest-neighbor graph of all rows in a matrix.
+
+ @param matrix 2-dimensional (or 3-dimensional if ndim > 1) array with series of equal length
+ @param nb_rows Number of series
+ @param nb_cols Length of the series
+ @see dtw_knn_graph
+ */
+idx_t dtw_knn_graph_matrix(seq_t *matrix, idx_t nb_rows, idx_t nb_cols, int ndim, idx_t k,
+                           idx_t *indices, seq_t *distances, DTWSettings *settings) {
+    return dtw_knn_graph(NULL, NULL, matrix, nb_cols, nb_rows, ndim, k, indices, distances, settings);
+}
+
 // MARK: DBA
 
 {% set suffix = 'ptrs' %}
@@ -18,6 +18,26 @@ bool is_openmp_supported() {
 }
 
 
+/*!
+ Register that nb distances are computed by one of the threads. Only the thread that
+ started the computation calls the callback (which can thus hold the Python GIL).
+ */
+void dtw_control_update_parallel(DTWControl *control, idx_t nb) {
+    if (control == NULL) {
+        return;
+    }
+#if defined(_OPENMP)
+    #pragma omp atomic
+    control->done += nb;
+    if (omp_get_thread_num() == 0) {
+        dtw_control_callback(control);
+    }
+#else
+    dtw_control_update(control, nb);
+#endif
+}
+
+
 /**
  Check the arguments passed to dtw_distances_* and prepare the array of indices to be used.
  The indices are created upfront to allow for easy parallelization.
@@ -91,6 +111,148 @@ int dtw_distances_prepare(DTWBlock *block, idx_t nb_series_r, idx_t nb_series_c,
 }
 
 
+/*!
+ Estimated cost of a DTW computation, the number of cells in the window and band of the DTW matrix.
+ */
+double dtw_schedule_pair_cost(idx_t l1, idx_t l2, DTWSettings *settings) {
+    idx_t ldiff = (l1 > l2) ? l1 - l2 : l2 - l1;
+    idx_t width = l2;
+    idx_t ri, cb, ce, window;
+    idx_t dl = (l1 > l2) ? l1 - l2 : 0;
+    idx_t dc = (l2 > l1) ? l2 - l1 : 0;
+    double cost = 1;
+    if (settings->max_length_diff != 0 && ldiff > settings->max_length_diff) {
+        return 1;
+    }
+    if (settings->window != 0) {
+        width = MIN(l2, ldiff + 2*settings->window - 1);
+    }
+    if (!dtw_settings_has_band(settings)) {
+        return (double)l1 * (double)width + 1;
+    }
+    // Count the cells in every row that are allowed by the window and the band
+    window = (settings->window == 0) ? MAX(l1, l2) : settings->window;
+    for (ri=0; ri<l1; ri++) {
+        dtw_settings_band_row(ri, l1, l2, settings, &cb, &ce);
+        cb = MAX(cb, ri - dl - window + 1);
+        ce = MIN(ce, ri + dc + window);
+        if (cb < ce) {
+            cost += (double)(ce - cb);
+        }
+    }
+    return cost;
+}
+
+
+static int dtw_schedule_item_cmp(const void *a, const void *b) {
+    double cost_a = ((const DTWScheduleItem *)a)->cost;
+    double cost_b = ((const DTWScheduleItem *)b)->cost;
+    // Largest cost first
+    return (cost_a < cost_b) - (cost_a > cost_b);
+}
+
+
+/*!
+ Split the rows of the block in parts with a similar cost and order them by cost, longest first.
+
+ A pair of long series can be many orders of magnitude more expensive than a pair of
+ short series. When the most expensive parts are computed first and the threads take the
+ next part when they are ready, no thread ends much later than the others.
+
+ @param lengths Lengths of the series
+ @param block Block of the distance matrix (corrected by dtw_distances_prepare)
+ @param cbs Column begin indices per row (see dtw_distances_prepare), if block->triu
+ @param nb_parts Rows that cost more than 1/nb_parts of the total are split
+ @param items Newly allocated array with the parts (to be freed by the caller)
+ @param settings DTW settings
+ @return Number of parts in items
+ */
+idx_t dtw_schedule_ptrs(idx_t *lengths, DTWBlock *block, idx_t *cbs, idx_t nb_parts,
+                        DTWScheduleItem **items, DTWSettings *settings) {
+    idx_t r, c, r_i, c_b;
+    idx_t nb_rows = block->re - block->rb;
+    idx_t nb_items = 0;
+    double total = 0;
+    double cost, target;
+    *items = NULL;
+    for (r_i=0; r_i<nb_rows; r_i++) {
+        r = block->rb + r_i;
+        for (c=(block->triu ? cbs[r_i] : block->cb); c<block->ce; c++) {
+            total += dtw_schedule_pair_cost(lengths[r], lengths[c], settings);
+        }
+    }
+    if (total == 0) {
+        return 0;
+    }
+    target = total / nb_parts;
+    // Every part that is split off costs at least target, thus at most nb_parts parts are split off
+    *items = (DTWScheduleItem *)malloc(sizeof(DTWScheduleItem) * (nb_rows + nb_parts + 1));
+    if (!*items) {
+        printf("Error: dtw_schedule_ptrs - cannot allocate memory (length = %zu)", nb_rows + nb_parts + 1);
+        return 0;
+    }
+    for (r_i=0; r_i<nb_rows; r_i++) {
+        r = block->rb + r_i;
+        c_b = block->triu ? cbs[r_i] : block->cb;
+        cost = 0;
+        for (c=c_b; c<block->ce; c++) {
+            cost += dtw_schedule_pair_cost(lengths[r], lengths[c], settings);
+            if (cost >= target || c == block->ce - 1) {
+                (*items)[nb_items].r_i = r_i;
+                (*items)[nb_items].cb = c_b;
+                (*items)[nb_items].ce = c + 1;
+                (*items)[nb_items].cost = cost;
+                nb_items++;
+                c_b = c + 1;
+                cost = 0;
+            }
+        }
+    }
+    qsort(*items, nb_items, sizeof(DTWScheduleItem), dtw_schedule_item_cmp);
+    return nb_items;
+}
+
+
+/* Distance matrix in parallel with the cost schedule (see dtw_schedule_ptrs). */
+static int dtw_distances_ptrs_parallel_cost(seq_t **ptrs, idx_t* lengths, int ndim, seq_t* output,
+                                            DTWBlock* block, idx_t *cbs, idx_t *rls, DTWSettings* settings) {
+#if defined(_OPENMP)
+    idx_t r, c, r_i, i;
+    seq_t value;
+    DTWScheduleItem *items;
+    idx_t nb_items = dtw_schedule_ptrs(lengths, block, cbs, 16 * omp_get_max_threads(), &items, settings);
+    if (items == NULL) {
+        return 1;
+    }
+    #pragma omp parallel for private(i, r_i, r, c, value) schedule(dynamic, 1)
+    for (i=0; i<nb_items; i++) {
+        if (dtw_control_stopped(settings->control)) {
+            continue;
+        }
+        r_i = items[i].r_i;
+        r = block->rb + r_i;
+        for (c=items[i].cb; c<items[i].ce; c++) {
+            if (ndim == 1) {
+                value = dtw_distance(ptrs[r], lengths[r], ptrs[c], lengths[c], settings);
+            } else {
+                value = dtw_distance_ndim(ptrs[r], lengths[r], ptrs[c], lengths[c], ndim, settings);
+            }
+            if (block->triu) {
+                output[rls[r_i] + c - cbs[r_i]] = value;
+            } else {
+                output[(block->ce - block->cb) * r_i + c - block->cb] = value;
+            }
+        }
+        dtw_control_update_parallel(settings->control, items[i].ce - items[i].cb);
+    }
+    free(items);
+    return 0;
+#else
+    return 1;
+#endif
+}
+
+
 {% set suffix = 'ptrs' %}
 {%- include 'dtw_distances_parallel.jinja.c' %}
 
@@ -109,3 +271,452 @@ int dtw_distances_prepare(DTWBlock *block, idx_t nb_series_r, idx_t nb_series_c,
 {% set suffix = 'ndim_matrices' %}
 {%- include 'dtw_distances_parallel.jinja.c' %}
 
+/*!
+
+@see dtw_distances_ptrs_ptrs
+*/
+idx_t dtw_distances_ptrs_ptrs_parallel(seq_t **ptrs_r, idx_t nb_ptrs_r, idx_t* lengths_r,
+                          seq_t **ptrs_c, idx_t nb_ptrs_c, idx_t* lengths_c,
+                          seq_t* output, DTWBlock* block, DTWSettings* settings) {
+    idx_t r, c, r_i, c_i;
+    idx_t length;
+    idx_t *cbs, *rls;
+
+    if (dtw_distances_prepare(block, nb_ptrs_r, nb_ptrs_c, &cbs, &rls, &length, settings) != 0) {
+        return 0;
+    }
+    
+#if defined(_OPENMP)
+    r_i=0;
+    #pragma omp parallel for private(r_i, c_i, r, c) schedule(guided)
+    for (r_i=0; r_i < (block->re - block->rb); r_i++) {
+        r = block->rb + r_i;
+        c_i = 0;
+        if (block->triu) {
+            c = cbs[r_i];
+        } else {
+            c = block->cb;
+        }
+        for (; c<block->ce; c++) {
+            double value = dtw_distance(ptrs_r[r], lengths_r[r],
+                                        ptrs_c[c], lengths_c[c], settings);
+            if (block->triu) {
+                output[rls[r_i] + c_i] = value;
+            } else {
+                output[(block->ce - block->cb) * r_i + c_i] = value;
+            }
+            c_i++;
+        }
+    }
+    
+    if (block->triu) {
+        free(cbs);
+        free(rls);
+    }
+    return length;
+#else
+    printf("ERROR: DTAIDistanceC is compiled without OpenMP support.\n");
+    for  (r_i=0; r_i<length; r_i++) {
+        output[r_i] = 0;
+    }
+    return 0;
+#endif
+}
+
+
+/*!
+
+@see dtw_distances_ndim_ptrs_ptrs
+*/
+idx_t dtw_distances_ndim_ptrs_ptrs_parallel(seq_t **ptrs_r, idx_t nb_ptrs_r, idx_t* lengths_r,
+                          seq_t **ptrs_c, idx_t nb_ptrs_c, idx_t* lengths_c, int ndim,
+                          seq_t* output, DTWBlock* block, DTWSettings* settings) {
+    idx_t r, c, r_i, c_i;
+    idx_t length;
+    idx_t *cbs, *rls;
+
+    if (dtw_distances_prepare(block, nb_ptrs_r, nb_ptrs_c, &cbs, &rls, &length, settings) != 0) {
+        return 0;
+    }
+    
+#if defined(_OPENMP)
+    r_i=0;
+    #pragma omp parallel for private(r_i, c_i, r, c) schedule(guided)
+    for (r_i=0; r_i < (block->re - block->rb); r_i++) {
+        r = block->rb + r_i;
+        c_i = 0;
+        if (block->triu) {
+            c = cbs[r_i];
+        } else {
+            c = block->cb;
+        }
+        for (; c<block->ce; c++) {
+            double value = dtw_distance_ndim(ptrs_r[r], lengths_r[r],
+                                             ptrs_c[c], lengths_c[c],
+                                             ndim, settings);
+            if (block->triu) {
+                output[rls[r_i] + c_i] = value;
+            } else {
+                output[(block->ce - block->cb) * r_i + c_i] = value;
+            }
+            c_i++;
+        }
+    }
+    
+    if (block->triu) {
+        free(cbs);
+        free(rls);
+    }
+    return length;
+#else
+    printf("ERROR: DTAIDistanceC is compiled without OpenMP support.\n");
+    for  (r_i=0; r_i<length; r_i++) {
+        output[r_i] = 0;
+    }
+    return 0;
+#endif
+}
+
+
+/*!
+Sparse distance matrix, executed on a list of pointers to arrays and in parallel.
+
+Every thread stores its distances in its own buffer, these buffers are merged
+at the end. The distances are thus not ordered.
+
+@see dtw_distances_sparse_ptrs
+*/
+idx_t dtw_distances_sparse_ptrs_parallel(seq_t **ptrs, idx_t nb_ptrs, idx_t* lengths, int ndim,
+                                         DTWSparse* output, DTWBlock* block, DTWSettings* settings) {
+#if defined(_OPENMP)
+    idx_t r, c, cb;
+    seq_t value;
+    int t, nb_threads;
+    bool failed = false;
+    DTWSparse *parts;
+
+    if (dtw_distances_length(block, nb_ptrs, nb_ptrs) == 0) {
+        return 0;
+    }
+
+    // Correct block
+    if (block->re == 0) {
+        block->re = nb_ptrs;
+    }
+    if (block->ce == 0) {
+        block->ce = nb_ptrs;
+    }
+
+    nb_threads = omp_get_max_threads();
+    parts = (DTWSparse *)malloc(sizeof(DTWSparse) * nb_threads);
+    if (!parts) {
+        return -1;
+    }
+    for (t=0; t<nb_threads; t++) {
+        parts[t] = dtw_sparse_empty();
+    }
+
+    #pragma omp parallel private(r, c, cb, value)
+    {
+        DTWSparse *part = &parts[omp_get_thread_num()];
+        // Rows have different lengths, see dtw_distances_ptrs_parallel
+        #pragma omp for schedule(guided)
+        for (r=block->rb; r<block->re; r++) {
+            if (block->triu && r + 1 > block->cb) {
+                cb = r+1;
+            } else {
+                cb = block->cb;
+            }
+            for (c=cb; c<block->ce; c++) {
+                if (ndim == 1) {
+                    value = dtw_distance(ptrs[r], lengths[r], ptrs[c], lengths[c], settings);
+                } else {
+                    value = dtw_distance_ndim(ptrs[r], lengths[r], ptrs[c], lengths[c], ndim, settings);
+                }
+                if (value < INFINITY && !dtw_sparse_append(part, r, c, value)) {
+                    #pragma omp atomic write
+                    failed = true;
+                }
+            }
+        }
+    }
+
+    // Merge the buffers of all threads
+    for (t=0; t<nb_threads; t++) {
+        if (!failed && !dtw_sparse_extend(output, &parts[t])) {
+            failed = true;
+        }
+        dtw_sparse_free(&parts[t]);
+    }
+    free(parts);
+    if (failed) {
+        return -1;
+    }
+    return output->length;
+#else
+    printf("ERROR: DTAIDistanceC is compiled without OpenMP support.\n");
+    return 0;
+#endif
+}
+
+
+/*!
+Exact k-nearest-neighbor graph of a set of series, executed in parallel.
+
+The rows are divided over the threads. Every pair is still compared only once,
+thus a thread also updates the k best distances of other rows. Every row has
+a lock to protect its k best distances.
+
+@see dtw_knn_graph
+*/
+idx_t dtw_knn_graph_parallel(seq_t **ptrs, idx_t *lengths, seq_t *matrix, idx_t nb_cols,
+                             idx_t nb_series, int ndim, idx_t k,
+                             idx_t *indices, seq_t *distances, DTWSettings *settings) {
+    idx_t i;
+#if defined(_OPENMP)
+    idx_t r;
+    idx_t *nb_kbest;
+    omp_lock_t *locks;
+    seq_t *envs = NULL;
+    DTWLanesFnPtr fn = NULL;
+    bool use_lanes = dtw_knn_graph_lanes_supported(matrix, ndim, settings);
+
+    for (i=0; i<nb_series*k; i++) {
+        indices[i] = -1;
+        distances[i] = INFINITY;
+    }
+    if (k <= 0) {
+        return nb_series;
+    }
+    nb_kbest = (idx_t *)calloc(nb_series, sizeof(idx_t));
+    if (!nb_kbest) {
+        return -1;
+    }
+    locks = (omp_lock_t *)malloc(sizeof(omp_lock_t) * nb_series);
+    if (!locks) {
+        free(nb_kbest);
+        return -1;
+    }
+    for (r=0; r<nb_series; r++) {
+        omp_init_lock(&locks[r]);
+    }
+    if (use_lanes) {
+        fn = dtw_distance_lanes_select();
+        envs = dtw_knn_graph_envelopes(matrix, nb_series, nb_cols, settings);
+    }
+
+    #pragma omp parallel private(r)
+    {
+        idx_t c, cb, ce;
+        idx_t step = 1;
+        seq_t threshold, value;
+        seq_t values[DTW_LANES];
+        seq_t *buffer = NULL;
+        DTWSettings lsettings;
+        if (use_lanes) {
+            // If allocation fails, this thread compares one pair at a time
+            buffer = (seq_t *)malloc(sizeof(seq_t) * dtw_distances_lanes_buffer_length(nb_cols, settings));
+            if (buffer) {
+                step = DTW_LANES;
+            }
+        }
+        // The first rows have more comparisons (upper triangular matrix), see dtw_distances_ptrs_parallel
+        #pragma omp for schedule(guided)
+        for (r=0; r<nb_series; r++) {
+            for (cb=r+1; cb<nb_series; cb+=step) {
+                ce = MIN(cb + step, nb_series);
+                threshold = 0;
+                for (c=cb; c<ce; c++) {
+                    omp_set_lock(&locks[c]);
+                    threshold = MAX(threshold, dtw_knn_threshold(distances, nb_kbest, k, c));
+                    omp_unset_lock(&locks[c]);
+                }
+                omp_set_lock(&locks[r]);
+                threshold = MAX(threshold, dtw_knn_threshold(distances, nb_kbest, k, r));
+                omp_unset_lock(&locks[r]);
+                lsettings = dtw_settings_threshold(settings, threshold);
+                dtw_knn_graph_distances(ptrs, lengths, matrix, nb_cols, ndim, envs, buffer, fn,
+                                        r, cb, ce, values, &lsettings);
+                for (c=cb; c<ce; c++) {
+                    value = values[c - cb];
+                    if (value < INFINITY) {
+                        omp_set_lock(&locks[r]);
+                        dtw_kbest_insert_idx(&distances[r*k], &indices[r*k], k, &nb_kbest[r], value, c);
+                        omp_unset_lock(&locks[r]);
+                        omp_set_lock(&locks[c]);
+                        dtw_kbest_insert_idx(&distances[c*k], &indices[c*k], k, &nb_kbest[c], value, r);
+                        omp_unset_lock(&locks[c]);
+                    }
+                }
+            }
+        }
+        free(buffer);
+    }
+
+    for (r=0; r<nb_series; r++) {
+        omp_destroy_lock(&locks[r]);
+    }
+    free(locks);
+    free(envs);
+    free(nb_kbest);
+    return nb_series;
+#else
+    printf("ERROR: DTAIDistanceC is compiled without OpenMP support.\n");
+    for (i=0; i<nb_series*k; i++) {
+        indices[i] = -1;
+        distances[i] = INFINITY;
+    }
+    return 0;
+#endif
+}
+
+
+/*!
+@see dtw_knn_graph_ptrs
+*/
+idx_t dtw_knn_graph_ptrs_parallel(seq_t **ptrs, idx_t nb_ptrs, idx_t *lengths, int ndim, idx_t k,
+                                  idx_t *indices, seq_t *distances, DTWSettings *settings) {
+    return dtw_knn_graph_parallel(ptrs, lengths, NULL, 0, nb_ptrs, ndim, k, indices, distances, settings);
+}
+
+
+/*!
+@see dtw_knn_graph_matrix
+*/
+idx_t dtw_knn_graph_matrix_parallel(seq_t *matrix, idx_t nb_rows, idx_t nb_cols, int ndim, idx_t k,
+                                    idx_t *indices, seq_t *distances, DTWSettings *settings) {
+    return dtw_knn_graph_parallel(NULL, NULL, matrix, nb_cols, nb_rows, ndim, k, indices, distances, settings);
+}
+
+
+/*!
+Distances between one query and a set of series, executed in parallel.
+
+If k > 0, every thread keeps its own k best distances. The smallest k-th best
+distance over all threads is shared and used as max_dist by all threads
+(it is always an upper bound on the true k-th best distance).
+
+@see dtw_distances_query
+*/
+idx_t dtw_distances_query_parallel(seq_t *query, idx_t query_length,
+                                   seq_t **ptrs, idx_t *lengths,
+                                   seq_t *matrix, idx_t nb_cols,
+                                   idx_t nb_series, int ndim, bool use_ndim,
+                                   seq_t *output, idx_t k, DTWSettings *settings) {
+    idx_t i;
+#if defined(_OPENMP)
+    seq_t threshold = INFINITY;
+    bool use_kbest = (k > 0 && k < nb_series);
+    seq_t *env_q = NULL;
+    if (settings->use_lb && lb_is_valid(settings) && !use_ndim && matrix != NULL) {
+        // The envelope of the query is the same for all comparisons
+        env_q = (seq_t *)malloc(sizeof(seq_t) * 2 * nb_cols);
+        if (env_q) {
+            lb_envelope(query, query_length, nb_cols, settings, env_q, &env_q[nb_cols]);
+        }
+    }
+
+    #pragma omp parallel private(i)
+    {
+        seq_t *kbest = NULL;
+        idx_t nb_kbest = 0;
+        seq_t cur_threshold, local_threshold;
+        seq_t *s;
+        idx_t l;
+        DTWSettings lsettings = *settings;
+        if (use_kbest) {
+            // If allocation fails, this thread computes its distances without pruning
+            kbest = (seq_t *)malloc(sizeof(seq_t) * k);
+        }
+        // Series can have different lengths, thus use dynamic scheduling
+        #pragma omp for schedule(dynamic)
+        for (i=0; i<nb_series; i++) {
+            if (ptrs != NULL) {
+                s = ptrs[i];
+                l = lengths[i];
+            } else {
+                s = &matrix[i*nb_cols*ndim];
+                l = nb_cols;
+            }
+            if (kbest != NULL) {
+                #pragma omp critical(dtw_query_threshold)
+                {
+                    cur_threshold = threshold;
+                }
+                lsettings = dtw_settings_threshold(settings, cur_threshold);
+            }
+            if (use_ndim) {
+                output[i] = dtw_distance_ndim(query, query_length, s, l, ndim, &lsettings);
+            } else if (env_q != NULL) {
+                output[i] = dtw_distance_envelope(query, query_length, env_q, &env_q[nb_cols], s, l, &lsettings);
+            } else {
+                output[i] = dtw_distance(query, query_length, s, l, &lsettings);
+            }
+            if (kbest != NULL) {
+                local_threshold = dtw_kbest_insert(kbest, k, &nb_kbest, output[i]);
+                if (local_threshold < cur_threshold) {
+                    #pragma omp critical(dtw_query_threshold)
+                    {
+                        if (local_threshold < threshold) {
+                            threshold = local_threshold;
+                        }
+                    }
+                }
+            }
+        }
+        free(kbest);
+    }
+    free(env_q);
+    return nb_series;
+#else
+    printf("ERROR: DTAIDistanceC is compiled without OpenMP support.\n");
+    for  (i=0; i<nb_series; i++) {
+        output[i] = 0;
+    }
+    return 0;
+#endif
+}
+
+
+/*!
+@see dtw_distances_query_ptrs
+*/
+idx_t dtw_distances_query_ptrs_parallel(seq_t *query, idx_t query_length,
+                                        seq_t **ptrs, idx_t nb_ptrs, idx_t *lengths,
+                                        seq_t *output, idx_t k, DTWSettings *settings) {
+    return dtw_distances_query_parallel(query, query_length, ptrs, lengths, NULL, 0,
+                                        nb_ptrs, 1, false, output, k, settings);
+}
+
+
+/*!
+@see dtw_distances_query_matrix
+*/
+idx_t dtw_distances_query_matrix_parallel(seq_t *query, idx_t query_length,
+                                          seq_t *matrix, idx_t nb_rows, idx_t nb_cols,
+                                          seq_t *output, idx_t k, DTWSettings *settings) {
+    return dtw_distances_query_parallel(query, query_length, NULL, NULL, matrix, nb_cols,
+                                        nb_rows, 1, false, output, k, settings);
+}
+
+
+/*!
+@see dtw_distances_query_ndim_ptrs
+*/
+idx_t dtw_distances_query_ndim_ptrs_parallel(seq_t *query, idx_t query_length,
+                                             seq_t **ptrs, idx_t nb_ptrs, idx_t *lengths, int ndim,
+                                             seq_t *output, idx_t k, DTWSettings *settings) {
+    return dtw_distances_query_parallel(query, query_length, ptrs, lengths, NULL, 0,
+                                        nb_ptrs, ndim, true, output, k, settings);
+}
+
+
+/*!
+@see dtw_distances_query_ndim_matrix
+*/
+idx_t dtw_distances_query_ndim_matrix_parallel(seq_t *query, idx_t query_length,
+                                               seq_t *matrix, idx_t nb_rows, idx_t nb_cols, int ndim,
+                                               seq_t *output, idx_t k, DTWSettings *settings) {
+    return dtw_distances_query_parallel(query, query_length, NULL, NULL, matrix, nb_cols,
+                                        nb_rows, ndim, true, output, k, settings);
+}
@@ -36,6 +36,85 @@ seq_t dtw_distance{{ suffix }}{{ suffix2 }}(seq_t *s1, idx_t l1,
                       seq_t *s2, idx_t l2, {% if "ndim" in suffix %}int ndim,{% endif %}
                       DTWSettings *settings) {
     {%- if inner_dist != "euclidean" %}
+    {%- if "ndim" in suffix %}
+    return dtw_distance_ndim_strided(s1, l1, ndim, 1, s2, l2, ndim, 1, ndim, settings);
+    {%- else %}
+    return dtw_distance_strided(s1, l1, 1, s2, l2, 1, settings);
+    {%- endif %}
+}
+
+
+/**
+{%- if "ndim" in suffix %}
+Compute the DTW between two n-dimensional series that are not contiguous in memory.
+
+Dimension d of element i of the first series is s1[i * stride1 + d * dstride1].
+A C-contiguous series has stride ndim and dstride 1, a Fortran-ordered series
+has stride 1 and dstride l1. The series are not copied, except if the Euclidean
+inner distance is used.
+{%- else %}
+Compute the DTW between two series that are not contiguous in memory.
+
+Element i of the first series is s1[i * stride1]. For example, a column of
+a C-contiguous matrix with n columns has stride n. The series are not copied,
+except if the lower bounds (use_lb, use_eapruning) or the Euclidean inner
+distance are used.
+{%- endif %}
+
+@param s1 First sequence
+@param l1 Length of first sequence
+@param stride1 Distance (in number of values) between two elements of s1
+{%- if "ndim" in suffix %}
+@param dstride1 Distance (in number of values) between two dimensions of s1
+{%- endif %}
+@param s2 Second sequence
+@param l2 Length of second sequence
+@param stride2 Distance (in number of values) between two elements of s2
+{%- if "ndim" in suffix %}
+@param dstride2 Distance (in number of values) between two dimensions of s2
+@param ndim Number of dimensions
+{%- endif %}
+@param settings A DTWSettings struct with options for the DTW algorithm.
+
+@see dtw_distance{{ suffix }}
+*/
+{%- if "ndim" in suffix %}
+seq_t dtw_distance_ndim_strided(seq_t *s1, idx_t l1, idx_t stride1, idx_t dstride1,
+                                seq_t *s2, idx_t l2, idx_t stride2, idx_t dstride2,
+                                int ndim, DTWSettings *settings) {
+    if (settings->inner_dist == 1 &&
+        (stride1 != ndim || dstride1 != 1 || stride2 != ndim || dstride2 != 1)) {
+        seq_t *c1 = dtw_gather(s1, l1, stride1, ndim, dstride1);
+        seq_t *c2 = dtw_gather(s2, l2, stride2, ndim, dstride2);
+        seq_t result = INFINITY;
+        if (c1 && c2) {
+            result = dtw_distance_ndim_euclidean(c1, l1, c2, l2, ndim, settings);
+        }
+        free(c1);
+        free(c2);
+        return result;
+    }
+    {%- else %}
+seq_t dtw_distance_strided(seq_t *s1, idx_t l1, idx_t stride1,
+                           seq_t *s2, idx_t l2, idx_t stride2,
+                           DTWSettings *settings) {
+    if ((stride1 != 1 || stride2 != 1) &&
+        (settings->use_lb || settings->use_eapruning || settings->inner_dist == 1)) {
+        // These options rely on methods for contiguous series
+        seq_t *c1 = dtw_gather(s1, l1, stride1, 1, 0);
+        seq_t *c2 = dtw_gather(s2, l2, stride2, 1, 0);
+        seq_t result = INFINITY;
+        if (c1 && c2) {
+            result = dtw_distance(c1, l1, c2, l2, settings);
+        }
+        free(c1);
+        free(c2);
+        return result;
+    }
+    if (settings->use_lb && lb_cascade_prune(s1, l1, s2, l2, settings)) {
+        return INFINITY;
+    }
+    {%- endif %}
     if (settings->inner_dist == 1) {
         return dtw_distance{{ suffix }}_euclidean(s1, l1, s2, l2, {% if "ndim" in suffix %}ndim, {% endif %} settings);
     }
@@ -55,18 +134,29 @@ seq_t dtw_distance{{ suffix }}{{ suffix2 }}(seq_t *s1, idx_t l1,
     seq_t max_step = settings->max_step;
     seq_t max_dist = settings->max_dist;
     seq_t penalty = settings->penalty;
+    seq_t penalty_horizontal = settings->penalty_s2;  // vertical move in matrix (down) = expanding s2
+    seq_t penalty_vertical = settings->penalty_s1;    // horizontal move in matrix (right) = expanding s1
 
     #ifdef DTWDEBUG
     printf("r=%zu, c=%zu\n", l1, l2);
     #endif
-    if (settings->use_pruning) {
+    if (settings->use_pruning && dtw_settings_band_has_euclidean(l1, l2, settings)) {
+        {%- if "euclidean" == inner_dist %}
         {%- if "ndim" in suffix %}
-        max_dist = ub_euclidean_ndim{{ suffix2 }}(s1, l1, s2, l2, ndim);
+        max_dist = ub_euclidean_ndim_euclidean(s1, l1, s2, l2, ndim);
         {%- else %}
-        max_dist = ub_euclidean{{ suffix2 }}(s1, l1, s2, l2);
+        max_dist = ub_euclidean_euclidean(s1, l1, s2, l2);
         {%- endif %}
-        {%- if "euclidean" == inner_dist %}
         {%- else %}
+        {%- if "ndim" in suffix %}
+        if (stride1 == ndim && dstride1 == 1 && stride2 == ndim && dstride2 == 1) {
+            max_dist = ub_euclidean_ndim(s1, l1, s2, l2, ndim);
+        } else {
+            max_dist = ub_euclidean_ndim_strided(s1, l1, stride1, dstride1, s2, l2, stride2, dstride2, ndim);
+        }
+        {%- else %}
+        max_dist = ub_euclidean_strided(s1, l1, stride1, s2, l2, stride2);
+        {%- endif %}
         max_dist = pow(max_dist, 2);
         {%- endif %}
     } else if (max_dist == 0) {
@@ -92,7 +182,13 @@ seq_t dtw_distance{{ suffix }}{{ suffix2 }}(seq_t *s1, idx_t l1,
     } else {
         max_step = pow(max_step, 2);
     }
-    penalty = pow(penalty, 2);
+    // For backward compatibility: if asymmetric penalties are not set, use symmetric penalty
+    if (penalty_horizontal == 0 && penalty_vertical == 0 && penalty != 0) {
+        penalty_horizontal = penalty;
+        penalty_vertical = penalty;
+    }
+    penalty_horizontal = pow(penalty_horizontal, 2);
+    penalty_vertical = pow(penalty_vertical, 2);
     // rows is for series 1, columns is for series 2
     idx_t length = MIN(l2+1, ldiff + 2*window + 1);
     assert(length > 0);
@@ -110,6 +206,20 @@ seq_t dtw_distance{{ suffix }}{{ suffix2 }}(seq_t *s1, idx_t l1,
     for (j=0; j<length*2; j++) {
         dtw[j] = INFINITY;
     }
+    {%- if "ndim" not in suffix %}
+    // EAPrunedDTW: cb[i+1] is a lower bound on the cost of the rows after row i
+    bool eapruning = settings->use_eapruning && max_dist != INFINITY;
+    bool abandoned = false;
+    // The tolerance avoids pruning the best path because of rounding errors
+    seq_t max_dist_row = max_dist * (1 + SEQ_T_REL_TOL);
+    seq_t *cb = NULL;
+    if (eapruning && lb_is_valid(settings)) {
+        cb = (seq_t *)malloc(sizeof(seq_t) * (3*l1 + 1));
+        if (cb) {
+            lb_keogh_cumulative(s1, l1, s2, l2, settings, cb, &cb[l1 + 1]);
+        }
+    }
+    {%- endif %}
     // Deal with psi-relaxation in first row
     for (i=0; i<settings->psi_2b + 1; i++) {
         dtw[i] = 0;
@@ -120,6 +230,10 @@ seq_t dtw_distance{{ suffix }}{{ suffix2 }}(seq_t *s1, idx_t l1,
     int i1 = 0;
     idx_t minj;
     idx_t maxj;
+    bool use_band = dtw_settings_has_band(settings);
+    bool psi_start;
+    idx_t band_b = 0;
+    idx_t band_e = l2;
     idx_t curidx = 0;
     idx_t dl_window = dl + window - 1;
     idx_t ldiff_window = window;
@@ -128,8 +242,12 @@ seq_t dtw_distance{{ suffix }}{{ suffix2 }}(seq_t *s1, idx_t l1,
     }
     seq_t minv;
     seq_t d;
+    {%- if "ndim" not in suffix and inner_dist != "euclidean" %}
+    seq_t s1i;
+    {%- endif %}
     seq_t tempv;
     seq_t psi_shortest = INFINITY;
+    DTWStats stats = dtw_stats_default();
     // keepRunning = 1;
     for (i=0; i<l1; i++) {
         // if (!keepRunning){  // not compatible with OMP
@@ -138,7 +256,11 @@ seq_t dtw_distance{{ suffix }}{{ suffix2 }}(seq_t *s1, idx_t l1,
         //     return INFINITY;
         // }
         {%- if "ndim" in suffix %}
+        {%- if "euclidean" == inner_dist %}
         i_idx = i * ndim;
+        {%- else %}
+        i_idx = i * stride1;
+        {%- endif %}
         {%- endif %}
         // maxj = i;
         // if (maxj > dl_window) {
@@ -165,6 +287,13 @@ seq_t dtw_distance{{ suffix }}{{ suffix2 }}(seq_t *s1, idx_t l1,
         //     skip = 0;
         // }
         skip = skip * (length != l2 + 1);
+        // The free start of psi is in the first column, also if the band of this row starts later
+        psi_start = (settings->psi_1b != 0 && i < settings->psi_1b && maxj == 0 && sc == 0);
+        if (use_band) {
+            dtw_settings_band_row(i, l1, l2, settings, &band_b, &band_e);
+            maxj = MAX(maxj, band_b);
+            minj = MIN(minj, band_e);
+        }
         // PrunedDTW
         if (sc > maxj) {
             #ifdef DTWDEBUG
@@ -174,8 +303,16 @@ seq_t dtw_distance{{ suffix }}{{ suffix2 }}(seq_t *s1, idx_t l1,
         }
         smaller_found = false;
         ec_next = i;
+        {%- if "ndim" not in suffix %}
+        if (cb) {
+            max_dist_row = max_dist * (1 + SEQ_T_REL_TOL) - cb[i + 1];
+        }
+        {%- if inner_dist != "euclidean" %}
+        s1i = s1[i * stride1];
+        {%- endif %}
+        {%- endif %}
         // Deal with psi-relaxation in first column
-        if (settings->psi_1b != 0 && maxj == 0 && i < settings->psi_1b) {
+        if (psi_start) {
             dtw[i1*length + 0] = 0;
         }
         #ifdef DTWDEBUG
@@ -183,15 +320,29 @@ seq_t dtw_distance{{ suffix }}{{ suffix2 }}(seq_t *s1, idx_t l1,
         #endif
         for (j=maxj; j<minj; j++) {
             {%- if "ndim" in suffix %}
+            {%- if "euclidean" == inner_dist %}
             j_idx = j * ndim;
+            {%- else %}
+            j_idx = j * stride2;
+            {%- endif %}
             {%- endif %}
             #ifdef DTWDEBUG
+            {%- if inner_dist == "euclidean" %}
             printf("ri=%zu,ci=%zu, s1[i] = s1[%zu] = %f , s2[j] = s2[%zu] = %f\n", i, j, i, s1[i], j, s2[j]);
+            {%- elif "ndim" in suffix %}
+            printf("ri=%zu,ci=%zu, s1[i] = s1[%zu] = %f , s2[j] = s2[%zu] = %f\n", i, j, i, s1[i_idx], j, s2[j_idx]);
+            {%- else %}
+            printf("ri=%zu,ci=%zu, s1[i] = s1[%zu] = %f , s2[j] = s2[%zu] = %f\n", i, j, i, s1i, j, s2[j * stride2]);
+            {%- endif %}
             #endif
             {%- if "ndim" in suffix %}
             d = 0;
             for (int d_i=0; d_i<ndim; d_i++) {
+                {%- if "euclidean" == inner_dist %}
                 d += SEDIST(s1[i_idx + d_i], s2[j_idx + d_i]);
+                {%- else %}
+                d += SEDIST(s1[i_idx + d_i * dstride1], s2[j_idx + d_i * dstride2]);
+                {%- endif %}
             }
             {%- if "euclidean" == inner_dist %}
             d = sqrt(d);
@@ -200,7 +351,7 @@ seq_t dtw_distance{{ suffix }}{{ suffix2 }}(seq_t *s1, idx_t l1,
             {%- if "euclidean" == inner_dist %}
             d = fabs(s1[i] - s2[j]);
             {%- else %}{# inner_dist == "squared euclidean" #}
-            d = SEDIST(s1[i], s2[j]);
+            d = SEDIST(s1i, s2[j * stride2]);
             {%- endif %}
             {%- endif %}
             if (d > max_step) {
@@ -210,12 +361,12 @@ seq_t dtw_distance{{ suffix }}{{ suffix2 }}(seq_t *s1, idx_t l1,
             curidx = i0 * length + j - skipp;
             minv = dtw[curidx];
             curidx += 1;
-            tempv = dtw[curidx] + penalty;
+            tempv = dtw[curidx] + penalty_horizontal;
             if (tempv < minv) {
                 minv = tempv;
             }
             curidx = i1 * length + j - skip;
-            tempv = dtw[curidx] + penalty;
+            tempv = dtw[curidx] + penalty_vertical;
             if (tempv < minv) {
                 minv = tempv;
             }
@@ -230,10 +381,17 @@ seq_t dtw_distance{{ suffix }}{{ suffix2 }}(seq_t *s1, idx_t l1,
             printf("i=%zu, j=%zu, d=%f, skip=%zu, skipp=%zu\n",i,j,d,skip,skipp);
             #endif
             // PrunedDTW
+            {%- if "ndim" in suffix %}
             if (dtw[curidx] > max_dist) {
                 #ifdef DTWDEBUG
                 printf("dtw[%zu] = %f > %f\n", curidx, dtw[curidx], max_dist);
                 #endif
+            {%- else %}
+            if (dtw[curidx] > max_dist_row) {
+                #ifdef DTWDEBUG
+                printf("dtw[%zu] = %f > %f\n", curidx, dtw[curidx], max_dist_row);
+                #endif
+            {%- endif %}
                 if (!smaller_found) {
                     sc = j + 1;
                 }
@@ -241,6 +399,7 @@ seq_t dtw_distance{{ suffix }}{{ suffix2 }}(seq_t *s1, idx_t l1,
                     #ifdef DTWDEBUG
                     printf("Break because of pruning with j=%zu, ec=%zu (saved %zu computations)\n", j, ec, minj-j);
                     #endif
+                    stats.cells++;
                     break;
                 }
             } else {
@@ -248,6 +407,7 @@ seq_t dtw_distance{{ suffix }}{{ suffix2 }}(seq_t *s1, idx_t l1,
                 ec_next = j + 1;
             }
         }
+        stats.cells += j - maxj;
         ec = ec_next;
         // Deal with Psi-relaxation in last column
         if (settings->psi_1e != 0 && minj == l2 && l1 - 1 - i <= settings->psi_1e) {
@@ -260,17 +420,42 @@ seq_t dtw_distance{{ suffix }}{{ suffix2 }}(seq_t *s1, idx_t l1,
         #ifdef DTWDEBUG
         dtw_print_twoline(dtw, l1, l2, length, i0, i1, skip, skipp, maxj, minj);
         #endif
+        {%- if "ndim" not in suffix %}
+        // EAPrunedDTW: all paths through this row exceed max_dist
+        if (eapruning && !smaller_found && i >= settings->psi_1b) {
+            abandoned = true;
+            stats.pairs_abandoned = 1;
+            stats.rows_abandoned = l1 - 1 - i;
+            break;
+        }
+        {%- endif %}
     }
+    {%- if "ndim" not in suffix %}
+    free(cb);
+    {%- endif %}
     if (window - 1 < 0) {
         l2 += window - 1;
     }
     {%- if "euclidean" == inner_dist %}
-    seq_t result = dtw[length * i1 + l2 - skip];
+    {%- set sqrt_b = "" %}
+    {%- set sqrt_e = "" %}
     {%- else %}
-    seq_t result = sqrt(dtw[length * i1 + l2 - skip]);
+    {%- set sqrt_b = "sqrt(" %}
+    {%- set sqrt_e = ")" %}
     {%- endif %}
+    {%- if "ndim" in suffix %}
+    seq_t result = {{ sqrt_b }}dtw[length * i1 + l2 - skip]{{ sqrt_e }};
     // Deal with psi-relaxation in the last row
     if (settings->psi_1e != 0 || settings->psi_2e != 0) {
+    {%- else %}
+    seq_t result = INFINITY;
+    if (abandoned) {
+        // Only paths that ended earlier because of psi-relaxation can be shorter
+        if (settings->psi_1e != 0) {
+            result = {{ sqrt_b }}psi_shortest{{ sqrt_e }};
+        }
+    } else if (settings->psi_1e != 0 || settings->psi_2e != 0) {
+    {%- endif %}
         if (settings->psi_2e != 0) {
             for (i=l2 - skip - settings->psi_2e; i<l2 - skip + 1; i++) { // iterate over vci
                 if (dtw[i1*length + i] < psi_shortest) {
@@ -278,12 +463,16 @@ seq_t dtw_distance{{ suffix }}{{ suffix2 }}(seq_t *s1, idx_t l1,
                 }
             }
         }
-        {%- if "euclidean" == inner_dist %}
-        result = psi_shortest;
-        {%- else %}
-        result = sqrt(psi_shortest);
-        {%- endif %}
+        result = {{ sqrt_b }}psi_shortest{{ sqrt_e }};
+    {%- if "ndim" in suffix %}
     }
+    {%- else %}
+    } else {
+        result = {{ sqrt_b }}dtw[length * i1 + l2 - skip]{{ sqrt_e }};
+    }
+    {%- endif %}
+    stats.pairs = 1;
+    dtw_stats_merge(&stats);
     free(dtw);
     // signal(SIGINT, SIG_DFL);  // not compatible with OMP
     if (settings->max_dist !=0 && result > settings->max_dist) {
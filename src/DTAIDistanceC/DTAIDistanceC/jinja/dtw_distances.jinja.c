@@ -70,6 +70,16 @@ idx_t dtw_distances_{{ suffix }}(
     idx_t length;
     idx_t i;
     seq_t value;
+    {%- if suffix == "matrix" %}
+    seq_t *buffer = NULL;
+    DTWLanesFnPtr fn = NULL;
+    seq_t *envs = NULL;
+    {%- elif suffix == "matrices" %}
+    seq_t *buffer = NULL;
+    DTWLanesFnPtr fn = NULL;
+    seq_t *envs_r = NULL;
+    seq_t *envs_c = NULL;
+    {%- endif %}
 
     length = dtw_distances_length(block, {{nb_size_r}}, {{nb_size_c}});
     if (length == 0) {
@@ -83,14 +93,57 @@ idx_t dtw_distances_{{ suffix }}(
     if (block->ce == 0) {
         block->ce = {{ nb_size_c }};
     }
+    {%- if suffix == "matrix" %}
+
+    if (dtw_distances_lanes_supported(settings)) {
+        buffer = (seq_t *)malloc(sizeof(seq_t) * dtw_distances_lanes_buffer_length(nb_cols, settings));
+        if (buffer) {
+            fn = dtw_distance_lanes_select();
+            envs = lb_envelopes_matrix(matrix, nb_rows, nb_cols, settings);
+        }
+    }
+    {%- elif suffix == "matrices" %}
+
+    if (nb_cols_r == nb_cols_c && dtw_distances_lanes_supported(settings)) {
+        buffer = (seq_t *)malloc(sizeof(seq_t) * dtw_distances_lanes_buffer_length(nb_cols_r, settings));
+        if (buffer) {
+            fn = dtw_distance_lanes_select();
+            envs_r = lb_envelopes_matrix(matrix_r, nb_rows_r, nb_cols_r, settings);
+            envs_c = lb_envelopes_matrix(matrix_c, nb_rows_c, nb_cols_c, settings);
+        }
+    }
+    {%- endif %}
 
     i = 0;
     for (r=block->rb; r<block->re; r++) {
+        {%- if "matrices" not in suffix %}
+        if (dtw_control_stopped(settings->control)) {
+            break;
+        }
+        {%- endif %}
         if (block->triu && r + 1 > block->cb) {
             cb = r+1;
         } else {
             cb = block->cb;
         }
+        {%- if suffix == "matrix" %}
+        if (buffer && cb < block->ce) {
+            dtw_distances_lanes(&matrix[r*nb_cols], (envs == NULL) ? NULL : &envs[r*2*nb_cols],
+                                matrix, envs, nb_cols, cb, block->ce,
+                                &output[i], buffer, fn, settings);
+            i += block->ce - cb;
+            dtw_control_update(settings->control, block->ce - cb);
+            continue;
+        }
+        {%- elif suffix == "matrices" %}
+        if (buffer && cb < block->ce) {
+            dtw_distances_lanes(&matrix_r[r*nb_cols_r], (envs_r == NULL) ? NULL : &envs_r[r*2*nb_cols_r],
+                                matrix_c, envs_c, nb_cols_r, cb, block->ce,
+                                &output[i], buffer, fn, settings);
+            i += block->ce - cb;
+            continue;
+        }
+        {%- endif %}
         for (c=cb; c<block->ce; c++) {
             {%- if suffix == "ptrs" %}
             value = dtw_distance(ptrs[r], lengths[r],
@@ -118,8 +171,23 @@ idx_t dtw_distances_{{ suffix }}(
             output[i] = value;
             i += 1;
         }
+        {%- if "matrices" not in suffix %}
+        dtw_control_update(settings->control, (cb < block->ce) ? block->ce - cb : 0);
+        {%- endif %}
     }
+    {%- if suffix == "matrix" %}
+    free(buffer);
+    free(envs);
+    {%- elif suffix == "matrices" %}
+    free(buffer);
+    free(envs_r);
+    free(envs_c);
+    {%- endif %}
+    {%- if "matrices" in suffix %}
     assert(length == i);
+    {%- else %}
+    assert(length == i || dtw_control_stopped(settings->control));
+    {%- endif %}
     return length;
 }
 
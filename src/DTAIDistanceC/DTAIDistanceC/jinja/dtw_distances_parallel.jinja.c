@@ -39,13 +39,115 @@ idx_t dtw_distances_{{suffix}}_parallel(
     idx_t r, c, r_i, c_i;
     idx_t length;
     idx_t *cbs, *rls;
+    {%- if suffix == "matrix" %}
+    seq_t *buffer;
+    seq_t *envs = NULL;
+    bool use_lanes;
+    DTWLanesFnPtr fn = NULL;
+    {%- elif suffix == "matrices" %}
+    seq_t *buffer;
+    seq_t *envs_r = NULL;
+    seq_t *envs_c = NULL;
+    bool use_lanes;
+    DTWLanesFnPtr fn = NULL;
+    {%- endif %}
 
     if (dtw_distances_prepare(block, {{nb_size_r}}, {{nb_size_c}}, &cbs, &rls, &length, settings) != 0) {
         return 0;
     }
     
 #if defined(_OPENMP)
+    {%- if "ptrs" in suffix %}
+    if (settings->schedule == 1) {
+        if (dtw_distances_ptrs_parallel_cost(ptrs, lengths, {% if "ndim" in suffix %}ndim{% else %}1{% endif %}, output, block, cbs, rls, settings) != 0) {
+            length = 0;
+        }
+        if (block->triu) {
+            free(cbs);
+            free(rls);
+        }
+        return length;
+    }
+    {%- endif %}
     r_i=0;
+    {%- if suffix == "matrix" or suffix == "matrices" %}
+    {%- if suffix == "matrix" %}
+    use_lanes = dtw_distances_lanes_supported(settings);
+    if (use_lanes) {
+        fn = dtw_distance_lanes_select();
+        envs = lb_envelopes_matrix(matrix, nb_rows, nb_cols, settings);
+    }
+    {%- else %}
+    use_lanes = nb_cols_r == nb_cols_c && dtw_distances_lanes_supported(settings);
+    if (use_lanes) {
+        fn = dtw_distance_lanes_select();
+        envs_r = lb_envelopes_matrix(matrix_r, nb_rows_r, nb_cols_r, settings);
+        envs_c = lb_envelopes_matrix(matrix_c, nb_rows_c, nb_cols_c, settings);
+    }
+    {%- endif %}
+    #pragma omp parallel private(r_i, c_i, r, c, buffer)
+    {
+        buffer = NULL;
+        if (use_lanes) {
+            buffer = (seq_t *)malloc(sizeof(seq_t) * dtw_distances_lanes_buffer_length({% if suffix == "matrix" %}nb_cols{% else %}nb_cols_r{% endif %}, settings));
+        }
+        #pragma omp for schedule(guided)
+        for (r_i=0; r_i < (block->re - block->rb); r_i++) {
+            {%- if suffix == "matrix" %}
+            if (dtw_control_stopped(settings->control)) {
+                continue;
+            }
+            {%- endif %}
+            r = block->rb + r_i;
+            c_i = 0;
+            if (block->triu) {
+                c = cbs[r_i];
+            } else {
+                c = block->cb;
+            }
+            if (buffer && c < block->ce) {
+                {%- if suffix == "matrix" %}
+                dtw_distances_lanes(&matrix[r*nb_cols], (envs == NULL) ? NULL : &envs[r*2*nb_cols],
+                                    matrix, envs, nb_cols, c, block->ce,
+                                    block->triu ? &output[rls[r_i]] : &output[(block->ce - block->cb) * r_i],
+                                    buffer, fn, settings);
+                dtw_control_update_parallel(settings->control, block->ce - c);
+                {%- else %}
+                dtw_distances_lanes(&matrix_r[r*nb_cols_r], (envs_r == NULL) ? NULL : &envs_r[r*2*nb_cols_r],
+                                    matrix_c, envs_c, nb_cols_r, c, block->ce,
+                                    block->triu ? &output[rls[r_i]] : &output[(block->ce - block->cb) * r_i],
+                                    buffer, fn, settings);
+                {%- endif %}
+                continue;
+            }
+            for (; c<block->ce; c++) {
+                {%- if suffix == "matrix" %}
+                double value = dtw_distance(&matrix[r*nb_cols], nb_cols,
+                                             &matrix[c*nb_cols], nb_cols, settings);
+                {%- else %}
+                double value = dtw_distance(&matrix_r[r*nb_cols_r], nb_cols_r,
+                                            &matrix_c[c*nb_cols_c], nb_cols_c, settings);
+                {%- endif %}
+                if (block->triu) {
+                    output[rls[r_i] + c_i] = value;
+                } else {
+                    output[(block->ce - block->cb) * r_i + c_i] = value;
+                }
+                c_i++;
+            }
+            {%- if suffix == "matrix" %}
+            dtw_control_update_parallel(settings->control, c_i);
+            {%- endif %}
+        }
+        free(buffer);
+    }
+    {%- if suffix == "matrix" %}
+    free(envs);
+    {%- else %}
+    free(envs_r);
+    free(envs_c);
+    {%- endif %}
+    {%- else %}
     {%- if suffix == "ptrs" %}
     // Rows have different lengths, thus use guided scheduling to make threads with shorter rows
     // not wait for threads with longer rows. Also the first rows are always longer than the last
@@ -56,6 +158,11 @@ idx_t dtw_distances_{{suffix}}_parallel(
     {%- endif %}
     #pragma omp parallel for private(r_i, c_i, r, c) schedule(guided)
     for (r_i=0; r_i < (block->re - block->rb); r_i++) {
+        {%- if "matrices" not in suffix %}
+        if (dtw_control_stopped(settings->control)) {
+            continue;
+        }
+        {%- endif %}
         r = block->rb + r_i;
         c_i = 0;
         if (block->triu) {
@@ -71,16 +178,10 @@ idx_t dtw_distances_{{suffix}}_parallel(
             double value = dtw_distance_ndim(ptrs[r], lengths[r],
                           ptrs[c], lengths[c],
                           ndim, settings);
-            {%- elif suffix == "matrix" %}
-            double value = dtw_distance(&matrix[r*nb_cols], nb_cols,
-                                         &matrix[c*nb_cols], nb_cols, settings);
             {%- elif suffix == "ndim_matrix" %}
             double value = dtw_distance_ndim(&matrix[r*nb_cols*ndim], nb_cols,
                                              &matrix[c*nb_cols*ndim], nb_cols,
                                              ndim, settings);
-            {%- elif suffix == "matrices" %}
-            double value = dtw_distance(&matrix_r[r*nb_cols_r], nb_cols_r,
-                                        &matrix_c[c*nb_cols_c], nb_cols_c, settings);
             {%- elif suffix == "ndim_matrices" %}
             double value = dtw_distance_ndim(&matrix_r[r*nb_cols_r*ndim], nb_cols_r,
                                              &matrix_c[c*nb_cols_c*ndim], nb_cols_c,
@@ -93,7 +194,11 @@ idx_t dtw_distances_{{suffix}}_parallel(
             }
             c_i++;
         }
+        {%- if "matrices" not in suffix %}
+        dtw_control_update_parallel(settings->control, c_i);
+        {%- endif %}
     }
+    {%- endif %}
     
     if (block->triu) {
         free(cbs);
@@ -0,0 +1,598 @@
+/*!
+ Compute warping path using Hirschberg's method.
+
+ The memory complexity is reduced to O(max(m,n)) instead of O(mn).
+ Use the Squared Euclidean inner distance.
+ Use the Type I steps.
+ 
+ Psi-relaxation is not supported.
+ Setting pruning has no effect.
+
+ @param f_s From array
+ @param f_l Length of from array
+ @param t_s To array
+ @param t_l Length of to array
+ @param switch_to_full When to use the full reprensentation for warping paths
+    Memory will by O(switch_to_full*switch_to_full) for these calls. This needs to be
+    minimally 2 and can be as large as there is memory available (e.g. 1000 woud be
+    around 7.6MiB for 64 bit representations).
+ @param ndim Number of dimensions
+ @param settings for Dynamic Time Warping.
+ @return DDPath structure
+*/
+DDPath dtw_wph_{{inner_dist}}_{{steps}}(seq_t *f_s, idx_t f_l,
+                           seq_t* t_s, idx_t t_l,
+                           idx_t switch_to_full,
+                           int ndim, DTWSettings * settings) {
+    // No support for psi relaxation
+    assert(settings->psi_1b == 0 && settings->psi_1e == 0);
+    assert(settings->psi_2b == 0 && settings->psi_2e == 0);
+    assert(settings->max_step == 0);
+    assert(settings->max_length_diff == 0);
+    
+    const idx_t inf_cols = 1;
+    const idx_t inf_rows = 1;
+    const idx_t width = t_l + inf_cols;
+    seq_t max_cost = settings->max_dist;
+    
+    if (switch_to_full < 2) {
+        switch_to_full = 2;
+    }
+    // Set max_cost
+    if (settings->use_pruning) {
+        max_cost = ub_euclidean(f_s, f_l, t_s, t_l);
+        if (settings->max_dist != 0 && max_cost >= settings->max_dist) {
+            max_cost = settings->max_dist;
+        }
+        max_cost *= max_cost;
+    } else {
+        if (settings->max_dist == 0) {
+            max_cost = INFINITY;
+        } else {
+            max_cost = settings->max_dist*settings->max_dist;
+        }
+    }
+    const DTWHSettings hsettings = {
+        .ndim = ndim,
+        .window =settings->window == 0 ? MAX(f_l, t_l): settings->window,
+        .window_type = settings->window_type,
+        .penalty = settings->penalty*settings->penalty,
+        .max_cost = max_cost,
+        .switch_to_full = switch_to_full // 1000 would be 7.6MiB for 64bit
+    };
+    
+    DDPath path;
+    seq_t* lines[2];  // temporary lines (size = inf_rows + 1)
+    for (int i=0; i<(inf_rows + 1); i++) {
+        lines[i] = (seq_t *)malloc(sizeof(seq_t) * width);
+        if (lines[i] == NULL) {
+            printf("ERROR: cannot allocate memory for DTWH");
+            exit(1);
+        }
+    }
+    seq_t * lastline_u = (seq_t *)malloc(sizeof(seq_t) * width);
+    seq_t * lastline_b = (seq_t *)malloc(sizeof(seq_t) * width);
+    if (lastline_u == NULL || lastline_b == NULL) {
+        printf("ERROR: cannot allocate memory for DTWH");
+        exit(1);
+    }
+    
+    idx_t f_i0, f_il, t_i0, t_il;
+    idx_t f_im, t_im;
+    seq_t dist, t_dm;
+    idx_t f_ll;
+    idx_t t_ll;
+    float rico = ((float)t_l) / f_l;
+    idx_t t_diag;
+    DDPath temppath;
+    int stack_i = 0;
+    int stack_size = round(log2(MAX(f_l,t_l))*2*4);
+    idx_t stack[stack_size];
+    dd_path_init(&path, round(f_l*1.2));
+    
+    stack[stack_i++] = t_l;
+    stack[stack_i++] = 0;
+    stack[stack_i++] = f_l;
+    stack[stack_i++] = 0;
+    while (stack_i > 0) {
+        f_i0 = stack[--stack_i];
+        f_il = stack[--stack_i];
+        t_i0 = stack[--stack_i];
+        t_il = stack[--stack_i];
+        #ifdef DTWHDEBUG
+        printf("== rec call ([%zu,%zu],[%zu,%zu])\n", f_i0, f_il, t_i0, t_il);
+        #endif
+        assert(f_il > f_i0);
+        assert(t_il > t_i0);
+        f_ll = f_il - f_i0;
+        t_ll = t_il - t_i0;
+
+        if (f_ll == 0) {
+            dd_path_insert_wo_doubles(&path, f_i0, t_i0);
+            continue;
+        }
+        if (t_ll == 0) {
+            dd_path_insert_wo_doubles(&path, f_i0, t_i0);
+            continue;
+        }
+        if (f_ll == 1) {
+            dd_path_insert_wo_doubles(&path, f_i0, t_i0);
+            for (idx_t t_i=t_i0+1; t_i<t_il; t_i++) {
+                dd_path_insert(&path, f_i0, t_i);
+            }
+            continue;
+        }
+        if (t_ll == 1) {
+            dd_path_insert_wo_doubles(&path, f_i0, f_i0);
+            for (idx_t f_i=f_i0+1; f_i<f_il; f_i++) {
+                dd_path_insert(&path, f_i, t_i0);
+            }
+            continue;
+        }
+        if (t_ll <= hsettings.switch_to_full || f_ll <= hsettings.switch_to_full) {
+            temppath = dtw_wph_wp_{{inner_dist}}_{{steps}}(f_i0, f_il, t_i0, t_il,
+                                              f_s, f_l, t_s, t_l, &hsettings);
+            #ifdef DTWHDEBUG
+            printf("t_len == %zu || f_len == %zu\n", t_ll, f_ll);
+            dd_path_print(&temppath);
+            #endif
+            path.distance = MAX(path.distance, temppath.distance);
+            dd_path_extend_wo_doubles(&path, &temppath, 1);
+            dd_path_free(&temppath);
+            continue;
+        }
+
+        f_im = (f_i0 + f_il - 1) / 2;
+        dtw_wph_llf_{{inner_dist}}_{{steps}}(lines, lastline_u,
+                               f_i0, f_im+1, t_i0, t_il,
+                               f_s, f_l, t_s, t_l,
+                               &hsettings);
+        dtw_wph_llr_{{inner_dist}}_{{steps}}(lines, lastline_b,
+                               f_im+1, f_il, t_i0, t_il,
+                               f_s, f_l, t_s, t_l,
+                               &hsettings);
+        // Select smallest distance after adding the prefix and postfix lastlines
+        // as best split in the to series
+        t_dm = INFINITY;
+        t_im = 0;
+        t_diag = round(f_im*rico);
+        for (idx_t i=0; i<t_ll; i++) {
+            dist = lastline_u[i] + lastline_b[i];
+            #ifdef DTWHDEBUG
+            printf("dist[%zu,%zu] = u[%zu] + b[%zu] = %f\n",
+                   f_im, t_i0 + i, i, i, dist);
+            #endif
+            // Smallest value or if equal closest to diagonal
+            //if (dist < t_dm || (dist == t_dm && (labs(t_i0+i-f_im) < labs(t_im-f_im)))) {
+            if (dist < t_dm || (dist == t_dm && (labs(t_i0+i-t_diag) < labs(t_im-t_diag)))) {
+                t_dm = dist;
+                t_im = t_i0 + i;
+            }
+        }
+        assert(t_dm < INFINITY);
+        path.distance = MAX(path.distance, t_dm);
+        if (t_dm > hsettings.max_cost) {
+            path.distance = INFINITY;
+            // Stop searching for path
+            break;
+        }
+
+        // Recurse based on the best split in the to series
+        stack[stack_i++] = t_il;
+        stack[stack_i++] = t_im;
+        stack[stack_i++] = f_il;
+        stack[stack_i++] = f_im;
+
+        stack[stack_i++] = t_im+1;
+        stack[stack_i++] = t_i0;
+        stack[stack_i++] = f_im+1;
+        stack[stack_i++] = f_i0;
+
+        if (stack_i > stack_size) {
+            printf("ERROR: Stack out of memory");
+            exit(1);
+        }
+
+        #ifdef DTWHDEBUG
+        dd_path_print(&path);
+        #endif
+    }
+
+    // Clean up
+    for (int i=0; i<(inf_rows + 1); i++) {
+        free(lines[i]);
+    }
+    free(lastline_u);
+    free(lastline_b);
+    path.distance = sqrt(path.distance);
+    return path;
+}
+
+/*!
+ Compute lastline for block `[f_i0:f_il. t_i0:t_il]` (excluding the last index.
+ 
+ @param lines Memory for storing temporary values, at least inf_rows + 1 lines
+ @param lastline Memory where the values that need to be returned are stored
+ @param f_i0 First index on the from series
+ @param f_il Last index+1 on the from series
+ @param t_i0 First index on the to series
+ @param t_il Last index+1 on the to series
+ @param f_s From series
+ @param f_l From series length
+ @param t_s To series
+ @param t_l To series length
+ @param settings A DTWHSettings struct
+*/
+void dtw_wph_llf_{{inner_dist}}_{{steps}}(seq_t** lines, seq_t* lastline,
+                             idx_t f_i0, idx_t f_il,
+                             idx_t t_i0, idx_t t_il,
+                             seq_t *f_s, idx_t f_l, seq_t* t_s, idx_t t_l,
+                             const DTWHSettings * settings) {
+    const idx_t inf_cols = 1;
+    const idx_t inf_rows = 1;
+    const idx_t f_ll = f_il - f_i0;
+    const idx_t t_ll = t_il - t_i0;
+    
+    idx_t i, j;
+    idx_t i_c, j_c;
+    seq_t d, tempv, minv;
+    seq_t * templine;
+    DDRange j_r;
+    idx_t sc = 0;
+    idx_t ec = 0;
+    bool smaller_found;
+    idx_t ec_next;
+    
+    #ifdef DTWHDEBUG
+    printf("compute llf: window=%zu\n", settings->window);
+    #endif
+    if (f_ll == 0) {
+        printf("Should not happen? (dtw_wph_llf_{{inner_dist}}_{{steps}})");
+        for (j=0; j<(inf_cols+t_ll); j++) {
+            lastline[j] = 0;
+        }
+        return;
+    }
+    for (idx_t j=0; j<inf_cols; j++) {
+        lines[0][j] = 0;
+    }
+    for (idx_t j=inf_cols; j<inf_cols+t_ll; j++) {
+        lines[0][j] = INFINITY;
+    }
+    
+    for (i=0; i<f_ll; i++) {
+        i_c = f_i0+i;
+
+        // Apply window
+        j_r = dtw_get_range_row(i, f_i0, sc, t_l, t_i0, t_il, f_l, t_l,
+                                settings->window, settings->window_type);
+        #ifdef DTWHDEBUG
+        printf("i=%zu = %zu, j=[%zu,%zu] -> [%zu,%zu]\n", i,i_c,t_i0,t_i0+t_ll,t_i0+j_r.b,t_i0+j_r.e);
+        #endif
+        assert(j_r.e > 0);
+        assert(j_r.e <= t_il);
+        assert(j_r.b < t_il);
+        smaller_found = false;
+        ec_next = i_c;
+        
+        // Set first columns to infinity + columns outside of window
+        for (j=0; j<(inf_cols+j_r.b); j++) {
+            lines[1][j] = INFINITY;
+        }
+        // Fill up line with cumulative distance
+        for (j=j_r.b; j<j_r.e; j++) {
+            j_c = t_i0+j;
+            d = 0;
+            for (int d_i=0; d_i<settings->ndim; d_i++) {
+                d += SEDIST(f_s[i_c*settings->ndim+d_i],
+                            t_s[j_c*settings->ndim+d_i]);
+            }
+            //printf("d = d(f[%zu],t[%zu]) = d(%f,%f) = %f\n",
+            //       f_i0+i, t_i0+j, f_s[f_i0+i], t_s[t_i0+j], d);
+            minv = lines[0][j-1+inf_cols];
+            tempv = lines[0][j+inf_cols] + settings->penalty;
+            if (tempv < minv) {minv = tempv;}
+            tempv = lines[1][j-1+inf_cols] + settings->penalty;
+            if (tempv < minv) {minv = tempv;}
+            lines[1][j+inf_cols] = d + minv;
+            
+            if (lines[1][j+inf_cols] > settings->max_cost) {
+                if (!smaller_found)
+                    sc = j_c + 1;
+                if (j_c >= ec)
+                    break;
+            } else {
+                smaller_found = true;
+                ec_next = j_c + 1;
+            }
+        }
+        for (j=j_r.e; j<t_ll; j++) {
+            lines[1][j+inf_cols] = INFINITY;
+        }
+        ec = ec_next;
+        #ifdef DTWHDEBUG
+        print_nbs(lines[inf_rows], 0, inf_cols + t_ll);
+        #endif // DTWHDEBUG
+        // Shift lines
+        templine = lines[0];
+        for (int line_i=0; line_i<inf_rows; line_i++) {
+            lines[line_i] = lines[line_i + 1];
+        }
+        lines[inf_rows] = templine;
+    }
+    memcpy(lastline, &lines[inf_rows - 1][inf_cols], sizeof(seq_t) * t_ll);
+    #ifdef DTWHDEBUG
+    printf("lastline([%zu,%zu],[%zu,%zu],f) = ",f_i0, f_il, t_i0, t_il);
+    print_nbs(lastline, 0, t_ll);
+    #endif // DTWHDEBUG
+}
+
+/*!
+ Compute reverse lastline for block `[f_i0:f_il. t_i0:t_il]` (excluding the last index.
+ 
+ @param lines Memory for storing temporary values, at least inf_rows + 1 lines
+ @param lastline Memory where the values that need to be returned are stored
+ @param f_i0 First index on the from series
+ @param f_il Last index+1 on the from series
+ @param t_i0 First index on the to series
+ @param t_il Last index+1 on the to series
+ @param f_s From series
+ @param f_l From series length
+ @param t_s To series
+ @param t_l To series length
+ @param settings A DTWHSettings struct
+*/
+void dtw_wph_llr_{{inner_dist}}_{{steps}}(seq_t** lines, seq_t* lastline,
+                             idx_t f_i0, idx_t f_il,
+                             idx_t t_i0, idx_t t_il,
+                             seq_t *f_s, idx_t f_l, seq_t* t_s, idx_t t_l,
+                             const DTWHSettings * settings) {
+    const idx_t inf_cols = 1;
+    const idx_t inf_rows = 1;
+    const idx_t f_ll = f_il - f_i0;
+    const idx_t t_ll = t_il - t_i0;
+    
+    idx_t i, j;
+    idx_t i_c, j_c;
+    seq_t d, tempv, minv;
+    seq_t * templine;
+    DDRange j_r;
+    idx_t sc = t_l-1;
+    idx_t ec = t_l-1;
+    bool smaller_found;
+    idx_t ec_next;
+    
+    #ifdef DTWHDEBUG
+    printf("compute llr([%zu,%zu],[%zu,%zu]): window=%zu\n", f_i0, f_il, t_i0, t_il, settings->window);
+    #endif
+    
+    if (f_ll == 0) {
+        printf("Should not happen? (dtw_wph_llr_{{inner_dist}}_{{steps}})");
+        for (j=0; j<(inf_cols+t_ll); j++) {
+            lastline[j] = 0;
+        }
+        return;
+    }
+    for (idx_t j=inf_cols+t_ll-1; j>=t_ll; j--) {
+        lines[0][j] = 0;
+    }
+    for (idx_t j=t_ll-1; j>=0; j--) {
+        lines[0][j] = INFINITY;
+    }
+    
+    for (i=f_ll-1; i>=0; i--) {
+        i_c = f_i0+i;
+
+        // Apply window
+        j_r = dtw_get_range_row(i, f_i0, 0, sc, t_i0, t_il, f_l, t_l,
+                                settings->window, settings->window_type);
+        #ifdef DTWHDEBUG
+        printf("i=%zu -> %zu, j=[0,%zu]=[%zu,%zu] (%zu<=j<=%zu) -> [%zu,%zu]=[%zu,%zu]\n",
+               i,i_c, t_ll,t_i0,t_i0+t_ll, 0, sc, j_r.b, j_r.e, t_i0+j_r.b,t_i0+j_r.e);
+        #endif
+        smaller_found = false;
+        ec_next = i_c;
+
+        // Set last columns to infinity + columns outside of window
+        for (j=inf_cols+t_ll-1; j>=j_r.e; j--) {
+            lines[1][j] = INFINITY;
+        }
+        // Fill up line with cumulative distance
+        for (j=j_r.e-1; j>=j_r.b; j--) {
+            j_c = t_i0+j;
+            d = 0;
+            for (int d_i=0; d_i<settings->ndim; d_i++) {
+                d += SEDIST(f_s[i_c*settings->ndim+d_i],
+                            t_s[j_c*settings->ndim+d_i]);
+            }
+            // d = SEDIST(f_s[f_i_b+dir*i], t_s[t_i_b+dir*j]);
+            #ifdef DTWHDEBUG
+            printf("d = d(f[%zu],t[%zu]) = d(%f,%f) = %f\n",
+                   i_c, j_c, f_s[i_c], t_s[j_c], d);
+            #endif
+            minv = lines[0][j+1];
+            tempv = lines[0][j] + settings->penalty;
+            if (tempv < minv) {minv = tempv;}
+            tempv = lines[1][j+1] + settings->penalty;
+            if (tempv < minv) {minv = tempv;}
+            lines[1][j] = d + minv;
+            
+            if (lines[1][j]> settings->max_cost) {
+                if (!smaller_found)
+                    sc = j_c - 1;
+                if (j_c >= ec)
+                    break;
+            } else {
+                smaller_found = true;
+                ec_next = j_c - 1;
+            }
+        }
+        if (j_r.b > 0) {
+            for (j=j_r.b-1; j>=0; j--) {
+                lines[1][j] = INFINITY;
+            }
+        }
+        ec = ec_next;
+        #ifdef DTWHDEBUG
+        print_nbs(lines[1], 0, inf_cols + t_ll);
+        #endif // DTWHDEBUG
+        // Shift lines
+        templine = lines[0];
+        for (int line_i=0; line_i<inf_rows; line_i++) {
+            lines[line_i] = lines[line_i + 1];
+        }
+        lines[inf_rows] = templine;
+    }
+
+    // Do one more transition but ignore the "+d" part since
+    // f(0:i) + f_r(i:n) == cost(0:n) and d should not be counted twice
+    for (j=0; j<t_ll; j++) {
+        minv = lines[0][j+1];
+        tempv = lines[0][j] + settings->penalty;
+        if (tempv < minv) {minv = tempv;}
+        lines[1][j] = minv;
+    }
+    #ifdef DTWHDEBUG
+    print_nbs(lines[1], 0, inf_cols + t_ll);
+    #endif // DTWHDEBUG
+    templine = lines[0];
+    lines[0] = lines[1];
+    lines[1] = templine;
+
+    memcpy(lastline, lines[inf_rows - 1], sizeof(seq_t) * t_ll);
+    #ifdef DTWHDEBUG
+    printf("lastline([%zu,%zu],[%zu,%zu],r) = [",f_i0, f_il, t_i0, t_il);
+    print_nbs(lastline, 0, t_ll);
+    #endif // DTWHDEBUG
+}
+
+/*!
+ Compute full cumulative cost matrix and path for block
+ `[f_i0:f_il. t_i0:t_il]` (excluding the last index.
+ 
+ @param f_i0 First index on the from series
+ @param f_il Last index+1 on the from series
+ @param t_i0 First index on the to series
+ @param t_il Last index+1 on the to series
+ @param f_s From series
+ @param f_l From series length
+ @param t_s To series
+ @param t_l To series length
+ @param settings A DTWHSettings struct
+*/
+DDPath dtw_wph_wp_{{inner_dist}}_{{steps}}(idx_t f_i0, idx_t f_il,
+                              idx_t t_i0, idx_t t_il,
+                              seq_t *f_s, idx_t f_l, seq_t* t_s, idx_t t_l,
+                              const DTWHSettings * settings) {
+    const idx_t inf_cols = 1;
+    const idx_t inf_rows = 1;
+    const idx_t f_ll = f_il - f_i0;
+    const idx_t t_ll = t_il - t_i0;
+    
+    DDPath path;
+    idx_t i, j;
+    idx_t i_c, j_c;
+    seq_t d, tempv, minv;
+    DDRange j_r;
+    idx_t sc = 0;
+    idx_t ec = 0;
+    bool smaller_found;
+    idx_t ec_next;
+    
+    seq_t *ccm = (seq_t*)malloc(sizeof(seq_t) * (inf_cols + t_ll) * (inf_rows + f_ll));
+    seq_t** rows = (seq_t**)malloc(sizeof(seq_t *) * (inf_rows + f_ll));
+    if (ccm == NULL || rows == NULL) {
+        printf("ERROR: cannot allocate memory for DTWH");
+        exit(1);
+    }
+    for (i=0; i<(inf_rows + f_ll); i++) {
+        rows[i] = &ccm[i*(inf_cols + t_ll)];
+    }
+    
+    for (i=0; i<inf_rows; i++) {
+        for (j=0; j<inf_cols; j++) {
+            rows[i][j] = 0;
+        }
+        for (j=inf_cols; j<(inf_cols+t_ll); j++) {
+            rows[i][j] = INFINITY;
+        }
+    }
+    for (i=inf_rows; i<(inf_rows+f_ll); i++) {
+        for (j=0; j<inf_cols; j++) {
+            rows[i][j] = INFINITY;
+        }
+    }
+    
+    for (i=0; i<f_ll; i++) {
+        i_c = f_i0+i;
+        j_r = dtw_get_range_row(i, f_i0, sc, t_l, t_i0, t_il, f_l, t_l,
+                                settings->window, settings->window_type);
+        #ifdef DTWHDEBUG
+        printf("i=%zu = %zu, j=[%zu,%zu] -> [%zu,%zu] (w=%zu)\n",
+               i,f_i0+i,t_i0,t_i0+t_ll,t_i0+j_r.b,t_i0+j_r.e,settings->window);
+        #endif
+//        assert(!(settings->window == 0 || settings->window == MAX(t_l, f_l)) || (j_r.b == 0 && j_r.e == t_ll));
+//        assert (!(settings->window > 0 || settings->window < MAX(t_l, f_l)) || (j_r.b < t_ll && j_r.e <= t_ll));
+        smaller_found = false;
+        ec_next = i_c;
+        
+        // printf("[");
+        for (j=0; j<j_r.b; j++) {
+            rows[inf_rows+i][inf_cols+j] = INFINITY;
+        }
+        for (j=j_r.b; j<j_r.e; j++) {
+            j_c = t_i0+j;
+            d = 0;
+            for (int d_i=0; d_i<settings->ndim; d_i++) {
+                d += SEDIST(f_s[i_c*settings->ndim+d_i],
+                            t_s[j_c*settings->ndim+d_i]);
+            }
+            // d = SEDIST(f_s[f_i0+i], t_s[t_i0+j]);
+            minv = rows[inf_rows+i-1][inf_cols+j-1];
+            tempv = rows[inf_rows+i-1][inf_cols+j] + settings->penalty;
+            if (tempv < minv) {minv = tempv;}
+            tempv = rows[inf_rows+i][inf_cols+j-1] + settings->penalty;
+            if (tempv < minv) {minv = tempv;}
+            rows[inf_rows+i][inf_cols+j] = d + minv;
+            // print_nb(rows[inf_rows+i][inf_cols+j]);
+            // printf(",");
+            
+            if (rows[inf_rows+i][inf_cols+j] > settings->max_cost) {
+                if (!smaller_found)
+                    sc = j_c + 1;
+                if (j_c >= ec)
+                    break;
+            } else {
+                smaller_found = true;
+                ec_next = j_c + 1;
+            }
+        }
+        for (j=j_r.e; j<t_ll; j++) {
+            rows[inf_rows+i][inf_cols+j] = INFINITY;
+        }
+        // printf("]\n");
+        ec = ec_next;
+    }
+    
+    dd_path_init(&path, t_ll+f_ll);
+    i = inf_rows + f_ll - 1;
+    j = inf_cols + t_ll - 1;
+    path.distance = rows[i][j];
+    while (i >= inf_rows && j >= inf_cols) {
+        dd_path_insert(&path, f_i0+i-inf_rows , t_i0+j-inf_cols);
+        if (rows[i-1][j-1] <= rows[i-1][j] + settings->penalty
+            && rows[i-1][j-1] <= rows[i][j-1] + settings->penalty) {
+            i = i-1;
+            j = j-1;
+        } else if (rows[i-1][j] <= rows[i][j-1]) {
+            i = i-1;
+        } else {
+            j = j-1;
+        }
+    }
+    dd_path_reverse(&path);
+    
+    free(ccm);
+    free(rows);
+    return path;
+}
@@ -59,7 +59,7 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
     DTWWps p = dtw_wps_parts(l1, l2, settings);
 
     {%- if "affinity" not in suffix %}
-    if (settings->use_pruning) {
+    if (settings->use_pruning && dtw_settings_band_has_euclidean(l1, l2, settings)) {
         if (ndim == 1) {
             p.max_dist = ub_euclidean(s1, l1, s2, l2);
         } else {
@@ -73,6 +73,14 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
     {%- endif %}
 
     idx_t ri, ci, min_ci, max_ci, wpsi, wpsi_start;
+    {%- if "affinity" not in suffix %}
+    idx_t ci_first;
+    DTWStats stats = dtw_stats_default();
+    bool use_band = dtw_settings_has_band(settings);
+    idx_t band_b = 0;
+    idx_t band_e = l2;
+    idx_t ci_start;
+    {%- endif %}
 
     // Top row: ri = -1
     for (wpsi=0; wpsi<settings->psi_2b+1; wpsi++) {
@@ -112,6 +120,11 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
     max_ci = p.window + p.ldiffc; // ri < overlap_right_i
     for (ri=0; ri<p.ri1; ri++) {
         ri_idx = ri * ndim;
+        {%- if "affinity" not in suffix %}
+        if (use_band) {
+            dtw_settings_band_row(ri, l1, l2, settings, &band_b, &band_e);
+        }
+        {%- endif %}
         ci = min_ci;
         wpsi = 1; // index for min_ci
         {%- if "affinity" in suffix %}
@@ -125,17 +138,19 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
         }
         {%- else %}
         // PrunedDTW
-        if (sc <= min_ci) {} else {
-            for (; ci<sc; ci++) {
+        ci_start = MIN(MAX(sc, band_b), max_ci);
+        if (ci_start <= min_ci) {} else {
+            for (; ci<ci_start; ci++) {
                 wps[ri_width + wpsi] = {{infinity}};
                 wpsi++;
             }
         }
         smaller_found = false;
         ec_next = ri;
+        ci_first = ci;
         {%- endif %}
         // A region assumes wps has the same column indices in the previous row
-        for (; ci<max_ci; ci++) {
+        for (; ci<{% if "affinity" in suffix %}max_ci{% else %}MIN(max_ci, band_e){% endif %}; ci++) {
             ci_idx = ci * ndim;
             d = 0;
             for (int d_i=0; d_i<ndim; d_i++) {
@@ -148,9 +163,9 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
             {{ affstep("-1", "-1", "  ") }}
             {%- else %}
             if (d > p.max_step) { wps[ri_width + wpsi] = {{infinity}}; wpsi++; continue;}
-            wps[ri_width + wpsi] = d + MIN3(wps[ri_width  + wpsi - 1] + p.penalty,
+            wps[ri_width + wpsi] = d + MIN3(wps[ri_width  + wpsi - 1] + p.penalty_s2,  // horizontal = expand s2
                                             wps[ri_widthp + wpsi - 1], // diagonal
-                                            wps[ri_widthp + wpsi] + p.penalty);
+                                            wps[ri_widthp + wpsi] + p.penalty_s1);  // vertical = expand s1
             // PrunedDTW
             if (wps[ri_width + wpsi] <= p.max_dist) {
                 smaller_found = true;
@@ -158,13 +173,16 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
             } else {
                 if (!smaller_found)
                     sc = ci + 1;
-                if (ci >= ec)
+                if (ci >= ec) {
+                    stats.cells++;
                     break;
+                }
             }
             {%- endif %}
             wpsi++;
         }
         {%- if "affinity" not in suffix %}
+        stats.cells += ci - ci_first;
         ec = ec_next;
         {%- endif %}
         for (idx_t i=ri_width + wpsi; i<ri_width + p.width; i++) {
@@ -182,6 +200,11 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
     max_ci = l2; // ri >= overlap_right_i
     for (ri=p.ri1; ri<p.ri2; ri++) {
         ri_idx = ri * ndim;
+        {%- if "affinity" not in suffix %}
+        if (use_band) {
+            dtw_settings_band_row(ri, l1, l2, settings, &band_b, &band_e);
+        }
+        {%- endif %}
         wpsi = 1;
         ci = min_ci;
         {%- if "affinity" in suffix %}
@@ -195,16 +218,18 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
         }
         {%- else %}
         // PrunedDTW
-        if (sc <= min_ci) {} else {
-            for (; ci<sc; ci++) {
+        ci_start = MIN(MAX(sc, band_b), max_ci);
+        if (ci_start <= min_ci) {} else {
+            for (; ci<ci_start; ci++) {
                 wps[ri_width + wpsi] = {{infinity}};
                 wpsi++;
             }
         }
         smaller_found = false;
         ec_next = ri;
+        ci_first = ci;
         {%- endif %}
-        for (; ci<max_ci; ci++) {
+        for (; ci<{% if "affinity" in suffix %}max_ci{% else %}MIN(max_ci, band_e){% endif %}; ci++) {
             ci_idx = ci * ndim;
             d = 0;
             for (int d_i=0; d_i<ndim; d_i++) {
@@ -218,9 +243,9 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
             {%- else %}
             if (d > p.max_step) { wps[ri_width + wpsi] = {{infinity}}; wpsi++; continue;}
             // B-region assumes wps has the same column indices in the previous row
-            wps[ri_width + wpsi] = d + MIN3(wps[ri_width  + wpsi - 1] + p.penalty,
+            wps[ri_width + wpsi] = d + MIN3(wps[ri_width  + wpsi - 1] + p.penalty_s2,  // horizontal = expand s2
                                             wps[ri_widthp + wpsi - 1],  // Diagonal
-                                            wps[ri_widthp + wpsi] + p.penalty);
+                                            wps[ri_widthp + wpsi] + p.penalty_s1);  // vertical = expand s1
             // PrunedDTW
             if (wps[ri_width + wpsi] <= p.max_dist) {
                 smaller_found = true;
@@ -228,13 +253,16 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
             } else {
                 if (!smaller_found)
                     sc = ci + 1;
-                if (ci >= ec)
+                if (ci >= ec) {
+                    stats.cells++;
                     break;
+                }
             }
             {%- endif %}
             wpsi++;
         }
         {%- if "affinity" not in suffix %}
+        stats.cells += ci - ci_first;
         ec = ec_next;
         {%- endif %}
         for (idx_t i=ri_width + wpsi; i<ri_width + p.width; i++) {
@@ -251,6 +279,11 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
     max_ci = 1 + 2 * p.window - 1 + p.ldiff;
     for (ri=p.ri2; ri<p.ri3; ri++) {
         ri_idx = ri * ndim;
+        {%- if "affinity" not in suffix %}
+        if (use_band) {
+            dtw_settings_band_row(ri, l1, l2, settings, &band_b, &band_e);
+        }
+        {%- endif %}
         ci = min_ci;
         wps[ri_width] = {{infinity}};
         wpsi = 1;
@@ -265,16 +298,18 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
         }
         {%- else %}
         // PrunedDTW
-        if (sc <= min_ci) {} else {
-            for (; ci<sc; ci++) {
+        ci_start = MIN(MAX(sc, band_b), max_ci);
+        if (ci_start <= min_ci) {} else {
+            for (; ci<ci_start; ci++) {
                 wps[ri_width + wpsi] = {{infinity}};
                 wpsi++;
             }
         }
         smaller_found = false;
         ec_next = ri;
+        ci_first = ci;
         {%- endif %}
-        for (; ci<max_ci; ci++) {
+        for (; ci<{% if "affinity" in suffix %}max_ci{% else %}MIN(max_ci, band_e){% endif %}; ci++) {
             ci_idx = ci * ndim;
             d = 0;
             for (int d_i=0; d_i<ndim; d_i++) {
@@ -288,9 +323,9 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
             {%- else %}
             if (d > p.max_step) { wps[ri_width + wpsi] = {{infinity}}; wpsi++; continue;}
             // C-region assumes wps has the column indices in the previous row shifted by one
-            wps[ri_width + wpsi] = d + MIN3(wps[ri_width  + wpsi - 1] + p.penalty,
+            wps[ri_width + wpsi] = d + MIN3(wps[ri_width  + wpsi - 1] + p.penalty_s2,  // horizontal = expand s2
                                             wps[ri_widthp + wpsi],  // Diagonal
-                                            wps[ri_widthp + wpsi + 1] + p.penalty);
+                                            wps[ri_widthp + wpsi + 1] + p.penalty_s1);  // vertical = expand s1
             // PrunedDTW
             if (wps[ri_width + wpsi] <= p.max_dist) {
                 smaller_found = true;
@@ -298,13 +333,16 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
             } else {
                 if (!smaller_found)
                     sc = ci + 1;
-                if (ci >= ec)
+                if (ci >= ec) {
+                    stats.cells++;
                     break;
+                }
             }
             {%- endif %}
             wpsi++;
         }
         {%- if "affinity" not in suffix %}
+        stats.cells += ci - ci_first;
         ec = ec_next;
         {%- endif %}
         for (idx_t i=ri_width + wpsi; i<ri_width + p.width; i++) {
@@ -329,6 +367,11 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
     }
     for (ri=p.ri3; ri<l1; ri++) {
         ri_idx = ri * ndim;
+        {%- if "affinity" not in suffix %}
+        if (use_band) {
+            dtw_settings_band_row(ri, l1, l2, settings, &band_b, &band_e);
+        }
+        {%- endif %}
         ci = min_ci;
         wpsi = wpsi_start;
         for (idx_t i=ri_width; i<(ri_width + wpsi); i++) {
@@ -345,16 +388,18 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
         }
         {%- else %}
         // PrunedDTW
-        if (sc <= min_ci) {} else {
-            for (; ci<sc; ci++) {
+        ci_start = MIN(MAX(sc, band_b), l2);
+        if (ci_start <= min_ci) {} else {
+            for (; ci<ci_start; ci++) {
                 wps[ri_width + wpsi] = {{infinity}};
                 wpsi++;
             }
         }
         smaller_found = false;
         ec_next = ri;
+        ci_first = ci;
         {%- endif %}
-        for (; ci<l2; ci++) {
+        for (; ci<{% if "affinity" in suffix %}l2{% else %}MIN(l2, band_e){% endif %}; ci++) {
             ci_idx = ci * ndim;
             d = 0;
             for (int d_i=0; d_i<ndim; d_i++) {
@@ -368,9 +413,9 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
             {%- else %}
             if (d > p.max_step) { wps[ri_width + wpsi] = {{infinity}}; wpsi++; continue;}
             // D-region assumes wps has the same column indices in the previous row
-            wps[ri_width + wpsi] = d + MIN3(wps[ri_width  + wpsi - 1] + p.penalty,
+            wps[ri_width + wpsi] = d + MIN3(wps[ri_width  + wpsi - 1] + p.penalty_s2,  // horizontal = expand s2
                                             wps[ri_widthp + wpsi - 1],  // Diagonal
-                                            wps[ri_widthp + wpsi] + p.penalty);
+                                            wps[ri_widthp + wpsi] + p.penalty_s1);  // vertical = expand s1
             // PrunedDTW
             if (wps[ri_width + wpsi] <= p.max_dist) {
                 smaller_found = true;
@@ -378,13 +423,16 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
             } else {
                 if (!smaller_found)
                     sc = ci + 1;
-                if (ci >= ec)
+                if (ci >= ec) {
+                    stats.cells++;
                     break;
+                }
             }
             {%- endif %}
             wpsi++;
         }
         {%- if "affinity" not in suffix %}
+        stats.cells += ci - ci_first;
         ec = ec_next;
         {%- endif %}
         for (idx_t i=ri_width + wpsi; i<ri_width + p.width; i++) {
@@ -406,6 +454,13 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
 
     seq_t rvalue = 0;
     idx_t final_wpsi = ri_widthp + wpsi - 1;
+    {%- if "affinity" not in suffix %}
+    if (use_band && band_e < l2) {
+        // The band of the last row stops before the last column, the cell of the
+        // last column is not computed (and is INFINITY)
+        final_wpsi = MIN(final_wpsi + l2 - band_e, ri_widthp + p.width - 1);
+    }
+    {%- endif %}
     // Deal with Psi-relaxation
     if (return_dtw && settings->psi_1e == 0 && settings->psi_2e == 0) {
         rvalue = wps[final_wpsi];
@@ -490,5 +545,9 @@ seq_t dtw_warping_paths{{ suffix }}{{ suffix2 }}(seq_t *wps,
     }
     {%- endif %}
 
+    {% if "affinity" not in suffix -%}
+    stats.pairs = 1;
+    dtw_stats_merge(&stats);
+    {% endif -%}
     return rvalue;
 }
@@ -0,0 +1,29 @@
+{%- if inner_dist == "squaredeuclidean" %}
+/*!
+ Keogh lower bound for DTW.
+ */
+seq_t lb_keogh(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings) {
+    if (!lb_is_valid(settings)) {
+        return 0;
+    }
+    dtw_stats_merge_lb(false);
+    seq_t *env = (seq_t *)malloc(sizeof(seq_t) * 2 * l1);
+    if (!env) {
+        printf("Error: lb_keogh - Cannot allocate memory (size=%zu)\n", 2 * l1);
+        return 0;
+    }
+    lb_envelope(s2, l2, l1, settings, env, &env[l1]);
+    seq_t t = lb_keogh_envelope_cost(s1, l1, env, &env[l1], INFINITY, settings->inner_dist);
+    free(env);
+    return lb_result(t, settings->inner_dist);
+}
+{%- else %}
+/*!
+ Keogh lower bound for DTW with the Euclidean inner distance.
+ */
+seq_t lb_keogh_euclidean(seq_t *s1, idx_t l1, seq_t *s2, idx_t l2, DTWSettings *settings) {
+    DTWSettings s = *settings;
+    s.inner_dist = 1;
+    return lb_keogh(s1, l1, s2, l2, &s);
+}
+{%- endif %}
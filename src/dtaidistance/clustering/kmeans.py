@@ -12,10 +12,10 @@ Time series clustering using k-means and Barycenter averages.
 :license: Apache License, Version 2.0, see LICENSE for details.
 
 """
+import os
 import logging
 import random
 import math
-import multiprocessing as mp
 
 
 logger = logging.getLogger("be.kuleuven.dtai.distance")
@@ -38,9 +38,10 @@ try:
 except ImportError:
     np = None
 
-from ..dtw import distance, distance_matrix_fast, distance_matrix, DTWSettings
+from ..dtw import distance, distance_matrix_fast, distance_matrix, prepare, DTWSettings
 from  .medoids import KMedoids
-from ..util import SeriesContainer
+from ..util import SeriesContainer, get_executor
+from ..sharedmem import SharedSeries
 from ..exceptions import NumpyException
 from .medoids import Medoids
 from ..dtw_barycenter import dba_loop
@@ -49,9 +50,10 @@ from .. import dtw, dtw_ndim
 
 def _distance_with_params(t):
     series, avgs, dists_options = t
+    distance = prepare(**dists_options)
     min_i, min_d = -1, float('inf')
     for i, avg in enumerate(avgs):
-        d = distance(series, avg, **dists_options)
+        d = distance(series, avg)
         if d < min_d:
             min_d, min_i = d, i
     return min_i, min_d
@@ -59,9 +61,10 @@ def _distance_with_params(t):
 
 def _distance_ndim_with_params(t):
     series, avgs, dists_options = t
+    distance = prepare(**{**dists_options, 'use_ndim': True})
     min_i, min_d = -1, float('inf')
     for i, avg in enumerate(avgs):
-        d = dtw_ndim.distance(series, avg, **dists_options)
+        d = distance(series, avg)
         if d < min_d:
             min_d, min_i = d, i
     return min_i, min_d
@@ -69,9 +72,10 @@ def _distance_ndim_with_params(t):
 
 def _distance_c_with_params(t):
     series, means, dists_options = t
+    distance = dtw_cc.PreparedDistance(**dists_options)
     min_i, min_d = -1, float('inf')
     for i, mean in enumerate(means):
-        d = dtw_cc.distance(series, mean, **dists_options)
+        d = distance(series, mean)
         if d < min_d:
             min_d, min_i = d, i
     return min_i, min_d
@@ -79,16 +83,24 @@ def _distance_c_with_params(t):
 
 def _distance_ndim_c_with_params(t):
     series, means, dists_options = t
+    distance = dtw_cc.PreparedDistanceNDim(**dists_options)
     min_i, min_d = -1, float('inf')
     for i, mean in enumerate(means):
-        d = dtw_cc.distance_ndim(series, mean, **dists_options)
+        d = distance(series, mean)
         if d < min_d:
             min_d, min_i = d, i
     return min_i, min_d
 
 
+def _assign_shared_with_params(t):
+    fn, series, idx_b, idx_e, means, dists_options = t
+    return [fn((series[idx], means, dists_options)) for idx in range(idx_b, idx_e)]
+
+
 def _dba_loop_with_params(t):
     series, c, mask, max_it, thr, use_c, nb_prob_samples = t
+    if isinstance(series, SharedSeries):
+        series = series.series
     return dba_loop(series, c=c, mask=mask, max_it=max_it, thr=thr, use_c=use_c,
                     nb_prob_samples=nb_prob_samples)
 
@@ -231,14 +243,15 @@ class KMeans(Medoids):
         logger.debug('... Done')
         return means
 
-    def fit_fast(self, series, monitor_distances=None):
+    def fit_fast(self, series, monitor_distances=None, backend=None, executor=None):
         use_c = self.dists_options.use_c
         self.dists_options.use_c = True
-        result = self.fit(series, use_parallel=True, monitor_distances=monitor_distances)
+        result = self.fit(series, use_parallel=True, monitor_distances=monitor_distances, backend=backend,
+                          executor=executor)
         self.dists_options.use_c = use_c
         return result
 
-    def fit(self, series, use_parallel=True, monitor_distances=None):
+    def fit(self, series, use_parallel=True, monitor_distances=None, backend=None, executor=None):
         """Perform K-means clustering.
 
         :param series: Container with series
@@ -250,13 +263,38 @@ class KMeans(Medoids):
             to monitor the clustering. If the boolean argument is true, this is the
             final assignment. If this function returns True, the clustering
             continues, if False is returned the clustering is stopped.
+        :param backend: Parallelization to use if use_parallel is true. None or 'multiprocessing'
+            uses a pool of processes. 'threads' uses a pool of threads that share the memory of
+            this process, this is faster if the C implementation is used (use_c) because the
+            series are not copied to other processes. 'sharedmem' uses a pool of processes that
+            read the series from shared memory, only the indices are sent to the processes.
+        :param executor: :class:`dtaidistance.util.Executor` to use instead of starting a pool
+            for the clustering (see also :meth:`dtaidistance.util.set_executor`).
         :return: cluster indices, number of iterations
             If the number of iterations is equal to max_it, the clustering
             did not converge.
         """
         if np is None:
             raise NumpyException("Numpy is required for the KMeans.fit method.")
+        if backend not in [None, 'multiprocessing', 'threads', 'sharedmem']:
+            raise ValueError(f"Unknown value for argument backend: {backend}")
         self.series = SeriesContainer.wrap(series, support_ndim=True)
+        pool, shared = None, None
+        try:
+            if use_parallel and backend == 'sharedmem':
+                shared = SharedSeries.create(self.series)
+            if use_parallel:
+                # One pool for all iterations
+                pool = get_executor('threads' if backend == 'threads' else 'multiprocessing', executor)
+            return self._fit(use_parallel, monitor_distances, pool, shared)
+        finally:
+            if pool is not None:
+                pool.release()
+            if shared is not None:
+                shared.close()
+                shared.unlink()
+
+    def _fit(self, use_parallel, monitor_distances, pool, shared):
         ndim = self.series.detected_ndim
         mask = np.full((self.k, len(self.series)), False, dtype=bool)
         mask_new = np.full((self.k, len(self.series)), False, dtype=bool)
@@ -281,6 +319,20 @@ class KMeans(Medoids):
             else:
                 fn = _distance_ndim_with_params
 
+        def assign():
+            if not use_parallel:
+                return list(map(fn, [(self.series[idx], self.means, self.dists_options) for idx in
+                                     range(len(self.series))]))
+            if shared is None:
+                return pool.map(fn, [(self.series[idx], self.means, self.dists_options) for idx in
+                                     range(len(self.series))])
+            # Only send ranges of indices, the series are read from the shared memory
+            chunk_size = max(1, -(-len(shared) // (4 * (os.cpu_count() or 1))))
+            chunks = pool.map(_assign_shared_with_params,
+                              [(fn, shared, idx, min(len(shared), idx + chunk_size), self.means,
+                                self.dists_options) for idx in range(0, len(shared), chunk_size)])
+            return [cluster_distance for chunk in chunks for cluster_distance in chunk]
+
         # Initialisations
         if self.initialize_with_kmeanspp:
             self.means = self.kmeansplusplus_centers(self.series)
@@ -298,13 +350,7 @@ class KMeans(Medoids):
 
             # Assignment step
             performed_it += 1
-            if use_parallel:
-                with mp.Pool() as p:
-                    clusters_distances = p.map(fn, [(self.series[idx], self.means, self.dists_options) for idx in
-                                                    range(len(self.series))])
-            else:
-                clusters_distances = list(map(fn, [(self.series[idx], self.means, self.dists_options) for idx in
-                                                   range(len(self.series))]))
+            clusters_distances = assign()
             if monitor_distances is not None:
                 cont = monitor_distances(clusters_distances, False)
                 if cont is False:
@@ -370,12 +416,12 @@ class KMeans(Medoids):
             diff = 0
             difflen = 0
             if use_parallel:
-                with mp.Pool() as p:
-                    means = p.map(_dba_loop_with_params,
-                                  [(self.series, self.series[best_medoid[ki]], mask[ki, :],
-                                    self.max_dba_it, self.thr, self.dists_options.get('use_c', False),
-                                    self.nb_prob_samples)
-                                   for ki in range(self.k)])
+                means = pool.map(_dba_loop_with_params,
+                                 [(self.series if shared is None else shared,
+                                   self.series[best_medoid[ki]], mask[ki, :],
+                                   self.max_dba_it, self.thr, self.dists_options.get('use_c', False),
+                                   self.nb_prob_samples)
+                                  for ki in range(self.k)])
             else:
                 means = list(map(_dba_loop_with_params,
                              [(self.series, self.series[best_medoid[ki]], mask[ki, :],
@@ -400,13 +446,7 @@ class KMeans(Medoids):
                 break
 
         # Final assignment
-        if use_parallel:
-            with mp.Pool() as p:
-                clusters_distances = p.map(fn, [(self.series[idx], self.means, self.dists_options) for idx in
-                                                range(len(self.series))])
-        else:
-            clusters_distances = list(map(fn, [(self.series[idx], self.means, self.dists_options) for idx in
-                                               range(len(self.series))]))
+        clusters_distances = assign()
         if monitor_distances is not None:
             monitor_distances(clusters_distances, True)
         clusters, distances = zip(*clusters_distances)
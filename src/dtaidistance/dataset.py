@@ -0,0 +1,147 @@
+# -*- coding: UTF-8 -*-
+"""
+dtaidistance.dataset
+~~~~~~~~~~~~~~~~~~~~
+
+Collections of series stored on disk and opened as memory-mapped arrays.
+
+A dataset is a directory with three files:
+
+- ``values.npy``: The values of all series, one after the other. The shape is
+  (nb_time_points,) or (nb_time_points, ndim) for n-dimensional series.
+- ``offsets.npy``: nb_series + 1 indices (int64), series i consists of the
+  time points ``values[offsets[i]:offsets[i+1]]``.
+- ``meta.json``: Version of the format, number of series, number of dimensions,
+  type of the values and optional user metadata.
+
+Opening a dataset maps the values in memory, the operating system only reads
+the pages that are used. The result is a matrix (series of equal length) or a
+:class:`~dtaidistance.util.RaggedSeries` that is passed to the C library without
+copying, such that datasets that are larger than memory can be used directly in
+:meth:`dtw.distance_matrix`, :meth:`dtw.distances_to` or the clustering methods.
+
+:author: Wannes Meert
+:copyright: Copyright 2025 KU Leuven, DTAI Research Group.
+:license: Apache License, Version 2.0, see LICENSE for details.
+
+"""
+import os
+import json
+import logging
+
+from . import util_numpy
+from .util import SeriesContainer, RaggedSeries
+from .exceptions import NumpyException
+
+try:
+    if util_numpy.test_without_numpy():
+        raise ImportError()
+    import numpy as np
+except ImportError:
+    np = None
+
+
+logger = logging.getLogger("be.kuleuven.dtai.distance")
+
+format_name = "dtaidistance.dataset"
+format_version = 1
+meta_filename = "meta.json"
+values_filename = "values.npy"
+offsets_filename = "offsets.npy"
+
+
+def read_meta(path):
+    """Metadata of the dataset in the given directory."""
+    with open(os.path.join(path, meta_filename), "r") as ifile:
+        meta = json.load(ifile)
+    if meta.get("format") != format_name:
+        raise ValueError("Directory {} does not contain a dataset".format(path))
+    if meta.get("version", 0) > format_version:
+        raise ValueError("Dataset in {} has version {}, only version {} or lower is supported".format(
+            path, meta.get("version"), format_version))
+    return meta
+
+
+def create_series(path, lengths, ndim=1, dtype='d', meta=None):
+    """Create a new dataset with the given lengths and return it to be filled in.
+
+    The values are not initialized. Assigning to a series (e.g. ``s[i][:] = serie``)
+    writes directly to the file, such that a dataset can be written one series at
+    a time without keeping all series in memory.
+
+    :param path: Directory of the dataset
+    :param lengths: Length of every series
+    :param ndim: Number of dimensions of every time point
+    :param dtype: Type of the values ('d' for double, 'f' for float32)
+    :param meta: Dictionary with user metadata (should be serializable as JSON)
+    :return: Writable matrix or :class:`RaggedSeries`, see :meth:`open_series`
+    """
+    if np is None:
+        raise NumpyException("Numpy is required for datasets")
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise ValueError("Values should be float32 or float64, got {}".format(dtype))
+    os.makedirs(path, exist_ok=True)
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(lengths)
+    np.save(os.path.join(path, offsets_filename), offsets)
+    shape = (int(offsets[-1]),) if ndim == 1 else (int(offsets[-1]), ndim)
+    values = np.lib.format.open_memmap(os.path.join(path, values_filename), mode="w+",
+                                       dtype=dtype, shape=shape)
+    del values
+    with open(os.path.join(path, meta_filename), "w") as ofile:
+        json.dump({
+            "format": format_name,
+            "version": format_version,
+            "nb_series": len(lengths),
+            "ndim": ndim,
+            "dtype": dtype.str,
+            "meta": meta
+        }, ofile, indent=2)
+    return open_series(path, mmap_mode="r+")
+
+
+def write_series(path, series, dtype=None, meta=None):
+    """Write the series to a new dataset.
+
+    :param path: Directory of the dataset
+    :param series: Iterable of series (see :class:`SeriesContainer`)
+    :param dtype: Type of the values (default is float32 if all series are float32,
+        otherwise double)
+    :param meta: Dictionary with user metadata (should be serializable as JSON)
+    :return: The dataset, see :meth:`open_series`
+    """
+    if np is None:
+        raise NumpyException("Numpy is required for datasets")
+    series = SeriesContainer.wrap(series)
+    if dtype is None:
+        dtype = np.float32 if series.is_float32() else np.float64
+    lengths = [len(serie) for serie in series]
+    s = create_series(path, lengths, ndim=series.detected_ndim or 1, dtype=dtype, meta=meta)
+    for i, serie in enumerate(series):
+        s[i][:] = serie
+    del s
+    return open_series(path)
+
+
+def open_series(path, mmap_mode="c"):
+    """Open the dataset in the given directory without reading the values.
+
+    :param path: Directory of the dataset
+    :param mmap_mode: Mode of the memory map (see ``numpy.memmap``). The default, 'c'
+        (copy-on-write), shares the pages with the file and never changes the file.
+        Use 'r' for read-only files.
+    :return: Matrix with one series per row if all series have the same length,
+        otherwise a :class:`RaggedSeries`
+    """
+    if np is None:
+        raise NumpyException("Numpy is required for datasets")
+    meta = read_meta(path)
+    offsets = np.load(os.path.join(path, offsets_filename))
+    values = np.load(os.path.join(path, values_filename), mmap_mode=mmap_mode)
+    if len(offsets) != meta["nb_series"] + 1 or offsets[-1] != len(values):
+        raise ValueError("Dataset in {} is inconsistent with its offsets".format(path))
+    lengths = np.diff(offsets)
+    if len(lengths) > 0 and (lengths == lengths[0]).all():
+        return values.reshape((len(lengths), int(lengths[0])) + values.shape[1:])
+    return RaggedSeries(values, offsets, ndim=meta["ndim"])
@@ -2,7 +2,25 @@
 from dtaidistancec_globals cimport seq_t, DDPath
 
 
-cdef extern from "dd_dtw.h":
+cdef extern from "dd_dtw.h" nogil:
+    cdef struct DTWControl_s:
+        Py_ssize_t done
+        Py_ssize_t total
+        int stop
+        int (*callback)(DTWControl_s *control) noexcept
+        void *callback_data
+    ctypedef DTWControl_s DTWControl
+
+    ctypedef struct DTWStats:
+        Py_ssize_t pairs
+        Py_ssize_t cells
+        Py_ssize_t rows_abandoned
+        Py_ssize_t pairs_abandoned
+        Py_ssize_t pairs_pruned
+        Py_ssize_t lbs
+
+    DTWStats dtw_stats
+
     ctypedef struct DTWSettings:
         Py_ssize_t window
         seq_t max_dist
@@ -17,6 +35,13 @@ cdef extern from "dd_dtw.h":
         Py_ssize_t psi_2e
         bint use_pruning
         int inner_dist
+        bint use_lb
+        bint use_eapruning
+        seq_t itakura_slope
+        Py_ssize_t *band
+        Py_ssize_t band_length
+        DTWControl *control
+        int schedule
 
     ctypedef struct DTWBlock:
         Py_ssize_t rb
@@ -25,6 +50,13 @@ cdef extern from "dd_dtw.h":
         Py_ssize_t ce
         bint triu
 
+    ctypedef struct DTWSparse:
+        Py_ssize_t *rows
+        Py_ssize_t *cols
+        seq_t *values
+        Py_ssize_t length
+        Py_ssize_t capacity
+
     ctypedef struct DTWWps:
         Py_ssize_t ldiff
         Py_ssize_t ldiffr
@@ -44,6 +76,9 @@ cdef extern from "dd_dtw.h":
         seq_t penalty_s2
 
     DTWSettings dtw_settings_default()
+    DTWControl dtw_control_default()
+    void dtw_stats_enable(bint enable)
+    void dtw_stats_reset()
     Py_ssize_t dtw_settings_wps_length(Py_ssize_t l1, Py_ssize_t l2, DTWSettings *settings)
     Py_ssize_t dtw_settings_wps_width(Py_ssize_t l1, Py_ssize_t l2, DTWSettings *settings)
     void dtw_settings_set_psi(Py_ssize_t psi, DTWSettings *settings)
@@ -53,6 +88,11 @@ cdef extern from "dd_dtw.h":
                           DTWSettings *settings)
     seq_t dtw_distance_ndim(seq_t *s1, Py_ssize_t l1, seq_t *s2, Py_ssize_t l2, int ndim,
                                DTWSettings *settings)
+    seq_t dtw_distance_strided(seq_t *s1, Py_ssize_t l1, Py_ssize_t stride1,
+                               seq_t *s2, Py_ssize_t l2, Py_ssize_t stride2, DTWSettings *settings)
+    seq_t dtw_distance_ndim_strided(seq_t *s1, Py_ssize_t l1, Py_ssize_t stride1, Py_ssize_t dstride1,
+                                    seq_t *s2, Py_ssize_t l2, Py_ssize_t stride2, Py_ssize_t dstride2,
+                                    int ndim, DTWSettings *settings)
 
     seq_t dtw_warping_paths(seq_t *wps, seq_t *s1, Py_ssize_t l1, seq_t *s2, int l2,
                                bint return_dtw, bint keep_int_repr, bint psi_neg, DTWSettings *settings)
@@ -92,6 +132,10 @@ cdef extern from "dd_dtw.h":
                                      Py_ssize_t *from_i, Py_ssize_t *to_i, Py_ssize_t *length_i, seq_t avg, int ndim, DTWSettings * settings)
     DTWWps dtw_wps_parts(Py_ssize_t l1, Py_ssize_t l2, DTWSettings * settings)
 
+    seq_t dtw_warping_path_approx(seq_t *s1, Py_ssize_t l1, seq_t *s2, Py_ssize_t l2, Py_ssize_t radius,
+                                  Py_ssize_t *i1, Py_ssize_t *i2, Py_ssize_t *length_i,
+                                  DTWSettings *settings)
+
     DDPath dtw_wph_sqeuc_typei(seq_t *f_s, Py_ssize_t f_l,
                                seq_t* t_s, Py_ssize_t t_l,
                                Py_ssize_t switch_to_full,
@@ -100,6 +144,17 @@ cdef extern from "dd_dtw.h":
     seq_t ub_euclidean(seq_t *s1, Py_ssize_t l1, seq_t *s2, Py_ssize_t l2)
     seq_t ub_euclidean_ndim(seq_t *s1, Py_ssize_t l1, seq_t *s2, Py_ssize_t l2, int ndim)
     seq_t lb_keogh(seq_t *s1, Py_ssize_t l1, seq_t *s2, Py_ssize_t l2, DTWSettings *settings)
+    bint lb_is_valid(DTWSettings *settings)
+    void lb_envelope(seq_t *s, Py_ssize_t l, Py_ssize_t l_other, DTWSettings *settings, seq_t *lower, seq_t *upper)
+    seq_t lb_keogh_envelope(seq_t *s1, Py_ssize_t l1, seq_t *lower, seq_t *upper, DTWSettings *settings)
+    seq_t lb_kim(seq_t *s1, Py_ssize_t l1, seq_t *s2, Py_ssize_t l2, DTWSettings *settings)
+    seq_t lb_improved(seq_t *s1, Py_ssize_t l1, seq_t *s2, Py_ssize_t l2, DTWSettings *settings)
+    seq_t lb_improved_envelope(seq_t *s1, Py_ssize_t l1, seq_t *s2, Py_ssize_t l2, seq_t *lower, seq_t *upper,
+                               DTWSettings *settings)
+    seq_t lb_cascade(seq_t *s1, Py_ssize_t l1, seq_t *s2, Py_ssize_t l2, seq_t threshold, DTWSettings *settings)
+    seq_t lb_cascade_envelope(seq_t *s1, Py_ssize_t l1, seq_t *lower1, seq_t *upper1,
+                              seq_t *s2, Py_ssize_t l2, seq_t *lower2, seq_t *upper2,
+                              seq_t threshold, DTWSettings *settings)
 
     void dtw_dba_ptrs(seq_t **ptrs, Py_ssize_t nb_ptrs, Py_ssize_t* lengths,
                   seq_t *c, Py_ssize_t t, unsigned char *mask, int prob_samples, int ndim, DTWSettings *settings)
@@ -118,7 +173,38 @@ cdef extern from "dd_dtw.h":
     Py_ssize_t dtw_distances_matrices(seq_t *matrix_r, Py_ssize_t nb_rows_r, Py_ssize_t nb_cols_r,
                                       seq_t *matrix_c, Py_ssize_t nb_rows_c, Py_ssize_t nb_cols_c,
                                       seq_t * output, DTWBlock * block, DTWSettings * settings)
+    Py_ssize_t dtw_distances_ndim_matrices(seq_t *matrix_r, Py_ssize_t nb_rows_r, Py_ssize_t nb_cols_r,
+                                           seq_t *matrix_c, Py_ssize_t nb_rows_c, Py_ssize_t nb_cols_c, int ndim,
+                                           seq_t * output, DTWBlock * block, DTWSettings * settings)
+    Py_ssize_t dtw_distances_ptrs_ptrs(seq_t **ptrs_r, Py_ssize_t nb_ptrs_r, Py_ssize_t* lengths_r,
+                                       seq_t **ptrs_c, Py_ssize_t nb_ptrs_c, Py_ssize_t* lengths_c,
+                                       seq_t* output, DTWBlock* block, DTWSettings* settings)
+    Py_ssize_t dtw_distances_ndim_ptrs_ptrs(seq_t **ptrs_r, Py_ssize_t nb_ptrs_r, Py_ssize_t* lengths_r,
+                                            seq_t **ptrs_c, Py_ssize_t nb_ptrs_c, Py_ssize_t* lengths_c, int ndim,
+                                            seq_t* output, DTWBlock* block, DTWSettings* settings)
     Py_ssize_t dtw_distances_length(DTWBlock *block, Py_ssize_t nb_series_r, Py_ssize_t nb_series_c)
+    DTWSparse dtw_sparse_empty()
+    void dtw_sparse_free(DTWSparse *sparse)
+    Py_ssize_t dtw_knn_graph_ptrs(seq_t **ptrs, Py_ssize_t nb_ptrs, Py_ssize_t *lengths, int ndim, Py_ssize_t k,
+                                  Py_ssize_t *indices, seq_t *distances, DTWSettings *settings)
+    Py_ssize_t dtw_knn_graph_matrix(seq_t *matrix, Py_ssize_t nb_rows, Py_ssize_t nb_cols, int ndim, Py_ssize_t k,
+                                    Py_ssize_t *indices, seq_t *distances, DTWSettings *settings)
+    Py_ssize_t dtw_distances_sparse_ptrs(seq_t **ptrs, Py_ssize_t nb_ptrs, Py_ssize_t* lengths, int ndim,
+                                         DTWSparse* output, DTWBlock* block, DTWSettings* settings)
+    const char* dtw_distance_lanes_isa()
+
+    Py_ssize_t dtw_distances_query_ptrs(seq_t *query, Py_ssize_t query_length,
+                                        seq_t **ptrs, Py_ssize_t nb_ptrs, Py_ssize_t *lengths,
+                                        seq_t *output, Py_ssize_t k, DTWSettings *settings)
+    Py_ssize_t dtw_distances_query_matrix(seq_t *query, Py_ssize_t query_length,
+                                          seq_t *matrix, Py_ssize_t nb_rows, Py_ssize_t nb_cols,
+                                          seq_t *output, Py_ssize_t k, DTWSettings *settings)
+    Py_ssize_t dtw_distances_query_ndim_ptrs(seq_t *query, Py_ssize_t query_length,
+                                             seq_t **ptrs, Py_ssize_t nb_ptrs, Py_ssize_t *lengths, int ndim,
+                                             seq_t *output, Py_ssize_t k, DTWSettings *settings)
+    Py_ssize_t dtw_distances_query_ndim_matrix(seq_t *query, Py_ssize_t query_length,
+                                               seq_t *matrix, Py_ssize_t nb_rows, Py_ssize_t nb_cols, int ndim,
+                                               seq_t *output, Py_ssize_t k, DTWSettings *settings)
 
     void dtw_print_wps(seq_t * wps, Py_ssize_t l1, Py_ssize_t l2, DTWSettings * settings)
     void dtw_print_wps_compact(seq_t * wps, Py_ssize_t l1, Py_ssize_t l2, DTWSettings * settings)
@@ -1,10 +1,18 @@
 
 from dtaidistancec_globals cimport seq_t
-from dtaidistancec_dtw cimport DTWBlock, DTWSettings
+from dtaidistancec_dtw cimport DTWBlock, DTWSettings, DTWSparse
 
 
 cdef extern from "dd_dtw_openmp.h":
     bint is_openmp_supported()
+    Py_ssize_t dtw_knn_graph_ptrs_parallel(seq_t **ptrs, Py_ssize_t nb_ptrs, Py_ssize_t *lengths, int ndim,
+                                           Py_ssize_t k, Py_ssize_t *indices, seq_t *distances,
+                                           DTWSettings *settings)
+    Py_ssize_t dtw_knn_graph_matrix_parallel(seq_t *matrix, Py_ssize_t nb_rows, Py_ssize_t nb_cols, int ndim,
+                                             Py_ssize_t k, Py_ssize_t *indices, seq_t *distances,
+                                             DTWSettings *settings)
+    Py_ssize_t dtw_distances_sparse_ptrs_parallel(seq_t **ptrs, Py_ssize_t nb_ptrs, Py_ssize_t* lengths, int ndim,
+                                                  DTWSparse* output, DTWBlock* block, DTWSettings* settings)
     Py_ssize_t dtw_distances_ptrs_parallel(seq_t **ptrs, Py_ssize_t nb_ptrs, Py_ssize_t* lengths,
                                            seq_t* output, DTWBlock* block, DTWSettings* settings)
     Py_ssize_t dtw_distances_ndim_ptrs_parallel(seq_t **ptrs, Py_ssize_t nb_ptrs, Py_ssize_t* lengths, int ndim,
@@ -19,3 +27,21 @@ cdef extern from "dd_dtw_openmp.h":
     Py_ssize_t dtw_distances_ndim_matrices_parallel(seq_t *matrix_r, Py_ssize_t nb_rows_r, Py_ssize_t nb_cols_r,
                                                     seq_t *matrix_c, Py_ssize_t nb_rows_c, Py_ssize_t nb_cols_c, int ndim,
                                                     seq_t * output, DTWBlock * block, DTWSettings * settings)
+    Py_ssize_t dtw_distances_ptrs_ptrs_parallel(seq_t **ptrs_r, Py_ssize_t nb_ptrs_r, Py_ssize_t* lengths_r,
+                                                seq_t **ptrs_c, Py_ssize_t nb_ptrs_c, Py_ssize_t* lengths_c,
+                                                seq_t* output, DTWBlock* block, DTWSettings* settings)
+    Py_ssize_t dtw_distances_ndim_ptrs_ptrs_parallel(seq_t **ptrs_r, Py_ssize_t nb_ptrs_r, Py_ssize_t* lengths_r,
+                                                     seq_t **ptrs_c, Py_ssize_t nb_ptrs_c, Py_ssize_t* lengths_c, int ndim,
+                                                     seq_t* output, DTWBlock* block, DTWSettings* settings)
+    Py_ssize_t dtw_distances_query_ptrs_parallel(seq_t *query, Py_ssize_t query_length,
+                                                 seq_t **ptrs, Py_ssize_t nb_ptrs, Py_ssize_t *lengths,
+                                                 seq_t *output, Py_ssize_t k, DTWSettings *settings)
+    Py_ssize_t dtw_distances_query_matrix_parallel(seq_t *query, Py_ssize_t query_length,
+                                                   seq_t *matrix, Py_ssize_t nb_rows, Py_ssize_t nb_cols,
+                                                   seq_t *output, Py_ssize_t k, DTWSettings *settings)
+    Py_ssize_t dtw_distances_query_ndim_ptrs_parallel(seq_t *query, Py_ssize_t query_length,
+                                                      seq_t **ptrs, Py_ssize_t nb_ptrs, Py_ssize_t *lengths, int ndim,
+                                                      seq_t *output, Py_ssize_t k, DTWSettings *settings)
+    Py_ssize_t dtw_distances_query_ndim_matrix_parallel(seq_t *query, Py_ssize_t query_length,
+                                                        seq_t *matrix, Py_ssize_t nb_rows, Py_ssize_t nb_cols, int ndim,
+                                                        seq_t *output, Py_ssize_t k, DTWSettings *settings)
@@ -2,6 +2,7 @@
 
 cdef extern from "dd_globals.h":
     ctypedef double seq_t
+    const char *SEQ_T_FORMAT
 
     ctypedef enum StepType:
         TypeI,
@@ -10,16 +10,20 @@ Dynamic Time Warping (DTW)
 :license: Apache License, Version 2.0, see LICENSE for details.
 
 """
+import os
+import copy
 import logging
 import array
 import math
+import heapq
+import time
 
 from . import ed
 from . import util
 from . import util_numpy
 from . import innerdistance
 from .util import SeriesContainer
-from .exceptions import NumpyException, CythonException
+from .exceptions import NumpyException, CythonException, ScipyException
 
 
 logger = logging.getLogger("be.kuleuven.dtai.distance")
@@ -41,6 +45,14 @@ except ImportError as exc:
     logger.debug(exc)
     dtw_cc_omp = None
 
+dtw_cc_f32 = None
+dtw_cc_omp_f32 = None
+try:
+    from . import dtw_cc_f32
+    from . import dtw_cc_omp_f32
+except ImportError:
+    logger.debug('DTAIDistance C library for float32 not available')
+
 dtw_cc_numpy = None
 try:
     from . import dtw_cc_numpy
@@ -101,11 +113,29 @@ def _check_library(include_omp=False, raise_exception=True):
             raise CythonException(msg)
 
 
+def _use_numpy(settings):
+    """Whether the Numpy implementation can be used for the given settings."""
+    return (np is not None and not settings.has_band() and
+            innerdistance.inner_dist_array_fn(settings.inner_dist, use_ndim=settings.use_ndim) is not None)
+
+
+def _c_libraries(*series):
+    """C libraries (sequential, OpenMP) to use for the given series.
+
+    The single precision variants are used if all series are float32 (and
+    these variants are available), otherwise the data is passed as double.
+    """
+    if dtw_cc_f32 is not None and all(util.is_float32(si) for si in series):
+        return dtw_cc_f32, dtw_cc_omp_f32
+    return dtw_cc, dtw_cc_omp
+
+
 class DTWSettings:
     def __init__(self, window=None, use_pruning=False, max_dist=None, max_step=None,
                  max_length_diff=None, penalty=None, penalty_s1=None, penalty_s2=None, 
                  psi=None, inner_dist=innerdistance.default,
-                 use_ndim=False, use_c=False):
+                 use_ndim=False, use_c=False, use_lb=False, use_eapruning=False,
+                 itakura_slope=None, band=None):
         """Settings for Dynamic Time Warping distance methods.
 
         :param window: Only allow for maximal shifts from the two diagonals smaller than this number.
@@ -140,6 +170,25 @@ class DTWSettings:
             You can also inherit from the 'innerdistance.CustomInnerDist' class.
         :param use_ndim: Use n-dimensional (aka multivariate) series instead of 1-dimensional series.
         :param use_c: Use the C variant if available.
+        :param use_lb: Use a cascade of lower bounds (LB_Kim, LB_Keogh in both directions and LB_Improved)
+            to skip the DTW computation if the distance is certainly larger than max_dist.
+            Only has an effect if max_dist is set and psi-relaxation is not used.
+            See :mod:`dtaidistance.lowerbounds`.
+        :param use_eapruning: Use EAPrunedDTW. Stop as soon as all cells in a row of the
+            cumulative cost matrix are larger than max_dist, and tighten max_dist for each
+            row with a lower bound (LB_Keogh) on the cost of the remaining rows.
+            Only has an effect if max_dist is set (or use_pruning is used).
+        :param itakura_slope: Only allow warping paths within an Itakura parallelogram with this
+            maximal slope (at least 1, relative to the diagonal). For example, 2 means that
+            a path can locally go at most twice as fast or slow as the diagonal.
+        :param band: Only allow warping paths within a custom band. The band is a sequence
+            with for every element i in the first series a tuple (begin, end) with the range of
+            elements in the second series that can be matched with it (end is not included).
+            Rows after the end of the band are not restricted. Can be combined with window
+            and itakura_slope, only the cells allowed by all are used.
+            When a band is used, the Numpy implementation is skipped (the other
+            implementations support it). Calling distance_numpy or warping_paths_numpy
+            directly, or using use_lowmem, raises a ValueError.
         """
         self.window = window
         self.use_pruning = use_pruning
@@ -153,6 +202,10 @@ class DTWSettings:
         self.inner_dist = inner_dist
         self.use_ndim = use_ndim
         self.use_c = use_c
+        self.use_lb = use_lb
+        self.use_eapruning = use_eapruning
+        self.itakura_slope = itakura_slope
+        self.band = band
 
         _, _, inner_val = innerdistance.inner_dist_fns(self.inner_dist)
 
@@ -215,7 +268,8 @@ class DTWSettings:
 
     def set_max_dist(self, s1, s2):
         _, _, ival_fn = innerdistance.inner_dist_fns(self.inner_dist, use_ndim=self.use_ndim)
-        if self.use_pruning and (self.max_dist == 0 or self.max_dist is None):
+        if self.use_pruning and (self.max_dist == 0 or self.max_dist is None) and \
+                self.band_has_euclidean(len(s1), len(s2)):
             self.max_dist = ub_euclidean(s1, s2, inner_dist=self.inner_dist)
             self.adj_max_dist = ival_fn(self.max_dist)
 
@@ -232,7 +286,11 @@ class DTWSettings:
             'psi': self.psi,
             'inner_dist': self.inner_dist,
             'use_ndim': self.use_ndim,
-            'use_c': self.use_c
+            'use_c': self.use_c,
+            'use_lb': self.use_lb,
+            'use_eapruning': self.use_eapruning,
+            'itakura_slope': self.itakura_slope,
+            'band': self.band
         }
 
     def c_kwargs(self):
@@ -246,8 +304,11 @@ class DTWSettings:
         penalty_s2 = 0 if self.penalty_s2 is None else self.penalty_s2
         psi = 0 if self.psi is None else self.psi
         use_pruning = 0 if self.use_pruning is None else self.use_pruning
+        use_lb = 0 if self.use_lb is None else self.use_lb
+        use_eapruning = 0 if self.use_eapruning is None else self.use_eapruning
+        itakura_slope = 0 if self.itakura_slope is None else self.itakura_slope
         inner_dist = innerdistance.to_c(self.inner_dist)
-        return {
+        c_kwargs = {
             'window': window,
             'max_dist': max_dist,
             'max_step': max_step,
@@ -257,8 +318,50 @@ class DTWSettings:
             'penalty_s2': penalty_s2,
             'psi': psi,
             'use_pruning': use_pruning,
+            'use_lb': use_lb,
+            'use_eapruning': use_eapruning,
+            'itakura_slope': itakura_slope,
             'inner_dist': inner_dist
         }
+        if self.band is not None:
+            c_kwargs['band'] = self.band
+        return c_kwargs
+
+    def has_band(self):
+        """Whether an Itakura parallelogram or custom band restricts the warping paths."""
+        return bool(self.itakura_slope) or self.band is not None
+
+    def band_row(self, i, r, c):
+        """Range of columns [begin, end) in row i that are allowed by the Itakura
+        parallelogram and the custom band (not by the window).
+
+        :param i: Row index (element in the first series)
+        :param r: Length of the first series
+        :param c: Length of the second series
+        """
+        b, e = 0, c
+        if self.itakura_slope:
+            b, e = _itakura_row(i, r, c, self.itakura_slope)
+            if i + 1 < r:
+                # Connect to the next row (the diagonal can be steeper than one)
+                e = max(e, _itakura_row(i + 1, r, c, self.itakura_slope)[0])
+        if self.band is not None and i < len(self.band):
+            b = max(b, int(self.band[i][0]))
+            e = min(e, int(self.band[i][1]))
+        return b, e
+
+    def band_has_euclidean(self, r, c):
+        """Whether the path used by the Euclidean distance is within the Itakura
+        parallelogram and custom band (and thus an upper bound that can be used for pruning)."""
+        if not self.has_band():
+            return True
+        e = c
+        for i in range(r):
+            b, e = self.band_row(i, r, c)
+            if not b <= min(i, c - 1) < e:
+                return False
+        # The last element of s1 is compared to the remaining elements of s2
+        return e == c
 
     def split_psi(self):
         psi_1b = psi_1e = psi_2b = psi_2e = 0
@@ -276,7 +379,8 @@ class DTWSettings:
     def from_h5_group(group):
         kwargs = {}
         for attr in ["window", "use_pruning", "max_dist", "max_step",
-                     "max_length_diff", "penalty", "psi", "inner_dist", "use_ndim", "use_c"]:
+                     "max_length_diff", "penalty", "psi", "inner_dist", "use_ndim", "use_c", "use_lb",
+                     "use_eapruning", "itakura_slope", "band"]:
             if attr in group.attrs:
                 kwargs[attr] = group.attrs[attr]
         return DTWSettings(**kwargs)
@@ -289,32 +393,28 @@ class DTWSettings:
         return r
 
 
+def _itakura_row(i, r, c, slope):
+    """Columns [begin, end) of row i within the Itakura parallelogram (same as the C version)."""
+    if r <= 1 or c <= 1:
+        return 0, c
+    slope = max(slope, 1)
+    a = (c - 1) / (r - 1)
+    diag = i * a
+    lower = max(diag / slope, (c - 1) - slope * a * (r - 1 - i))
+    upper = min(diag * slope, (c - 1) - a * (r - 1 - i) / slope)
+    # Always include the diagonal such that no row is empty
+    lower = min(lower, math.floor(diag))
+    upper = max(upper, math.ceil(diag))
+    return max(0, math.ceil(lower - 1e-9)), min(c, math.floor(upper + 1e-9) + 1)
+
+
 def lb_keogh(s1, s2, **kwargs):
-    """Lowerbound LB_KEOGH"""
-    s = DTWSettings(**kwargs)
-    if s.use_c:
-        return dtw_cc.lb_keogh(s1, s2, window=s.window, max_dist=s.max_dist,
-                               max_step=s.max_step, inner_dist=s.inner_dist)
-    if s.window is None:
-        s.window = max(len(s1), len(s2))
-    idist_fn, result_fn, _ = innerdistance.inner_dist_fns(s.inner_dist, use_ndim=s.use_ndim)
-
-    t = 0
-    imin_diff = max(0, len(s1) - len(s2)) + s.window - 1
-    imax_diff = max(0, len(s2) - len(s1)) + s.window
-    for i in range(len(s1)):
-        imin = max(0, i - imin_diff)
-        imax = min(len(s2), i + imax_diff)
-        ui = array_max(s2[imin:imax])
-        li = array_min(s2[imin:imax])
-        ci = s1[i]
-        if ci > ui:
-            t += idist_fn(ci, ui)  # (ci - ui)**2
-        elif ci < li:
-            t += idist_fn(ci, li)  # (ci - li)**2
-        else:
-            pass
-    return result_fn(t)
+    """Lowerbound LB_KEOGH
+
+    See :meth:`dtaidistance.lowerbounds.lb_keogh`
+    """
+    from . import lowerbounds
+    return lowerbounds.lb_keogh(s1, s2, **kwargs)
 
 
 def ub_euclidean(s1, s2, inner_dist=innerdistance.default):
@@ -348,7 +448,20 @@ def distance(s1, s2, **kwargs) -> float:
             logger.warning("C-library not available, using the Python version")
         else:
             return distance_fast(s1, s2, **s.kwargs())
-    idist_fn, result_fn, ival_fn = innerdistance.inner_dist_fns(s.inner_dist, use_ndim=s.use_ndim)
+    if s.use_lb and s.max_dist and not s.use_ndim:
+        from . import lowerbounds
+        # The tolerance avoids pruning a pair with distance max_dist because of rounding errors
+        threshold = s.max_dist * (1 + 1e-9)
+        if lowerbounds.lb_cascade(s1, s2, threshold=threshold, **s.kwargs()) > threshold:
+            return inf
+    if dtw_cc is None and _use_numpy(s):
+        return distance_numpy(s1, s2, **s.kwargs())
+    return _distance_python(s1, s2, s, innerdistance.inner_dist_fns(s.inner_dist, use_ndim=s.use_ndim))
+
+
+def _distance_python(s1, s2, s, inner_dist_fns):
+    """Pure Python DTW distance for settings s that are completed for s1 and s2."""
+    idist_fn, result_fn, ival_fn = inner_dist_fns
     r, c = len(s1), len(s2)
     if s.adj_max_length_diff is not None and abs(r - c) > s.adj_max_length_diff:
         return inf
@@ -365,6 +478,23 @@ def distance(s1, s2, **kwargs) -> float:
     i0 = 1
     i1 = 0
     psi_shortest = inf
+    # EAPrunedDTW: cb[i + 1] is a lower bound on the cost of the rows after row i
+    eapruning = s.use_eapruning and s.adj_max_dist != inf
+    use_band = s.has_band()
+    abandoned = False
+    # The tolerance avoids pruning the best path because of rounding errors
+    max_dist_row = s.adj_max_dist * (1 + 1e-9)
+    cb = None
+    if eapruning and not s.use_ndim and psi_1b == 0 and psi_1e == 0 and psi_2b == 0 and psi_2e == 0:
+        from . import lowerbounds
+        lower, upper = lowerbounds.envelope(s2, r, window)
+        cb = [0] * (r + 1)
+        for i in range(r - 1, -1, -1):
+            cb[i] = cb[i + 1]
+            if s1[i] > upper[i]:
+                cb[i] += idist_fn(s1[i], upper[i])
+            elif s1[i] < lower[i]:
+                cb[i] += idist_fn(s1[i], lower[i])
     for i in range(r):
         # print("i={}".format(i))
         # print(dtw)
@@ -376,13 +506,20 @@ def distance(s1, s2, **kwargs) -> float:
             dtw[ii] = inf
         j_start = max(0, i - max(0, r - c) - window + 1)
         j_end = min(c, i + max(0, c - r) + window)
+        # The free start of psi is in the first column, also if the band of this row starts later
+        psi_start = psi_1b != 0 and i < psi_1b and max(j_start, sc) == 0
+        if use_band:
+            band_b, band_e = s.band_row(i, r, c)
+            j_start, j_end = max(j_start, band_b), min(j_end, band_e)
         if sc > j_start:
             j_start = sc
         smaller_found = False
         ec_next = i
+        if cb is not None:
+            max_dist_row = s.adj_max_dist * (1 + 1e-9) - cb[i + 1]
         if length == c + 1:
             skip = 0
-        if psi_1b != 0 and j_start == 0 and i < psi_1b:
+        if psi_start:
             dtw[i1 * length] = 0
         for j in range(j_start, j_end):
             # d = (s1[i] - s2[j])**2
@@ -400,7 +537,7 @@ def distance(s1, s2, **kwargs) -> float:
             # print('{}, {}, {}'.format(dtw[i0, j - skipp], dtw[i0, j + 1 - skipp], dtw[i1, j - skip]))
             # print('i={}, j={}, d={}, skip={}, skipp={}'.format(i,j,d,skip,skipp))
             # print(dtw)
-            if dtw[i1 * length + j + 1 - skip] > s.adj_max_dist:
+            if dtw[i1 * length + j + 1 - skip] > max_dist_row:
                 if not smaller_found:
                     sc = j + 1
                 if j >= ec:
@@ -411,7 +548,13 @@ def distance(s1, s2, **kwargs) -> float:
         ec = ec_next
         if psi_1e != 0 and j_end == len(s2) and len(s1) - 1 - i <= psi_1e:
             psi_shortest = min(psi_shortest, dtw[i1 * length + j_end - skip])
-    if psi_1e == 0 and psi_2e == 0:
+        if eapruning and not smaller_found and i >= psi_1b:
+            # EAPrunedDTW: all paths through this row exceed max_dist
+            abandoned = True
+            break
+    if abandoned:
+        d = psi_shortest if psi_1e != 0 else inf
+    elif psi_1e == 0 and psi_2e == 0:
         d = dtw[i1 * length + min(c, c + window - 1) - skip]
     else:
         ic = min(c, c + window - 1) - skip
@@ -420,12 +563,85 @@ def distance(s1, s2, **kwargs) -> float:
             d = min(array_min(vc), psi_shortest)
         else:
             d = min(dtw[i1 * length + min(c, c + window - 1) - skip], psi_shortest)
-    if s.adj_max_dist and d > s.adj_max_dist:
-        d = inf
     d = result_fn(d)
+    # Compare with max_dist as given, like the C library, to avoid rounding errors
+    if s.max_dist and d > s.max_dist:
+        d = inf
     return d
 
 
+def prepare(seq_format='d', **kwargs):
+    """Distance function with settings that are parsed once.
+
+    :meth:`distance` parses the settings for every call. For many calls with
+    short series (e.g. in a subsequence search or a clustering loop), this takes
+    more time than the DTW computation itself. The returned object is called as
+    ``fn(s1, s2)`` and gives the same result as ``distance(s1, s2, **kwargs)``.
+    The ``max_dist`` attribute can be changed between calls.
+
+    ::
+
+        fn = dtw.prepare(window=10, use_c=True)
+        ds = [fn(query, serie) for serie in series]
+
+    If use_c is true, the series should be buffers of doubles (e.g. a Numpy
+    array or ``array.array('d')``), no conversions are done. The buffers do not
+    need to be contiguous (e.g. a column of a matrix).
+
+    :param seq_format: Type of the values if use_c is true, 'd' for double or
+        'f' for float32 (requires the float32 C library).
+    :param kwargs: See arguments for :class:`DTWSettings`
+    :return: Callable with arguments s1 and s2
+    """
+    s = DTWSettings(**kwargs)
+    if s.use_c:
+        if dtw_cc is None:
+            logger.warning("C-library not available, using the Python version")
+        else:
+            cc = dtw_cc_f32 if seq_format == 'f' else dtw_cc
+            if cc is None:
+                raise CythonException("The C library for float32 is not available")
+            if s.use_ndim:
+                return cc.PreparedDistanceNDim(**s.c_kwargs())
+            return cc.PreparedDistance(**s.c_kwargs())
+    return PreparedDistance(s)
+
+
+class PreparedDistance:
+    def __init__(self, settings):
+        """Pure Python version of the distance function returned by :meth:`prepare`.
+
+        :param settings: :class:`DTWSettings`
+        """
+        self.settings = settings
+        self.inner_dist_fns = innerdistance.inner_dist_fns(settings.inner_dist, use_ndim=settings.use_ndim)
+
+    @property
+    def max_dist(self):
+        return self.settings.max_dist
+
+    @max_dist.setter
+    def max_dist(self, value):
+        self.settings.max_dist = value
+        self.settings.adj_max_dist = inf if not value else self.inner_dist_fns[2](value)
+
+    def __call__(self, s1, s2):
+        s = self.settings
+        if s.use_pruning and not s.max_dist:
+            # The bound depends on the series, do not change the prepared settings
+            s = copy.copy(s)
+            s.set_max_dist(s1, s2)
+        if s.use_lb and s.max_dist and not s.use_ndim:
+            from . import lowerbounds
+            # The tolerance avoids pruning a pair with distance max_dist because of rounding errors
+            threshold = s.max_dist * (1 + 1e-9)
+            if lowerbounds.lb_cascade(s1, s2, threshold=threshold, **s.kwargs()) > threshold:
+                return inf
+        if dtw_cc is None and _use_numpy(s):
+            return distance_numpy(s1, s2, **s.kwargs())
+        return _distance_python(s1, s2, s, self.inner_dist_fns)
+
+
 def distance_fast(s1, s2, use_pruning=True, **kwargs):
     """Same as :meth:`distance` but with different defaults to choose the fast C-based version of
     the implementation (use_c = True) and use pruning (use_pruning = True).
@@ -435,18 +651,117 @@ def distance_fast(s1, s2, use_pruning=True, **kwargs):
     ``array.array('d', [1,2,3])``
     """
     _check_library(raise_exception=True)
-    # Check that Numpy arrays for C contiguous
-    s1 = util_numpy.verify_np_array(s1)
-    s2 = util_numpy.verify_np_array(s2)
+    cc, _ = _c_libraries(s1, s2)
+    # Numpy arrays that are not contiguous (e.g. a column of a matrix) are read
+    # using their strides, only the type is converted if necessary
+    s1 = util_numpy.verify_np_array(s1, dtype=cc.seq_format, allow_strided=True)
+    s2 = util_numpy.verify_np_array(s2, dtype=cc.seq_format, allow_strided=True)
     s = DTWSettings(use_pruning=use_pruning, **kwargs)
     # Move data to C library
     if s.use_ndim is False:
-        d = dtw_cc.distance(s1, s2, **s.c_kwargs())
+        d = cc.distance(s1, s2, **s.c_kwargs())
     else:
-        d = dtw_cc.distance_ndim(s1, s2, **s.c_kwargs())
+        d = cc.distance_ndim(s1, s2, **s.c_kwargs())
     return d
 
 
+def distance_numpy(s1, s2, **kwargs):
+    """Same as :meth:`distance` but evaluates the dynamic program per anti-diagonal
+    using Numpy operations instead of per cell.
+
+    All cells on an anti-diagonal only depend on the two previous anti-diagonals
+    and are computed at once. This is used automatically by :meth:`distance`
+    if the C library is not available. Only a number of anti-diagonals are kept
+    in memory. Cells with a value larger than max_dist are pruned.
+
+    :param s1: First sequence
+    :param s2: Second sequence
+    :param kwargs: :class:`DTWSettings` arguments (band and itakura_slope are not supported)
+    :returns: DTW distance
+    """
+    if np is None:
+        raise NumpyException("Numpy is required for the distance_numpy method")
+    s = DTWSettings.for_dtw(s1, s2, **kwargs)
+    if s.has_band():
+        raise ValueError("The arguments band and itakura_slope are not supported by distance_numpy")
+    r, c = len(s1), len(s2)
+    if s.adj_max_length_diff is not None and abs(r - c) > s.adj_max_length_diff:
+        return inf
+    _, result_fn, _ = innerdistance.inner_dist_fns(s.inner_dist, use_ndim=s.use_ndim)
+    _, psi_1e, _, psi_2e = s.split_psi()
+    last_row, last_col = _dtw_numpy_diagonals(s1, s2, s)
+    d = last_row[c]
+    if psi_1e != 0:
+        d = min(d, array_min(last_col[r - psi_1e:]))
+    if psi_2e != 0:
+        d = min(d, array_min(last_row[c - psi_2e:]))
+    if s.adj_max_dist and d > s.adj_max_dist:
+        d = inf
+    return float(result_fn(d))
+
+
+def _dtw_numpy_diagonals(s1, s2, s, wps=None):
+    """Compute the DTW recurrence per anti-diagonal.
+
+    Anti-diagonal k contains the cells (i, j) of the warping paths matrix with
+    i + j = k and is stored as an array indexed by i.
+
+    :param s: DTWSettings
+    :param wps: Optional warping paths matrix of shape (len(s1) + 1, len(s2) + 1)
+        that is filled with all values.
+    :returns: (last row, last column) of the warping paths matrix
+    """
+    cost_fn = innerdistance.inner_dist_array_fn(s.inner_dist, use_ndim=s.use_ndim)
+    if cost_fn is None:
+        raise AttributeError("The inner distance {} is not supported for Numpy".format(s.inner_dist))
+    s1 = np.asarray(s1, dtype=DTYPE)
+    s2r = np.asarray(s2, dtype=DTYPE)[::-1]
+    r, c = len(s1), len(s2r)
+    window = max(r, c) if s.window is None else s.window
+    psi_1b, _, psi_2b, _ = s.split_psi()
+    # Band: i - j <= lower and j - i <= upper
+    lower = max(0, r - c) + window - 1
+    upper = max(0, c - r) + window - 1
+    max_step = inf if s.adj_max_step is None else s.adj_max_step
+    max_dist = inf if not s.adj_max_dist else s.adj_max_dist
+    prune = max_step < inf or max_dist < inf
+    last_row = np.full(c + 1, inf)
+    last_col = np.full(r + 1, inf)
+    prev2 = np.full(r + 1, inf)  # Anti-diagonal k - 2
+    prev1 = np.full(r + 1, inf)  # Anti-diagonal k - 1
+    cur = np.full(r + 1, inf)
+    for k in range(r + c + 1):
+        cur.fill(inf)
+        # First row and column, with psi-relaxation
+        if k <= psi_2b and k <= c:
+            cur[0] = 0
+        if k <= psi_1b and k <= r:
+            cur[k] = 0
+        i_b = max(1, k - c, (k - upper + 1) // 2)
+        i_e = min(r, k - 1, (k + lower) // 2)
+        if i_b <= i_e:
+            d = cost_fn(s1[i_b - 1:i_e], s2r[c - k + i_b:c - k + i_e + 1])
+            values = np.minimum(prev2[i_b - 1:i_e], prev1[i_b - 1:i_e] + s.adj_penalty_s1)
+            np.minimum(values, prev1[i_b:i_e + 1] + s.adj_penalty_s2, out=values)
+            values += d
+            values[d > max_step] = inf
+            values[values > max_dist] = inf
+            cur[i_b:i_e + 1] = values
+        if prune and k > max(psi_1b, psi_2b) and not (np.isfinite(cur).any() or np.isfinite(prev1).any()):
+            # All further cells depend on two anti-diagonals without a path
+            break
+        if wps is not None:
+            i_b2, i_e2 = max(0, k - c), min(r, k)
+            idxs = np.arange(i_b2, i_e2 + 1)
+            wps[idxs, k - idxs] = cur[i_b2:i_e2 + 1]
+        if k >= c:
+            last_col[k - c] = cur[k - c]
+        if k >= r:
+            last_row[k - r] = cur[r]
+        prev2, prev1, cur = prev1, cur, prev2
+    return last_row, last_col
+
+
 def _distance_with_params(t):
     return distance(t[0], t[1], **t[2])
 
@@ -456,11 +771,22 @@ def _distance_with_params_ndim(t):
 
 
 def _distance_c_with_params(t):
-    return dtw_cc.distance(t[0], t[1], **t[2])
+    cc, _ = _c_libraries(t[0], t[1])
+    return cc.distance(t[0], t[1], **t[2])
 
 
 def _distance_c_with_params_ndim(t):
-    return dtw_cc.distance_ndim(t[0], t[1], **t[2])
+    cc, _ = _c_libraries(t[0], t[1])
+    return cc.distance_ndim(t[0], t[1], **t[2])
+
+
+def _pool_map(fn, args, executor=None):
+    """Map fn over args with a pool of processes (see :meth:`util.get_executor`)."""
+    pool = util.get_executor('multiprocessing', executor)
+    try:
+        return pool.map(fn, args)
+    finally:
+        pool.release()
 
 
 def warping_paths(s1, s2, psi_neg=True, keep_int_repr=False, **kwargs):
@@ -482,6 +808,8 @@ def warping_paths(s1, s2, psi_neg=True, keep_int_repr=False, **kwargs):
         return warping_paths_fast(s1, s2, psi_neg=psi_neg, **s.kwargs())
     if np is None:
         raise NumpyException("Numpy is required for the warping_paths method")
+    if dtw_cc is None and _use_numpy(s):
+        return warping_paths_numpy(s1, s2, psi_neg=psi_neg, keep_int_repr=keep_int_repr, **s.kwargs())
     cost, result_fn, _ = innerdistance.inner_dist_fns(s.inner_dist, use_ndim=s.use_ndim)
     r, c = len(s1), len(s2)
     if s.adj_max_length_diff is not None and abs(r - c) > s.adj_max_length_diff:
@@ -497,11 +825,15 @@ def warping_paths(s1, s2, psi_neg=True, keep_int_repr=False, **kwargs):
     i1 = 0
     sc = 0
     ec = 0
+    use_band = s.has_band()
     for i in range(r):
         i0 = i
         i1 = i + 1
         j_start = max(0, i - max(0, r - c) - window + 1)
         j_end = min(c, i + max(0, c - r) + window)
+        if use_band:
+            band_b, band_e = s.band_row(i, r, c)
+            j_start, j_end = max(j_start, band_b), min(j_end, band_e)
         if sc > j_start:
             j_start = sc
         smaller_found = False
@@ -522,13 +854,19 @@ def warping_paths(s1, s2, psi_neg=True, keep_int_repr=False, **kwargs):
                 smaller_found = True
                 ec_next = j + 1
         ec = ec_next
+    return _warping_paths_end(dtw, r, c, window, s, psi_neg, keep_int_repr, result_fn)
+
+
+def _warping_paths_end(dtw, r, c, window, s, psi_neg, keep_int_repr, result_fn):
+    """Select the DTW distance from the warping paths matrix (taking into account psi-relaxation)."""
+    _, psi_1e, _, psi_2e = s.split_psi()
     # Decide which d to return
     if not keep_int_repr:
         dtw = result_fn(dtw)
     if psi_1e == 0 and psi_2e == 0:
-        d = dtw[i1, min(c, c + window - 1)]
+        d = dtw[r, min(c, c + window - 1)]
     else:
-        ir = i1
+        ir = r
         ic = min(c, c + window - 1)
         if psi_1e != 0:
             vr = dtw[ir:max(0, ir-psi_1e-1):-1, ic]
@@ -561,6 +899,35 @@ def warping_paths(s1, s2, psi_neg=True, keep_int_repr=False, **kwargs):
     return d, dtw
 
 
+def warping_paths_numpy(s1, s2, psi_neg=True, keep_int_repr=False, **kwargs):
+    """Same as :meth:`warping_paths` but evaluates the dynamic program per anti-diagonal
+    using Numpy operations instead of per cell (see :meth:`distance_numpy`).
+
+    This is used automatically by :meth:`warping_paths` if the C library is not
+    available. Cells with a value larger than max_dist are pruned.
+
+    :param s1: First sequence
+    :param s2: Second sequence
+    :param psi_neg: See :meth:`warping_paths`
+    :param keep_int_repr: See :meth:`warping_paths`
+    :param kwargs: See arguments for :class:`DTWSettings` (band and itakura_slope are not supported)
+    :returns: (DTW distance, DTW matrix)
+    """
+    if np is None:
+        raise NumpyException("Numpy is required for the warping_paths_numpy method")
+    s = DTWSettings.for_dtw(s1, s2, **kwargs)
+    if s.has_band():
+        raise ValueError("The arguments band and itakura_slope are not supported by warping_paths_numpy")
+    r, c = len(s1), len(s2)
+    if s.adj_max_length_diff is not None and abs(r - c) > s.adj_max_length_diff:
+        return inf, None
+    _, result_fn, _ = innerdistance.inner_dist_fns(s.inner_dist, use_ndim=s.use_ndim)
+    window = max(r, c) if s.window is None else s.window
+    dtw = np.full((r + 1, c + 1), inf)
+    _dtw_numpy_diagonals(s1, s2, s, wps=dtw)
+    return _warping_paths_end(dtw, r, c, window, s, psi_neg, keep_int_repr, result_fn)
+
+
 def warping_paths_fast(s1, s2, psi_neg=True, keep_int_repr=False, compact=False, **kwargs):
     """Fast C version of :meth:`warping_paths`.
 
@@ -577,26 +944,27 @@ def warping_paths_fast(s1, s2, psi_neg=True, keep_int_repr=False, compact=False,
     """
     if np is None:
         raise util_numpy.NumpyException("Numpy needed for warping_paths_fast")
-    s1 = util_numpy.verify_np_array(s1)
-    s2 = util_numpy.verify_np_array(s2)
+    _check_library(raise_exception=True)
+    cc, _ = _c_libraries(s1, s2)
+    s1 = util_numpy.verify_np_array(s1, dtype=cc.seq_format)
+    s2 = util_numpy.verify_np_array(s2, dtype=cc.seq_format)
     r = len(s1)
     c = len(s2)
-    _check_library(raise_exception=True)
     settings = DTWSettings.for_dtw(s1, s2, **kwargs)
     if compact:
-        wps_width = dtw_cc.wps_width(r, c, **settings.c_kwargs())
-        wps_compact = np.full((len(s1)+1, wps_width), inf)
+        wps_width = cc.wps_width(r, c, **settings.c_kwargs())
+        wps_compact = np.full((len(s1)+1, wps_width), inf, dtype=cc.seq_format)
         if settings.use_ndim:
-            d = dtw_cc.warping_paths_compact_ndim(wps_compact, s1, s2, psi_neg, keep_int_repr, **settings.c_kwargs())
+            d = cc.warping_paths_compact_ndim(wps_compact, s1, s2, psi_neg, keep_int_repr, **settings.c_kwargs())
         else:
-            d = dtw_cc.warping_paths_compact(wps_compact, s1, s2, psi_neg, keep_int_repr, **settings.c_kwargs())
+            d = cc.warping_paths_compact(wps_compact, s1, s2, psi_neg, keep_int_repr, **settings.c_kwargs())
         return d, wps_compact
 
-    dtw = np.full((r + 1, c + 1), inf)
+    dtw = np.full((r + 1, c + 1), inf, dtype=cc.seq_format)
     if settings.use_ndim:
-        d = dtw_cc.warping_paths_ndim(dtw, s1, s2, psi_neg, keep_int_repr, **settings.c_kwargs())
+        d = cc.warping_paths_ndim(dtw, s1, s2, psi_neg, keep_int_repr, **settings.c_kwargs())
     else:
-        d = dtw_cc.warping_paths(dtw, s1, s2, psi_neg, keep_int_repr, **settings.c_kwargs())
+        d = cc.warping_paths(dtw, s1, s2, psi_neg, keep_int_repr, **settings.c_kwargs())
     return d, dtw
 
 
@@ -741,6 +1109,163 @@ def warping_paths_affinity_fast(s1, s2, window=None, only_triu=False,
     return d, dtw
 
 
+class DTWControl:
+    RUNNING = 0
+    CANCELLED = 1
+    TIMEOUT = 2
+
+    def __init__(self, callback=None, timeout=None, show_progress=False):
+        """Progress reporting, cancellation and deadline for distance matrix computations.
+
+        The computation (also the C and OpenMP implementations) regularly reports the number
+        of computed distances and checks whether it should stop. If the computation stops
+        before all distances are computed, the distance matrix contains NaN for the distances
+        that are not computed and ``status`` is CANCELLED or TIMEOUT.
+        A KeyboardInterrupt (Ctrl-C) also stops the computation and is then raised.
+
+        :param callback: Function that is called with arguments (done, total), the number of
+            distances that are computed and the total number of distances. Returning True
+            cancels the computation.
+        :param timeout: Stop the computation after this number of seconds.
+        :param show_progress: Show progress using the tqdm library.
+        """
+        self.callback = callback
+        self.timeout = timeout
+        self.show_progress = show_progress
+        self.done = 0
+        self.total = 0
+        self.status = DTWControl.RUNNING
+        self._cancel = False
+        self._deadline = None
+        self._progress = None
+
+    def cancel(self):
+        """Stop the computation (e.g. from another thread)."""
+        self._cancel = True
+
+    @property
+    def stopped(self):
+        return self.status != DTWControl.RUNNING
+
+    def start(self, total):
+        self.done = 0
+        self.total = total
+        self.status = DTWControl.RUNNING
+        self._cancel = False
+        if self.timeout is not None:
+            self._deadline = time.monotonic() + self.timeout
+        if self.show_progress:
+            if tqdm is None:
+                raise ValueError('show_progress cannot be true is tqdm is not available')
+            self._progress = tqdm(total=total)
+
+    def update(self, done):
+        """Register the number of computed distances.
+
+        :return: Reason to stop (CANCELLED or TIMEOUT) or RUNNING to continue
+        """
+        if self._progress is not None:
+            self._progress.update(done - self.done)
+        self.done = done
+        if self.status != DTWControl.RUNNING:
+            return self.status
+        if self.callback is not None and self.callback(done, self.total):
+            self._cancel = True
+        if self._cancel:
+            self.status = DTWControl.CANCELLED
+        elif self._deadline is not None and time.monotonic() > self._deadline:
+            self.status = DTWControl.TIMEOUT
+        return self.status
+
+    def stop(self, status):
+        if status != DTWControl.RUNNING and self.status == DTWControl.RUNNING:
+            self.status = status
+
+    def close(self):
+        if self._progress is not None:
+            self._progress.close()
+            self._progress = None
+
+
+class DTWStats:
+    fields = ('pairs', 'cells', 'rows_abandoned', 'pairs_abandoned', 'pairs_pruned', 'lbs')
+    _nb_active = 0
+
+    def __init__(self):
+        """Counters of the work done by the C implementation, see :meth:`stats`.
+
+        - pairs: Number of DTW computations (pairs of series)
+        - cells: Number of cells in the DTW matrices that are computed
+        - rows_abandoned: Number of rows that are skipped by early abandoning (use_eapruning)
+        - pairs_abandoned: Number of pairs for which the computation is abandoned early
+        - pairs_pruned: Number of pairs that are skipped because of a lower bound (use_lb)
+        - lbs: Number of lower bounds that are computed
+
+        The kernel for series of equal length that computes multiple pairs at once
+        (see :meth:`dtw_cc.lanes_isa`) counts the cells and abandoned rows and pairs
+        only for the lanes that hold a real pair, unused lanes are not counted.
+        """
+        for field in self.fields:
+            setattr(self, field, 0)
+        self._start = None
+
+    @staticmethod
+    def _libraries():
+        return [lib for lib in (dtw_cc, dtw_cc_omp, dtw_cc_f32, dtw_cc_omp_f32) if lib is not None]
+
+    @staticmethod
+    def _counters():
+        counters = {field: 0 for field in DTWStats.fields}
+        for lib in DTWStats._libraries():
+            for field, value in lib.stats_get().items():
+                counters[field] += value
+        return counters
+
+    def __enter__(self):
+        if DTWStats._nb_active == 0:
+            for lib in self._libraries():
+                lib.stats_reset()
+                lib.stats_enable(True)
+        DTWStats._nb_active += 1
+        self._start = self._counters()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        counters = self._counters()
+        for field in self.fields:
+            setattr(self, field, counters[field] - self._start[field])
+        DTWStats._nb_active -= 1
+        if DTWStats._nb_active == 0:
+            for lib in self._libraries():
+                lib.stats_enable(False)
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.fields}
+
+    def __str__(self):
+        return "DTWStats({})".format(", ".join("{}={}".format(field, getattr(self, field))
+                                               for field in self.fields))
+
+
+def stats():
+    """Count the work done by the C implementation within a with-block.
+
+    For example::
+
+        with dtw.stats() as st:
+            dtw.distance_matrix_fast(series, max_dist=5, use_lb=True)
+        print(st.cells, st.pairs_pruned)
+
+    The counters are available after the with-block, see :class:`DTWStats`.
+    Every thread counts in its own counters that are merged when a computation
+    finishes. Computations in other threads of this process that run at the same
+    time are also counted. The Python implementation and computations in other
+    processes (use_mp) are not counted.
+    """
+    _check_library(raise_exception=True)
+    return DTWStats()
+
+
 def distance_matrix_func(use_c=False, parallel=False, show_progress=False):
     def distance_matrix_wrapper(seqs, **kwargs):
         return distance_matrix(seqs, parallel=parallel, use_c=use_c,
@@ -749,7 +1274,8 @@ def distance_matrix_func(use_c=False, parallel=False, show_progress=False):
 
 
 def distance_matrix(s, block=None, compact=False, parallel=False,
-                    use_mp=False, show_progress=False, only_triu=False, **kwargs):
+                    use_mp=False, show_progress=False, only_triu=False, out=None, sparse=False,
+                    control=None, schedule=None, backend=None, executor=None, **kwargs):
     """Distance matrix for all sequences in s.
 
     :param s: Iterable of series
@@ -758,19 +1284,58 @@ def distance_matrix(s, block=None, compact=False, parallel=False,
     :param compact: Return the distance matrix as an array representing the upper triangular matrix.
     :param parallel: Use parallel operations
     :param use_mp: Force use Multiprocessing for parallel operations (not OpenMP)
-    :param show_progress: Show progress using the tqdm library. This is only supported for
-        the pure Python version (thus not the C-based implementations).
+    :param show_progress: Show progress using the tqdm library.
     :param only_triu: Only compute upper traingular matrix of warping paths.
         This is useful if s1 and s2 are the same series and the matrix would be mirrored around the diagonal.
+    :param out: Numpy array (e.g. a ``numpy.memmap``) to write the distances to. A one-dimensional
+        array is filled with the condensed distance matrix (as with ``compact=True``), a
+        two-dimensional array of shape (len(s), len(s)) with the full matrix.
+        The distances are computed and written in blocks of rows, such that the memory
+        used does not grow with the size of the matrix.
+    :param sparse: Only return the distances that are not infinity (thus not larger than
+        ``max_dist``). The memory that is used depends on the number of such pairs instead
+        of on the number of combinations.
+        If True, return the (rows, columns, values) arrays of the computed pairs, in row-major order.
+        If 'coo' or 'csr', return a ``scipy.sparse`` matrix of shape (len(s), len(s)). This
+        matrix is symmetric, unless only_triu is true.
+    :param control: :class:`DTWControl` object to report progress, and to cancel the computation
+        or stop after a timeout. The distances that are not computed are NaN.
+    :param schedule: How the pairs are divided over the threads or processes if parallel is true.
+        'rows' (default) divides the rows of the matrix. 'cost' estimates the cost of every pair
+        from the lengths of the series and the window, and computes the most expensive pairs
+        first (dynamic scheduling). This avoids that a few threads with the longest series
+        finish much later than the others if the lengths of the series vary a lot.
+        In C with OpenMP, this is only used for series of different lengths.
+    :param backend: Parallelization to use if parallel is true. None (default) uses OpenMP
+        for the C implementation and multiprocessing otherwise (or if use_mp is true).
+        'openmp' and 'multiprocessing' force one of both. 'threads' uses a pool of threads that
+        share the memory of this process (no copies of the series). The C implementation releases
+        the GIL, thus this is an alternative for multiprocessing if OpenMP is not available.
+        'sharedmem' uses a pool of processes that read the series from shared memory and write
+        the distances to a shared array. The series are copied once instead of pickling both
+        series for every pair (see :mod:`dtaidistance.sharedmem`).
+    :param executor: :class:`util.Executor` to use if a pool of processes or threads is
+        used, instead of starting a new pool (see also :meth:`util.set_executor`).
     :param kwargs: See arguments for :class:`DTWSettings`
     :returns: The distance matrix or the condensed distance matrix if the compact argument is true
+        (or out if given, or the sparse representation if sparse is given)
     """
     settings = DTWSettings(**kwargs)
+    if backend not in [None, 'openmp', 'multiprocessing', 'threads', 'sharedmem']:
+        raise ValueError(f"Unknown value for argument backend: {backend}")
+    if backend == 'multiprocessing':
+        use_mp = True
+    use_threads = parallel and backend == 'threads'
+    use_shm = parallel and backend == 'sharedmem'
+    if use_shm and np is None:
+        raise NumpyException("Numpy is required for the sharedmem backend")
+    if backend == 'openmp' and (use_mp or not settings.use_c):
+        raise ValueError("Backend 'openmp' requires use_c=True and use_mp=False")
     # Check whether multiprocessing is available
     if settings.use_c:
-        requires_omp = parallel and not use_mp
+        requires_omp = parallel and not use_mp and not use_threads and not use_shm
         _check_library(raise_exception=True, include_omp=requires_omp)
-    if parallel and (use_mp or not settings.use_c):
+    if parallel and not use_threads and (use_mp or use_shm or not settings.use_c):
         try:
             import multiprocessing as mp
             logger.info('Using multiprocessing')
@@ -780,10 +1345,33 @@ def distance_matrix(s, block=None, compact=False, parallel=False,
             raise Exception(msg)
     else:
         mp = None
+    # Pairs are distributed over a pool of processes or threads
+    use_pool = mp is not None or use_threads
+    if sparse not in [False, True, 'coo', 'csr']:
+        raise ValueError(f"Unknown value for argument sparse: {sparse}")
+    if schedule not in [None, 'rows', 'cost']:
+        raise ValueError(f"Unknown value for argument schedule: {schedule}")
+    if sparse and out is not None:
+        raise ValueError("Arguments sparse and out cannot be combined")
+    if sparse and control is not None:
+        raise ValueError("Arguments sparse and control cannot be combined")
+    if sparse and np is None:
+        raise NumpyException("Numpy is required for the sparse argument")
+    if out is not None:
+        if np is None:
+            raise NumpyException("Numpy is required for the out argument")
+        if compact and out.ndim != 1:
+            raise ValueError("Argument out should be one-dimensional if compact is true")
     if block is not None:
-        if len(block) > 2 and block[2] is False and compact is False:
+        if len(block) > 2 and block[2] is False and compact is False and sparse is not True \
+                and (out is None or out.ndim != 1):
             raise Exception(f'Block cannot have a third argument triu=false with compact=false')
         if (block[0][1] - block[0][0]) < 1 or (block[1][1] - block[1][0]) < 1:
+            if out is not None:
+                return out
+            if sparse:
+                return _distance_matrix_sparse_result(np.zeros(0, dtype=int), np.zeros(0, dtype=int),
+                                                      np.zeros(0), sparse, len(s), only_triu)
             return []
     # Prepare options and data to pass to distance method
     dist_opts = settings.kwargs()
@@ -792,77 +1380,285 @@ def distance_matrix(s, block=None, compact=False, parallel=False,
         ndim = s.detected_ndim
     else:
         ndim = 1
+    cc, cc_omp = _c_libraries(s)
     if settings.use_c:
         for k, v in dist_opts.items():
             if v is None:
                 # None is represented as 0.0 for C
                 dist_opts[k] = 0
 
-    logger.info('Computing distances')
-    if settings.use_c and parallel and not use_mp and dtw_cc_omp is not None:
-        logger.info("Compute distances in C (parallel=OMP)")
-        dist_opts['block'] = block
-        if settings.use_ndim:
-            dists = dtw_cc_omp.distance_matrix_ndim(s, ndim, **dist_opts)
-        else:
-            dists = dtw_cc_omp.distance_matrix(s, **dist_opts)
+    def pool_map(fn, args, chunksize=None):
+        if control is None:
+            return pool.map(fn, args, chunksize=chunksize)
+        # Report progress and check whether to stop after every chunk
+        dists = [math.nan] * len(args)
+        chunk_size = 100 * (os.cpu_count() or 1)
+        for i in range(0, len(args), chunk_size):
+            if control.stopped:
+                break
+            dists[i:i + chunk_size] = pool.map(fn, args[i:i + chunk_size], chunksize=chunksize)
+            control.update(control.done + len(args[i:i + chunk_size]))
+        return dists
 
-    elif settings.use_c and parallel and (dtw_cc_omp is None or use_mp):
-        logger.info("Compute distances in C (parallel=MP)")
-        idxs = _distance_matrix_idxs(block, len(s))
-        if settings.use_ndim:
-            fn = _distance_c_with_params_ndim
-        else:
-            fn = _distance_c_with_params
-        with mp.Pool() as p:
-            dists = p.map(fn, [(s[r], s[c], dist_opts) for c, r in zip(*idxs)])
+    def pool_map_pairs(fn, idxs):
+        args = [(s[r], s[c], dist_opts) for r, c in zip(*idxs)]
+        if schedule != 'cost':
+            return pool_map(fn, args)
+        # Most expensive pairs first, one pair at a time
+        costs = [_pair_cost(len(s1), len(s2), settings) for s1, s2, _ in args]
+        order = sorted(range(len(args)), key=lambda i: -costs[i])
+        dists = [0.0] * len(args)
+        for i, d in zip(order, pool_map(fn, [args[i] for i in order], chunksize=1)):
+            dists[i] = d
+        return dists
 
-    elif settings.use_c and not parallel:
-        logger.info("Compute distances in C (parallel=No)")
-        dist_opts['block'] = block
-        if settings.use_ndim:
-            dists = dtw_cc.distance_matrix_ndim(s, ndim, **dist_opts)
-        else:
-            dists = dtw_cc.distance_matrix(s, **dist_opts)
+    def compute(block, out=None):
+        """Condensed distances for the given block (written to out if given)."""
+        if control is not None and control.stopped:
+            # Stopped during a previous block
+            dists = array.array('d', [math.nan]) * _distance_matrix_length(block, len(s))
+            if out is not None:
+                out[:] = dists
+                return out
+            return dists
+        out_c = None
+        if out is not None and out.dtype == np.dtype(cc.seq_format) and out.flags.c_contiguous:
+            # The C library can write directly in the given buffer
+            out_c = out
+        if use_shm:
+            logger.info("Compute distances in {} (parallel=MP, shared memory)".format(
+                "C" if settings.use_c else "Python"))
+            dists = sharedmem.distance_matrix_blocks(pool, shared_s, block=block, schedule=schedule,
+                                                     control=control, **settings.kwargs())
+
+        elif settings.use_c and parallel and not use_pool and cc_omp is not None:
+            logger.info("Compute distances in C (parallel=OMP)")
+            if settings.use_ndim:
+                dists = cc_omp.distance_matrix_ndim(s, ndim, block=block, out=out_c, control=control,
+                                                     schedule=schedule, **dist_opts)
+            else:
+                dists = cc_omp.distance_matrix(s, block=block, out=out_c, control=control,
+                                               schedule=schedule, **dist_opts)
+
+        elif settings.use_c and parallel and (cc_omp is None or use_pool):
+            logger.info("Compute distances in C (parallel={})".format("threads" if use_threads else "MP"))
+            idxs = _distance_matrix_idxs(block, len(s))
+            if settings.use_ndim:
+                fn = _distance_c_with_params_ndim
+            else:
+                fn = _distance_c_with_params
+            dists = pool_map_pairs(fn, idxs)
+
+        elif settings.use_c and not parallel:
+            logger.info("Compute distances in C (parallel=No)")
+            if settings.use_ndim:
+                dists = cc.distance_matrix_ndim(s, ndim, block=block, out=out_c, control=control,
+                                                 **dist_opts)
+            else:
+                dists = cc.distance_matrix(s, block=block, out=out_c, control=control, **dist_opts)
 
-    elif not settings.use_c and parallel:
-        logger.info("Compute distances in Python (parallel=MP)")
-        idxs = _distance_matrix_idxs(block, len(s))
-        if settings.use_ndim:
-            fn = _distance_with_params_ndim
-        else:
-            fn = _distance_with_params
-        with mp.Pool() as p:
-            dists = p.map(fn, [(s[r], s[c], dist_opts) for c, r in zip(*idxs)])
+        elif not settings.use_c and parallel:
+            logger.info("Compute distances in Python (parallel={})".format("threads" if use_threads else "MP"))
+            idxs = _distance_matrix_idxs(block, len(s))
+            if settings.use_ndim:
+                fn = _distance_with_params_ndim
+            else:
+                fn = _distance_with_params
+            dists = pool_map_pairs(fn, idxs)
 
-    elif not settings.use_c and not parallel:
-        logger.info("Compute distances in Python (parallel=No)")
-        dists = distance_matrix_python(s, block=block, show_progress=show_progress, settings=settings)
+        elif not settings.use_c and not parallel:
+            logger.info("Compute distances in Python (parallel=No)")
+            dists = distance_matrix_python(s, block=block, settings=settings, control=control)
 
-    else:
-        raise Exception(f'Unsupported combination of: parallel={parallel}, '
-                        f'use_c={s.use_c}, dtw_cc_omp={dtw_cc_omp}, use_mp={use_mp}')
+        else:
+            raise Exception(f'Unsupported combination of: parallel={parallel}, '
+                            f'use_c={s.use_c}, dtw_cc_omp={dtw_cc_omp}, use_mp={use_mp}')
+
+        exp_length = _distance_matrix_length(block, len(s))
+        assert len(dists) == exp_length, "len(dists)={} != {} (block = {})".format(len(dists), exp_length, block)
+        if out is not None and dists is not out:
+            out[:] = dists
+            return out
+        return dists
+
+    def compute_sparse(block):
+        """Rows, columns and values of the distances that are not infinity."""
+        if settings.use_c and parallel and not use_pool and cc_omp is not None:
+            logger.info("Compute sparse distances in C (parallel=OMP)")
+            rows, cols, values = (np.asarray(a) for a in
+                                  cc_omp.distance_matrix_sparse(s, block=block, ndim=ndim, **dist_opts))
+            # The threads' buffers are merged, restore the row-major order
+            order = np.lexsort((cols, rows))
+            return rows[order], cols[order], values[order]
+        if settings.use_c and not parallel:
+            logger.info("Compute sparse distances in C (parallel=No)")
+            return tuple(np.asarray(a) for a in cc.distance_matrix_sparse(s, block=block, ndim=ndim, **dist_opts))
+        # Compute blocks of rows and only keep the distances that are not infinity
+        rows, cols, values = [], [], []
+        for sub_block, _ in _distance_matrix_row_blocks(block, len(s), 2**20):
+            dists = np.asarray(compute(sub_block))
+            idxs = _distance_matrix_idxs(sub_block, len(s))
+            keep = dists < inf
+            rows.append(np.asarray(idxs[0])[keep])
+            cols.append(np.asarray(idxs[1])[keep])
+            values.append(dists[keep])
+        return np.concatenate(rows), np.concatenate(cols), np.concatenate(values)
+
+    if control is None and show_progress:
+        control = DTWControl(show_progress=True)
+    if control is not None:
+        control.start(_distance_matrix_length(block, len(s)))
+    pool = None
+    shared_s = None
+    if use_shm:
+        from . import sharedmem
+        shared_s = sharedmem.SharedSeries.create(s)
+    try:
+        if mp is not None:
+            pool = util.get_executor('multiprocessing', executor)
+        elif use_threads:
+            pool = util.get_executor('threads', executor)
+        logger.info('Computing distances')
+        if out is not None:
+            return _distance_matrix_out(compute, out, block=block, nb_series=len(s), only_triu=only_triu)
+        if sparse:
+            rows, cols, values = compute_sparse(block)
+            return _distance_matrix_sparse_result(rows, cols, values, sparse, len(s), only_triu)
+        dists = compute(block)
+    finally:
+        if pool is not None:
+            pool.release()
+        if shared_s is not None:
+            shared_s.close()
+            shared_s.unlink()
+        if control is not None:
+            control.close()
 
-    exp_length = _distance_matrix_length(block, len(s))
-    assert len(dists) == exp_length, "len(dists)={} != {} (block = {})".format(len(dists), exp_length, block)
     if compact:
         return dists
 
     # Create full matrix and fill upper triangular matrix with distance values (or only block if specified)
-    dists_matrix = distances_array_to_matrix(dists, nb_series=len(s), block=block, only_triu=only_triu)
+    dists_matrix = distances_array_to_matrix(dists, nb_series=len(s), block=block, only_triu=only_triu,
+                                             dtype=_result_dtype(dists))
 
     return dists_matrix
 
 
-def distances_array_to_matrix(dists, nb_series, block=None, only_triu=False):
+def _distance_matrix_out(compute, out, block=None, nb_series=None, only_triu=False, block_size=2**24):
+    """Fill out with the distance matrix, computed one block of rows at a time.
+
+    For every block of rows (with about block_size distances), ``compute(block, buffer)``
+    writes the condensed distances to the buffer. If out is condensed, the buffer is a view
+    on out. Otherwise, a reused buffer is copied to the rows (and columns) of out.
+    A ``numpy.memmap`` is flushed after every block.
+    """
+    full_block, triu = _complete_block(block, nb_series)
+    (rb, re), (cb, ce) = full_block[0], (full_block[1][0], min(nb_series, full_block[1][1]))
+    if out.ndim == 1:
+        exp_length = _distance_matrix_length(block, nb_series)
+        if len(out) != exp_length:
+            raise ValueError(f"Argument out has length {len(out)}, expected {exp_length}")
+    elif out.shape != (nb_series, nb_series):
+        raise ValueError(f"Argument out has shape {out.shape}, expected {(nb_series, nb_series)}")
+
+    def row_range(r):
+        if triu:
+            return max(r + 1, cb), max(ce, r + 1)
+        return cb, ce
+
+    def flush():
+        if isinstance(out, np.memmap):
+            out.flush()
+
+    prefill = block is not None and block != 0 or only_triu
+    if out.ndim == 2:
+        buffer = np.empty(max(block_size, ce - cb), dtype=out.dtype)
+        if prefill:
+            # Not all cells are computed, the others are infinity (and zero on the diagonal)
+            nb_rows = max(1, block_size // max(1, nb_series))
+            for r_b in range(0, nb_series, nb_rows):
+                out[r_b:r_b + nb_rows] = inf
+                if not only_triu:
+                    for r in range(r_b, min(nb_series, r_b + nb_rows)):
+                        out[r, r] = 0
+                flush()
+
+    offset = 0
+    for sub_block, length in _distance_matrix_row_blocks(block, nb_series, block_size):
+        r_b, r_e = sub_block[0]
+        if out.ndim == 1:
+            compute(sub_block, out[offset:offset + length])
+            offset += length
+        else:
+            dists = compute(sub_block, buffer[:length])
+            idx = 0
+            for r in range(r_b, r_e):
+                c_b, c_e = row_range(r)
+                out[r, c_b:c_e] = dists[idx:idx + c_e - c_b]
+                if not only_triu:
+                    out[c_b:c_e, r] = dists[idx:idx + c_e - c_b]
+                    if not prefill:
+                        out[r, r] = 0
+                idx += c_e - c_b
+        flush()
+    return out
+
+
+def _distance_matrix_sparse_result(rows, cols, values, sparse, nb_series, only_triu):
+    if sparse is True:
+        return rows, cols, values
+    try:
+        from scipy import sparse as sp
+    except ImportError:
+        raise ScipyException("The sparse argument 'coo' or 'csr' requires the scipy package to be installed.")
+    if not only_triu:
+        rows, cols, values = np.concatenate([rows, cols]), np.concatenate([cols, rows]), np.concatenate([values, values])
+    matrix = sp.coo_matrix((values, (rows, cols)), shape=(nb_series, nb_series))
+    if sparse == 'csr':
+        return matrix.tocsr()
+    return matrix
+
+
+def _distance_matrix_row_blocks(block, nb_series, block_size):
+    """Split the block in blocks of consecutive rows with about block_size distances.
+
+    :return: Generator of (sub_block, length) tuples
+    """
+    full_block, triu = _complete_block(block, nb_series)
+    (rb, re), (cb, ce) = full_block[0], (full_block[1][0], min(nb_series, full_block[1][1]))
+    r_b = rb
+    while r_b < re:
+        r_e = r_b
+        length = 0
+        while r_e < re:
+            if triu:
+                row_length = max(0, ce - max(r_e + 1, cb))
+            else:
+                row_length = ce - cb
+            if r_e > r_b and length + row_length > block_size:
+                break
+            length += row_length
+            r_e += 1
+        if triu:
+            yield ((r_b, r_e), (cb, ce)), length
+        else:
+            yield ((r_b, r_e), (cb, ce), False), length
+        r_b = r_e
+
+
+def distances_array_to_matrix(dists, nb_series, block=None, only_triu=False, dtype=None):
     """Transform a condensed distances array to a full matrix representation.
 
     The upper triangular matrix will contain all the distances.
+
+    :param dtype: Type of the matrix (default is double)
     """
     if np is None:
         raise NumpyException("Numpy is required for the distances_array_to_matrix method, "
                              "set compact to true")
-    dists_matrix = np.full((nb_series, nb_series), inf, dtype=DTYPE)
+    if dtype is None:
+        dtype = DTYPE
+    dists_matrix = np.full((nb_series, nb_series), inf, dtype=dtype)
     idxs = _distance_matrix_idxs(block, nb_series)
     dists_matrix[idxs] = dists
     if not only_triu:
@@ -888,10 +1684,10 @@ def distance_array_index(a, b, nb_series):
     return idx
 
 
-def distance_matrix_python(s, block=None, show_progress=False, settings=None):
+def distance_matrix_python(s, block=None, show_progress=False, settings=None, control=None):
     if settings is None:
         settings = DTWSettings()
-    dists = array.array('d', [inf] * _distance_matrix_length(block, len(s)))
+    dists = array.array('d', [inf if control is None else math.nan] * _distance_matrix_length(block, len(s)))
     block, triu = _complete_block(block, len(s))
     it_r = range(block[0][0], block[0][1])
     if show_progress:
@@ -900,6 +1696,8 @@ def distance_matrix_python(s, block=None, show_progress=False, settings=None):
         it_r = tqdm(it_r)
     idx = 0
     for r in it_r:
+        if control is not None and control.stopped:
+            break
         if triu:
             it_c = range(max(r + 1, block[1][0]), min(len(s), block[1][1]))
         else:
@@ -907,6 +1705,8 @@ def distance_matrix_python(s, block=None, show_progress=False, settings=None):
         for c in it_c:
             dists[idx] = distance(s[r], s[c], **settings.kwargs())
             idx += 1
+        if control is not None:
+            control.update(control.done + len(it_c))
     return dists
 
 
@@ -973,10 +1773,33 @@ def _distance_matrix_length(block, nb_series):
     return length
 
 
+def _pair_cost(l1, l2, settings):
+    """Estimated cost of a DTW computation, the number of cells in the window and band."""
+    ldiff = abs(l1 - l2)
+    if settings.max_length_diff is not None and ldiff > settings.max_length_diff:
+        return 1
+    width = l2
+    if settings.window:
+        width = min(l2, ldiff + 2 * settings.window - 1)
+    if not settings.has_band():
+        return l1 * width + 1
+    # Count the cells in every row that are allowed by the window and the band
+    window = settings.window if settings.window else max(l1, l2)
+    cost = 1
+    for i in range(l1):
+        b, e = settings.band_row(i, l1, l2)
+        b = max(b, i - max(0, l1 - l2) - window + 1)
+        e = min(e, i + max(0, l2 - l1) + window)
+        cost += max(0, e - b)
+    return cost
+
+
 def distance_matrix_fast(s, max_dist=None, use_pruning=True, max_length_diff=None,
                          window=None, max_step=None, penalty=None, psi=None,
                          block=None, compact=False, parallel=True, use_mp=False,
-                         only_triu=False, inner_dist=innerdistance.default, use_c=True):
+                         only_triu=False, inner_dist=innerdistance.default, use_c=True,
+                         use_lb=False, use_eapruning=False, itakura_slope=None, band=None, out=None,
+                         sparse=False, control=None, schedule=None, backend=None, executor=None):
     """Same as :meth:`distance_matrix` but with different defaults to choose the
     fast parallized C version (use_c = True, parallel = True, use_pruning = True).
 
@@ -985,7 +1808,7 @@ def distance_matrix_fast(s, max_dist=None, use_pruning=True, max_length_diff=Non
     the parallelization is changed to use Python's multiprocessing library.
     """
     _check_library(raise_exception=True, include_omp=False)
-    if not use_mp and parallel:
+    if not use_mp and parallel and backend is None:
         try:
             _check_library(raise_exception=True, include_omp=True)
         except CythonException:
@@ -995,7 +1818,426 @@ def distance_matrix_fast(s, max_dist=None, use_pruning=True, max_length_diff=Non
                            max_step=max_step, penalty=penalty, psi=psi,
                            block=block, compact=compact, parallel=parallel,
                            use_c=True, use_mp=use_mp, show_progress=False,
-                           only_triu=only_triu, inner_dist=inner_dist)
+                           only_triu=only_triu, inner_dist=inner_dist, use_lb=use_lb,
+                           use_eapruning=use_eapruning,
+                           itakura_slope=itakura_slope, band=band, out=out, sparse=sparse,
+                           control=control, schedule=schedule, backend=backend, executor=executor)
+
+
+def distances_to(query, s, k=None, parallel=False, use_mp=False, executor=None, **kwargs):
+    """Distances between one query series and all sequences in s (one-vs-many).
+
+    This avoids computing a full distance matrix when only the distances
+    to a single series are needed (e.g. nearest neighbor search).
+
+    If k is given, the k-th smallest distance found so far is used as
+    ``max_dist`` for the remaining comparisons. Comparisons that cannot be
+    among the k nearest series are thus abandoned early. When using OpenMP,
+    this best-so-far distance is shared between all threads.
+
+    :param query: Query series
+    :param s: Iterable of series
+    :param k: Only return the k nearest series in s
+    :param parallel: Use parallel operations
+    :param use_mp: Force use Multiprocessing for parallel operations (not OpenMP).
+        No early abandoning is applied between processes.
+    :param executor: :class:`util.Executor` to use for multiprocessing (see :meth:`distance_matrix`)
+    :param kwargs: See arguments for :class:`DTWSettings`
+    :returns: Array with the distances to all series in s. If k is given, a tuple
+        (indices, distances) with the k nearest series sorted by distance.
+    """
+    settings = DTWSettings(**kwargs)
+    if settings.use_c:
+        requires_omp = parallel and not use_mp
+        _check_library(raise_exception=True, include_omp=requires_omp)
+    if parallel and (use_mp or not settings.use_c):
+        try:
+            import multiprocessing as mp
+            logger.info('Using multiprocessing')
+        except ImportError:
+            msg = 'Cannot load multiprocessing'
+            logger.error(msg)
+            raise Exception(msg)
+    else:
+        mp = None
+    if k is not None and k <= 0:
+        raise ValueError('k should be a positive integer, got {}'.format(k))
+    c_k = 0 if k is None else k
+    # Prepare options and data to pass to distance method
+    dist_opts = settings.kwargs()
+    s = SeriesContainer.wrap(s)
+    if settings.use_ndim:
+        ndim = s.detected_ndim
+    else:
+        ndim = 1
+    cc, cc_omp = _c_libraries(query, s)
+    if settings.use_c:
+        query = util_numpy.verify_np_array(query, dtype=cc.seq_format)
+        for key, v in dist_opts.items():
+            if v is None:
+                # None is represented as 0.0 for C
+                dist_opts[key] = 0
+
+    logger.info('Computing distances')
+    if len(s) == 0:
+        dists = array.array('d')
+
+    elif settings.use_c and parallel and not use_mp and cc_omp is not None:
+        logger.info("Compute distances in C (parallel=OMP)")
+        if settings.use_ndim:
+            dists = cc_omp.distances_to_ndim(query, s, ndim, k=c_k, **dist_opts)
+        else:
+            dists = cc_omp.distances_to(query, s, k=c_k, **dist_opts)
+
+    elif settings.use_c and parallel and (cc_omp is None or use_mp):
+        logger.info("Compute distances in C (parallel=MP)")
+        if settings.use_ndim:
+            fn = _distance_c_with_params_ndim
+        else:
+            fn = _distance_c_with_params
+        dists = _pool_map(fn, [(query, s[i], dist_opts) for i in range(len(s))], executor)
+
+    elif settings.use_c and not parallel:
+        logger.info("Compute distances in C (parallel=No)")
+        if settings.use_ndim:
+            dists = cc.distances_to_ndim(query, s, ndim, k=c_k, **dist_opts)
+        else:
+            dists = cc.distances_to(query, s, k=c_k, **dist_opts)
+
+    elif not settings.use_c and parallel:
+        logger.info("Compute distances in Python (parallel=MP)")
+        if settings.use_ndim:
+            fn = _distance_with_params_ndim
+        else:
+            fn = _distance_with_params
+        dists = _pool_map(fn, [(query, s[i], dist_opts) for i in range(len(s))], executor)
+
+    else:
+        logger.info("Compute distances in Python (parallel=No)")
+        dists = distances_to_python(query, s, k=k, settings=settings)
+
+    if np is not None:
+        dists = np.asarray(dists, dtype=_result_dtype(dists))
+    elif not isinstance(dists, array.array):
+        dists = array.array('d', dists)
+    if k is None:
+        return dists
+    return _k_smallest(dists, k)
+
+
+def distances_to_python(query, s, k=None, settings=None):
+    """Pure Python version of :meth:`distances_to` without parallelization.
+
+    :returns: Array with the distances to all series in s. If k is given,
+        only the k smallest distances are exact, the other ones can be infinity.
+    """
+    if settings is None:
+        settings = DTWSettings()
+    dists = array.array('d', [inf] * len(s))
+    dist_opts = settings.kwargs()
+    kbest = []  # Max-heap (negated values) with the k smallest distances
+    for i in range(len(s)):
+        if k is not None and len(kbest) == k:
+            threshold = -kbest[0]
+            if 0 < threshold < (settings.max_dist or inf):
+                dist_opts['max_dist'] = threshold
+                dist_opts['use_pruning'] = False
+        dists[i] = distance(query, s[i], **dist_opts)
+        if k is not None:
+            if len(kbest) < k:
+                heapq.heappush(kbest, -dists[i])
+            elif dists[i] < -kbest[0]:
+                heapq.heapreplace(kbest, -dists[i])
+    return dists
+
+
+def _result_dtype(dists):
+    """Numpy type for the distances returned by the C library (float32 if
+    the single precision library was used)."""
+    if isinstance(dists, array.array) and dists.typecode == 'f':
+        return np.float32
+    return DTYPE
+
+
+def _k_smallest(dists, k):
+    """Indices and values of the k smallest distances, sorted by distance."""
+    if np is not None:
+        idxs = np.argsort(dists, kind='stable')[:k]
+        return idxs, dists[idxs]
+    idxs = sorted(range(len(dists)), key=lambda i: dists[i])[:k]
+    return idxs, array.array('d', [dists[i] for i in idxs])
+
+
+def distances_to_fast(query, s, k=None, max_dist=None, use_pruning=True, max_length_diff=None,
+                      window=None, max_step=None, penalty=None, psi=None,
+                      parallel=True, use_mp=False, inner_dist=innerdistance.default,
+                      use_lb=False, use_eapruning=False, itakura_slope=None, band=None, executor=None):
+    """Same as :meth:`distances_to` but with different defaults to choose the
+    fast parallized C version (use_c = True, parallel = True, use_pruning = True).
+
+    By default, this is the OMP C parallelization. If the OMP functionality is not available
+    the parallelization is changed to use Python's multiprocessing library.
+    """
+    _check_library(raise_exception=True, include_omp=False)
+    if not use_mp and parallel:
+        try:
+            _check_library(raise_exception=True, include_omp=True)
+        except CythonException:
+            use_mp = True
+    return distances_to(query, s, k=k, max_dist=max_dist, use_pruning=use_pruning,
+                        max_length_diff=max_length_diff, window=window,
+                        max_step=max_step, penalty=penalty, psi=psi,
+                        parallel=parallel, use_c=True, use_mp=use_mp,
+                        inner_dist=inner_dist, use_lb=use_lb, use_eapruning=use_eapruning,
+                        itakura_slope=itakura_slope, band=band, executor=executor)
+
+
+def knn_graph(s, k, parallel=False, **kwargs):
+    """Exact k-nearest-neighbor graph of all sequences in s.
+
+    Every pair of series is compared only once. For every series, the k-th
+    smallest distance found so far is kept and a comparison is abandoned
+    as soon as it cannot be among the k nearest neighbors of either series
+    (the largest of both k-th distances is used as ``max_dist``). With
+    ``use_lb``, the lower bound cascade is checked first against this value.
+    No full distance matrix is stored.
+
+    :param s: Iterable of series
+    :param k: Number of neighbors
+    :param parallel: Use parallel operations (OpenMP, only for the C implementation)
+    :param kwargs: See arguments for :class:`DTWSettings`
+    :returns: Tuple (indices, distances), both arrays of shape (len(s), k). Every row
+        contains the nearest series sorted by distance. If less than k neighbors
+        are found (e.g. because of ``max_dist``), the index is -1 and the distance infinity.
+    """
+    if np is None:
+        raise NumpyException("Numpy is required for the knn_graph method")
+    if k <= 0:
+        raise ValueError('k should be a positive integer, got {}'.format(k))
+    settings = DTWSettings(**kwargs)
+    if settings.use_c:
+        _check_library(raise_exception=True, include_omp=parallel)
+    dist_opts = settings.kwargs()
+    s = SeriesContainer.wrap(s)
+    if settings.use_ndim:
+        ndim = s.detected_ndim
+    else:
+        ndim = 1
+    cc, cc_omp = _c_libraries(s)
+    if settings.use_c:
+        for key, v in dist_opts.items():
+            if v is None:
+                # None is represented as 0.0 for C
+                dist_opts[key] = 0
+
+    logger.info('Computing kNN graph')
+    if settings.use_c and parallel:
+        logger.info("Compute kNN graph in C (parallel=OMP)")
+        indices, dists = cc_omp.knn_graph(s, k, ndim=ndim, **dist_opts)
+    elif settings.use_c:
+        logger.info("Compute kNN graph in C (parallel=No)")
+        indices, dists = cc.knn_graph(s, k, ndim=ndim, **dist_opts)
+    else:
+        logger.info("Compute kNN graph in Python (parallel=No)")
+        indices, dists = knn_graph_python(s, k, settings=settings)
+    indices = np.asarray(indices, dtype=np.intp).reshape(len(s), k)
+    dists = np.asarray(dists, dtype=_result_dtype(dists)).reshape(len(s), k)
+    return indices, dists
+
+
+def knn_graph_python(s, k, settings=None):
+    """Pure Python version of :meth:`knn_graph` without parallelization.
+
+    :returns: Tuple (indices, distances), both lists of length len(s)*k (row-major).
+    """
+    if settings is None:
+        settings = DTWSettings()
+    dist_opts = settings.kwargs()
+    kbest = [[] for _ in range(len(s))]  # Sorted (distance, index) tuples per series
+
+    def threshold(r):
+        if len(kbest[r]) < k:
+            return inf
+        return kbest[r][-1][0]
+
+    def insert(r, value, idx):
+        if len(kbest[r]) == k:
+            if value >= kbest[r][-1][0]:
+                return
+            kbest[r].pop()
+        i = len(kbest[r])
+        while i > 0 and kbest[r][i - 1][0] > value:
+            i -= 1
+        kbest[r].insert(i, (value, idx))
+
+    for r in range(len(s)):
+        for c in range(r + 1, len(s)):
+            opts = dict(dist_opts)
+            max_dist = max(threshold(r), threshold(c))
+            if 0 < max_dist < (settings.max_dist or inf):
+                opts['max_dist'] = max_dist
+                opts['use_pruning'] = False
+            d = distance(s[r], s[c], **opts)
+            if d < inf:
+                insert(r, d, c)
+                insert(c, d, r)
+    indices, dists = [], []
+    for row in kbest:
+        indices.extend([idx for _, idx in row] + [-1] * (k - len(row)))
+        dists.extend([d for d, _ in row] + [inf] * (k - len(row)))
+    return indices, dists
+
+
+def knn_graph_fast(s, k, max_dist=None, use_pruning=True, max_length_diff=None,
+                   window=None, max_step=None, penalty=None, psi=None,
+                   parallel=True, inner_dist=innerdistance.default,
+                   use_lb=True, use_eapruning=False, itakura_slope=None, band=None):
+    """Same as :meth:`knn_graph` but with different defaults to choose the
+    fast parallized C version (use_c = True, parallel = True, use_lb = True).
+
+    If the OMP functionality is not available, the sequential C version is used.
+    """
+    _check_library(raise_exception=True, include_omp=False)
+    if parallel:
+        try:
+            _check_library(raise_exception=True, include_omp=True)
+        except CythonException:
+            parallel = False
+    return knn_graph(s, k, max_dist=max_dist, use_pruning=use_pruning,
+                     max_length_diff=max_length_diff, window=window,
+                     max_step=max_step, penalty=penalty, psi=psi,
+                     parallel=parallel, use_c=True, inner_dist=inner_dist,
+                     use_lb=use_lb, use_eapruning=use_eapruning,
+                     itakura_slope=itakura_slope, band=band)
+
+
+def cdist(sa, sb, parallel=False, use_mp=False, show_progress=False, executor=None, **kwargs):
+    """Distances between each pair of series from two collections (similar to
+    ``scipy.spatial.distance.cdist``).
+
+    This avoids computing the full distance matrix for the concatenation of
+    both collections when only the distances between the two collections are
+    needed (e.g. between a training and a test set).
+
+    :param sa: Iterable of series (rows)
+    :param sb: Iterable of series (columns)
+    :param parallel: Use parallel operations
+    :param use_mp: Force use Multiprocessing for parallel operations (not OpenMP)
+    :param show_progress: Show progress using the tqdm library. This is only supported for
+        the pure Python version (thus not the C-based implementations).
+    :param executor: :class:`util.Executor` to use for multiprocessing (see :meth:`distance_matrix`)
+    :param kwargs: See arguments for :class:`DTWSettings`
+    :returns: Matrix of shape (len(sa), len(sb)) with the distances. If Numpy is not
+        available, a list of arrays is returned (one per series in sa).
+    """
+    settings = DTWSettings(**kwargs)
+    if settings.use_c:
+        requires_omp = parallel and not use_mp
+        _check_library(raise_exception=True, include_omp=requires_omp)
+    if parallel and (use_mp or not settings.use_c):
+        try:
+            import multiprocessing as mp
+            logger.info('Using multiprocessing')
+        except ImportError:
+            msg = 'Cannot load multiprocessing'
+            logger.error(msg)
+            raise Exception(msg)
+    else:
+        mp = None
+    # Prepare options and data to pass to distance method
+    dist_opts = settings.kwargs()
+    sa = SeriesContainer.wrap(sa)
+    sb = SeriesContainer.wrap(sb)
+    if settings.use_ndim:
+        ndim = sa.detected_ndim
+    else:
+        ndim = 1
+    cc, cc_omp = _c_libraries(sa, sb)
+    if settings.use_c:
+        for key, v in dist_opts.items():
+            if v is None:
+                # None is represented as 0.0 for C
+                dist_opts[key] = 0
+
+    logger.info('Computing distances')
+    if len(sa) == 0 or len(sb) == 0:
+        dists = array.array('d')
+
+    elif settings.use_c and parallel and not use_mp and cc_omp is not None:
+        logger.info("Compute distances in C (parallel=OMP)")
+        if settings.use_ndim:
+            dists = cc_omp.distance_matrices_ndim(sa, sb, ndim, **dist_opts)
+        else:
+            dists = cc_omp.distance_matrices(sa, sb, **dist_opts)
+
+    elif settings.use_c and parallel and (cc_omp is None or use_mp):
+        logger.info("Compute distances in C (parallel=MP)")
+        if settings.use_ndim:
+            fn = _distance_c_with_params_ndim
+        else:
+            fn = _distance_c_with_params
+        dists = _pool_map(fn, [(sa[r], sb[c], dist_opts) for r in range(len(sa)) for c in range(len(sb))],
+                          executor)
+
+    elif settings.use_c and not parallel:
+        logger.info("Compute distances in C (parallel=No)")
+        if settings.use_ndim:
+            dists = cc.distance_matrices_ndim(sa, sb, ndim, **dist_opts)
+        else:
+            dists = cc.distance_matrices(sa, sb, **dist_opts)
+
+    elif not settings.use_c and parallel:
+        logger.info("Compute distances in Python (parallel=MP)")
+        if settings.use_ndim:
+            fn = _distance_with_params_ndim
+        else:
+            fn = _distance_with_params
+        dists = _pool_map(fn, [(sa[r], sb[c], dist_opts) for r in range(len(sa)) for c in range(len(sb))],
+                          executor)
+
+    else:
+        logger.info("Compute distances in Python (parallel=No)")
+        it_r = range(len(sa))
+        if show_progress:
+            if tqdm is None:
+                raise ValueError('show_progress cannot be true is tqdm is not available')
+            it_r = tqdm(it_r)
+        dists = array.array('d', [inf] * (len(sa) * len(sb)))
+        for r in it_r:
+            for c in range(len(sb)):
+                dists[r * len(sb) + c] = distance(sa[r], sb[c], **dist_opts)
+
+    assert len(dists) == len(sa) * len(sb)
+    if np is None:
+        if not isinstance(dists, array.array):
+            dists = array.array('d', dists)
+        return [dists[r * len(sb):(r + 1) * len(sb)] for r in range(len(sa))]
+    return np.asarray(dists, dtype=_result_dtype(dists)).reshape((len(sa), len(sb)))
+
+
+def cdist_fast(sa, sb, max_dist=None, use_pruning=True, max_length_diff=None,
+               window=None, max_step=None, penalty=None, psi=None,
+               parallel=True, use_mp=False, inner_dist=innerdistance.default,
+               use_lb=False, use_eapruning=False, itakura_slope=None, band=None, executor=None):
+    """Same as :meth:`cdist` but with different defaults to choose the
+    fast parallized C version (use_c = True, parallel = True, use_pruning = True).
+
+    By default, this is the OMP C parallelization. If the OMP functionality is not available
+    the parallelization is changed to use Python's multiprocessing library.
+    """
+    _check_library(raise_exception=True, include_omp=False)
+    if not use_mp and parallel:
+        try:
+            _check_library(raise_exception=True, include_omp=True)
+        except CythonException:
+            use_mp = True
+    return cdist(sa, sb, max_dist=max_dist, use_pruning=use_pruning,
+                 max_length_diff=max_length_diff, window=window,
+                 max_step=max_step, penalty=penalty, psi=psi,
+                 parallel=parallel, use_c=True, use_mp=use_mp,
+                 show_progress=False, inner_dist=inner_dist, use_lb=use_lb,
+                 use_eapruning=use_eapruning,
+                 itakura_slope=itakura_slope, band=band, executor=executor)
 
 
 def warping_path(from_s, to_s, include_distance=False, use_ndim=False, **kwargs):
@@ -1035,6 +2277,7 @@ def warping_path_fast(from_s, to_s, include_distance=False, use_lowmem=False,
     if type(use_lowmem) is int:
         switch_to_full = use_lowmem
     from_s, to_s, settings_kwargs = warping_path_args_to_c(from_s, to_s, **kwargs)
+    cc, _ = _c_libraries(from_s, to_s)
     if use_lowmem:
         if "psi" in kwargs:
             raise ValueError("The argument psi is not supported when use_lowmem=True")
@@ -1042,23 +2285,25 @@ def warping_path_fast(from_s, to_s, include_distance=False, use_lowmem=False,
             raise ValueError("The argument max_step is not supported when use_lowmem=True")
         if "max_length_diff" in kwargs:
             raise ValueError("The argument max_length_diff is not supported when use_lowmem=True")
+        if kwargs.get("band") is not None or kwargs.get("itakura_slope"):
+            raise ValueError("The arguments band and itakura_slope are not supported when use_lowmem=True")
         if ndim == 1:
-            path, d = dtw_cc.warping_path_lowmem(
+            path, d = cc.warping_path_lowmem(
                 from_s, to_s, switch_to_full=switch_to_full,
                 ndim=ndim, **settings_kwargs)
         else:
-            path, d = dtw_cc.warping_path_lowmem_ndim(
+            path, d = cc.warping_path_lowmem_ndim(
                 from_s, to_s, switch_to_full=switch_to_full,
                 ndim=ndim, **settings_kwargs)
         if include_distance:
             result = path, d
         result = path
     elif ndim > 1:
-        result = dtw_cc.warping_path_ndim(
+        result = cc.warping_path_ndim(
             from_s, to_s, ndim=ndim, include_distance=include_distance,
             **settings_kwargs)
     else:
-        result = dtw_cc.warping_path(
+        result = cc.warping_path(
             from_s, to_s, include_distance=include_distance,
             **settings_kwargs)
     return result
@@ -1069,11 +2314,122 @@ def warping_path_prob(from_s, to_s, avg, include_distance=False, use_c=True, **k
     if not use_c:
         raise AttributeError('warping_path_prob with use_c=False not yet supported')
     from_s, to_s, settings_kwargs = warping_path_args_to_c(from_s, to_s, **kwargs)
-    result = dtw_cc.warping_path_prob(from_s, to_s, avg,
-                                      include_distance=include_distance, **settings_kwargs)
+    cc, _ = _c_libraries(from_s, to_s)
+    result = cc.warping_path_prob(from_s, to_s, avg,
+                                  include_distance=include_distance, **settings_kwargs)
     return result
 
 
+def distance_approx(s1, s2, radius=1, include_path=False, use_c=False, **kwargs):
+    """Approximate Dynamic Time Warping with a multiresolution approach (FastDTW).
+
+    The series are halved in length by averaging pairs of values (Piecewise
+    Aggregate Approximation) until one of them is not longer than ``radius + 2``.
+    At that resolution DTW is solved exactly. The warping path is then projected to
+    the next resolution, widened with ``radius`` cells in all directions and DTW
+    is only computed in that band (using the ``band`` argument of :class:`DTWSettings`).
+    The number of cells that is computed is thus linear in the length of the series,
+    O((l1 + l2) * radius), instead of quadratic.
+
+    The result is never smaller than the exact DTW distance (with the same settings)
+    because it is the cost of a valid warping path. A larger radius is slower but
+    closer to the exact distance, see the documentation for some numbers.
+
+    Salvador, S., & Chan, P. (2007). FastDTW: Toward accurate dynamic time warping
+    in linear time and space. Intelligent Data Analysis, 11(5), 561-580.
+
+    :param s1: First sequence
+    :param s2: Second sequence
+    :param radius: Number of cells around the projected warping path that are also
+        explored at every resolution
+    :param include_path: Return a tuple (distance, path) instead of only the distance
+    :param use_c: Use the C implementation
+    :param kwargs: :class:`DTWSettings` arguments. These are only used at full
+        resolution. The window, psi, band and itakura_slope options are not supported
+        (raise a ValueError).
+    :return: Approximate DTW distance
+    """
+    if radius < 0:
+        raise ValueError("The radius should be a non-negative integer, got {}".format(radius))
+    radius = int(radius)
+    _check_approx_kwargs(kwargs)
+    if use_c and dtw_cc is None:
+        logger.warning("C-library not available, using the Python version")
+        use_c = False
+    if use_c:
+        cc, _ = _c_libraries(s1, s2)
+        s1 = util_numpy.verify_np_array(s1, dtype=cc.seq_format)
+        s2 = util_numpy.verify_np_array(s2, dtype=cc.seq_format)
+        s = DTWSettings(**kwargs)
+        d, path = cc.warping_path_approx(s1, s2, radius=radius, include_path=include_path,
+                                         **s.c_kwargs())
+    else:
+        coarse_kwargs = dict(kwargs)
+        coarse_kwargs.update({'max_dist': None, 'max_step': None, 'max_length_diff': None,
+                              'use_pruning': False})
+        d, path = _warping_path_approx_python(s1, s2, radius, kwargs, coarse_kwargs, include_path)
+    if include_path:
+        return d, path
+    return d
+
+
+def distance_approx_fast(s1, s2, radius=1, include_path=False, **kwargs):
+    """Same as :meth:`distance_approx` but with different defaults to choose the
+    C-based version of the implementation (use_c = True).
+    """
+    _check_library(raise_exception=True)
+    return distance_approx(s1, s2, radius=radius, include_path=include_path, use_c=True, **kwargs)
+
+
+def _check_approx_kwargs(kwargs):
+    if kwargs.get("band") is not None or kwargs.get("itakura_slope"):
+        raise ValueError("The arguments band and itakura_slope are not supported by distance_approx, "
+                         "it restricts the warping paths to its own band")
+    if kwargs.get("window"):
+        raise ValueError("The argument window is not supported by distance_approx")
+    if kwargs.get("psi"):
+        raise ValueError("The argument psi is not supported by distance_approx")
+    if kwargs.get("use_ndim"):
+        raise ValueError("The argument use_ndim is not supported by distance_approx")
+
+
+def _halve(s):
+    h = [(s[2 * i] + s[2 * i + 1]) / 2 for i in range(len(s) // 2)]
+    if len(s) % 2 == 1:
+        h.append(s[-1])
+    return h
+
+
+def _band_from_path(path, l1, l2, radius):
+    band_b, band_e = [l2] * l1, [0] * l1
+    for i, j in path:
+        for r in range(2 * i, min(2 * i + 2, l1)):
+            band_b[r] = min(band_b[r], 2 * j)
+            band_e[r] = max(band_e[r], min(2 * j + 2, l2))
+    # The path is monotone, the widest range in rows [i-radius, i+radius] is thus
+    # given by the begin of row i-radius and the end of row i+radius.
+    return [(max(0, band_b[max(0, i - radius)] - radius), min(l2, band_e[min(l1 - 1, i + radius)] + radius))
+            for i in range(l1)]
+
+
+def _warping_path_approx_python(s1, s2, radius, kwargs, coarse_kwargs, include_path=True):
+    r, c = len(s1), len(s2)
+    if r == 0 or c == 0:
+        return inf, []
+    band = None
+    if r > radius + 2 and c > radius + 2:
+        _, path = _warping_path_approx_python(_halve(s1), _halve(s2), radius, coarse_kwargs, coarse_kwargs)
+        if len(path) > 0:
+            band = _band_from_path(path, r, c, radius)
+    kwargs = dict(kwargs, band=band)
+    if not include_path:
+        return distance(s1, s2, **kwargs), None
+    path, d = warping_path(s1, s2, include_distance=True, **kwargs)
+    if d == inf:
+        return inf, []
+    return d, path
+
+
 def warping_amount(path):
     """
         Returns the number of compressions and expansions performed to obtain the best path.
@@ -1238,6 +2594,9 @@ def warping_path_args_to_c(s1, s2, **kwargs):
             return 0
         return value
     settings_kwargs = {key: get(key) for key in
-                       ['window', 'max_dist', 'max_step', 'max_length_diff', 'penalty', 'psi']}
+                       ['window', 'max_dist', 'max_step', 'max_length_diff', 'penalty', 'psi',
+                        'itakura_slope']}
+    if kwargs.get('band') is not None:
+        settings_kwargs['band'] = kwargs['band']
     return s1, s2, settings_kwargs
 
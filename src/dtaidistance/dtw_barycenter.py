@@ -15,7 +15,7 @@ import math
 import array
 import random
 
-from .dtw import warping_path, distance_matrix
+from .dtw import warping_path, distance_matrix, _c_libraries
 from . import dtw_ndim
 from . import ed
 from . import util
@@ -64,7 +64,8 @@ def get_good_c(s, mask, nb_initial_samples, use_c=False, **kwargs):
 
 
 def dba_loop(s, c=None, max_it=10, thr=0.001, mask=None,
-             keep_averages=False, use_c=False, nb_initial_samples=None, nb_prob_samples=None, **kwargs):
+             keep_averages=False, use_c=False, nb_initial_samples=None, nb_prob_samples=None,
+             parallel=False, executor=None, **kwargs):
     """Loop around the DTW Barycenter Averaging (DBA) method until convergence.
 
     :param s: Container of sequences
@@ -82,6 +83,9 @@ def dba_loop(s, c=None, max_it=10, thr=0.001, mask=None,
     :param nb_prob_samples: Probabilistically sample the best path instead of the
         deterministic version.
     :param use_c: Use a fast C implementation instead of a Python version.
+    :param parallel: Compute the warping paths in parallel (see :meth:`dba`). The C
+        implementation is then only used for the warping paths.
+    :param executor: See :meth:`dba`
     :param kwargs: Arguments for dtw.distance
     """
     if np is None:
@@ -128,20 +132,21 @@ def dba_loop(s, c=None, max_it=10, thr=0.001, mask=None,
 
     for it in range(max_it):
         logger.debug('DBA Iteration {}'.format(it))
-        if use_c:
+        if use_c and (not parallel or nb_prob_samples):
             assert(c is not None)
-            c_copy = c.copy()  # The C code reuses this array
+            cc, _ = _c_libraries(s)
+            c_copy = np.array(c, dtype=cc.seq_format)  # The C code reuses this array
             # c_copy = c.flatten()
             if ndim == 1:
-                dtw_cc.dba(s, c_copy, mask=mask_copy, nb_prob_samples=nb_prob_samples, **kwargs)
+                cc.dba(s, c_copy, mask=mask_copy, nb_prob_samples=nb_prob_samples, **kwargs)
                 # avg = c_copy
             else:
-                dtw_cc.dba_ndim(s, c_copy, mask=mask_copy, nb_prob_samples=nb_prob_samples, ndim=ndim, **kwargs)
+                cc.dba_ndim(s, c_copy, mask=mask_copy, nb_prob_samples=nb_prob_samples, ndim=ndim, **kwargs)
                 # avg = c_copy.reshape(-1, ndim)
             avg = c_copy
         else:
             if not nb_prob_samples:
-                avg = dba(s, c, mask=mask, use_c=use_c, **kwargs)
+                avg = dba(s, c, mask=mask, use_c=use_c, parallel=parallel, executor=executor, **kwargs)
             else:
                 avg = dba(s, c, mask=mask, nb_prob_samples=nb_prob_samples, use_c=use_c, **kwargs)
         if keep_averages:
@@ -165,7 +170,22 @@ def dba_loop(s, c=None, max_it=10, thr=0.001, mask=None,
     return avg
 
 
-def dba(s, c, mask=None, samples=None, use_c=False, nb_initial_samples=None, **kwargs):
+def _warping_path_with_params(t):
+    c, seq, use_c, ndim, kwargs = t
+    if use_c:
+        cc, _ = _c_libraries(seq)
+        c = util_numpy.verify_np_array(c, dtype=cc.seq_format)
+        seq = util_numpy.verify_np_array(seq, dtype=cc.seq_format)
+        if ndim == 1:
+            return cc.warping_path(c, seq, **kwargs)
+        return cc.warping_path_ndim(c, seq, ndim=ndim, **kwargs)
+    if ndim == 1:
+        return warping_path(c, seq, **kwargs)
+    return dtw_ndim.warping_path(c, seq, **kwargs)
+
+
+def dba(s, c, mask=None, samples=None, use_c=False, nb_initial_samples=None,
+        parallel=False, executor=None, **kwargs):
     """DTW Barycenter Averaging.
 
     F. Petitjean, A. Ketterlin, and P. Gan ̧carski.
@@ -182,6 +202,9 @@ def dba(s, c, mask=None, samples=None, use_c=False, nb_initial_samples=None, **k
         nb_initial_samples samples and select the series closest to all other samples
         as c.
     :param use_c: Use a fast C implementation instead of a Python version.
+    :param parallel: Compute the warping paths with a pool of processes.
+    :param executor: :class:`util.Executor` to use instead of starting a new pool
+        (see also :meth:`util.set_executor`).
     :param kwargs: Arguments for dtw.distance
     :return: Bary-center of length len(c).
     """
@@ -207,19 +230,18 @@ def dba(s, c, mask=None, samples=None, use_c=False, nb_initial_samples=None, **k
             c = get_good_c(s, mask, nb_initial_samples, use_c=use_c, **kwargs)
     t = len(c)
     assoctab = [[] for _ in range(t)]
-    for idx, seq in enumerate(s):
-        if mask is not None and not mask[idx]:
-            continue
-        if use_c:
-            if ndim == 1:
-                m = dtw_cc.warping_path(c, seq, **kwargs)
-            else:
-                m = dtw_cc.warping_path_ndim(c, seq, ndim=ndim, **kwargs)
-        else:
-            if ndim == 1:
-                m = warping_path(c, seq, **kwargs)
-            else:
-                m = dtw_ndim.warping_path(c, seq, **kwargs)
+    idxs = [idx for idx in range(len(s)) if mask[idx]]
+    args = [(c, s[idx], use_c, ndim, kwargs) for idx in idxs]
+    if parallel:
+        pool = util.get_executor('multiprocessing', executor)
+        try:
+            paths = pool.map(_warping_path_with_params, args)
+        finally:
+            pool.release()
+    else:
+        paths = map(_warping_path_with_params, args)
+    for idx, m in zip(idxs, paths):
+        seq = s[idx]
         for i, j in m:
             assoctab[i].append(seq[j])
     # cp = array.array('d', [0] * t)
@@ -227,7 +249,8 @@ def dba(s, c, mask=None, samples=None, use_c=False, nb_initial_samples=None, **k
         shape = (t,)
     else:
         shape = (t, ndim)
-    cp = np.zeros(shape, dtype=np.double)
+    # Keep single precision series in single precision (like the C implementation)
+    cp = np.zeros(shape, dtype=np.float32 if s.is_float32() else np.double)
     for i, values in enumerate(assoctab):
         if len(values) == 0:
             print('WARNING: zero values in assoctab')
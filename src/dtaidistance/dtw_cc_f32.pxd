@@ -0,0 +1 @@
+include "dtw_cc.pxd"
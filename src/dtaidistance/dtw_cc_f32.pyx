@@ -0,0 +1,14 @@
+"""
+dtaidistance.dtw_cc_f32
+~~~~~~~~~~~~~~~~~~~~~~~
+
+Dynamic Time Warping (DTW), C implementation, for single precision
+(float32) series. This module is compiled from the same sources as
+dtw_cc but with DTAI_SEQ_T_FLOAT defined (seq_t is float).
+
+:author: Wannes Meert
+:copyright: Copyright 2017-2025 KU Leuven, DTAI Research Group.
+:license: Apache License, Version 2.0, see LICENSE for details.
+
+"""
+include "dtw_cc.pyx"
@@ -0,0 +1,461 @@
+# Shared implementation of dtw_cc_omp and dtw_cc_omp_f32 (included in both).
+# The including module is responsible for the (c)imports.
+
+
+def is_openmp_supported():
+    return dtaidistancec_dtw_omp.is_openmp_supported()
+
+
+def stats_enable(bint enable=True):
+    """Start or stop counting the work done by the DTW kernels of this module.
+    See :meth:`dtaidistance.dtw.stats`."""
+    dtaidistancec_dtw.dtw_stats_enable(enable)
+
+
+def stats_reset():
+    dtaidistancec_dtw.dtw_stats_reset()
+
+
+def stats_get():
+    """Counters of the DTW kernels of this module (dictionary)."""
+    return dtaidistancec_dtw.dtw_stats
+
+
+def distance_matrix(cur, block=None, out=None, control=None, **kwargs):
+    """Compute a distance matrix between all sequences given in `cur`.
+    This method calls a pure c implementation of the dtw computation that
+    avoids the GIL.
+
+    Assumes C-contiguous arrays.
+
+    :param cur: DTWSeriesMatrix or DTWSeriesPointers
+    :param block: see DTWBlock
+    :param out: Contiguous buffer of seq_t-s (e.g. a Numpy memmap) to write the
+        distances to instead of a new array.
+    :param control: Progress and cancellation (see :class:`dtaidistance.dtw.DTWControl`).
+        Distances that are not computed because of a stop are NaN.
+    :param kwargs: Settings (see DTWSettings)
+    :return: The distance matrix as a list representing the triangular matrix
+        (or out if given).
+    """
+    cdef DTWSeriesMatrix matrix
+    cdef DTWSeriesPointers ptrs
+    cdef Py_ssize_t length = 0
+    cdef Py_ssize_t block_rb=0
+    cdef Py_ssize_t block_re=0
+    cdef Py_ssize_t block_cb=0
+    cdef Py_ssize_t block_ce=0
+    cdef Py_ssize_t ri = 0
+    if block is not None and block != 0.0:
+        block_rb = block[0][0]
+        block_re = block[0][1]
+        block_cb = block[1][0]
+        block_ce = block[1][1]
+
+    settings = DTWSettings(**kwargs)
+    cdef DTWBlock dtwblock = DTWBlock(rb=block_rb, re=block_re, cb=block_cb, ce=block_ce)
+    if block is not None and block != 0.0 and len(block) > 2 and block[2] is False:
+        dtwblock.triu_set(False)
+    length = distance_matrix_length(dtwblock, len(cur))
+
+    # Correct block
+    if dtwblock.re == 0:
+        dtwblock.re_set(len(cur))
+    if dtwblock.ce == 0:
+        dtwblock.ce_set(len(cur))
+
+    cdef array.array dists = None
+    cdef seq_t[::1] out_view
+    cdef seq_t *dists_ptr
+    if out is None:
+        dists = array.array(seq_format)
+        array.resize(dists, length)
+        dists_ptr = <seq_t *>dists.data.as_voidptr
+    else:
+        out_view = out
+        if out_view.shape[0] != length:
+            raise ValueError(f"Argument out has length {out_view.shape[0]}, expected {length}")
+        if length == 0:
+            return out
+        dists_ptr = &out_view[0]
+
+    cdef DTWControl dtwcontrol = None
+    if control is not None:
+        dtwcontrol = DTWControl(control)
+        dtwcontrol.attach(settings, dists_ptr, length)
+
+    if isinstance(cur, DTWSeriesMatrix) or isinstance(cur, DTWSeriesPointers):
+        pass
+    elif cur.__class__.__name__ == "SeriesContainer":
+        cur = cur.c_data_compat(seq_format)
+    else:
+        cur = dtw_series_from_data(cur)
+
+    if isinstance(cur, DTWSeriesPointers):
+        ptrs = cur
+        dtaidistancec_dtw_omp.dtw_distances_ptrs_parallel(
+            ptrs._ptrs, ptrs._nb_ptrs, ptrs._lengths,
+            dists_ptr, &dtwblock._block, &settings._settings)
+    elif isinstance(cur, DTWSeriesMatrix):
+        matrix = cur
+        dtaidistancec_dtw_omp.dtw_distances_matrix_parallel(
+            <seq_t *>&matrix._data[0,0], matrix.nb_rows, matrix.nb_cols,
+            dists_ptr, &dtwblock._block, &settings._settings)
+
+    if dtwcontrol is not None:
+        dtwcontrol.finish()
+
+    if out is not None:
+        return out
+    return dists
+
+
+def distance_matrix_sparse(cur, block=None, int ndim=1, **kwargs):
+    """Compute a distance matrix between all sequences given in `cur` and
+    only keep the distances that are not infinity (e.g. not larger than max_dist).
+    Every thread collects its distances in a buffer, these are merged at the end.
+
+    :param cur: DTWSeriesMatrix, DTWSeriesMatrixNDim or DTWSeriesPointers
+    :param block: see DTWBlock
+    :param ndim: Number of dimensions (if larger than 1, n-dimensional DTW is used)
+    :param kwargs: Settings (see DTWSettings)
+    :return: Rows, columns and values as arrays (not ordered).
+    """
+    cdef DTWSeriesPointers ptrs
+    cdef DTWSparse sparse = DTWSparse()
+    cdef DTWBlock dtwblock = _dtw_block(block)
+    settings = DTWSettings(**kwargs)
+    ptrs = dtw_series_as_pointers(_series_container_c(cur, force_pointers=True))
+    if dtaidistancec_dtw_omp.dtw_distances_sparse_ptrs_parallel(
+            ptrs._ptrs, ptrs._nb_ptrs, ptrs._lengths, ndim,
+            &sparse._sparse, &dtwblock._block, &settings._settings) < 0:
+        raise MemoryError()
+    return sparse.arrays()
+
+
+def knn_graph(cur, Py_ssize_t k, int ndim=1, **kwargs):
+    """Compute the k nearest neighbors of all sequences given in `cur`,
+    the rows are divided over the threads (OpenMP).
+
+    :param cur: DTWSeriesMatrix, DTWSeriesMatrixNDim or DTWSeriesPointers
+    :param k: Number of neighbors
+    :param ndim: Number of dimensions (if larger than 1, n-dimensional DTW is used)
+    :param kwargs: Settings (see DTWSettings)
+    :return: Indices and distances as arrays of length len(cur)*k (row-major).
+    """
+    cdef DTWSeriesMatrix matrix
+    cdef DTWSeriesMatrixNDim matrixnd
+    cdef DTWSeriesPointers ptrs
+    cdef Py_ssize_t result = 0
+    cdef Py_ssize_t nb_series
+    cdef array.array indices = array.array("q" if sizeof(Py_ssize_t) == 8 else "i")
+    cdef array.array dists = array.array(seq_format)
+    settings = DTWSettings(**kwargs)
+    cur = _series_container_c(cur)
+    if isinstance(cur, DTWSeriesPointers):
+        nb_series = (<DTWSeriesPointers>cur)._nb_ptrs
+    else:
+        nb_series = cur.nb_rows
+    array.resize(indices, nb_series * k)
+    array.resize(dists, nb_series * k)
+    if nb_series * k == 0:
+        return indices, dists
+
+    if isinstance(cur, DTWSeriesPointers):
+        ptrs = cur
+        result = dtaidistancec_dtw_omp.dtw_knn_graph_ptrs_parallel(
+            ptrs._ptrs, ptrs._nb_ptrs, ptrs._lengths, ndim, k,
+            <Py_ssize_t *>indices.data.as_voidptr, <seq_t *>dists.data.as_voidptr, &settings._settings)
+    elif isinstance(cur, DTWSeriesMatrix):
+        matrix = cur
+        result = dtaidistancec_dtw_omp.dtw_knn_graph_matrix_parallel(
+            <seq_t *>&matrix._data[0,0], matrix.nb_rows, matrix.nb_cols, 1, k,
+            <Py_ssize_t *>indices.data.as_voidptr, <seq_t *>dists.data.as_voidptr, &settings._settings)
+    elif isinstance(cur, DTWSeriesMatrixNDim):
+        matrixnd = cur
+        result = dtaidistancec_dtw_omp.dtw_knn_graph_matrix_parallel(
+            <seq_t *>&matrixnd._data[0,0,0], matrixnd.nb_rows, matrixnd.nb_cols, ndim, k,
+            <Py_ssize_t *>indices.data.as_voidptr, <seq_t *>dists.data.as_voidptr, &settings._settings)
+    else:
+        raise Exception("Unknown series container")
+    if result < 0:
+        raise MemoryError()
+    return indices, dists
+
+
+def distance_matrix_ndim(cur, int ndim, block=None, out=None, control=None, **kwargs):
+    """Compute a distance matrix between all sequences given in `cur`.
+    This method calls a pure c implementation of the dtw computation that
+    avoids the GIL.
+
+    Assumes C-contiguous arrays.
+
+    :param cur: DTWSeriesMatrix or DTWSeriesPointers
+    :param block: see DTWBlock
+    :param out: Contiguous buffer of seq_t-s (e.g. a Numpy memmap) to write the
+        distances to instead of a new array.
+    :param control: Progress and cancellation (see :class:`dtaidistance.dtw.DTWControl`).
+        Distances that are not computed because of a stop are NaN.
+    :param kwargs: Settings (see DTWSettings)
+    :return: The distance matrix as a list representing the triangular matrix
+        (or out if given).
+    """
+    cdef DTWSeriesMatrix matrix
+    cdef DTWSeriesMatrixNDim matrixnd
+    cdef DTWSeriesPointers ptrs
+    cdef Py_ssize_t length = 0
+    cdef Py_ssize_t block_rb=0
+    cdef Py_ssize_t block_re=0
+    cdef Py_ssize_t block_cb=0
+    cdef Py_ssize_t block_ce=0
+    cdef Py_ssize_t ri = 0
+    if block is not None and block != 0.0:
+        block_rb = block[0][0]
+        block_re = block[0][1]
+        block_cb = block[1][0]
+        block_ce = block[1][1]
+
+    settings = DTWSettings(**kwargs)
+    cdef DTWBlock dtwblock = DTWBlock(rb=block_rb, re=block_re, cb=block_cb, ce=block_ce)
+    if block is not None and block != 0.0 and len(block) > 2 and block[2] is False:
+        dtwblock.triu_set(False)
+    length = distance_matrix_length(dtwblock, len(cur))
+
+    # Correct block
+    if dtwblock.re == 0:
+        dtwblock.re_set(len(cur))
+    if dtwblock.ce == 0:
+        dtwblock.ce_set(len(cur))
+
+    cdef array.array dists = None
+    cdef seq_t[::1] out_view
+    cdef seq_t *dists_ptr
+    if out is None:
+        dists = array.array(seq_format)
+        array.resize(dists, length)
+        dists_ptr = <seq_t *>dists.data.as_voidptr
+    else:
+        out_view = out
+        if out_view.shape[0] != length:
+            raise ValueError(f"Argument out has length {out_view.shape[0]}, expected {length}")
+        if length == 0:
+            return out
+        dists_ptr = &out_view[0]
+
+    cdef DTWControl dtwcontrol = None
+    if control is not None:
+        dtwcontrol = DTWControl(control)
+        dtwcontrol.attach(settings, dists_ptr, length)
+
+    if isinstance(cur, DTWSeriesMatrix) or isinstance(cur, DTWSeriesPointers):
+        pass
+    elif cur.__class__.__name__ == "SeriesContainer":
+        cur = cur.c_data_compat(seq_format)
+    else:
+        cur = dtw_series_from_data(cur, force_pointers=True)
+
+    if isinstance(cur, DTWSeriesPointers):
+        ptrs = cur
+        dtaidistancec_dtw_omp.dtw_distances_ndim_ptrs_parallel(
+            ptrs._ptrs, ptrs._nb_ptrs, ptrs._lengths, ndim,
+            dists_ptr, &dtwblock._block, &settings._settings)
+    elif isinstance(cur, DTWSeriesMatrix):
+        # This is not a n-dimensional case ?
+        matrix = cur
+        dtaidistancec_dtw_omp.dtw_distances_matrix_parallel(
+            <seq_t *>&matrix._data[0,0], matrix.nb_rows, matrix.nb_cols,
+            dists_ptr, &dtwblock._block, &settings._settings)
+    elif isinstance(cur, DTWSeriesMatrixNDim):
+        matrixnd = cur
+        dtaidistancec_dtw_omp.dtw_distances_ndim_matrix_parallel(
+            <seq_t *>&matrixnd._data[0,0,0], matrixnd.nb_rows, matrixnd.nb_cols, ndim,
+            dists_ptr, &dtwblock._block, &settings._settings)
+    else:
+        raise Exception("Unknown series container")
+
+    if dtwcontrol is not None:
+        dtwcontrol.finish()
+
+    if out is not None:
+        return out
+    return dists
+
+
+def distance_matrices(cur_r, cur_c, **kwargs):
+    """Compute the distances between all sequences in `cur_r` and all
+    sequences in `cur_c`.
+    This method calls a pure c implementation of the dtw computation that
+    avoids the GIL and runs the comparisons in parallel (OpenMP).
+
+    Assumes C-contiguous arrays.
+
+    :param cur_r: DTWSeriesMatrix or DTWSeriesPointers
+    :param cur_c: DTWSeriesMatrix or DTWSeriesPointers
+    :param kwargs: Settings (see DTWSettings)
+    :return: The distances as an array of length len(cur_r)*len(cur_c) (row-major).
+    """
+    cdef DTWSeriesMatrix matrix_r, matrix_c
+    cdef DTWSeriesPointers ptrs_r, ptrs_c
+    cdef DTWBlock dtwblock
+    cdef array.array dists = array.array(seq_format)
+    settings = DTWSettings(**kwargs)
+    cur_r = _series_container_c(cur_r)
+    cur_c = _series_container_c(cur_c)
+
+    if isinstance(cur_r, DTWSeriesMatrix) and isinstance(cur_c, DTWSeriesMatrix):
+        matrix_r = cur_r
+        matrix_c = cur_c
+        dtwblock = DTWBlock(rb=0, re=matrix_r.nb_rows, cb=0, ce=matrix_c.nb_rows, triu=False)
+        array.resize(dists, matrix_r.nb_rows * matrix_c.nb_rows)
+        dtaidistancec_dtw_omp.dtw_distances_matrices_parallel(
+            <seq_t *>&matrix_r._data[0,0], matrix_r.nb_rows, matrix_r.nb_cols,
+            <seq_t *>&matrix_c._data[0,0], matrix_c.nb_rows, matrix_c.nb_cols,
+            <seq_t *>dists.data.as_voidptr, &dtwblock._block, &settings._settings)
+    else:
+        ptrs_r = dtw_series_as_pointers(cur_r)
+        ptrs_c = dtw_series_as_pointers(cur_c)
+        dtwblock = DTWBlock(rb=0, re=ptrs_r._nb_ptrs, cb=0, ce=ptrs_c._nb_ptrs, triu=False)
+        array.resize(dists, ptrs_r._nb_ptrs * ptrs_c._nb_ptrs)
+        dtaidistancec_dtw_omp.dtw_distances_ptrs_ptrs_parallel(
+            ptrs_r._ptrs, ptrs_r._nb_ptrs, ptrs_r._lengths,
+            ptrs_c._ptrs, ptrs_c._nb_ptrs, ptrs_c._lengths,
+            <seq_t *>dists.data.as_voidptr, &dtwblock._block, &settings._settings)
+
+    return dists
+
+
+def distance_matrices_ndim(cur_r, cur_c, int ndim, **kwargs):
+    """Compute the distances between all n-dimensional sequences in `cur_r`
+    and all n-dimensional sequences in `cur_c`.
+
+    Assumes C-contiguous arrays.
+
+    See distance_matrices().
+    :param cur_r: DTWSeriesMatrixNDim or DTWSeriesPointers
+    :param cur_c: DTWSeriesMatrixNDim or DTWSeriesPointers
+    :param ndim: Number of dimensions
+    :param kwargs: Settings (see DTWSettings)
+    :return: The distances as an array of length len(cur_r)*len(cur_c) (row-major).
+    """
+    cdef DTWSeriesMatrixNDim matrix_r, matrix_c
+    cdef DTWSeriesPointers ptrs_r, ptrs_c
+    cdef DTWBlock dtwblock
+    cdef array.array dists = array.array(seq_format)
+    settings = DTWSettings(**kwargs)
+    cur_r = _series_container_c(cur_r, force_pointers=True)
+    cur_c = _series_container_c(cur_c, force_pointers=True)
+
+    if isinstance(cur_r, DTWSeriesMatrixNDim) and isinstance(cur_c, DTWSeriesMatrixNDim):
+        matrix_r = cur_r
+        matrix_c = cur_c
+        dtwblock = DTWBlock(rb=0, re=matrix_r.nb_rows, cb=0, ce=matrix_c.nb_rows, triu=False)
+        array.resize(dists, matrix_r.nb_rows * matrix_c.nb_rows)
+        dtaidistancec_dtw_omp.dtw_distances_ndim_matrices_parallel(
+            <seq_t *>&matrix_r._data[0,0,0], matrix_r.nb_rows, matrix_r.nb_cols,
+            <seq_t *>&matrix_c._data[0,0,0], matrix_c.nb_rows, matrix_c.nb_cols, ndim,
+            <seq_t *>dists.data.as_voidptr, &dtwblock._block, &settings._settings)
+    else:
+        ptrs_r = dtw_series_as_pointers(cur_r)
+        ptrs_c = dtw_series_as_pointers(cur_c)
+        dtwblock = DTWBlock(rb=0, re=ptrs_r._nb_ptrs, cb=0, ce=ptrs_c._nb_ptrs, triu=False)
+        array.resize(dists, ptrs_r._nb_ptrs * ptrs_c._nb_ptrs)
+        dtaidistancec_dtw_omp.dtw_distances_ndim_ptrs_ptrs_parallel(
+            ptrs_r._ptrs, ptrs_r._nb_ptrs, ptrs_r._lengths,
+            ptrs_c._ptrs, ptrs_c._nb_ptrs, ptrs_c._lengths, ndim,
+            <seq_t *>dists.data.as_voidptr, &dtwblock._block, &settings._settings)
+
+    return dists
+
+
+def distances_to(const seq_t[:] query, cur, Py_ssize_t k=0, **kwargs):
+    """Compute the distances between `query` and all sequences given in `cur`.
+    This method calls a pure c implementation of the dtw computation that
+    avoids the GIL and runs the comparisons in parallel (OpenMP). If k > 0,
+    the k-th smallest distance found so far is shared between threads.
+
+    Assumes C-contiguous arrays.
+
+    :param query: Query sequence (buffer of seq_t-s)
+    :param cur: DTWSeriesMatrix or DTWSeriesPointers
+    :param k: If k > 0, only the k smallest distances are guaranteed to be
+        computed. Comparisons that cannot be among the k smallest are abandoned
+        early and their distance is set to infinity.
+    :param kwargs: Settings (see DTWSettings)
+    :return: The distances as an array of length len(cur).
+    """
+    cdef DTWSeriesMatrix matrix
+    cdef DTWSeriesPointers ptrs
+    settings = DTWSettings(**kwargs)
+
+    if isinstance(cur, DTWSeriesMatrix) or isinstance(cur, DTWSeriesPointers):
+        pass
+    elif cur.__class__.__name__ == "SeriesContainer":
+        cur = cur.c_data_compat(seq_format)
+    else:
+        cur = dtw_series_from_data(cur)
+
+    cdef array.array dists = array.array(seq_format)
+
+    if isinstance(cur, DTWSeriesPointers):
+        ptrs = cur
+        array.resize(dists, ptrs._nb_ptrs)
+        dtaidistancec_dtw_omp.dtw_distances_query_ptrs_parallel(
+            <seq_t *>&query[0], len(query), ptrs._ptrs, ptrs._nb_ptrs, ptrs._lengths,
+            <seq_t *>dists.data.as_voidptr, k, &settings._settings)
+    elif isinstance(cur, DTWSeriesMatrix):
+        matrix = cur
+        array.resize(dists, matrix.nb_rows)
+        dtaidistancec_dtw_omp.dtw_distances_query_matrix_parallel(
+            <seq_t *>&query[0], len(query), <seq_t *>&matrix._data[0,0], matrix.nb_rows, matrix.nb_cols,
+            <seq_t *>dists.data.as_voidptr, k, &settings._settings)
+    else:
+        raise Exception("Unknown series container")
+
+    return dists
+
+
+def distances_to_ndim(const seq_t[:, :] query, cur, int ndim, Py_ssize_t k=0, **kwargs):
+    """Compute the distances between the n-dimensional `query` and all
+    sequences given in `cur`.
+
+    Assumes C-contiguous arrays.
+
+    See distances_to().
+    :param query: Query sequence (buffer of seq_t-s)
+    :param cur: DTWSeriesMatrixNDim or DTWSeriesPointers
+    :param ndim: Number of dimensions
+    :param k: See distances_to()
+    :param kwargs: Settings (see DTWSettings)
+    :return: The distances as an array of length len(cur).
+    """
+    cdef DTWSeriesMatrixNDim matrixnd
+    cdef DTWSeriesPointers ptrs
+    settings = DTWSettings(**kwargs)
+    if query.shape[1] != ndim:
+        raise Exception("Dimension of sequence entries needs to be the same: {} != {}".format(query.shape[1], ndim))
+
+    if isinstance(cur, DTWSeriesMatrixNDim) or isinstance(cur, DTWSeriesPointers):
+        pass
+    elif cur.__class__.__name__ == "SeriesContainer":
+        cur = cur.c_data_compat(seq_format)
+    else:
+        cur = dtw_series_from_data(cur, force_pointers=True)
+
+    cdef array.array dists = array.array(seq_format)
+
+    if isinstance(cur, DTWSeriesPointers):
+        ptrs = cur
+        array.resize(dists, ptrs._nb_ptrs)
+        dtaidistancec_dtw_omp.dtw_distances_query_ndim_ptrs_parallel(
+            <seq_t *>&query[0,0], len(query), ptrs._ptrs, ptrs._nb_ptrs, ptrs._lengths, ndim,
+            <seq_t *>dists.data.as_voidptr, k, &settings._settings)
+    elif isinstance(cur, DTWSeriesMatrixNDim):
+        matrixnd = cur
+        array.resize(dists, matrixnd.nb_rows)
+        dtaidistancec_dtw_omp.dtw_distances_query_ndim_matrix_parallel(
+            <seq_t *>&query[0,0], len(query), <seq_t *>&matrixnd._data[0,0,0], matrixnd.nb_rows, matrixnd.nb_cols, ndim,
+            <seq_t *>dists.data.as_voidptr, k, &settings._settings)
+    else:
+        raise Exception("Unknown series container")
+
+    return dists
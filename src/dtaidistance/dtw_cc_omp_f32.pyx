@@ -0,0 +1,22 @@
+"""
+dtaidistance.dtw_cc_omp_f32
+~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Dynamic Time Warping (DTW), C implementation, with OpenMP support,
+for single precision (float32) series.
+
+:author: Wannes Meert
+:copyright: Copyright 2020 KU Leuven, DTAI Research Group.
+:license: Apache License, Version 2.0, see LICENSE for details.
+
+"""
+from cpython cimport array
+import array
+from dtw_cc_f32 cimport DTWSeriesMatrix, DTWSeriesMatrixNDim, DTWSeriesPointers, DTWSettings, DTWBlock, DTWSparse, DTWControl
+from dtw_cc_f32 import dtw_series_from_data, dtw_series_as_pointers, distance_matrix_length, _series_container_c, _dtw_block, seq_format
+cimport dtaidistancec_dtw
+cimport dtaidistancec_dtw_omp
+from dtaidistancec_dtw cimport seq_t
+
+
+include "dtw_cc_omp.pxi"
@@ -129,7 +129,7 @@ def distance_matrix(s, ndim=None, max_dist=None, use_pruning=False, max_length_d
                     window=None, max_step=None, penalty=None, psi=None,
                     block=None, compact=False, parallel=False,
                     use_c=False, use_mp=False, show_progress=False, only_triu=False,
-                    inner_dist=innerdistance.default):
+                    inner_dist=innerdistance.default, executor=None):
     """Distance matrix for all n-dimensional sequences in s.
 
     This method returns the dependent DTW (DTW_D) [1] distance between two
@@ -161,6 +161,7 @@ def distance_matrix(s, ndim=None, max_dist=None, use_pruning=False, max_length_d
     :param show_progress: Show progress using the tqdm library. This is only supported for
         the pure Python version (thus not the C-based implementations).
     :param only_triu: Only fill the upper triangle
+    :param executor: See :meth:`dtw.distance_matrix`
     :returns: The distance matrix or the condensed distance matrix if the compact argument is true
 
     [1] M. Shokoohi-Yekta, B. Hu, H. Jin, J. Wang, and E. Keogh.
@@ -174,7 +175,7 @@ def distance_matrix(s, ndim=None, max_dist=None, use_pruning=False, max_length_d
                     window=window, max_step=max_step, penalty=penalty, psi=psi,
                     block=block, compact=compact, parallel=parallel,
                     use_c=use_c, use_mp=use_mp, show_progress=show_progress, only_triu=only_triu,
-                    inner_dist=inner_dist, use_ndim=True)
+                    inner_dist=inner_dist, use_ndim=True, executor=executor)
 
 
 def distance_matrix_fast(s, ndim=None, max_dist=None, max_length_diff=None,
@@ -189,6 +190,58 @@ def distance_matrix_fast(s, ndim=None, max_dist=None, max_length_diff=None,
                            inner_dist=inner_dist)
 
 
+def distances_to(query, s, k=None, ndim=None, max_dist=None, use_pruning=False, max_length_diff=None,
+                 window=None, max_step=None, penalty=None, psi=None, parallel=False,
+                 use_c=False, use_mp=False, inner_dist=innerdistance.default, executor=None):
+    """Distances between one n-dimensional query and all n-dimensional sequences in s.
+
+    See :meth:`dtw.distances_to`.
+    """
+    s = SeriesContainer.wrap(s)
+    s.set_detected_ndim(ndim)
+    return dtw.distances_to(query, s, k=k, max_dist=max_dist, use_pruning=use_pruning,
+                            max_length_diff=max_length_diff, window=window, max_step=max_step,
+                            penalty=penalty, psi=psi, parallel=parallel, use_c=use_c, use_mp=use_mp,
+                            inner_dist=inner_dist, use_ndim=True, executor=executor)
+
+
+def distances_to_fast(query, s, k=None, ndim=None, max_dist=None, max_length_diff=None,
+                      window=None, max_step=None, penalty=None, psi=None, parallel=True,
+                      inner_dist=innerdistance.default):
+    """Fast C version of :meth:`distances_to`."""
+    return distances_to(query, s, k=k, ndim=ndim, max_dist=max_dist, use_pruning=True,
+                        max_length_diff=max_length_diff, window=window, max_step=max_step,
+                        penalty=penalty, psi=psi, parallel=parallel, use_c=True,
+                        inner_dist=inner_dist)
+
+
+def cdist(sa, sb, ndim=None, max_dist=None, use_pruning=False, max_length_diff=None,
+          window=None, max_step=None, penalty=None, psi=None, parallel=False,
+          use_c=False, use_mp=False, show_progress=False, inner_dist=innerdistance.default,
+          executor=None):
+    """Distances between each pair of n-dimensional series from two collections.
+
+    See :meth:`dtw.cdist`.
+    """
+    sa = SeriesContainer.wrap(sa)
+    sa.set_detected_ndim(ndim)
+    return dtw.cdist(sa, sb, max_dist=max_dist, use_pruning=use_pruning,
+                     max_length_diff=max_length_diff, window=window, max_step=max_step,
+                     penalty=penalty, psi=psi, parallel=parallel, use_c=use_c, use_mp=use_mp,
+                     show_progress=show_progress, inner_dist=inner_dist, use_ndim=True,
+                     executor=executor)
+
+
+def cdist_fast(sa, sb, ndim=None, max_dist=None, max_length_diff=None,
+               window=None, max_step=None, penalty=None, psi=None, parallel=True,
+               inner_dist=innerdistance.default):
+    """Fast C version of :meth:`cdist`."""
+    return cdist(sa, sb, ndim=ndim, max_dist=max_dist, use_pruning=True,
+                 max_length_diff=max_length_diff, window=window, max_step=max_step,
+                 penalty=penalty, psi=psi, parallel=parallel, use_c=True,
+                 inner_dist=inner_dist)
+
+
 def warping_path(from_s, to_s, **kwargs):
     """Compute warping path between two sequences."""
     return dtw.warping_path(from_s, to_s, use_ndim=True, **kwargs)
@@ -66,6 +66,10 @@ class SquaredEuclidean:
     def inner_dist(x, y):
         return (x - y) ** 2
 
+    @staticmethod
+    def inner_dist_array(x, y):
+        return (x - y) ** 2
+
     @staticmethod
     def result(x):
         if np is not None and isinstance(x, np.ndarray):
@@ -84,6 +88,10 @@ class SquaredEuclideanNdim:
     def inner_dist(x, y):
         return np.sum((x - y) ** 2)
 
+    @staticmethod
+    def inner_dist_array(x, y):
+        return np.sum((x - y) ** 2, axis=-1)
+
     @staticmethod
     def result(x):
         return np.sqrt(x)
@@ -102,6 +110,10 @@ class Euclidean:
     def inner_dist(x, y):
         return abs(x - y)
 
+    @staticmethod
+    def inner_dist_array(x, y):
+        return np.abs(x - y)
+
     @staticmethod
     def result(x):
         return x
@@ -118,6 +130,10 @@ class EuclideanNdim:
     def inner_dist(x, y):
         return np.sqrt(np.sum(np.power(x - y, 2)))
 
+    @staticmethod
+    def inner_dist_array(x, y):
+        return np.sqrt(np.sum(np.power(x - y, 2), axis=-1))
+
     @staticmethod
     def result(x):
         return x
@@ -198,6 +214,18 @@ def inner_dist_fns(inner_dist="squared euclidean", use_ndim=False):
     return use_cls.inner_dist, use_cls.result, use_cls.inner_val
 
 
+def inner_dist_array_fn(inner_dist="squared euclidean", use_ndim=False):
+    """Return the inner distance function that works element-wise on arrays
+    of points, or None if the inner distance does not offer such a function.
+
+    :param inner_dist: Type of inner_dist
+    :param use_ndim: Use multivariate or not
+    :return: inner_dist_array
+    """
+    use_cls = inner_dist_cls(inner_dist, use_ndim)
+    return getattr(use_cls, 'inner_dist_array', None)
+
+
 def to_c(inner_dist):
     if hasattr(inner_dist, 'inner_dist') and hasattr(inner_dist, 'result'):
         raise AttributeError('Custom inner distance functions are not supported for the fast C implementation')
@@ -2,6 +2,11 @@
 
 cdef extern from "dd_globals.h":
     ctypedef {{seq_t}} seq_t
+    const char *SEQ_T_FORMAT
+
+    ctypedef enum StepType:
+        TypeI,
+        TypeIII
 
     ctypedef struct DDPathEntry:
         Py_ssize_t i
@@ -6,6 +6,18 @@ cdef class DTWBlock:
 
 cdef class DTWSettings:
     cdef dtaidistancec_dtw.DTWSettings _settings
+    cdef Py_ssize_t[::1] _band
+
+cdef class DTWControl:
+    cdef dtaidistancec_dtw.DTWControl _control
+    cdef object _py_control
+    cdef object _exception
+    cdef void attach(self, DTWSettings settings, seq_t *dists, Py_ssize_t length)
+    cdef int update(self)
+
+
+cdef class DTWSparse:
+    cdef dtaidistancec_dtw.DTWSparse _sparse
 
 cdef class DTWWps:
     cdef dtaidistancec_dtw.DTWWps _wps
@@ -14,10 +26,11 @@ cdef class DTWSeriesPointers:
     cdef seq_t **_ptrs
     cdef Py_ssize_t *_lengths
     cdef Py_ssize_t _nb_ptrs
+    cdef object _data
 
 cdef class DTWSeriesMatrix:
-    cdef seq_t[:,::1] _data
+    cdef const seq_t[:,::1] _data
 
 cdef class DTWSeriesMatrixNDim:
-    cdef seq_t[:,:,::1] _data
+    cdef const seq_t[:,:,::1] _data
 
@@ -16,7 +16,10 @@ from cython.view cimport array as cvarray
 from libc.stdlib cimport abort, malloc, free, abs, labs
 from libc.stdint cimport intptr_t
 from libc.stdio cimport printf
+from libc.math cimport INFINITY, NAN
+from libc.string cimport memcpy
 from cpython.mem cimport PyMem_Malloc, PyMem_Free
+from cpython.exc cimport PyErr_CheckSignals
 
 cimport dtaidistancec_dtw
 cimport dtaidistancec_globals
@@ -27,6 +30,10 @@ cdef extern from "Python.h":
     Py_ssize_t PY_SSIZE_T_MAX
 
 
+# Type code (as used by the array module) of the values in the series
+seq_format = dtaidistancec_globals.SEQ_T_FORMAT.decode('ascii')
+
+
 cdef class DTWBlock:
     def __cinit__(self):
         pass
@@ -71,6 +78,78 @@ cdef class DTWBlock:
         return f'DTWBlock(rb={self.rb},re={self.re},cb={self.cb},ce={self.ce},triu={self.triu})'
 
 
+cdef int _dtw_control_callback(dtaidistancec_dtw.DTWControl *control) noexcept with gil:
+    return (<DTWControl>control.callback_data).update()
+
+
+cdef class DTWControl:
+    """Progress and cancellation of a computation in C.
+
+    The C library updates the counters of the C struct and calls back after every row.
+    The updates are passed to the Python object (see :class:`dtaidistance.dtw.DTWControl`).
+    """
+    def __cinit__(self, control):
+        self._control = dtaidistancec_dtw.dtw_control_default()
+        self._control.done = control.done
+        self._control.total = control.total
+        self._control.callback = _dtw_control_callback
+        self._control.callback_data = <void *>self
+        self._py_control = control
+        self._exception = None
+
+    cdef void attach(self, DTWSettings settings, seq_t *dists, Py_ssize_t length):
+        """Use this control for the settings. The distances that are not computed remain NaN."""
+        cdef Py_ssize_t i
+        settings._settings.control = &self._control
+        for i in range(length):
+            dists[i] = NAN
+
+    cdef int update(self):
+        try:
+            # Ctrl-C is only noticed by the thread that holds the GIL
+            PyErr_CheckSignals()
+            return self._py_control.update(self._control.done)
+        except BaseException as exc:
+            self._exception = exc
+            return self._py_control.CANCELLED
+
+    def finish(self):
+        """Pass the final counters to the Python object and raise the exception
+        that occurred in the callback (e.g. KeyboardInterrupt), if any."""
+        if self._exception is None:
+            self._py_control.update(self._control.done)
+        self._py_control.stop(self._control.stop)
+        if self._exception is not None:
+            raise self._exception
+
+
+cdef class DTWSparse:
+    """Distances stored as (row, column, value) triplets (only those that are not infinity)."""
+    def __cinit__(self):
+        self._sparse = dtaidistancec_dtw.dtw_sparse_empty()
+
+    def __dealloc__(self):
+        dtaidistancec_dtw.dtw_sparse_free(&self._sparse)
+
+    def __len__(self):
+        return self._sparse.length
+
+    def arrays(self):
+        """The rows, columns and values as arrays (the data is copied)."""
+        cdef array.array rows = array.array("q" if sizeof(Py_ssize_t) == 8 else "i")
+        cdef array.array cols = array.array("q" if sizeof(Py_ssize_t) == 8 else "i")
+        cdef array.array values = array.array(seq_format)
+        cdef Py_ssize_t length = self._sparse.length
+        array.resize(rows, length)
+        array.resize(cols, length)
+        array.resize(values, length)
+        if length > 0:
+            memcpy(rows.data.as_voidptr, self._sparse.rows, sizeof(Py_ssize_t) * length)
+            memcpy(cols.data.as_voidptr, self._sparse.cols, sizeof(Py_ssize_t) * length)
+            memcpy(values.data.as_voidptr, self._sparse.values, sizeof(seq_t) * length)
+        return rows, cols, values
+
+
 cdef class DTWWps:
     def __cinit__(self):
         pass
@@ -96,6 +175,7 @@ cdef class DTWSettings:
         pass
 
     def __init__(self, **kwargs):
+        cdef Py_ssize_t i
         self._settings = dtaidistancec_dtw.dtw_settings_default()
         if "window" in kwargs:
             if kwargs["window"] is None:
@@ -122,6 +202,16 @@ cdef class DTWSettings:
                 self._settings.penalty = 0
             else:
                 self._settings.penalty = kwargs["penalty"]
+        if "penalty_s1" in kwargs:
+            if kwargs["penalty_s1"] is None:
+                self._settings.penalty_s1 = 0
+            else:
+                self._settings.penalty_s1 = kwargs["penalty_s1"]
+        if "penalty_s2" in kwargs:
+            if kwargs["penalty_s2"] is None:
+                self._settings.penalty_s2 = 0
+            else:
+                self._settings.penalty_s2 = kwargs["penalty_s2"]
         if "psi" in kwargs:
             if kwargs["psi"] is None:
                 self._settings.psi_1b = 0
@@ -150,6 +240,34 @@ cdef class DTWSettings:
                 self._settings.use_pruning = False
             else:
                 self._settings.use_pruning = kwargs["use_pruning"]
+        if "use_lb" in kwargs:
+            if kwargs["use_lb"] is None:
+                self._settings.use_lb = False
+            else:
+                self._settings.use_lb = kwargs["use_lb"]
+        if "use_eapruning" in kwargs:
+            if kwargs["use_eapruning"] is None:
+                self._settings.use_eapruning = False
+            else:
+                self._settings.use_eapruning = kwargs["use_eapruning"]
+        if "itakura_slope" in kwargs:
+            if kwargs["itakura_slope"] is None:
+                self._settings.itakura_slope = 0
+            else:
+                self._settings.itakura_slope = kwargs["itakura_slope"]
+        if "band" in kwargs:
+            band = kwargs["band"]
+            if band is None or (isinstance(band, int) and band == 0):
+                band = []
+            if len(band) > 0:
+                # Keep a reference to the memory, the C struct only stores the pointer
+                self._band = cvarray(shape=(2 * len(band),), itemsize=sizeof(Py_ssize_t),
+                                     format="q" if sizeof(Py_ssize_t) == 8 else "i")
+                for i, (b, e) in enumerate(band):
+                    self._band[2 * i] = b
+                    self._band[2 * i + 1] = e
+                self._settings.band = &self._band[0]
+                self._settings.band_length = len(band)
         if "inner_dist" in kwargs:
             inner_dist = kwargs["inner_dist"]
             if inner_dist == "squared euclidean" or inner_dist == 0:
@@ -158,6 +276,14 @@ cdef class DTWSettings:
                 self._settings.inner_dist = 1
             else:
                 raise AttributeError("Unknown inner_dist: {}".format(kwargs["inner_dist"]))
+        if "schedule" in kwargs:
+            schedule = kwargs["schedule"]
+            if schedule is None or schedule == "rows" or schedule == 0:
+                self._settings.schedule = 0
+            elif schedule == "cost" or schedule == 1:
+                self._settings.schedule = 1
+            else:
+                raise AttributeError("Unknown schedule: {}".format(kwargs["schedule"]))
 
     @property
     def window(self):
@@ -179,6 +305,14 @@ cdef class DTWSettings:
     def penalty(self):
         return self._settings.penalty
 
+    @property
+    def penalty_s1(self):
+        return self._settings.penalty_s1
+
+    @property
+    def penalty_s2(self):
+        return self._settings.penalty_s2
+
     @property
     def psi(self):
         return {
@@ -192,6 +326,24 @@ cdef class DTWSettings:
     def use_pruning(self):
         return self._settings.use_pruning
 
+    @property
+    def use_lb(self):
+        return self._settings.use_lb
+
+    @property
+    def use_eapruning(self):
+        return self._settings.use_eapruning
+
+    @property
+    def itakura_slope(self):
+        return self._settings.itakura_slope
+
+    @property
+    def band(self):
+        if self._settings.band == NULL:
+            return None
+        return [(self._band[2 * i], self._band[2 * i + 1]) for i in range(self._settings.band_length)]
+
     @property
     def inner_dist(self):
         if self._settings.inner_dist == 0:
@@ -209,8 +361,14 @@ cdef class DTWSettings:
             f"  max_step = {self.max_step}\n"
             f"  max_length_diff = {self.max_length_diff}\n"
             f"  penalty = {self.penalty}\n"
+            f"  penalty_s1 = {self.penalty_s1}\n"
+            f"  penalty_s2 = {self.penalty_s2}\n"
             f"  psi = {self.psi}\n"
             f"  use_pruning = {self.use_pruning}\n"
+            f"  use_lb = {self.use_lb}\n"
+            f"  use_eapruning = {self.use_eapruning}\n"
+            f"  itakura_slope = {self.itakura_slope}\n"
+            f"  band_length = {self._settings.band_length}\n"
             f"  inner_dist = {self.inner_dist}\n"
             "}")
 
@@ -235,7 +393,7 @@ cdef class DTWSeriesPointers:
 
 
 cdef class DTWSeriesMatrix:
-    def __cinit__(self, seq_t[:, ::1] data):
+    def __cinit__(self, const seq_t[:, ::1] data):
         self._data = data
 
     @property
@@ -248,7 +406,7 @@ cdef class DTWSeriesMatrix:
 
 
 cdef class DTWSeriesMatrixNDim:
-    def __cinit__(self, seq_t[:, :, ::1] data):
+    def __cinit__(self, const seq_t[:, :, ::1] data):
         self._data = data
 
     @property
@@ -264,16 +422,45 @@ cdef class DTWSeriesMatrixNDim:
         return self._data.shape[2]
 
 
+def dtw_series_from_ragged(const seq_t[::1] values, const long long[::1] offsets, int ndim=1):
+    """Pointers to the series in one contiguous buffer. The data is not copied.
+
+    :param values: Values of all series, one after the other (flattened if ndim > 1)
+    :param offsets: Start of every series in number of time points, followed by the end
+        of the last series
+    :param ndim: Number of dimensions of every time point
+    """
+    cdef DTWSeriesPointers ptrs
+    cdef Py_ssize_t i
+    cdef Py_ssize_t nb_series = offsets.shape[0] - 1
+    if nb_series < 0:
+        raise ValueError("Expected at least one offset")
+    if nb_series > 0 and (offsets[0] < 0 or offsets[nb_series] * ndim > values.shape[0]):
+        raise ValueError("Offsets are outside of the values buffer")
+    ptrs = DTWSeriesPointers(nb_series)
+    for i in range(nb_series):
+        if offsets[i + 1] < offsets[i]:
+            raise ValueError("Offsets should be increasing")
+        ptrs._ptrs[i] = <seq_t *>&values[0] + offsets[i] * ndim
+        ptrs._lengths[i] = offsets[i + 1] - offsets[i]
+    ptrs._data = values
+    return ptrs
+
+
 def dtw_series_from_data(data, force_pointers=False):
     cdef DTWSeriesPointers ptrs
     cdef DTWSeriesMatrix matrix
+    cdef DTWSeriesMatrixNDim matrixnd
     cdef intptr_t ptr
+    if data.__class__.__name__ == "RaggedSeries":
+        return data.c_data_compat(seq_format)
     if force_pointers or isinstance(data, list) or isinstance(data, set) or isinstance(data, tuple):
         ptrs = DTWSeriesPointers(len(data))
         for i in range(len(data)):
             ptr = data[i].ctypes.data  # uniform for memoryviews and numpy
             ptrs._ptrs[i] = <seq_t *> ptr
             ptrs._lengths[i] = len(data[i])
+        ptrs._data = data
         return ptrs
     try:
         matrix = DTWSeriesMatrix(data)
@@ -281,12 +468,64 @@ def dtw_series_from_data(data, force_pointers=False):
     except ValueError:
         pass
     try:
-        matrix = DTWSeriesMatrixNDim(data)
-        return matrix
+        matrixnd = DTWSeriesMatrixNDim(data)
+        return matrixnd
     except ValueError:
         raise ValueError(f"Cannot convert data of type {type(data)}")
 
 
+def dtw_series_as_pointers(cur):
+    """Represent the series in a container as DTWSeriesPointers.
+    The data is not copied, the pointers refer to the rows of a matrix.
+
+    :param cur: DTWSeriesMatrix, DTWSeriesMatrixNDim, DTWSeriesPointers or a list of arrays
+    """
+    cdef DTWSeriesPointers ptrs
+    cdef DTWSeriesMatrix matrix
+    cdef DTWSeriesMatrixNDim matrixnd
+    cdef Py_ssize_t i
+    if isinstance(cur, DTWSeriesPointers):
+        return cur
+    if isinstance(cur, DTWSeriesMatrix):
+        matrix = cur
+        ptrs = DTWSeriesPointers(matrix.nb_rows)
+        for i in range(matrix.nb_rows):
+            ptrs._ptrs[i] = <seq_t *>&matrix._data[i, 0]
+            ptrs._lengths[i] = matrix.nb_cols
+        ptrs._data = matrix
+        return ptrs
+    if isinstance(cur, DTWSeriesMatrixNDim):
+        matrixnd = cur
+        ptrs = DTWSeriesPointers(matrixnd.nb_rows)
+        for i in range(matrixnd.nb_rows):
+            ptrs._ptrs[i] = <seq_t *>&matrixnd._data[i, 0, 0]
+            ptrs._lengths[i] = matrixnd.nb_cols
+        ptrs._data = matrixnd
+        return ptrs
+    return dtw_series_from_data(cur, force_pointers=True)
+
+
+def lanes_isa():
+    """Instruction set used to compute multiple DTW distances between series of
+    equal length at once (e.g. in a distance matrix)."""
+    return dtaidistancec_dtw.dtw_distance_lanes_isa().decode('ascii')
+
+
+def stats_enable(bint enable=True):
+    """Start or stop counting the work done by the DTW kernels of this module.
+    See :meth:`dtaidistance.dtw.stats`."""
+    dtaidistancec_dtw.dtw_stats_enable(enable)
+
+
+def stats_reset():
+    dtaidistancec_dtw.dtw_stats_reset()
+
+
+def stats_get():
+    """Counters of the DTW kernels of this module (dictionary)."""
+    return dtaidistancec_dtw.dtw_stats
+
+
 def ub_euclidean(seq_t[:] s1, seq_t[:] s2):
     """ See ed.euclidean_distance"""
     return dtaidistancec_dtw.ub_euclidean(&s1[0], len(s1), &s2[0], len(s2))
@@ -307,38 +546,179 @@ def lb_keogh(seq_t[:] s1, seq_t[:] s2, **kwargs):
     return dtaidistancec_dtw.lb_keogh(&s1[0], len(s1), &s2[0], len(s2), &settings._settings)
 
 
-def distance(seq_t[:] s1, seq_t[:] s2, **kwargs):
+def lb_envelope(seq_t[:] s, seq_t[:] lower, seq_t[:] upper, **kwargs):
+    """Compute the lower and upper envelope of s.
+
+    :param s: Series
+    :param lower: Array to store the lower envelope, its length is the length of
+        the series that will be compared with the envelope
+    :param upper: Array to store the upper envelope (same length as lower)
+    """
+    # Assumes C contiguous
+    if len(lower) != len(upper):
+        raise ValueError("Lower and upper envelope should have the same length")
+    settings = DTWSettings(**kwargs)
+    dtaidistancec_dtw.lb_envelope(&s[0], len(s), len(lower), &settings._settings, &lower[0], &upper[0])
+
+
+def lb_keogh_envelope(seq_t[:] s1, seq_t[:] lower, seq_t[:] upper, **kwargs):
+    # Assumes C contiguous
+    settings = DTWSettings(**kwargs)
+    return dtaidistancec_dtw.lb_keogh_envelope(&s1[0], len(s1), &lower[0], &upper[0], &settings._settings)
+
+
+def lb_kim(seq_t[:] s1, seq_t[:] s2, **kwargs):
+    # Assumes C contiguous
+    settings = DTWSettings(**kwargs)
+    return dtaidistancec_dtw.lb_kim(&s1[0], len(s1), &s2[0], len(s2), &settings._settings)
+
+
+def lb_improved(seq_t[:] s1, seq_t[:] s2, **kwargs):
+    # Assumes C contiguous
+    settings = DTWSettings(**kwargs)
+    return dtaidistancec_dtw.lb_improved(&s1[0], len(s1), &s2[0], len(s2), &settings._settings)
+
+
+def lb_improved_envelope(seq_t[:] s1, seq_t[:] s2, seq_t[:] lower, seq_t[:] upper, **kwargs):
+    # Assumes C contiguous
+    settings = DTWSettings(**kwargs)
+    return dtaidistancec_dtw.lb_improved_envelope(&s1[0], len(s1), &s2[0], len(s2), &lower[0], &upper[0],
+                                                  &settings._settings)
+
+
+def lb_cascade_envelope(seq_t[:] s1, seq_t[:] s2, seq_t[:] lower1=None, seq_t[:] upper1=None,
+                        seq_t[:] lower2=None, seq_t[:] upper2=None, threshold=None, **kwargs):
+    """Lower bound cascade with precomputed envelopes.
+
+    :param lower1: Lower envelope of s1 (length of s2) or None
+    :param upper1: Upper envelope of s1 (length of s2) or None
+    :param lower2: Lower envelope of s2 (length of s1) or None
+    :param upper2: Upper envelope of s2 (length of s1) or None
+    """
+    # Assumes C contiguous
+    settings = DTWSettings(**kwargs)
+    cdef seq_t c_threshold = INFINITY if threshold is None else threshold
+    cdef seq_t *lower1_ptr = NULL
+    cdef seq_t *upper1_ptr = NULL
+    cdef seq_t *lower2_ptr = NULL
+    cdef seq_t *upper2_ptr = NULL
+    if lower1 is not None and upper1 is not None:
+        lower1_ptr = &lower1[0]
+        upper1_ptr = &upper1[0]
+    if lower2 is not None and upper2 is not None:
+        lower2_ptr = &lower2[0]
+        upper2_ptr = &upper2[0]
+    return dtaidistancec_dtw.lb_cascade_envelope(&s1[0], len(s1), lower1_ptr, upper1_ptr,
+                                                 &s2[0], len(s2), lower2_ptr, upper2_ptr,
+                                                 c_threshold, &settings._settings)
+
+
+def lb_cascade(seq_t[:] s1, seq_t[:] s2, threshold=None, **kwargs):
+    # Assumes C contiguous
+    settings = DTWSettings(**kwargs)
+    cdef seq_t c_threshold = INFINITY if threshold is None else threshold
+    return dtaidistancec_dtw.lb_cascade(&s1[0], len(s1), &s2[0], len(s2), c_threshold, &settings._settings)
+
+
+cdef inline Py_ssize_t _stride(Py_ssize_t nb_bytes) except? -1:
+    """Stride of a buffer in number of values instead of bytes."""
+    if nb_bytes % <Py_ssize_t>sizeof(seq_t) != 0:
+        raise ValueError("Stride of {} bytes is not a multiple of the size of the values".format(nb_bytes))
+    return nb_bytes // <Py_ssize_t>sizeof(seq_t)
+
+
+cdef seq_t _distance_strided(const seq_t[:] s1, const seq_t[:] s2, DTWSettings settings) except? -1:
+    cdef Py_ssize_t stride1 = _stride(s1.strides[0])
+    cdef Py_ssize_t stride2 = _stride(s2.strides[0])
+    cdef seq_t d
+    with nogil:
+        d = dtaidistancec_dtw.dtw_distance_strided(<seq_t *>&s1[0], s1.shape[0], stride1,
+                                                   <seq_t *>&s2[0], s2.shape[0], stride2, &settings._settings)
+    return d
+
+
+cdef seq_t _distance_ndim_strided(const seq_t[:, :] s1, const seq_t[:, :] s2, DTWSettings settings) except? -1:
+    if s1.shape[1] != s2.shape[1]:
+        raise Exception("Dimension of sequence entries needs to be the same: {} != {}".format(s1.shape[1], s2.shape[1]))
+    cdef int ndim = s1.shape[1]
+    cdef Py_ssize_t stride1 = _stride(s1.strides[0])
+    cdef Py_ssize_t dstride1 = _stride(s1.strides[1])
+    cdef Py_ssize_t stride2 = _stride(s2.strides[0])
+    cdef Py_ssize_t dstride2 = _stride(s2.strides[1])
+    cdef seq_t d
+    with nogil:
+        d = dtaidistancec_dtw.dtw_distance_ndim_strided(<seq_t *>&s1[0, 0], s1.shape[0], stride1, dstride1,
+                                                        <seq_t *>&s2[0, 0], s2.shape[0], stride2, dstride2,
+                                                        ndim, &settings._settings)
+    return d
+
+
+def distance(const seq_t[:] s1, const seq_t[:] s2, **kwargs):
     """DTW distance.
 
-    Assumes C-contiguous arrays.
+    The arrays do not need to be contiguous (e.g. a column of a matrix) or
+    writable, the values are read with the strides of the buffers without copying.
 
     See distance().
     :param s1: First sequence (buffer of seq_t-s)
     :param s2: Second sequence (buffer of seq_t-s)
     :param kwargs: Settings (see DTWSettings)
     """
-    # Assumes C contiguous
-    settings = DTWSettings(**kwargs)
-    return dtaidistancec_dtw.dtw_distance(&s1[0], len(s1), &s2[0], len(s2), &settings._settings)
+    cdef DTWSettings settings = DTWSettings(**kwargs)
+    return _distance_strided(s1, s2, settings)
 
 
-def distance_ndim(seq_t[:, :] s1, seq_t[:, :] s2, **kwargs):
+def distance_ndim(const seq_t[:, :] s1, const seq_t[:, :] s2, **kwargs):
     """DTW distance for n-dimensional arrays.
 
-    Assumes C-contiguous arrays.
+    The arrays do not need to be contiguous (e.g. a selection of columns or a
+    Fortran-ordered array), the values are read with the strides of the buffers
+    without copying.
 
     See distance().
     :param s1: First sequence (buffer of seq_t-s)
     :param s2: Second sequence (buffer of seq_t-s)
-    :param ndim: Number of dimensions
     :param kwargs: Settings (see DTWSettings)
     """
-    # Assumes C contiguous
-    settings = DTWSettings(**kwargs)
-    if s1.shape[1] != s2.shape[1]:
-        raise Exception("Dimension of sequence entries needs to be the same: {} != {}".format(s1.shape[1], s2.shape[1]))
-    ndim = s1.shape[1]
-    return dtaidistancec_dtw.dtw_distance_ndim(&s1[0,0], len(s1), &s2[0,0], len(s2), ndim, &settings._settings)
+    cdef DTWSettings settings = DTWSettings(**kwargs)
+    return _distance_ndim_strided(s1, s2, settings)
+
+
+cdef class PreparedDistanceBase:
+    cdef DTWSettings settings
+
+    def __init__(self, **kwargs):
+        self.settings = DTWSettings(**kwargs)
+
+    @property
+    def max_dist(self):
+        return self.settings._settings.max_dist
+
+    @max_dist.setter
+    def max_dist(self, value):
+        self.settings._settings.max_dist = 0 if value is None else value
+
+    def __str__(self):
+        return str(self.settings)
+
+
+cdef class PreparedDistance(PreparedDistanceBase):
+    """DTW distance with settings that are parsed once.
+
+    See dtw.prepare(). The series are buffers of seq_t-s (not necessarily contiguous).
+    """
+    def __call__(self, const seq_t[:] s1, const seq_t[:] s2):
+        return _distance_strided(s1, s2, self.settings)
+
+
+cdef class PreparedDistanceNDim(PreparedDistanceBase):
+    """DTW distance for n-dimensional series with settings that are parsed once.
+
+    See dtw.prepare(). The series are two-dimensional buffers of seq_t-s (not
+    necessarily contiguous).
+    """
+    def __call__(self, const seq_t[:, :] s1, const seq_t[:, :] s2):
+        return _distance_ndim_strided(s1, s2, self.settings)
 
 
 def distance_ndim_assinglearray(seq_t[:] s1, seq_t[:] s2, int ndim, **kwargs):
@@ -353,8 +733,12 @@ def distance_ndim_assinglearray(seq_t[:] s1, seq_t[:] s2, int ndim, **kwargs):
     :param kwargs: Settings (see DTWSettings)
     """
     # Assumes C contiguous
-    settings = DTWSettings(**kwargs)
-    return dtaidistancec_dtw.dtw_distance_ndim(&s1[0], len(s1), &s2[0], len(s2), ndim, &settings._settings)
+    cdef DTWSettings settings = DTWSettings(**kwargs)
+    cdef seq_t d
+    with nogil:
+        d = dtaidistancec_dtw.dtw_distance_ndim(&s1[0], s1.shape[0], &s2[0], s2.shape[0], ndim,
+                                                &settings._settings)
+    return d
 
 
 def wps_length(Py_ssize_t l1, Py_ssize_t l2, **kwargs):
@@ -381,6 +765,34 @@ def wps_width(Py_ssize_t l1, Py_ssize_t l2, **kwargs):
 {% set suffix = '_ndim' %}
 {%- include 'dtw_cc_warpingpath.jinja.pyx' %}
 
+
+def warping_path_approx(seq_t[:] s1, seq_t[:] s2, Py_ssize_t radius=1, include_path=True, **kwargs):
+    # Assumes C contiguous
+    cdef Py_ssize_t path_length = 0
+    cdef seq_t dist
+    cdef Py_ssize_t *i1 = NULL
+    cdef Py_ssize_t *i2 = NULL
+    cdef DTWSettings settings = DTWSettings(**kwargs)
+    if len(s1) == 0 or len(s2) == 0:
+        return INFINITY, [] if include_path else None
+    if include_path:
+        i1 = <Py_ssize_t *> PyMem_Malloc(2 * (len(s1) + len(s2)) * sizeof(Py_ssize_t))
+        if not i1:
+            raise MemoryError()
+        i2 = &i1[len(s1) + len(s2)]
+    try:
+        with nogil:
+            dist = dtaidistancec_dtw.dtw_warping_path_approx(&s1[0], s1.shape[0], &s2[0], s2.shape[0], radius,
+                                                             i1, i2, &path_length, &settings._settings)
+        path = None
+        if include_path:
+            path = [(i1[i], i2[i]) for i in range(path_length)]
+            path.reverse()
+    finally:
+        PyMem_Free(i1)
+    return dist, path
+
+
 def warping_path_lowmem(seq_t[:] s1, seq_t[:] s2, int switch_to_full=1000, **kwargs):
     # Assumes C contiguous
     settings = DTWSettings(**kwargs)
@@ -507,15 +919,282 @@ def warping_path_prob(seq_t[:] s1, seq_t[:] s2, seq_t avg, include_distance=Fals
 {% set suffix = '' %}
 {%- include 'dtw_cc_distancematrix.jinja.pyx' %}
 
+
+def distance_matrix_sparse(cur, block=None, int ndim=1, **kwargs):
+    """Compute a distance matrix between all sequences given in `cur` and
+    only keep the distances that are not infinity (e.g. not larger than max_dist).
+
+    :param cur: DTWSeriesMatrix, DTWSeriesMatrixNDim or DTWSeriesPointers
+    :param block: see DTWBlock
+    :param ndim: Number of dimensions (if larger than 1, n-dimensional DTW is used)
+    :param kwargs: Settings (see DTWSettings)
+    :return: Rows, columns and values as arrays (in row-major order).
+    """
+    cdef DTWSeriesPointers ptrs
+    cdef DTWSparse sparse = DTWSparse()
+    cdef DTWBlock dtwblock = _dtw_block(block)
+    settings = DTWSettings(**kwargs)
+    ptrs = dtw_series_as_pointers(_series_container_c(cur, force_pointers=True))
+    if dtaidistancec_dtw.dtw_distances_sparse_ptrs(
+            ptrs._ptrs, ptrs._nb_ptrs, ptrs._lengths, ndim,
+            &sparse._sparse, &dtwblock._block, &settings._settings) < 0:
+        raise MemoryError()
+    return sparse.arrays()
+
+
+def knn_graph(cur, Py_ssize_t k, int ndim=1, **kwargs):
+    """Compute the k nearest neighbors of all sequences given in `cur`.
+
+    :param cur: DTWSeriesMatrix, DTWSeriesMatrixNDim or DTWSeriesPointers
+    :param k: Number of neighbors
+    :param ndim: Number of dimensions (if larger than 1, n-dimensional DTW is used)
+    :param kwargs: Settings (see DTWSettings)
+    :return: Indices and distances as arrays of length len(cur)*k (row-major).
+    """
+    cdef DTWSeriesMatrix matrix
+    cdef DTWSeriesMatrixNDim matrixnd
+    cdef DTWSeriesPointers ptrs
+    cdef Py_ssize_t result = 0
+    cdef Py_ssize_t nb_series
+    cdef array.array indices = array.array("q" if sizeof(Py_ssize_t) == 8 else "i")
+    cdef array.array dists = array.array(seq_format)
+    settings = DTWSettings(**kwargs)
+    cur = _series_container_c(cur)
+    if isinstance(cur, DTWSeriesPointers):
+        nb_series = (<DTWSeriesPointers>cur)._nb_ptrs
+    else:
+        nb_series = cur.nb_rows
+    array.resize(indices, nb_series * k)
+    array.resize(dists, nb_series * k)
+    if nb_series * k == 0:
+        return indices, dists
+
+    if isinstance(cur, DTWSeriesPointers):
+        ptrs = cur
+        result = dtaidistancec_dtw.dtw_knn_graph_ptrs(
+            ptrs._ptrs, ptrs._nb_ptrs, ptrs._lengths, ndim, k,
+            <Py_ssize_t *>indices.data.as_voidptr, <seq_t *>dists.data.as_voidptr, &settings._settings)
+    elif isinstance(cur, DTWSeriesMatrix):
+        matrix = cur
+        result = dtaidistancec_dtw.dtw_knn_graph_matrix(
+            <seq_t *>&matrix._data[0,0], matrix.nb_rows, matrix.nb_cols, 1, k,
+            <Py_ssize_t *>indices.data.as_voidptr, <seq_t *>dists.data.as_voidptr, &settings._settings)
+    elif isinstance(cur, DTWSeriesMatrixNDim):
+        matrixnd = cur
+        result = dtaidistancec_dtw.dtw_knn_graph_matrix(
+            <seq_t *>&matrixnd._data[0,0,0], matrixnd.nb_rows, matrixnd.nb_cols, ndim, k,
+            <Py_ssize_t *>indices.data.as_voidptr, <seq_t *>dists.data.as_voidptr, &settings._settings)
+    else:
+        raise Exception("Unknown series container")
+    if result < 0:
+        raise MemoryError()
+    return indices, dists
+
 {% set suffix = '_ndim' %}
 {%- include 'dtw_cc_distancematrix.jinja.pyx' %}
 
 
+def distance_matrices(cur_r, cur_c, **kwargs):
+    """Compute the distances between all sequences in `cur_r` and all
+    sequences in `cur_c`.
+    This method calls a pure c implementation of the dtw computation that
+    avoids the GIL.
+
+    Assumes C-contiguous arrays.
+
+    :param cur_r: DTWSeriesMatrix or DTWSeriesPointers
+    :param cur_c: DTWSeriesMatrix or DTWSeriesPointers
+    :param kwargs: Settings (see DTWSettings)
+    :return: The distances as an array of length len(cur_r)*len(cur_c) (row-major).
+    """
+    cdef DTWSeriesMatrix matrix_r, matrix_c
+    cdef DTWSeriesPointers ptrs_r, ptrs_c
+    cdef DTWBlock dtwblock
+    cdef array.array dists = array.array(seq_format)
+    settings = DTWSettings(**kwargs)
+    cur_r = _series_container_c(cur_r)
+    cur_c = _series_container_c(cur_c)
+
+    if isinstance(cur_r, DTWSeriesMatrix) and isinstance(cur_c, DTWSeriesMatrix):
+        matrix_r = cur_r
+        matrix_c = cur_c
+        dtwblock = DTWBlock(rb=0, re=matrix_r.nb_rows, cb=0, ce=matrix_c.nb_rows, triu=False)
+        array.resize(dists, matrix_r.nb_rows * matrix_c.nb_rows)
+        dtaidistancec_dtw.dtw_distances_matrices(
+            <seq_t *>&matrix_r._data[0,0], matrix_r.nb_rows, matrix_r.nb_cols,
+            <seq_t *>&matrix_c._data[0,0], matrix_c.nb_rows, matrix_c.nb_cols,
+            <seq_t *>dists.data.as_voidptr, &dtwblock._block, &settings._settings)
+    else:
+        ptrs_r = dtw_series_as_pointers(cur_r)
+        ptrs_c = dtw_series_as_pointers(cur_c)
+        dtwblock = DTWBlock(rb=0, re=ptrs_r._nb_ptrs, cb=0, ce=ptrs_c._nb_ptrs, triu=False)
+        array.resize(dists, ptrs_r._nb_ptrs * ptrs_c._nb_ptrs)
+        dtaidistancec_dtw.dtw_distances_ptrs_ptrs(
+            ptrs_r._ptrs, ptrs_r._nb_ptrs, ptrs_r._lengths,
+            ptrs_c._ptrs, ptrs_c._nb_ptrs, ptrs_c._lengths,
+            <seq_t *>dists.data.as_voidptr, &dtwblock._block, &settings._settings)
+
+    return dists
+
+
+def distance_matrices_ndim(cur_r, cur_c, int ndim, **kwargs):
+    """Compute the distances between all n-dimensional sequences in `cur_r`
+    and all n-dimensional sequences in `cur_c`.
+
+    Assumes C-contiguous arrays.
+
+    See distance_matrices().
+    :param cur_r: DTWSeriesMatrixNDim or DTWSeriesPointers
+    :param cur_c: DTWSeriesMatrixNDim or DTWSeriesPointers
+    :param ndim: Number of dimensions
+    :param kwargs: Settings (see DTWSettings)
+    :return: The distances as an array of length len(cur_r)*len(cur_c) (row-major).
+    """
+    cdef DTWSeriesMatrixNDim matrix_r, matrix_c
+    cdef DTWSeriesPointers ptrs_r, ptrs_c
+    cdef DTWBlock dtwblock
+    cdef array.array dists = array.array(seq_format)
+    settings = DTWSettings(**kwargs)
+    cur_r = _series_container_c(cur_r, force_pointers=True)
+    cur_c = _series_container_c(cur_c, force_pointers=True)
+
+    if isinstance(cur_r, DTWSeriesMatrixNDim) and isinstance(cur_c, DTWSeriesMatrixNDim):
+        matrix_r = cur_r
+        matrix_c = cur_c
+        dtwblock = DTWBlock(rb=0, re=matrix_r.nb_rows, cb=0, ce=matrix_c.nb_rows, triu=False)
+        array.resize(dists, matrix_r.nb_rows * matrix_c.nb_rows)
+        dtaidistancec_dtw.dtw_distances_ndim_matrices(
+            <seq_t *>&matrix_r._data[0,0,0], matrix_r.nb_rows, matrix_r.nb_cols,
+            <seq_t *>&matrix_c._data[0,0,0], matrix_c.nb_rows, matrix_c.nb_cols, ndim,
+            <seq_t *>dists.data.as_voidptr, &dtwblock._block, &settings._settings)
+    else:
+        ptrs_r = dtw_series_as_pointers(cur_r)
+        ptrs_c = dtw_series_as_pointers(cur_c)
+        dtwblock = DTWBlock(rb=0, re=ptrs_r._nb_ptrs, cb=0, ce=ptrs_c._nb_ptrs, triu=False)
+        array.resize(dists, ptrs_r._nb_ptrs * ptrs_c._nb_ptrs)
+        dtaidistancec_dtw.dtw_distances_ndim_ptrs_ptrs(
+            ptrs_r._ptrs, ptrs_r._nb_ptrs, ptrs_r._lengths,
+            ptrs_c._ptrs, ptrs_c._nb_ptrs, ptrs_c._lengths, ndim,
+            <seq_t *>dists.data.as_voidptr, &dtwblock._block, &settings._settings)
+
+    return dists
+
+
+def _series_container_c(cur, force_pointers=False):
+    """Convert a set of series to a container that can be passed to the C library."""
+    if isinstance(cur, DTWSeriesMatrix) or isinstance(cur, DTWSeriesMatrixNDim) or isinstance(cur, DTWSeriesPointers):
+        return cur
+    if cur.__class__.__name__ == "SeriesContainer":
+        return cur.c_data_compat(seq_format)
+    return dtw_series_from_data(cur, force_pointers=force_pointers)
+
+
+def _dtw_block(block):
+    """Convert a block argument (None, 0 or tuple) to a DTWBlock."""
+    if block is None or block == 0.0:
+        return DTWBlock(rb=0, re=0, cb=0, ce=0)
+    return DTWBlock(rb=block[0][0], re=block[0][1], cb=block[1][0], ce=block[1][1],
+                    triu=not (len(block) > 2 and block[2] is False))
+
+
 def distance_matrix_length(DTWBlock block, Py_ssize_t nb_series):
     cdef Py_ssize_t length
     length = dtaidistancec_dtw.dtw_distances_length(&block._block, nb_series, nb_series)
     return length
 
+
+def distances_to(const seq_t[:] query, cur, Py_ssize_t k=0, **kwargs):
+    """Compute the distances between `query` and all sequences given in `cur`.
+    This method calls a pure c implementation of the dtw computation that
+    avoids the GIL.
+
+    Assumes C-contiguous arrays.
+
+    :param query: Query sequence (buffer of seq_t-s)
+    :param cur: DTWSeriesMatrix or DTWSeriesPointers
+    :param k: If k > 0, only the k smallest distances are guaranteed to be
+        computed. Comparisons that cannot be among the k smallest are abandoned
+        early and their distance is set to infinity.
+    :param kwargs: Settings (see DTWSettings)
+    :return: The distances as an array of length len(cur).
+    """
+    cdef DTWSeriesMatrix matrix
+    cdef DTWSeriesPointers ptrs
+    settings = DTWSettings(**kwargs)
+
+    if isinstance(cur, DTWSeriesMatrix) or isinstance(cur, DTWSeriesPointers):
+        pass
+    elif cur.__class__.__name__ == "SeriesContainer":
+        cur = cur.c_data_compat(seq_format)
+    else:
+        cur = dtw_series_from_data(cur)
+
+    cdef array.array dists = array.array(seq_format)
+
+    if isinstance(cur, DTWSeriesPointers):
+        ptrs = cur
+        array.resize(dists, ptrs._nb_ptrs)
+        dtaidistancec_dtw.dtw_distances_query_ptrs(
+            <seq_t *>&query[0], len(query), ptrs._ptrs, ptrs._nb_ptrs, ptrs._lengths,
+            <seq_t *>dists.data.as_voidptr, k, &settings._settings)
+    elif isinstance(cur, DTWSeriesMatrix):
+        matrix = cur
+        array.resize(dists, matrix.nb_rows)
+        dtaidistancec_dtw.dtw_distances_query_matrix(
+            <seq_t *>&query[0], len(query), <seq_t *>&matrix._data[0,0], matrix.nb_rows, matrix.nb_cols,
+            <seq_t *>dists.data.as_voidptr, k, &settings._settings)
+    else:
+        raise Exception("Unknown series container")
+
+    return dists
+
+
+def distances_to_ndim(const seq_t[:, :] query, cur, int ndim, Py_ssize_t k=0, **kwargs):
+    """Compute the distances between the n-dimensional `query` and all
+    sequences given in `cur`.
+
+    Assumes C-contiguous arrays.
+
+    See distances_to().
+    :param query: Query sequence (buffer of seq_t-s)
+    :param cur: DTWSeriesMatrixNDim or DTWSeriesPointers
+    :param ndim: Number of dimensions
+    :param k: See distances_to()
+    :param kwargs: Settings (see DTWSettings)
+    :return: The distances as an array of length len(cur).
+    """
+    cdef DTWSeriesMatrixNDim matrixnd
+    cdef DTWSeriesPointers ptrs
+    settings = DTWSettings(**kwargs)
+    if query.shape[1] != ndim:
+        raise Exception("Dimension of sequence entries needs to be the same: {} != {}".format(query.shape[1], ndim))
+
+    if isinstance(cur, DTWSeriesMatrixNDim) or isinstance(cur, DTWSeriesPointers):
+        pass
+    elif cur.__class__.__name__ == "SeriesContainer":
+        cur = cur.c_data_compat(seq_format)
+    else:
+        cur = dtw_series_from_data(cur, force_pointers=True)
+
+    cdef array.array dists = array.array(seq_format)
+
+    if isinstance(cur, DTWSeriesPointers):
+        ptrs = cur
+        array.resize(dists, ptrs._nb_ptrs)
+        dtaidistancec_dtw.dtw_distances_query_ndim_ptrs(
+            <seq_t *>&query[0,0], len(query), ptrs._ptrs, ptrs._nb_ptrs, ptrs._lengths, ndim,
+            <seq_t *>dists.data.as_voidptr, k, &settings._settings)
+    elif isinstance(cur, DTWSeriesMatrixNDim):
+        matrixnd = cur
+        array.resize(dists, matrixnd.nb_rows)
+        dtaidistancec_dtw.dtw_distances_query_ndim_matrix(
+            <seq_t *>&query[0,0], len(query), <seq_t *>&matrixnd._data[0,0,0], matrixnd.nb_rows, matrixnd.nb_cols, ndim,
+            <seq_t *>dists.data.as_voidptr, k, &settings._settings)
+    else:
+        raise Exception("Unknown series container")
+
+    return dists
+
 {% set suffix = '' %}
 {%- include 'dtw_cc_dba.jinja.pyx' %}
 
@@ -528,30 +1207,36 @@ cdef dba_inner(cur, seq_t *c_ptr, Py_ssize_t c_len, unsigned char *mask_ptr, int
     cdef DTWSeriesMatrix matrix
     cdef DTWSeriesMatrixNDim matrix_ndim
     cdef DTWSeriesPointers ptrs
+    cdef Py_ssize_t nb_rows, nb_cols
     if isinstance(cur, DTWSeriesMatrix) or isinstance(cur, DTWSeriesPointers):
         pass
     elif cur.__class__.__name__ == "SeriesContainer":
-        cur = cur.c_data_compat()
+        cur = cur.c_data_compat(seq_format)
     else:
         cur = dtw_series_from_data(cur)
 
     if isinstance(cur, DTWSeriesPointers):
         ptrs = cur
-        dtaidistancec_dtw.dtw_dba_ptrs(
-            ptrs._ptrs, ptrs._nb_ptrs, ptrs._lengths,
-            c_ptr, c_len, mask_ptr, nb_prob_samples, ndim, &settings._settings)
+        with nogil:
+            dtaidistancec_dtw.dtw_dba_ptrs(
+                ptrs._ptrs, ptrs._nb_ptrs, ptrs._lengths,
+                c_ptr, c_len, mask_ptr, nb_prob_samples, ndim, &settings._settings)
     elif isinstance(cur, DTWSeriesMatrix):
         matrix = cur
-        matrix_ptr = &matrix._data[0, 0]
-        dtaidistancec_dtw.dtw_dba_matrix(
-            matrix_ptr, matrix.nb_rows, matrix.nb_cols,
-            c_ptr, c_len, mask_ptr, nb_prob_samples, ndim, &settings._settings)
+        matrix_ptr = <seq_t *>&matrix._data[0, 0]
+        nb_rows, nb_cols = matrix.nb_rows, matrix.nb_cols
+        with nogil:
+            dtaidistancec_dtw.dtw_dba_matrix(
+                matrix_ptr, nb_rows, nb_cols,
+                c_ptr, c_len, mask_ptr, nb_prob_samples, ndim, &settings._settings)
     elif isinstance(cur, DTWSeriesMatrixNDim):
         matrix_ndim = cur
-        matrix_ptr = &matrix_ndim._data[0, 0, 0]
-        dtaidistancec_dtw.dtw_dba_matrix(
-            matrix_ptr, matrix_ndim.nb_rows, matrix_ndim.nb_cols,
-            c_ptr, c_len, mask_ptr, nb_prob_samples, ndim, &settings._settings)
+        matrix_ptr = <seq_t *>&matrix_ndim._data[0, 0, 0]
+        nb_rows, nb_cols = matrix_ndim.nb_rows, matrix_ndim.nb_cols
+        with nogil:
+            dtaidistancec_dtw.dtw_dba_matrix(
+                matrix_ptr, nb_rows, nb_cols,
+                c_ptr, c_len, mask_ptr, nb_prob_samples, ndim, &settings._settings)
     else:
         raise ValueError("Series are not the expected type (DTWSeriesPointers, DTWSeriesMatrix "
                          "or DTWSeriesMatrixNDim): {}".format(type(cur)))
@@ -3,7 +3,7 @@ def distance_matrix{{suffix}}(cur,{{s}}
         {%- if "ndim" in suffix -%}
         int ndim,{{s}}
         {%- endif -%}
-        block=None, **kwargs):
+        block=None, out=None, control=None, **kwargs):
     """Compute a distance matrix between all sequences given in `cur`.
     This method calls a pure c implementation of the dtw computation that
     avoids the GIL.
@@ -12,8 +12,13 @@ def distance_matrix{{suffix}}(cur,{{s}}
 
     :param cur: DTWSeriesMatrix or DTWSeriesPointers
     :param block: see DTWBlock
+    :param out: Contiguous buffer of seq_t-s (e.g. a Numpy memmap) to write the
+        distances to instead of a new array.
+    :param control: Progress and cancellation (see :class:`dtaidistance.dtw.DTWControl`).
+        Distances that are not computed because of a stop are NaN.
     :param kwargs: Settings (see DTWSettings)
-    :return: The distance matrix as a list representing the triangular matrix.
+    :return: The distance matrix as a list representing the triangular matrix
+        (or out if given).
     """
     cdef DTWSeriesMatrix matrix
     {%- if "ndim" in suffix %}
@@ -44,15 +49,32 @@ def distance_matrix{{suffix}}(cur,{{s}}
     if dtwblock.ce == 0:
         dtwblock.ce_set(len(cur))
 
-    cdef array.array dists = array.array('d')
-    array.resize(dists, length)
+    cdef array.array dists = None
+    cdef seq_t[::1] out_view
+    cdef seq_t *dists_ptr
+    if out is None:
+        dists = array.array(seq_format)
+        array.resize(dists, length)
+        dists_ptr = <seq_t *>dists.data.as_voidptr
+    else:
+        out_view = out
+        if out_view.shape[0] != length:
+            raise ValueError(f"Argument out has length {out_view.shape[0]}, expected {length}")
+        if length == 0:
+            return out
+        dists_ptr = &out_view[0]
+
+    cdef DTWControl dtwcontrol = None
+    if control is not None:
+        dtwcontrol = DTWControl(control)
+        dtwcontrol.attach(settings, dists_ptr, length)
 
     if isinstance(cur, DTWSeriesMatrix){{s}}
         {%- if "ndim" in suffix %}or isinstance(cur, DTWSeriesMatrixNDim) {% endif -%}
         or isinstance(cur, DTWSeriesPointers):
         pass
     elif cur.__class__.__name__ == "SeriesContainer":
-        cur = cur.c_data_compat()
+        cur = cur.c_data_compat(seq_format)
     else:
         cur = dtw_series_from_data(cur{%- if "ndim" in suffix %}, force_pointers=True{% endif -%})
 
@@ -61,11 +83,11 @@ def distance_matrix{{suffix}}(cur,{{s}}
         {%- if "ndim" in suffix %}
         dtaidistancec_dtw.dtw_distances_ndim_ptrs(
             ptrs._ptrs, ptrs._nb_ptrs, ptrs._lengths, ndim,
-            dists.data.as_{{seq_t}}s, &dtwblock._block, &settings._settings)
+            dists_ptr, &dtwblock._block, &settings._settings)
         {%- else %}
         dtaidistancec_dtw.dtw_distances_ptrs(
             ptrs._ptrs, ptrs._nb_ptrs, ptrs._lengths,
-            dists.data.as_{{seq_t}}s, &dtwblock._block, &settings._settings)
+            dists_ptr, &dtwblock._block, &settings._settings)
         {%- endif %}
     elif isinstance(cur, DTWSeriesMatrix):
         {%- if "ndim" in suffix %}
@@ -73,16 +95,21 @@ def distance_matrix{{suffix}}(cur,{{s}}
         {%- endif %}
         matrix = cur
         dtaidistancec_dtw.dtw_distances_matrix(
-            &matrix._data[0,0], matrix.nb_rows, matrix.nb_cols,
-            dists.data.as_{{seq_t}}s, &dtwblock._block, &settings._settings)
+            <seq_t *>&matrix._data[0,0], matrix.nb_rows, matrix.nb_cols,
+            dists_ptr, &dtwblock._block, &settings._settings)
     {%- if "ndim" in suffix %}
     elif isinstance(cur, DTWSeriesMatrixNDim):
         matrixnd = cur
         dtaidistancec_dtw.dtw_distances_ndim_matrix(
-            &matrixnd._data[0,0,0], matrixnd.nb_rows, matrixnd.nb_cols, ndim,
-            dists.data.as_{{seq_t}}s, &dtwblock._block, &settings._settings)
+            <seq_t *>&matrixnd._data[0,0,0], matrixnd.nb_rows, matrixnd.nb_cols, ndim,
+            dists_ptr, &dtwblock._block, &settings._settings)
     {%- endif %}
     else:
         raise Exception("Unknown series container")
 
+    if dtwcontrol is not None:
+        dtwcontrol.finish()
+
+    if out is not None:
+        return out
     return dists
@@ -9,7 +9,7 @@ def warping_path{{suffix}}(
     # Assumes C contiguous
     cdef Py_ssize_t path_length;
     cdef seq_t dist;
-    settings = DTWSettings(**kwargs)
+    cdef DTWSettings settings = DTWSettings(**kwargs)
     cdef Py_ssize_t *i1 = <Py_ssize_t *> PyMem_Malloc((len(s1) + len(s2)) * sizeof(Py_ssize_t))
     if not i1:
         raise MemoryError()
@@ -18,9 +18,13 @@ def warping_path{{suffix}}(
         raise MemoryError()
     try:
         {%- if "ndim" in suffix %}
-        dist = dtaidistancec_dtw.dtw_warping_path_ndim(&s1[0, 0], len(s1), &s2[0, 0], len(s2), i1, i2, &path_length, ndim, &settings._settings)
+        with nogil:
+            dist = dtaidistancec_dtw.dtw_warping_path_ndim(&s1[0, 0], s1.shape[0], &s2[0, 0], s2.shape[0], i1, i2,
+                                                           &path_length, ndim, &settings._settings)
         {%- else %}
-        dist = dtaidistancec_dtw.dtw_warping_path(&s1[0], len(s1), &s2[0], len(s2), i1, i2, &path_length, &settings._settings)
+        with nogil:
+            dist = dtaidistancec_dtw.dtw_warping_path(&s1[0], s1.shape[0], &s2[0], s2.shape[0], i1, i2,
+                                                      &path_length, &settings._settings)
         {%- endif %}
         path = []
         for i in range(path_length):
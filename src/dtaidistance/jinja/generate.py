@@ -32,8 +32,10 @@ def change_dd_globals_h():
     dd_globals_h = thisdir.parent.parent / "DTAIDistanceC" / "DTAIDistanceC" / "dd_globals.h"
     with FileInput(files=[dd_globals_h], inplace=True) as f:
         for line in f:
-            if "typedef" in line and "seq_t" in line:
-                line = "typedef {} seq_t;\n".format(seq_t)
+            if "typedef" in line and "default seq_t" in line:
+                line = "typedef {} seq_t;  // default seq_t\n".format(seq_t)
+            elif "SEQ_T_FORMAT" in line and "default seq_t format" in line:
+                line = "#define SEQ_T_FORMAT \"{}\"  // default seq_t format\n".format(seq_format)
             print(line, end='')
 
 
@@ -41,14 +41,22 @@ def test_without_pandas():
     return False
 
 
-def verify_np_array(seq):
+def verify_np_array(seq, dtype=None, allow_strided=False):
+    """Convert a Numpy array to the given type and to a C-contiguous array.
+
+    :param allow_strided: Do not copy arrays that are not C-contiguous (for methods
+        that read the values using the strides of the array)
+    """
     try:
         np = importlib.import_module("numpy")
     except ImportError as e:
         raise NumpyException("Expects numpy to be installed") from e
     if np is not None:
         if isinstance(seq, (np.ndarray, np.generic)):
-            if not seq.data.c_contiguous:
+            if dtype is not None and seq.dtype != np.dtype(dtype):
+                logger.debug("Sequence of type {} is converted to {}".format(seq.dtype, np.dtype(dtype)))
+                seq = seq.astype(dtype)
+            if not allow_strided and not seq.data.c_contiguous:
                 logger.debug("Warning: Sequence 1 passed to method distance is not C-contiguous. " +
                              "The sequence will be copied.")
                 seq = seq.copy(order='C')
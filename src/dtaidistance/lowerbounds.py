@@ -0,0 +1,396 @@
+# -*- coding: UTF-8 -*-
+"""
+dtaidistance.lowerbounds
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+Lower bounds for Dynamic Time Warping (DTW)
+
+A lower bound is cheaper to compute than the DTW distance and can be used
+to skip the DTW computation if the bound is already larger than the largest
+distance of interest (e.g., max_dist, or the k-th best distance so far).
+
+The cascade computes the bounds from cheap to expensive and stops as soon
+as one of them is larger than the given threshold:
+
+1. LB_Kim: First and last points, O(1)
+2. LB_Keogh(s1, s2): Distance of s1 to the envelope of s2, O(n)
+3. LB_Keogh(s2, s1): Distance of s2 to the envelope of s1, O(n)
+4. LB_Improved(s1, s2): LB_Keogh(s1, s2) plus the LB_Keogh of s2 to the
+   envelope of the projection of s1 on the envelope of s2, O(n)
+
+The envelopes of a series only depend on the window and on the length of the
+other series. They can be computed once with :class:`Envelope` and passed to
+all lower bound functions instead of the series itself. For a set of series,
+use :meth:`envelopes` (the envelopes are stored next to the
+:class:`~dtaidistance.util.SeriesContainer`).
+
+The bounds only use the window and the inner distance. They remain valid
+when max_step, penalties or a band are used, as these can only increase the
+DTW distance, but they do not become tighter. They are not valid when
+psi-relaxation is used and will return 0 in that case. Multivariate series
+(use_ndim) are not supported.
+
+References:
+
+- Kim, S. W., Park, S., & Chu, W. W. (2001). An index-based approach for
+  similarity search supporting time warping in large sequence databases. ICDE.
+- Keogh, E., & Ratanamahatana, C. A. (2005). Exact indexing of dynamic
+  time warping. Knowledge and Information Systems, 7(3).
+- Lemire, D. (2009). Faster retrieval with a two-pass dynamic-time-warping
+  lower bound. Pattern Recognition, 42(9).
+
+:author: Wannes Meert
+:copyright: Copyright 2026 KU Leuven, DTAI Research Group.
+:license: Apache License, Version 2.0, see LICENSE for details.
+
+"""
+import logging
+import math
+import array
+from collections import deque
+
+from . import util
+from . import util_numpy
+from . import innerdistance
+from . import dtw
+
+
+logger = logging.getLogger("be.kuleuven.dtai.distance")
+
+
+try:
+    if util_numpy.test_without_numpy():
+        raise ImportError()
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class Envelope:
+    def __init__(self, s, l_other=None, window=None, use_c=False):
+        """Lower and upper envelope of a series.
+
+        The envelope is computed once (in linear time) and can be passed to
+        all lower bound functions instead of the series itself.
+
+        :param s: Series
+        :param l_other: Length of the series that will be compared with the
+            envelope (default is the length of s)
+        :param window: Window as defined in :class:`DTWSettings`
+        :param use_c: Use the C library to compute the envelope
+        """
+        self.series = s
+        self.l_other = len(s) if l_other is None else l_other
+        self.window = window
+        self.lower, self.upper = envelope(s, l_other=self.l_other, window=window, use_c=use_c)
+
+    def __len__(self):
+        return len(self.series)
+
+    def check(self, l_other, window):
+        """Raise a ValueError if this envelope cannot be used to compare
+        with a series of length l_other using the given window."""
+        if l_other != self.l_other:
+            raise ValueError("Envelope was computed for series of length {}, "
+                             "compared with series of length {}".format(self.l_other, l_other))
+        if _window(window, len(self.series), l_other) != _window(self.window, len(self.series), l_other):
+            raise ValueError("Envelope was computed for window={}, "
+                             "used with window={}".format(self.window, window))
+
+    def __str__(self):
+        return "Envelope(length={}, l_other={}, window={})".format(len(self.series), self.l_other, self.window)
+
+
+def envelopes(s, l_other=None, window=None, use_c=False):
+    """Envelopes for all series in s.
+
+    The envelopes are stored in the :class:`~dtaidistance.util.SeriesContainer`
+    and are only computed once per window when the same container is reused.
+
+    :param s: Iterable of series or SeriesContainer
+    :param l_other: Length of the series that will be compared with the
+        envelopes (default is the length of each series)
+    :param window: Window as defined in :class:`DTWSettings`
+    :param use_c: Use the C library to compute the envelopes
+    :return: List of :class:`Envelope`
+    """
+    s = util.SeriesContainer.wrap(s)
+    return s.envelopes(l_other=l_other, window=window, use_c=use_c)
+
+
+def _window(window, l, l_other):
+    max_length = max(l, l_other)
+    if window is None or window == 0:
+        return max_length
+    return min(window, max_length)
+
+
+def _unwrap(s):
+    if isinstance(s, Envelope):
+        return s.series, s
+    return s, None
+
+
+def _settings(s1, s2, kwargs):
+    s = dtw.DTWSettings(**kwargs)
+    if s.window is None or s.window == 0:
+        s.window = max(len(s1), len(s2))
+    return s
+
+
+def _use_c(s, s1, s2):
+    if not s.use_c:
+        return None
+    if dtw.dtw_cc is None:
+        logger.warning("C-library not available, using the Python version")
+        return None
+    cc, _ = dtw._c_libraries(s1, s2)
+    return cc
+
+
+def _c_array(a, cc):
+    """Array that can be passed to the C library cc without copying if possible."""
+    if a is None:
+        return None
+    if np is not None and isinstance(a, np.ndarray):
+        return util_numpy.verify_np_array(a, dtype=cc.seq_format)
+    if isinstance(a, array.array) and a.typecode == cc.seq_format:
+        return a
+    return array.array(cc.seq_format, a)
+
+
+def _envelope(env, s, l_other, window):
+    """Envelope of s, reuse the precomputed envelope env if available."""
+    if env is not None:
+        env.check(l_other, window)
+        return env.lower, env.upper
+    return envelope(s, l_other, window)
+
+
+def is_valid(**kwargs):
+    """Check whether the lower bounds are valid for the given settings.
+
+    :param kwargs: :class:`DTWSettings` arguments
+    :return: False if psi-relaxation or multivariate series are used
+    """
+    s = dtw.DTWSettings(**kwargs)
+    if s.use_ndim:
+        return False
+    return not any(psi != 0 for psi in s.split_psi())
+
+
+def envelope(s, l_other=None, window=None, use_c=False):
+    """Lower and upper envelope of series s.
+
+    The upper (lower) envelope at position i is the maximum (minimum)
+    value in s that can be matched with position i in a series of length
+    l_other given the window.
+
+    The window slides monotonically over s, the minimum and maximum are
+    thus maintained with two monotonic queues. This takes linear time,
+    independent of the window size:
+
+    Lemire, D. (2006). Streaming maximum-minimum filter using no more than
+    three comparisons per element. Nordic Journal of Computing, 13(4).
+
+    :param s: Series
+    :param l_other: Length of the series that is compared with the envelope
+        (default is the length of s)
+    :param window: Window as defined in :class:`DTWSettings`
+    :param use_c: Use the C library
+    :return: Tuple with the lower and upper envelope, both of length l_other
+    """
+    l = len(s)
+    if l_other is None:
+        l_other = l
+    window = _window(window, l, l_other)
+    if use_c:
+        if dtw.dtw_cc is None:
+            logger.warning("C-library not available, using the Python version")
+        else:
+            cc, _ = dtw._c_libraries(s)
+            if np is not None:
+                lower, upper = np.empty(l_other, dtype=cc.seq_format), np.empty(l_other, dtype=cc.seq_format)
+            else:
+                lower, upper = array.array(cc.seq_format, [0]) * l_other, array.array(cc.seq_format, [0]) * l_other
+            cc.lb_envelope(_c_array(s, cc), lower, upper, window=window)
+            return lower, upper
+    imin_diff = max(0, l_other - l) + window - 1
+    imax_diff = max(0, l - l_other) + window
+    lower = array.array('d', [0]) * l_other
+    upper = array.array('d', [0]) * l_other
+    uq, lq = deque(), deque()  # Indices in s with decreasing (uq) and increasing (lq) values
+    j = 0
+    for i in range(l_other):
+        imin = max(0, i - imin_diff)
+        imax = min(l, i + imax_diff)
+        while j < imax:
+            while uq and s[uq[-1]] <= s[j]:
+                uq.pop()
+            uq.append(j)
+            while lq and s[lq[-1]] >= s[j]:
+                lq.pop()
+            lq.append(j)
+            j += 1
+        while uq and uq[0] < imin:
+            uq.popleft()
+        while lq and lq[0] < imin:
+            lq.popleft()
+        upper[i] = s[uq[0]] if uq else -math.inf
+        lower[i] = s[lq[0]] if lq else math.inf
+    return lower, upper
+
+
+def _keogh_cost(s1, lower, upper, idist_fn, threshold=math.inf):
+    t = 0
+    for i in range(len(s1)):
+        ci = s1[i]
+        if ci > upper[i]:
+            t += idist_fn(ci, upper[i])
+        elif ci < lower[i]:
+            t += idist_fn(ci, lower[i])
+        if t > threshold:
+            break
+    return t
+
+
+def _kim_cost(s1, s2, idist_fn):
+    if len(s1) == 0 or len(s2) == 0:
+        return 0
+    t = idist_fn(s1[0], s2[0])
+    if len(s1) > 1 or len(s2) > 1:
+        t += idist_fn(s1[-1], s2[-1])
+    return t
+
+
+def _improved_cost(s1, s2, lower, upper, window, idist_fn, threshold=math.inf):
+    h = [upper[i] if s1[i] > upper[i] else (lower[i] if s1[i] < lower[i] else s1[i])
+         for i in range(len(s1))]
+    lower_h, upper_h = envelope(h, len(s2), window)
+    return _keogh_cost(s2, lower_h, upper_h, idist_fn, threshold)
+
+
+def lb_kim(s1, s2, **kwargs):
+    """Lower bound LB_Kim.
+
+    Every warping path matches the first points and the last points of both series.
+
+    :param s1: First series (or its :class:`Envelope`)
+    :param s2: Second series (or its :class:`Envelope`)
+    :param kwargs: :class:`DTWSettings` arguments
+    :return: Lower bound for the DTW distance
+    """
+    (s1, _), (s2, _) = _unwrap(s1), _unwrap(s2)
+    s = _settings(s1, s2, kwargs)
+    if not is_valid(**s.kwargs()):
+        return 0
+    cc = _use_c(s, s1, s2)
+    if cc is not None:
+        return cc.lb_kim(_c_array(s1, cc), _c_array(s2, cc), **s.c_kwargs())
+    idist_fn, result_fn, _ = innerdistance.inner_dist_fns(s.inner_dist)
+    return result_fn(_kim_cost(s1, s2, idist_fn))
+
+
+def lb_keogh(s1, s2, **kwargs):
+    """Lower bound LB_Keogh.
+
+    Distance between s1 and the envelope of s2.
+
+    :param s1: First series (or its :class:`Envelope`)
+    :param s2: Second series or its :class:`Envelope` (for series of length len(s1))
+    :param kwargs: :class:`DTWSettings` arguments
+    :return: Lower bound for the DTW distance
+    """
+    (s1, _), (s2, env2) = _unwrap(s1), _unwrap(s2)
+    s = _settings(s1, s2, kwargs)
+    if not is_valid(**s.kwargs()):
+        return 0
+    cc = _use_c(s, s1, s2)
+    if cc is not None:
+        if env2 is not None:
+            env2.check(len(s1), s.window)
+            return cc.lb_keogh_envelope(_c_array(s1, cc), _c_array(env2.lower, cc), _c_array(env2.upper, cc),
+                                        **s.c_kwargs())
+        return cc.lb_keogh(_c_array(s1, cc), _c_array(s2, cc), **s.c_kwargs())
+    idist_fn, result_fn, _ = innerdistance.inner_dist_fns(s.inner_dist)
+    lower, upper = _envelope(env2, s2, len(s1), s.window)
+    return result_fn(_keogh_cost(s1, lower, upper, idist_fn))
+
+
+def lb_improved(s1, s2, **kwargs):
+    """Lower bound LB_Improved.
+
+    LB_Keogh(s1, s2) plus the LB_Keogh between s2 and the projection of s1
+    on the envelope of s2. This bound is at least as tight as LB_Keogh(s1, s2).
+
+    :param s1: First series (or its :class:`Envelope`)
+    :param s2: Second series or its :class:`Envelope` (for series of length len(s1))
+    :param kwargs: :class:`DTWSettings` arguments
+    :return: Lower bound for the DTW distance
+    """
+    (s1, _), (s2, env2) = _unwrap(s1), _unwrap(s2)
+    s = _settings(s1, s2, kwargs)
+    if not is_valid(**s.kwargs()):
+        return 0
+    cc = _use_c(s, s1, s2)
+    if cc is not None:
+        if env2 is not None:
+            env2.check(len(s1), s.window)
+            return cc.lb_improved_envelope(_c_array(s1, cc), _c_array(s2, cc),
+                                           _c_array(env2.lower, cc), _c_array(env2.upper, cc), **s.c_kwargs())
+        return cc.lb_improved(_c_array(s1, cc), _c_array(s2, cc), **s.c_kwargs())
+    idist_fn, result_fn, _ = innerdistance.inner_dist_fns(s.inner_dist)
+    lower, upper = _envelope(env2, s2, len(s1), s.window)
+    t = _keogh_cost(s1, lower, upper, idist_fn)
+    t += _improved_cost(s1, s2, lower, upper, s.window, idist_fn)
+    return result_fn(t)
+
+
+def lb_cascade(s1, s2, threshold=None, **kwargs):
+    """Cascade of lower bounds (LB_Kim, LB_Keogh in both directions, LB_Improved).
+
+    The bounds are computed from cheap to expensive and the cascade stops
+    as soon as a bound is larger than the threshold.
+
+    :param s1: First series or its :class:`Envelope` (for series of length len(s2))
+    :param s2: Second series or its :class:`Envelope` (for series of length len(s1))
+    :param threshold: Stop when a lower bound is larger than this value
+        (e.g., max_dist). If None, all bounds are computed.
+    :param kwargs: :class:`DTWSettings` arguments
+    :return: The tightest lower bound that has been computed
+    """
+    (s1, env1), (s2, env2) = _unwrap(s1), _unwrap(s2)
+    s = _settings(s1, s2, kwargs)
+    if not is_valid(**s.kwargs()):
+        return 0
+    cc = _use_c(s, s1, s2)
+    if cc is not None:
+        lower1 = upper1 = lower2 = upper2 = None
+        if env1 is not None:
+            env1.check(len(s2), s.window)
+            lower1, upper1 = _c_array(env1.lower, cc), _c_array(env1.upper, cc)
+        if env2 is not None:
+            env2.check(len(s1), s.window)
+            lower2, upper2 = _c_array(env2.lower, cc), _c_array(env2.upper, cc)
+        return cc.lb_cascade_envelope(_c_array(s1, cc), _c_array(s2, cc), lower1, upper1, lower2, upper2,
+                                      threshold=threshold, **s.c_kwargs())
+    idist_fn, result_fn, ival_fn = innerdistance.inner_dist_fns(s.inner_dist)
+    threshold = math.inf if threshold is None else ival_fn(threshold)
+    # LB_Kim
+    lb = _kim_cost(s1, s2, idist_fn)
+    if lb > threshold:
+        return result_fn(lb)
+    # LB_Keogh(s1, s2), the envelope of s2 is reused by LB_Improved
+    lower, upper = _envelope(env2, s2, len(s1), s.window)
+    lb_keogh_12 = _keogh_cost(s1, lower, upper, idist_fn, threshold)
+    lb = max(lb, lb_keogh_12)
+    if lb > threshold:
+        return result_fn(lb)
+    # LB_Keogh(s2, s1)
+    lower_1, upper_1 = _envelope(env1, s1, len(s2), s.window)
+    lb = max(lb, _keogh_cost(s2, lower_1, upper_1, idist_fn, threshold))
+    if lb > threshold:
+        return result_fn(lb)
+    # LB_Improved(s1, s2)
+    t = lb_keogh_12 + _improved_cost(s1, s2, lower, upper, s.window, idist_fn, threshold - lb_keogh_12)
+    return result_fn(max(lb, t))
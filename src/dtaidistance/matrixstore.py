@@ -0,0 +1,348 @@
+# -*- coding: UTF-8 -*-
+"""
+dtaidistance.matrixstore
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+Distance matrices that are computed in tiles and stored on disk.
+
+A large distance matrix is split in square tiles of the upper triangular
+matrix. Every finished tile is written to its own ``.npy`` file such that
+an interrupted computation can be restarted and only computes the missing
+tiles. Rows can be read back lazily without loading the full matrix.
+
+:author: Wannes Meert
+:copyright: Copyright 2025 KU Leuven, DTAI Research Group.
+:license: Apache License, Version 2.0, see LICENSE for details.
+
+"""
+import os
+import json
+import hashlib
+import logging
+
+from . import dtw
+from . import util_numpy
+from .util import SeriesContainer, RaggedSeries
+from .exceptions import NumpyException
+
+try:
+    if util_numpy.test_without_numpy():
+        raise ImportError()
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
+
+logger = logging.getLogger("be.kuleuven.dtai.distance")
+
+meta_filename = "meta.json"
+tiles_dirname = "tiles"
+series_filename = "series.npy"
+offsets_filename = "series_offsets.npy"
+
+
+def series_fingerprint(s):
+    """Hash of the given series, used to check that a store belongs to the same data."""
+    h = hashlib.sha1()
+    for series in s:
+        series = np.ascontiguousarray(series, dtype=np.double)
+        h.update(str(series.shape).encode())
+        h.update(series.tobytes())
+    return h.hexdigest()
+
+
+def _jsonable(value):
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (tuple, list)):
+        return [_jsonable(v) for v in value]
+    if np is not None and isinstance(value, np.ndarray):
+        return _jsonable(value.tolist())
+    if np is not None and isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class DistanceMatrixStore:
+    def __init__(self, path, nb_series, tile_size, settings=None, fingerprint=None):
+        """Distance matrix stored on disk as tiles of the upper triangular matrix.
+
+        The directory contains a ``meta.json`` file with the number of series, the tile size,
+        the DTW settings (see :meth:`DTWSettings.kwargs`) and a fingerprint of the series,
+        and a ``tiles`` directory with one ``.npy`` file per finished tile.
+        Use :meth:`create` or :meth:`open` instead of this constructor.
+
+        :param path: Directory of the store
+        :param nb_series: Number of series (the matrix has shape (nb_series, nb_series))
+        :param tile_size: Number of rows and columns in a tile
+        :param settings: Dictionary with the DTW settings
+        :param fingerprint: Fingerprint of the series (see :meth:`series_fingerprint`)
+        """
+        if np is None:
+            raise NumpyException("Numpy is required for the distance matrix store")
+        self.path = path
+        self.nb_series = nb_series
+        self.tile_size = tile_size
+        self.settings = settings if settings is not None else {}
+        self.fingerprint = fingerprint
+        self.nb_tiles = (nb_series + tile_size - 1) // tile_size
+
+    @staticmethod
+    def create(path, s, tile_size=1000, **kwargs):
+        """Create a new store or open the existing store in the given directory.
+
+        An existing store is only reused if it was created for the same series,
+        tile size and settings. Otherwise a ValueError is raised.
+
+        :param path: Directory of the store
+        :param s: Series for which the distance matrix will be stored
+        :param tile_size: Number of rows and columns in a tile
+        :param kwargs: See arguments for :class:`DTWSettings`
+        """
+        if np is None:
+            raise NumpyException("Numpy is required for the distance matrix store")
+        if tile_size < 1:
+            raise ValueError("tile_size should be a positive number (got {})".format(tile_size))
+        settings = dtw.DTWSettings(**kwargs).kwargs()
+        settings.pop("use_c")
+        settings = _jsonable(settings)
+        s = SeriesContainer.wrap(s)
+        store = DistanceMatrixStore(path, len(s), tile_size, settings, series_fingerprint(s))
+        if os.path.exists(os.path.join(path, meta_filename)):
+            existing = DistanceMatrixStore.open(path)
+            for key in ["nb_series", "tile_size", "settings", "fingerprint"]:
+                if getattr(existing, key) != getattr(store, key):
+                    raise ValueError("Existing store in {} has a different {} ({} != {})".format(
+                        path, key, getattr(existing, key), getattr(store, key)))
+            return existing
+        os.makedirs(os.path.join(path, tiles_dirname), exist_ok=True)
+        store._write_meta()
+        return store
+
+    @staticmethod
+    def open(path):
+        """Open an existing store."""
+        with open(os.path.join(path, meta_filename), "r") as ifile:
+            meta = json.load(ifile)
+        return DistanceMatrixStore(path, meta["nb_series"], meta["tile_size"],
+                                   meta["settings"], meta["fingerprint"])
+
+    def _write_meta(self):
+        meta = {
+            "nb_series": self.nb_series,
+            "tile_size": self.tile_size,
+            "settings": self.settings,
+            "fingerprint": self.fingerprint
+        }
+        fn = os.path.join(self.path, meta_filename)
+        with open(fn + ".tmp", "w") as ofile:
+            json.dump(meta, ofile, indent=2)
+        os.replace(fn + ".tmp", fn)
+
+    def dtw_kwargs(self):
+        """The DTW settings of this store as arguments for :class:`DTWSettings`."""
+        return dict(self.settings)
+
+    def write_series(self, s):
+        """Write the series to the store such that workers can read them (see :mod:`dtaidistance.worker`).
+
+        All series are concatenated in one array, the begin index of every series is stored separately.
+        """
+        s = SeriesContainer.wrap(s)
+        if series_fingerprint(s) != self.fingerprint:
+            raise ValueError("The series do not match the fingerprint of the store in {}".format(self.path))
+        series = [np.asarray(series) for series in s]
+        offsets = np.zeros(len(series) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(series) for series in series])
+        for fn, data in [(offsets_filename, offsets), (series_filename, np.concatenate(series))]:
+            fn = os.path.join(self.path, fn)
+            with open(fn + ".tmp", "wb") as ofile:
+                np.save(ofile, data)
+            os.replace(fn + ".tmp", fn)
+
+    def has_series(self):
+        return os.path.exists(os.path.join(self.path, series_filename))
+
+    def read_series(self):
+        """Read the series that were written with :meth:`write_series`.
+
+        The values are memory-mapped (see :mod:`dtaidistance.dataset`), not loaded.
+        """
+        data = np.load(os.path.join(self.path, series_filename), mmap_mode="c")
+        offsets = np.load(os.path.join(self.path, offsets_filename))
+        return RaggedSeries(data, offsets)
+
+    # Tiles
+
+    def tiles(self):
+        """All tiles (row tile, column tile) of the upper triangular matrix, in row-major order."""
+        return [(ti, tj) for ti in range(self.nb_tiles) for tj in range(ti, self.nb_tiles)]
+
+    def tile_range(self, t):
+        """Begin and end index of the rows (or columns) in the given row (or column) tile."""
+        return t * self.tile_size, min(self.nb_series, (t + 1) * self.tile_size)
+
+    def tile_block(self, ti, tj):
+        """Block argument for :meth:`dtw.distance_matrix` to compute the given tile."""
+        return self.tile_range(ti), self.tile_range(tj)
+
+    def tile_path(self, ti, tj):
+        return os.path.join(self.path, tiles_dirname, "tile_{}_{}.npy".format(ti, tj))
+
+    def has_tile(self, ti, tj):
+        return os.path.exists(self.tile_path(ti, tj))
+
+    def pending_tiles(self):
+        """Tiles that have not yet been computed."""
+        return [(ti, tj) for ti, tj in self.tiles() if not self.has_tile(ti, tj)]
+
+    def is_complete(self):
+        return len(self.pending_tiles()) == 0
+
+    def write_tile(self, ti, tj, dists):
+        """Write a tile to disk.
+
+        The file is first written to a temporary file and then renamed, such that
+        a tile file only exists if it is complete.
+
+        :param dists: Array of shape (rows in tile, columns in tile). For tiles on the
+            diagonal only the values above the diagonal are used.
+        """
+        fn = self.tile_path(ti, tj)
+        fn_tmp = "{}.{}.tmp".format(fn[:-4], os.getpid())
+        with open(fn_tmp, "wb") as ofile:
+            np.save(ofile, dists)
+        os.replace(fn_tmp, fn)
+
+    def read_tile(self, ti, tj, mmap_mode="r"):
+        """Read a tile from disk (returns None if the tile is not yet computed)."""
+        if not self.has_tile(ti, tj):
+            return None
+        return np.load(self.tile_path(ti, tj), mmap_mode=mmap_mode)
+
+    def compute_tile(self, s, ti, tj, **kwargs):
+        """Compute the distances in a tile and write it to disk.
+
+        :param s: Series for which the store was created
+        :param kwargs: Extra arguments for :meth:`dtw.distance_matrix` (e.g. parallel or use_c)
+        """
+        (rb, re), (cb, ce) = self.tile_block(ti, tj)
+        dtw_kwargs = self.dtw_kwargs()
+        dtw_kwargs.update(kwargs)
+        dists = dtw.distance_matrix(s, block=((rb, re), (cb, ce)), compact=True, **dtw_kwargs)
+        tile = np.full((re - rb, ce - cb), np.inf)
+        if ti == tj:
+            tile[np.triu_indices(re - rb, k=1)] = dists
+        else:
+            tile[:, :] = np.asarray(dists).reshape((re - rb, ce - cb))
+        self.write_tile(ti, tj, tile)
+        return tile
+
+    # Lazy access
+
+    def __len__(self):
+        return self.nb_series
+
+    def row(self, r):
+        """Row r of the (symmetric) distance matrix.
+
+        Only the tiles that contain values of this row are read. Values of tiles
+        that are not yet computed are NaN.
+        """
+        if not 0 <= r < self.nb_series:
+            raise IndexError("Row {} out of range for {} series".format(r, self.nb_series))
+        result = np.full(self.nb_series, np.nan)
+        ti = r // self.tile_size
+        lr = r - ti * self.tile_size
+        for tj in range(self.nb_tiles):
+            cb, ce = self.tile_range(tj)
+            if tj < ti:
+                tile = self.read_tile(tj, ti)
+                if tile is not None:
+                    result[cb:ce] = tile[:, lr]
+            elif tj > ti:
+                tile = self.read_tile(ti, tj)
+                if tile is not None:
+                    result[cb:ce] = tile[lr, :]
+            else:
+                tile = self.read_tile(ti, ti)
+                if tile is not None:
+                    result[cb:r] = tile[:lr, lr]
+                    result[r + 1:ce] = tile[lr, lr + 1:]
+        result[r] = 0
+        return result
+
+    def __getitem__(self, r):
+        return self.row(r)
+
+    def __iter__(self):
+        for r in range(self.nb_series):
+            yield self.row(r)
+
+    def to_matrix(self, only_triu=False):
+        """Load the full distance matrix in memory.
+
+        :param only_triu: Only fill in the upper triangular matrix (other values are infinity,
+            as in :meth:`dtw.distance_matrix`)
+        """
+        result = np.full((self.nb_series, self.nb_series), np.nan)
+        for ti, tj in self.tiles():
+            tile = self.read_tile(ti, tj)
+            if tile is None:
+                continue
+            (rb, re), (cb, ce) = self.tile_block(ti, tj)
+            if ti == tj:
+                idxs = np.triu_indices(re - rb, k=1)
+                result[idxs[0] + rb, idxs[1] + cb] = tile[idxs]
+            else:
+                result[rb:re, cb:ce] = tile
+        if only_triu:
+            result[np.tril_indices(self.nb_series, k=0)] = np.inf
+        else:
+            idxs = np.tril_indices(self.nb_series, k=-1)
+            result[idxs] = result.T[idxs]
+            np.fill_diagonal(result, 0)
+        return result
+
+
+def distance_matrix(s, path, tile_size=1000, show_progress=False, parallel=False, use_mp=False, **kwargs):
+    """Distance matrix for all sequences in s, computed in tiles that are stored in a directory.
+
+    Tiles that are already present in the directory (e.g. from a previous run that was
+    interrupted) are not computed again.
+
+    :param s: Iterable of series
+    :param path: Directory of the store
+    :param tile_size: Number of rows and columns in a tile
+    :param show_progress: Show progress over the tiles using the tqdm library
+    :param parallel: Use parallel operations to compute a tile
+    :param use_mp: Force use Multiprocessing for parallel operations (not OpenMP)
+    :param kwargs: See arguments for :class:`DTWSettings`
+    :returns: The :class:`DistanceMatrixStore`
+    """
+    s = SeriesContainer.wrap(s)
+    use_c = kwargs.pop("use_c", False)
+    store = DistanceMatrixStore.create(path, s, tile_size=tile_size, **kwargs)
+    pending = store.pending_tiles()
+    logger.debug("Computing {} of {} tiles".format(len(pending), len(store.tiles())))
+    if show_progress:
+        if tqdm is None:
+            raise ValueError('show_progress cannot be true is tqdm is not available')
+        pending = tqdm(pending)
+    for ti, tj in pending:
+        store.compute_tile(s, ti, tj, parallel=parallel, use_mp=use_mp, use_c=use_c)
+    return store
+
+
+def distance_matrix_fast(s, path, tile_size=1000, show_progress=False, parallel=True, use_pruning=True,
+                         **kwargs):
+    """Same as :meth:`distance_matrix` but with different defaults to choose the
+    fast C-based version of the methods (use_c = True, parallel = True, use_pruning = True).
+    """
+    return distance_matrix(s, path, tile_size=tile_size, show_progress=show_progress,
+                           parallel=parallel, use_c=True, use_pruning=use_pruning, **kwargs)
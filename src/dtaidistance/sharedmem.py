@@ -0,0 +1,271 @@
+# -*- coding: UTF-8 -*-
+"""
+dtaidistance.sharedmem
+~~~~~~~~~~~~~~~~~~~~~~
+
+Series and results in shared memory for a pool of processes.
+
+The series are copied once to a shared memory block (one contiguous buffer with
+the values of all series, preceded by the offsets of every series). When such an
+object is sent to another process, only the name of the block is pickled and the
+receiving process attaches to the same memory. Workers thus receive indices or
+blocks of the matrix instead of the series and write their results directly to
+a shared output array.
+
+:author: Wannes Meert
+:copyright: Copyright 2025 KU Leuven, DTAI Research Group.
+:license: Apache License, Version 2.0, see LICENSE for details.
+
+"""
+import os
+import sys
+import logging
+from multiprocessing import shared_memory
+
+from . import dtw
+from . import util_numpy
+from .util import SeriesContainer, RaggedSeries
+from .exceptions import NumpyException
+
+try:
+    if util_numpy.test_without_numpy():
+        raise ImportError()
+    import numpy as np
+except ImportError:
+    np = None
+
+
+logger = logging.getLogger("be.kuleuven.dtai.distance")
+
+# Shared series this process is attached to (name -> object), such that a worker attaches
+# only once to series that are used by many tasks. Workers of a persistent executor keep
+# the last max_attached series open (the memory is only freed after all processes close it).
+_attached = {}
+max_attached = 2
+
+
+def _open(name):
+    if sys.version_info >= (3, 13):
+        # Only the process that created the block should remove it
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def _remember(obj):
+    while len(_attached) >= max_attached:
+        _attached.pop(next(iter(_attached))).close()
+    _attached[obj.shm.name] = obj
+    return obj
+
+
+def _attach_series(name, nb_series, dtype, ndim):
+    if name not in _attached:
+        _remember(SharedSeries(_open(name), nb_series, dtype, ndim))
+    return _attached[name]
+
+
+def _attach_array(name, shape, dtype):
+    return SharedArray(_open(name), shape, dtype)
+
+
+def _close(shm):
+    try:
+        shm.close()
+    except BufferError:
+        # A view on the memory still exists, the mapping is closed when it is garbage collected
+        logger.debug("Shared memory {} is still in use".format(shm.name))
+
+
+class SharedSeries:
+    def __init__(self, shm, nb_series, dtype, ndim, owner=False):
+        """Series stored in a shared memory block.
+
+        Use :meth:`create` to copy series to a new block. The block starts with
+        nb_series + 1 offsets (int64, in number of time points) followed by the
+        values of all series. The ``series`` attribute is a matrix if all series
+        have the same length, otherwise a :class:`RaggedSeries`. Both are views on the
+        shared memory that can be given to all methods that expect a list of series.
+
+        :param shm: ``multiprocessing.shared_memory.SharedMemory`` object
+        :param nb_series: Number of series
+        :param dtype: Type of the values
+        :param ndim: Number of dimensions of every time point
+        :param owner: This object created the block and removes it in :meth:`unlink`
+        """
+        if np is None:
+            raise NumpyException("Numpy is required for shared memory series")
+        self.shm = shm
+        self.owner = owner
+        self.nb_series = nb_series
+        self.dtype = np.dtype(dtype)
+        self.ndim = ndim
+        self.offsets = np.ndarray((nb_series + 1,), dtype=np.int64, buffer=shm.buf)
+        self.lengths = np.diff(self.offsets)
+        shape = (int(self.offsets[-1]),) if ndim == 1 else (int(self.offsets[-1]), ndim)
+        values = np.ndarray(shape, dtype=self.dtype, buffer=shm.buf, offset=self.offsets.nbytes)
+        if nb_series > 0 and (self.lengths == self.lengths[0]).all():
+            # All series have the same length, use a matrix (no list of pointers is needed in C)
+            self.series = values.reshape((nb_series, int(self.lengths[0])) + shape[1:])
+        else:
+            self.series = RaggedSeries(values, self.offsets, ndim=ndim)
+
+    @classmethod
+    def create(cls, series):
+        """Copy the series to a new shared memory block.
+
+        :param series: Iterable of series (see :class:`SeriesContainer`)
+        :return: :class:`SharedSeries` that owns the block
+        """
+        if np is None:
+            raise NumpyException("Numpy is required for shared memory series")
+        series = SeriesContainer.wrap(series)
+        dtype = np.float32 if series.is_float32() else np.float64
+        ndim = series.detected_ndim or 1
+        lengths = [len(serie) for serie in series]
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(lengths)
+        size = offsets.nbytes + int(offsets[-1]) * ndim * np.dtype(dtype).itemsize
+        shm = shared_memory.SharedMemory(create=True, size=max(1, size))
+        np.ndarray(offsets.shape, dtype=np.int64, buffer=shm.buf)[:] = offsets
+        shared = cls(shm, len(lengths), dtype, ndim, owner=True)
+        for i, serie in enumerate(series):
+            shared[i][:] = serie
+        return shared
+
+    def close(self):
+        """Close the access to the shared memory (the block itself is not removed)."""
+        self.series = None
+        self.offsets = None
+        _close(self.shm)
+
+    def unlink(self):
+        """Remove the shared memory block if this object created it."""
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        self.unlink()
+
+    def __getitem__(self, item):
+        return self.series[item]
+
+    def __len__(self):
+        return self.nb_series
+
+    def __reduce__(self):
+        return _attach_series, (self.shm.name, self.nb_series, self.dtype.str, self.ndim)
+
+    def __str__(self):
+        return "SharedSeries({}):\n{}".format(self.shm.name, self.series)
+
+
+class SharedArray:
+    def __init__(self, shm, shape, dtype, owner=False):
+        """Numpy array stored in a shared memory block.
+
+        Use :meth:`create` to create a new block. The array is available as the
+        ``array`` attribute.
+        """
+        if np is None:
+            raise NumpyException("Numpy is required for shared memory arrays")
+        self.shm = shm
+        self.owner = owner
+        self.array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, shape, dtype='d'):
+        """Create a new shared memory block for an array with the given shape and type."""
+        if np is None:
+            raise NumpyException("Numpy is required for shared memory arrays")
+        shape = tuple(shape) if isinstance(shape, (tuple, list)) else (shape,)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        return cls(shared_memory.SharedMemory(create=True, size=max(1, size)), shape, dtype, owner=True)
+
+    def close(self):
+        """Close the access to the shared memory (the block itself is not removed)."""
+        self.array = None
+        _close(self.shm)
+
+    def unlink(self):
+        """Remove the shared memory block if this object created it."""
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        self.unlink()
+
+    def __reduce__(self):
+        return _attach_array, (self.shm.name, self.array.shape, self.array.dtype.str)
+
+
+def _distance_matrix_block(t):
+    series, out, offset, block, kwargs = t
+    dists = dtw.distance_matrix(series.series, block=block, compact=True, **kwargs)
+    out.array[offset:offset + len(dists)] = dists
+    out.close()
+    return len(dists)
+
+
+def _block_cost(cumlengths, block, nb_series):
+    """Estimated cost of a block, the sum of the products of the lengths of all pairs."""
+    block, triu = dtw._complete_block(block, nb_series)
+    (rb, re), (cb, ce) = block[0], block[1]
+    cost = 0
+    for r in range(rb, re):
+        c_b = max(r + 1, cb) if triu else cb
+        c_e = min(nb_series, ce)
+        if c_b < c_e:
+            cost += (cumlengths[r + 1] - cumlengths[r]) * (cumlengths[c_e] - cumlengths[c_b])
+    return cost
+
+
+def distance_matrix_blocks(pool, series, block=None, schedule=None, control=None, **kwargs):
+    """Condensed distance matrix, computed by a pool of processes.
+
+    The block is split in blocks of consecutive rows. Every task only contains the
+    block and the names of the shared memory, the worker computes the distances
+    and writes them to the shared output array.
+
+    :param pool: :class:`util.Executor`
+    :param series: :class:`SharedSeries`
+    :param block: See :meth:`dtw.distance_matrix`
+    :param schedule: If 'cost', use smaller blocks and start with the most expensive blocks.
+    :param control: :class:`dtw.DTWControl` object. The distances of the blocks that are
+        not computed are NaN.
+    :param kwargs: See arguments for :class:`dtw.DTWSettings`
+    :return: Numpy array with the condensed distances
+    """
+    nb_series = len(series)
+    length = dtw._distance_matrix_length(block, nb_series)
+    nb_parts = (16 if schedule == 'cost' else 4) * (os.cpu_count() or 1)
+    block_size = max(1, min(2**20, -(-length // nb_parts)))
+    with SharedArray.create(length) as out:
+        out.array[:] = np.nan
+        tasks = []
+        offset = 0
+        for sub_block, sub_length in dtw._distance_matrix_row_blocks(block, nb_series, block_size):
+            tasks.append((series, out, offset, sub_block, kwargs))
+            offset += sub_length
+        if schedule == 'cost':
+            cumlengths = np.zeros(nb_series + 1, dtype=np.int64)
+            cumlengths[1:] = np.cumsum(series.lengths)
+            tasks.sort(key=lambda t: -_block_cost(cumlengths, t[3], nb_series))
+        if control is None:
+            pool.map(_distance_matrix_block, tasks, chunksize=1)
+            return out.array.copy()
+        # Submit the tasks in waves, such that no tasks are left in the pool when stopped
+        wave_size = os.cpu_count() or 1
+        for i in range(0, len(tasks), wave_size):
+            if control.stopped:
+                break
+            for nb_done in pool.imap_unordered(_distance_matrix_block, tasks[i:i + wave_size]):
+                control.update(control.done + nb_done)
+        return out.array.copy()
@@ -986,8 +986,9 @@ def loco_warping_paths(s1, s2, **kwargs):
     r, c = len(s1), len(s2)
 
     if s.use_c:
-        s1 = util_numpy.verify_np_array(s1)
-        s2 = util_numpy.verify_np_array(s2)
+        # The LoCo C library is only compiled for double precision
+        s1 = util_numpy.verify_np_array(s1, dtype=DTYPE)
+        s2 = util_numpy.verify_np_array(s2, dtype=DTYPE)
         dtw._check_library(raise_exception=True)
         inf_rows, inf_cols = s.inf_rows_cols()
         wps = np.full((r + inf_rows, c + inf_cols), -inf, dtype=DTYPE)
@@ -16,6 +16,7 @@ import logging
 
 from .. import dtw  # import warping_paths, warping_paths_fast, best_path, warping_paths_affinity, distance
 from .. import dtw_ndim
+from .. import lowerbounds
 from .. import util_numpy
 from .. import util
 
@@ -205,14 +206,12 @@ class SubsequenceSearch:
         if k is not None and self.k is not None and k <= self.k and self.kbest_distances is not None:
             return self.kbest_distances[:k]
         if self.use_ndim:
-            distance = dtw_ndim.distance
-            lb_keogh = None
+            lb_cascade = None
             if self.use_lb:
                 self.use_lb = False
                 logger.warning('The setting use_lb is ignored for multivariate series.')
         else:
-            distance = dtw.distance
-            lb_keogh = dtw.lb_keogh
+            lb_cascade = lowerbounds.lb_cascade
         if k is None or self.keep_all_distances:
             self.distances = np.zeros((len(self.s),))
             # if self.use_lb:
@@ -221,12 +220,28 @@ class SubsequenceSearch:
         h = [(-np.inf, -1)]
         max_dist = self.max_dist
         self.dists_options['max_dist'] = max_dist
+        # The settings are parsed once, only max_dist changes
+        distance = dtw.prepare(**{**self.dists_options, 'use_ndim': self.use_ndim})
+        use_c = self.dists_options.get('use_c', False)
+        query = util_numpy.verify_np_array(self.query, dtype='d', allow_strided=True) if use_c else self.query
+        query_env = None
         for idx, series in enumerate(self.s):
             if self.use_lb:
-                lb = lb_keogh(self.query, series, **self.dists_options)
-                if lb > max_dist:
+                if query_env is None or query_env.l_other != len(series):
+                    # The envelope of the query is the same for all series of the same length
+                    query_env = lowerbounds.Envelope(self.query, l_other=len(series),
+                                                     window=self.dists_options.get('window'),
+                                                     use_c=self.dists_options.get('use_c', False))
+                # The tolerance avoids pruning a series at distance max_dist because of rounding errors
+                threshold = max_dist * (1 + 1e-9)
+                lb = lb_cascade(query_env, series, threshold=threshold, **self.dists_options)
+                if lb > threshold:
+                    if self.keep_all_distances or k is None:
+                        self.distances[idx] = np.inf
                     continue
-            dist = distance(self.query, series, **self.dists_options)
+            if use_c:
+                series = util_numpy.verify_np_array(series, dtype='d', allow_strided=True)
+            dist = distance(query, series)
             if k is not None:
                 if len(h) < k:
                     if not np.isinf(dist) and dist <= max_dist:
@@ -237,6 +252,7 @@ class SubsequenceSearch:
                         heapq.heappushpop(h, (-dist, idx))
                         max_dist = min(max_dist, -h[0][0])
                 self.dists_options['max_dist'] = max_dist
+                distance.max_dist = max_dist
             if self.keep_all_distances or k is None:
                 self.distances[idx] = dist
         if k is not None:
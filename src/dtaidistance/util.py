@@ -21,6 +21,9 @@ import heapq
 import time
 from bisect import bisect_left, bisect_right
 from enum import Enum
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .exceptions import NumpyException
 
 
 logger = logging.getLogger("be.kuleuven.dtai.distance")
@@ -41,6 +44,11 @@ try:
 except ImportError:
     dtw_cc_omp = None
 
+try:
+    from . import dtw_cc_f32
+except ImportError:
+    dtw_cc_f32 = None
+
 try:
     from . import dtw_cc_numpy
 except ImportError:
@@ -59,6 +67,7 @@ def try_import_c(verbose=False):
     msgs = []
     global dtw_cc
     global dtw_cc_omp
+    global dtw_cc_f32
     global dtw_cc_numpy
     try:
         from . import dtw_cc
@@ -76,6 +85,14 @@ def try_import_c(verbose=False):
         msgs.append(str(exc))
         dtw_cc_omp = None
         is_complete = False
+    try:
+        from . import dtw_cc_f32
+    except Exception as exc:
+        print('Cannot import C-based library for float32 (dtw_cc_f32)')
+        msgs.append('Cannot import C-based library for float32 (dtw_cc_f32)')
+        msgs.append(str(exc))
+        dtw_cc_f32 = None
+        is_complete = False
     try:
         from . import dtw_cc_numpy
     except Exception as exc:
@@ -187,6 +204,130 @@ def detect_ndim(s):
     return None
 
 
+def is_float32(s):
+    """True if the series (or all series in a SeriesContainer) are
+    stored as single precision (float32) values."""
+    if isinstance(s, SeriesContainer):
+        return s.is_float32()
+    if isinstance(s, RaggedSeries):
+        return s.dtype == np.float32
+    if np is not None and isinstance(s, np.ndarray):
+        return s.dtype == np.float32
+    if isinstance(s, array):
+        return s.typecode == 'f'
+    return False
+
+
+class RaggedSeries:
+    def __init__(self, values, offsets, ndim=None):
+        """Series of different lengths stored in one contiguous buffer.
+
+        The values of all series are stored one after the other in ``values``.
+        Series i consists of the time points ``values[offsets[i]:offsets[i+1]]``.
+        The C-components receive pointers into this buffer, nothing is copied
+        or checked per series. A slice with step 1 is a view on the same buffer.
+
+        :param values: Array with the values of all series (1D, or 2D with shape
+            (nb_time_points, ndim) for n-dimensional series)
+        :param offsets: Array with nb_series + 1 indices (in number of time points)
+        :param ndim: Number of dimensions of every time point (default is derived
+            from the shape of values)
+        """
+        if np is None:
+            raise NumpyException("Numpy is required for ragged series")
+        values = np.asarray(values)
+        if values.dtype not in (np.float32, np.float64):
+            values = values.astype(np.float64)
+        if ndim is None:
+            ndim = 1 if values.ndim == 1 else values.shape[1]
+        if ndim > 1 and values.ndim == 1:
+            values = values.reshape((-1, ndim))
+        if values.ndim != (1 if ndim == 1 else 2):
+            raise ValueError("Expected values with shape (n,) or (n, ndim), got {}".format(values.shape))
+        self.values = np.ascontiguousarray(values)
+        self.offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+        self.ndim = ndim
+        if len(self.offsets) == 0:
+            raise ValueError("Expected at least one offset")
+        if (np.diff(self.offsets) < 0).any() or self.offsets[0] < 0 or \
+                self.offsets[-1] > len(self.values):
+            raise ValueError("Offsets should be increasing and within the values")
+
+    @classmethod
+    def from_list(cls, series, dtype=None):
+        """Copy a list of series to one contiguous buffer.
+
+        :param series: Iterable of series (see :class:`SeriesContainer`)
+        :param dtype: Type of the values (default is float32 if all series are
+            float32, otherwise float64)
+        """
+        if np is None:
+            raise NumpyException("Numpy is required for ragged series")
+        if isinstance(series, RaggedSeries):
+            return series
+        series = [np.asarray(serie) for serie in series]
+        if dtype is None:
+            dtype = np.float32 if len(series) > 0 and all(serie.dtype == np.float32 for serie in series) \
+                else np.float64
+        ndim = series[0].shape[1] if len(series) > 0 and series[0].ndim > 1 else 1
+        offsets = np.zeros(len(series) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(serie) for serie in series])
+        if len(series) == 0:
+            values = np.zeros((0,) if ndim == 1 else (0, ndim), dtype=dtype)
+        else:
+            values = np.concatenate(series).astype(dtype, copy=False)
+        return cls(values, offsets, ndim=ndim)
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    def c_data_compat(self, seq_format='d'):
+        """Pointers into the values buffer for the C-component.
+
+        See :meth:`SeriesContainer.c_data_compat`. The values are only copied if
+        their type differs from seq_format. The copy is kept alive by the returned
+        pointers, the values of this object (e.g. a memory map) are not changed.
+        """
+        cc = dtw_cc_f32 if seq_format == 'f' else dtw_cc
+        if cc is None:
+            raise Exception('C library not loaded')
+        values = self.values
+        if values.dtype != np.dtype(seq_format):
+            logger.debug("Ragged series have dtype {}, converting to '{}'.".format(values.dtype, seq_format))
+            values = values.astype(seq_format)
+        return cc.dtw_series_from_ragged(values.reshape(-1), self.offsets, self.ndim)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step == 1:
+                return RaggedSeries(self.values, self.offsets[start:max(start, stop) + 1], ndim=self.ndim)
+            item = range(start, stop, step)
+        if isinstance(item, (int, np.integer)):
+            if item < 0:
+                item += len(self)
+            if not 0 <= item < len(self):
+                raise IndexError("Index {} out of range for {} series".format(item, len(self)))
+            return self.values[self.offsets[item]:self.offsets[item + 1]]
+        # A selection of series is copied to a new buffer
+        return RaggedSeries.from_list([self[int(i)] for i in item], dtype=self.values.dtype)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def __str__(self):
+        return "RaggedSeries(nb_series={}, ndim={}, dtype={})".format(len(self), self.ndim, self.values.dtype)
+
+
 class SeriesContainer:
     def __init__(self, series, support_ndim=True):
         """Container for a list of series.
@@ -206,13 +347,24 @@ class SeriesContainer:
         - List[List[List]]
         - numpy.array (3 dimensional)
 
+        For series of different lengths, a :class:`RaggedSeries` stores all
+        values in one buffer and is passed to C without copying.
+
         When using the C-based extensions, the data is automatically verified and converted.
         """
         self.support_ndim = support_ndim
+        self._envelopes = {}
         # Always detect the dimensionality of the time series, even if support_ndim is false
         self.detected_ndim = False
         if isinstance(series, SeriesContainer):
             self.series = series.series
+            self.detected_ndim = series.detected_ndim
+        elif isinstance(series, RaggedSeries):
+            self.series = series
+            if not self.support_ndim and series.ndim > 1:
+                raise Exception('N-dimensional series are not supported '
+                                '(series.ndim = {}) > 1'.format(series.ndim))
+            self.detected_ndim = series.ndim
         elif np is not None and isinstance(series, np.ndarray):
             # A np.matrix always returns a 2D array, also if you select one row (to be consistent
             # and always be a matrix datastructure). The methods in this toolbox expect a
@@ -248,27 +400,38 @@ class SeriesContainer:
             return
         self.detected_ndim = ndim
 
-    def c_data_compat(self):
+    def c_data_compat(self, seq_format='d'):
         """Return a datastructure that the C-component knows how to handle.
         The method tries to avoid copying or reallocating memory.
 
+        :param seq_format: Type code of the values the C-component expects,
+            'd' for double (dtw_cc) or 'f' for float32 (dtw_cc_f32).
+            Series with another type of values are converted (and thus copied).
         :return: Either a list of buffers or a two-dimensional buffer. The
             buffers are guaranteed to be C-contiguous and can thus be used
             as regular pointer-based arrays in C.
         """
-        if dtw_cc is None:
+        if seq_format == 'f':
+            cc = dtw_cc_f32
+        else:
+            cc = dtw_cc
+        if cc is None:
             raise Exception('C library not loaded')
+        if isinstance(self.series, RaggedSeries):
+            return self.series.c_data_compat(seq_format)
         if type(self.series) == list:
             for i in range(len(self.series)):
                 serie = self.series[i]
                 if np is not None and isinstance(serie, np.ndarray):
                     if not self.support_ndim and serie.ndim != 1:
                         raise Exception('N-dimensional arrays are not supported (serie.ndim = {})'.format(serie.ndim))
-                    if not serie.flags.c_contiguous:
-                        serie = np.asarray(serie, order="C")
+                    if not serie.flags.c_contiguous or serie.dtype != np.dtype(seq_format):
+                        serie = np.asarray(serie, dtype=seq_format, order="C")
                         self.series[i] = serie
                 elif isinstance(serie, array):
-                    pass
+                    if serie.typecode != seq_format:
+                        serie = array(seq_format, serie)
+                        self.series[i] = serie
                 else:
                     raise Exception(
                         "Type of series not supported, "
@@ -276,13 +439,18 @@ class SeriesContainer:
                             type(serie)
                         )
                     )
-            return dtw_cc.dtw_series_from_data(self.series)
+            return cc.dtw_series_from_data(self.series)
         elif np is not None and isinstance(self.series, np.ndarray):
             if not self.series.flags.c_contiguous:
                 logger.warning("Numpy array not C contiguous, copying data.")
                 self.series = self.series.copy(order="C")
+            if self.series.dtype != np.dtype(seq_format):
+                logger.debug("Numpy array has dtype {}, converting to '{}'.".format(self.series.dtype, seq_format))
+                self.series = self.series.astype(seq_format, order="C")
             if not self.support_ndim and self.series.ndim > 2:
                 raise Exception(f'N-dimensional series are not supported (series.ndim = {self.series.ndim})')
+            if seq_format != 'd':
+                return cc.dtw_series_from_data(self.series)
             if dtw_cc_numpy is None:
                 logger.warning("DTAIDistance C-extension for Numpy is not available. Proceeding anyway.")
                 return dtw_cc.dtw_series_from_data(self.series)
@@ -290,7 +458,36 @@ class SeriesContainer:
                 return dtw_cc_numpy.dtw_series_from_numpy_ndim(self.series)
             else:
                 return dtw_cc_numpy.dtw_series_from_numpy(self.series)
-        return dtw_cc.dtw_series_from_data(self.series)
+        return cc.dtw_series_from_data(self.series)
+
+    def is_float32(self):
+        """True if all series are stored as single precision (float32) values."""
+        if np is not None and isinstance(self.series, np.ndarray):
+            return self.series.dtype == np.float32
+        if isinstance(self.series, RaggedSeries):
+            return self.series.dtype == np.float32
+        if type(self.series) == list and len(self.series) > 0:
+            return all(is_float32(serie) for serie in self.series)
+        return False
+
+    def envelopes(self, l_other=None, window=None, use_c=False):
+        """Envelopes of all series, used by the lower bounds.
+
+        The envelopes are computed once for every combination of l_other and
+        window and are stored in this container.
+
+        :param l_other: Length of the series that will be compared with the
+            envelopes (default is the length of each series)
+        :param window: Window as defined in :class:`dtaidistance.dtw.DTWSettings`
+        :param use_c: Use the C library to compute the envelopes
+        :return: List of :class:`dtaidistance.lowerbounds.Envelope`
+        """
+        from .lowerbounds import Envelope
+        key = (l_other, window)
+        if key not in self._envelopes:
+            self._envelopes[key] = [Envelope(serie, l_other=l_other, window=window, use_c=use_c)
+                                    for serie in self.series]
+        return self._envelopes[key]
 
     def get_max_y(self):
         max_y = 0
@@ -455,6 +652,141 @@ class DetectKnee:
         return rvalue
 
 
+class ThreadPool:
+    def __init__(self, max_workers=None):
+        """Pool of threads with the same map interface as ``multiprocessing.Pool``.
+
+        The threads share the memory of this process, the arguments are not pickled.
+        Only useful for functions that release the GIL (e.g. the C implementation of DTW)
+        or on a free-threaded Python build.
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def map(self, fn, args, chunksize=None):
+        return list(self._executor.map(fn, args))
+
+    def imap_unordered(self, fn, args, chunksize=None):
+        futures = [self._executor.submit(fn, arg) for arg in args]
+        for future in as_completed(futures):
+            yield future.result()
+
+    def terminate(self):
+        if sys.version_info >= (3, 9):
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        else:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.terminate()
+
+
+_executor = None
+
+
+class Executor:
+    def __init__(self, max_workers=None, backend='multiprocessing'):
+        """Pool of processes or threads that is reused by the parallel methods.
+
+        Starting a pool of processes is slow because every process imports Numpy
+        and DTAIDistance again. An executor is started once and can be passed as
+        the ``executor`` argument or can be set for all methods with :meth:`set_executor`.
+        It keeps running until :meth:`shutdown` is called (or at the end of a with-block).
+
+        :param max_workers: Number of processes or threads (default is the number of CPUs)
+        :param backend: 'multiprocessing' (a ``multiprocessing.Pool``) or 'threads' (a :class:`ThreadPool`)
+        """
+        if backend not in ['multiprocessing', 'threads']:
+            raise ValueError(f"Unknown value for argument backend: {backend}")
+        self.backend = backend
+        self.temporary = False
+        if backend == 'threads':
+            self._pool = ThreadPool(max_workers)
+        else:
+            import multiprocessing as mp
+            if os.name == 'posix':
+                # The processes should use the resource tracker of this process, otherwise
+                # their tracker removes the shared memory that they use when they stop.
+                from multiprocessing import resource_tracker
+                resource_tracker.ensure_running()
+            self._pool = mp.Pool(max_workers)
+
+    @property
+    def running(self):
+        return self._pool is not None
+
+    def map(self, fn, args, chunksize=None):
+        return self._pool.map(fn, args, chunksize=chunksize)
+
+    def imap_unordered(self, fn, args, chunksize=1):
+        return self._pool.imap_unordered(fn, args, chunksize=chunksize)
+
+    def shutdown(self):
+        """Stop the processes or threads."""
+        global _executor
+        if self._pool is None:
+            return
+        self._pool.terminate()
+        if self.backend == 'multiprocessing':
+            self._pool.join()
+        self._pool = None
+        if _executor is self:
+            _executor = None
+
+    def release(self):
+        """Stop the executor if it was started only for one computation (see :meth:`get_executor`)."""
+        if self.temporary:
+            self.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+
+def set_executor(executor):
+    """Set the executor that is used by all parallel methods.
+
+    :param executor: :class:`Executor` or None to start a new pool for every computation
+    :return: The previous executor
+    """
+    global _executor
+    previous = _executor
+    _executor = executor
+    return previous
+
+
+def get_executor(backend='multiprocessing', executor=None):
+    """The executor to use for a parallel computation.
+
+    This is the given executor, or otherwise the executor set with :meth:`set_executor`,
+    if it uses the given backend. If no executor is given or set, a temporary executor
+    is started that is stopped by :meth:`Executor.release`.
+
+    :param backend: 'multiprocessing' or 'threads'
+    :param executor: :class:`Executor` or None
+    :raises ValueError: If the given executor is not running or uses another backend
+    """
+    if executor is not None:
+        if not executor.running:
+            raise ValueError("The given executor is not running (shutdown was called)")
+        if executor.backend != backend:
+            raise ValueError(f"The given executor uses backend '{executor.backend}' "
+                             f"but this method requires '{backend}'")
+        return executor
+    if _executor is not None and _executor.running:
+        if _executor.backend == backend:
+            return _executor
+        logger.warning(f"The executor set with set_executor uses backend '{_executor.backend}' "
+                       f"but this method requires '{backend}', a temporary executor is started")
+    executor = Executor(backend=backend)
+    executor.temporary = True
+    return executor
+
+
 class SortedList:
     def __init__(self, values):
         self._l = sorted(values)
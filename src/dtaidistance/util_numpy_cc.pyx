@@ -9,7 +9,7 @@ Dynamic Time Warping (DTW), C implementation, numpy specific extensions.
 :license: Apache License, Version 2.0, see LICENSE for details.
 
 """
-import dtw_cc
+from dtw_cc import DTWSeriesMatrix, DTWSeriesMatrixNDim
 from libc.stdint cimport intptr_t
 import numpy as np
 cimport numpy as np
@@ -28,7 +28,7 @@ def dtw_series_from_numpy(np.ndarray[DTYPE_t, ndim=2] data):
             logger.debug("Warning: The numpy array or matrix passed to method distance_matrix is not C-contiguous. " +
                          "The array will be copied.")
             data = data.copy(order='C')
-    ptrs = dtw_cc.DTWSeriesMatrix(data)
+    ptrs = DTWSeriesMatrix(data)
     return ptrs
 
 
@@ -37,5 +37,5 @@ def dtw_series_from_numpy_ndim(np.ndarray[DTYPE_t, ndim=3] data):
             logger.debug("Warning: The numpy array or matrix passed to method distance_matrix is not C-contiguous. " +
                          "The array will be copied.")
             data = data.copy(order='C')
-    ptrs = dtw_cc.DTWSeriesMatrixNDim(data)
+    ptrs = DTWSeriesMatrixNDim(data)
     return ptrs
@@ -0,0 +1,255 @@
+# -*- coding: UTF-8 -*-
+"""
+dtaidistance.worker
+~~~~~~~~~~~~~~~~~~~
+
+Compute a distance matrix with multiple processes or machines that share a directory.
+
+The coordinator writes the series and settings to a :class:`DistanceMatrixStore`.
+Any number of workers, possibly on different hosts, claim the tiles of this store
+by atomically creating a lock file and write the finished tiles to the store.
+No scheduler or server is required, only a shared filesystem.
+
+Start a worker with::
+
+    python -m dtaidistance.worker /shared/path/to/store
+
+:author: Wannes Meert
+:copyright: Copyright 2025 KU Leuven, DTAI Research Group.
+:license: Apache License, Version 2.0, see LICENSE for details.
+
+"""
+import os
+import sys
+import time
+import socket
+import logging
+import argparse
+import threading
+import subprocess
+
+from .matrixstore import DistanceMatrixStore
+
+
+logger = logging.getLogger("be.kuleuven.dtai.distance")
+
+locks_dirname = "locks"
+# Maximal number of seconds between refreshing the lock of a tile that is computed
+heartbeat_interval = 10
+# Default number of seconds after which the lock of a tile is considered stale
+lock_timeout_default = 6 * heartbeat_interval
+
+
+def worker_id():
+    """Identifier of this worker process (hostname and process id)."""
+    return "{}:{}".format(socket.gethostname(), os.getpid())
+
+
+def lock_path(store, ti, tj):
+    return os.path.join(store.path, locks_dirname, "tile_{}_{}.lock".format(ti, tj))
+
+
+def claim_tile(store, ti, tj, lock_timeout=lock_timeout_default):
+    """Claim a tile by creating its lock file.
+
+    Creating a file with O_EXCL is atomic, also on shared filesystems, thus only one
+    worker can claim a tile.
+
+    :param lock_timeout: Locks that are older than this number of seconds are considered
+        stale (e.g. the worker crashed) and can be taken over. None means never,
+        thus a tile claimed by a crashed worker is never computed.
+        Workers refresh the lock while computing a tile (see :class:`LockHeartbeat`),
+        thus the timeout should be larger than ``heartbeat_interval``.
+    :return: True if the tile is claimed by this worker
+    """
+    fn = lock_path(store, ti, tj)
+    try:
+        fd = os.open(fn, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        if lock_timeout is None:
+            return False
+        try:
+            if time.time() - os.path.getmtime(fn) < lock_timeout:
+                return False
+            # Renaming is atomic, only one worker can take over the stale lock
+            fn_stale = "{}.stale.{}".format(fn, worker_id())
+            os.rename(fn, fn_stale)
+            os.remove(fn_stale)
+        except FileNotFoundError:
+            return False
+        logger.info("Taking over stale lock for tile ({}, {})".format(ti, tj))
+        return claim_tile(store, ti, tj, lock_timeout=None)
+    with os.fdopen(fd, "w") as ofile:
+        ofile.write(worker_id())
+    return True
+
+
+def release_tile(store, ti, tj):
+    try:
+        os.remove(lock_path(store, ti, tj))
+    except FileNotFoundError:
+        pass
+
+
+class LockHeartbeat:
+    """Refresh the modification time of a lock file in a background thread.
+
+    A worker that is still computing a tile keeps its lock alive, such that other
+    workers do not take it over, while the lock of a crashed worker becomes stale.
+    """
+    def __init__(self, fn, interval=None):
+        self.fn = fn
+        self.interval = heartbeat_interval if interval is None else interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                os.utime(self.fn)
+            except FileNotFoundError:
+                logger.warning("Lock {} was removed while computing".format(self.fn))
+                return
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+
+
+def work(path, max_tiles=None, lock_timeout=lock_timeout_default, **kwargs):
+    """Compute pending tiles of the store until no unclaimed tiles are left.
+
+    :param path: Directory of the store (created by :meth:`prepare`)
+    :param max_tiles: Stop after computing this number of tiles
+    :param lock_timeout: See :meth:`claim_tile`
+    :param kwargs: Extra arguments for :meth:`dtw.distance_matrix` (e.g. parallel or use_c)
+    :return: Number of tiles computed by this worker
+    """
+    store = DistanceMatrixStore.open(path)
+    s = store.read_series()
+    os.makedirs(os.path.join(path, locks_dirname), exist_ok=True)
+    interval = heartbeat_interval
+    if lock_timeout is not None:
+        interval = min(interval, lock_timeout / 4)
+    nb_computed = 0
+    for ti, tj in store.pending_tiles():
+        if max_tiles is not None and nb_computed >= max_tiles:
+            break
+        if not claim_tile(store, ti, tj, lock_timeout=lock_timeout):
+            continue
+        try:
+            # The tile can be finished in between listing and claiming it
+            if not store.has_tile(ti, tj):
+                logger.debug("Worker {} computes tile ({}, {})".format(worker_id(), ti, tj))
+                with LockHeartbeat(lock_path(store, ti, tj), interval):
+                    store.compute_tile(s, ti, tj, **kwargs)
+                nb_computed += 1
+        finally:
+            release_tile(store, ti, tj)
+    return nb_computed
+
+
+def prepare(s, path, tile_size=1000, **kwargs):
+    """Create the store with the series and settings such that workers can start.
+
+    :param s: Iterable of series
+    :param path: Shared directory of the store
+    :param tile_size: Number of rows and columns in a tile
+    :param kwargs: See arguments for :class:`DTWSettings`
+    :returns: The :class:`DistanceMatrixStore`
+    """
+    store = DistanceMatrixStore.create(path, s, tile_size=tile_size, **kwargs)
+    if not store.has_series():
+        store.write_series(s)
+    os.makedirs(os.path.join(path, locks_dirname), exist_ok=True)
+    return store
+
+
+def worker_args(use_c=False, parallel=False, lock_timeout=lock_timeout_default):
+    """Command line arguments to start a worker with the given options."""
+    args = []
+    if use_c:
+        args.append("--use-c")
+    if parallel:
+        args.append("--parallel")
+    if lock_timeout is None:
+        args.append("--no-lock-timeout")
+    else:
+        args += ["--lock-timeout", str(lock_timeout)]
+    return args
+
+
+def distance_matrix(s, path, nb_workers=2, tile_size=1000, use_c=False, parallel=False,
+                    lock_timeout=lock_timeout_default, poll_interval=1, timeout=None, **kwargs):
+    """Distance matrix for all sequences in s, computed by worker processes.
+
+    This starts nb_workers local worker processes. More workers can be started on
+    other machines that share the directory. After the local workers are finished,
+    this process computes the remaining unclaimed tiles itself and waits for tiles
+    that are claimed by other workers.
+
+    :param s: Iterable of series
+    :param path: Shared directory of the store
+    :param nb_workers: Number of local worker processes
+    :param tile_size: Number of rows and columns in a tile
+    :param use_c: Use the C implementation in the workers
+    :param parallel: Use parallel operations in the workers
+    :param lock_timeout: See :meth:`claim_tile`
+    :param poll_interval: Seconds between checks whether tiles of other workers are finished
+    :param timeout: Raise an exception if the matrix is not complete after this number
+        of seconds. None means wait until all tiles are finished.
+    :param kwargs: See arguments for :class:`DTWSettings`
+    :returns: The :class:`DistanceMatrixStore`
+    """
+    store = prepare(s, path, tile_size=tile_size, **kwargs)
+    cmd = [sys.executable, "-m", "dtaidistance.worker", path] + \
+        worker_args(use_c=use_c, parallel=parallel, lock_timeout=lock_timeout)
+    start_time = time.time()
+    procs = [subprocess.Popen(cmd) for _ in range(nb_workers)]
+    for proc in procs:
+        if proc.wait() != 0:
+            raise Exception("Worker exited with code {}".format(proc.returncode))
+    while True:
+        work(path, lock_timeout=lock_timeout, use_c=use_c, parallel=parallel)
+        if store.is_complete():
+            break
+        if timeout is not None and time.time() - start_time > timeout:
+            raise Exception("Distance matrix is not complete after {} seconds, "
+                            "{} tiles are pending".format(timeout, len(store.pending_tiles())))
+        time.sleep(poll_interval)
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compute tiles of a distance matrix store')
+    parser.add_argument('--verbose', '-v', action='count', default=0, help='Verbose output')
+    parser.add_argument('--quiet', '-q', action='count', default=0, help='Quiet output')
+    parser.add_argument('--use-c', action='store_true', help='Use the C implementation')
+    parser.add_argument('--parallel', action='store_true', help='Use parallel operations')
+    parser.add_argument('--max-tiles', type=int, help='Stop after this number of tiles')
+    parser.add_argument('--lock-timeout', type=float, default=lock_timeout_default,
+                        help='Take over locks older than this number of seconds '
+                             '(default: {})'.format(lock_timeout_default))
+    parser.add_argument('--no-lock-timeout', action='store_const', const=None, dest='lock_timeout',
+                        help='Never take over locks')
+    parser.add_argument('path', help='Directory of the distance matrix store')
+    args = parser.parse_args(argv)
+
+    if not logger.hasHandlers():
+        # Only configure the output if the calling program did not (e.g. when started as a script)
+        logger.setLevel(max(logging.INFO - 10 * (args.verbose - args.quiet), logging.DEBUG))
+        logger.addHandler(logging.StreamHandler(sys.stdout))
+
+    nb_computed = work(args.path, max_tiles=args.max_tiles, lock_timeout=args.lock_timeout,
+                       use_c=args.use_c, parallel=args.parallel)
+    logger.info("Worker {} computed {} tiles".format(worker_id(), nb_computed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
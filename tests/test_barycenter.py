@@ -6,7 +6,7 @@ import logging
 import random
 from pathlib import Path
 
-from dtaidistance import dtw_barycenter, util_numpy
+from dtaidistance import dtw_barycenter, util, util_numpy
 import dtaidistance.dtw_visualisation as dtwvis
 from dtaidistance.exceptions import MatplotlibException, PyClusteringException
 from dtaidistance.clustering.kmeans import KMeans
@@ -365,6 +365,51 @@ def test_barycenter():
             np.testing.assert_array_almost_equal(result, exp_result)
 
 
+@numpyonly
+def test_barycenter_executor():
+    with util_numpy.test_uses_numpy() as np:
+        series = np.array(
+            [[0., 1, 1, 1],
+             [0., 2, 0, 0],
+             [1., 0, 0, 0],
+             [0., 1, 1, 1],
+             [0., 2, 0, 0],
+             [1., 0, 0, 0]])
+        exp_result = np.array([0.33333333, 1.33333333, 0.25, 0.33333333])
+        with util.Executor(max_workers=2) as executor:
+            for use_c in [False, True]:
+                result = dba_loop(series, use_c=use_c, parallel=True, executor=executor)
+                np.testing.assert_array_almost_equal(result, exp_result)
+            assert executor.running
+
+
+@numpyonly
+def test_barycenter_float32():
+    with util_numpy.test_uses_numpy() as np:
+        series = np.array(
+            [[0., 1, 1, 1],
+             [0., 2, 0, 0],
+             [1., 0, 0, 0],
+             [0., 1, 1, 1],
+             [0., 2, 0, 0],
+             [1., 0, 0, 0]], dtype=np.float32)
+        exp_result = np.array([0.33333333, 1.33333333, 0.25, 0.33333333])
+        for use_c in [False, True]:
+            for parallel in [False, True]:
+                result = dba_loop(series, use_c=use_c, parallel=parallel)
+                assert result.dtype == np.float32
+                np.testing.assert_array_almost_equal(result, exp_result, decimal=5)
+        series_ndim = np.array(
+            [[[0., 0], [1, 2], [1, 0], [1, 0]],
+             [[0., 1], [2, 0], [0, 0], [0, 0]],
+             [[1., 2], [0, 0], [0, 0], [0, 1]]], dtype=np.float32)
+        exp_result = dba_loop(series_ndim.astype(np.double), use_c=False)
+        for use_c in [False, True]:
+            result = dba_loop(series_ndim, use_c=use_c)
+            assert result.dtype == np.float32
+            np.testing.assert_array_almost_equal(result, exp_result, decimal=5)
+
+
 @numpyonly
 def test_ndim_barycenter_single():
     with util_numpy.test_uses_numpy() as np:
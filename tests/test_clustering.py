@@ -5,7 +5,7 @@ import pytest
 import logging
 from pathlib import Path
 
-from dtaidistance import dtw, dtw_ndim, clustering, util_numpy
+from dtaidistance import dtw, dtw_ndim, clustering, util, util_numpy
 import dtaidistance.dtw_visualisation as dtwvis
 from dtaidistance.exceptions import PyClusteringException
 
@@ -98,6 +98,31 @@ def test_kmeans_ndim():
         assert str(cl) == "{0: {1, 2, 4, 6}, 1: {0, 3, 5, 7, 8, 9}}"
 
 
+@numpyonly
+@pytest.mark.parametrize("backend", ["threads", "sharedmem"])
+def test_kmeans_backend(backend):
+    with util_numpy.test_uses_numpy() as np:
+        np.random.seed(seed=3980)
+        arr = np.random.random((10, 10, 3))
+
+        model = clustering.kmeans.KMeans(k=2, dists_options={"use_c": True})
+        cl, p = model.fit(arr, backend=backend)
+        assert str(cl) == "{0: {1, 2, 4, 6}, 1: {0, 3, 5, 7, 8, 9}}"
+
+
+@numpyonly
+def test_kmeans_executor():
+    with util_numpy.test_uses_numpy() as np:
+        with util.Executor(max_workers=2) as executor:
+            for backend in [None, "sharedmem"]:
+                np.random.seed(seed=3980)
+                arr = np.random.random((10, 10, 3))
+                model = clustering.kmeans.KMeans(k=2, dists_options={"use_c": True})
+                cl, p = model.fit(arr, backend=backend, executor=executor)
+                assert str(cl) == "{0: {1, 2, 4, 6}, 1: {0, 3, 5, 7, 8, 9}}"
+            assert executor.running
+
+
 @numpyonly
 def test_kmeans_ndim2():
     with util_numpy.test_uses_numpy() as np:
@@ -0,0 +1,85 @@
+import pytest
+from dtaidistance import dtw, dataset, util, util_numpy
+
+
+numpyonly = pytest.mark.skipif("util_numpy.test_without_numpy()")
+
+
+@numpyonly
+@pytest.mark.parametrize("use_c", [False, True])
+def test_dataset_ragged(tmp_path, use_c):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=11)
+        s = [np.cumsum(rng.randn(rng.randint(10, 30))) for _ in range(15)]
+        path = str(tmp_path / "dataset")
+        d = dataset.write_series(path, s, meta={"name": "test"})
+        assert isinstance(d, util.RaggedSeries)
+        assert dataset.read_meta(path)["meta"] == {"name": "test"}
+        for i in range(len(s)):
+            np.testing.assert_array_equal(d[i], s[i])
+        expected = dtw.distance_matrix(s, window=3, use_c=use_c)
+        np.testing.assert_allclose(dtw.distance_matrix(d, window=3, use_c=use_c), expected)
+        np.testing.assert_allclose(dtw.distances_to(s[0], d, window=3, use_c=use_c), expected[0])
+
+
+@numpyonly
+def test_dataset_convert(tmp_path):
+    """Converting a float32 dataset for a double computation does not load it in memory."""
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=12)
+        s = [np.cumsum(rng.randn(rng.randint(10, 30))).astype(np.float32) for _ in range(10)]
+        path = str(tmp_path / "dataset")
+        dataset.write_series(path, s)
+        d = dataset.open_series(path)
+        values = d.values
+        query = s[0].astype(np.float64)
+        expected = dtw.distances_to(query, [si.astype(np.float64) for si in s], window=3, use_c=True)
+        np.testing.assert_allclose(dtw.distances_to(query, d, window=3, use_c=True), expected)
+        assert d.values is values
+        assert d.dtype == np.float32 and d.values.base is not None
+
+
+@numpyonly
+def test_dataset_matrix(tmp_path):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=13)
+        s = rng.randn(8, 20).astype(np.float32)
+        path = str(tmp_path / "dataset")
+        dataset.write_series(path, s)
+        d = dataset.open_series(path)
+        assert isinstance(d, np.memmap)
+        assert d.dtype == np.float32 and d.shape == s.shape
+        np.testing.assert_allclose(dtw.distance_matrix_fast(d), dtw.distance_matrix_fast(s))
+
+
+@numpyonly
+@pytest.mark.parametrize("ragged", [False, True])
+def test_dataset_readonly(tmp_path, ragged):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=14)
+        if ragged:
+            s = [np.cumsum(rng.randn(rng.randint(10, 30))) for _ in range(12)]
+        else:
+            s = list(np.cumsum(rng.randn(12, 20), axis=1))
+        path = str(tmp_path / "dataset")
+        dataset.write_series(path, s)
+        d = dataset.open_series(path, mmap_mode="r")
+        expected = dtw.distance_matrix_fast(s, window=3)
+        for parallel in [False, True]:
+            np.testing.assert_allclose(dtw.distance_matrix_fast(d, window=3, parallel=parallel), expected)
+        for parallel in [False, True]:
+            np.testing.assert_allclose(dtw.distances_to(d[0], d, window=3, use_c=True, parallel=parallel),
+                                       expected[0])
+
+
+@numpyonly
+def test_dataset_create(tmp_path):
+    with util_numpy.test_uses_numpy() as np:
+        path = str(tmp_path / "dataset")
+        d = dataset.create_series(path, [3, 5, 4], ndim=2)
+        for i in range(len(d)):
+            d[i][:] = i
+        del d
+        d = dataset.open_series(path)
+        assert d.ndim == 2 and len(d) == 3
+        np.testing.assert_array_equal(d[1], np.full((5, 2), 1.0))
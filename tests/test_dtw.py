@@ -2,11 +2,12 @@ import math
 import pytest
 import logging
 import sys
-from dtaidistance import dtw, util_numpy
+from dtaidistance import dtw, dtw_ndim, util, util_numpy
 
 
 logger = logging.getLogger("be.kuleuven.dtai.distance")
 numpyonly = pytest.mark.skipif("util_numpy.test_without_numpy()")
+scipyonly = pytest.mark.skipif("util_numpy.test_without_scipy()")
 
 
 def test_expected_length1():
@@ -191,6 +192,582 @@ def test_distance_matrix_block():
                 run_distance_matrix_block(parallel=parallel, use_c=use_c, compact=compact)
 
 
+@numpyonly
+def test_distance_matrix_lanes():
+    """Series of equal length are compared multiple pairs at once."""
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=5)
+        s = rng.rand(21, 30)
+        assert dtw.dtw_cc.lanes_isa() in ["default", "avx2", "avx512f"]
+        for kwargs in [{}, {"window": 4}, {"penalty": 0.1}, {"max_step": 0.4},
+                       {"max_dist": 1.5}, {"use_pruning": True}, {"block": ((2, 15), (4, 19))}]:
+            for parallel in [False, True]:
+                # A list of series uses the pairwise computation
+                expected = dtw.distance_matrix_fast(list(s), parallel=parallel, **kwargs)
+                m = dtw.distance_matrix_fast(s, parallel=parallel, **kwargs)
+                np.testing.assert_array_equal(m, expected)
+
+
+
+@numpyonly
+def test_distance_matrix_lanes_max_dist_tie():
+    """A pair with a distance equal to max_dist is not pruned by the lanes kernel."""
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=29)
+        for s in rng.randn(100, 2, 20):
+            d = dtw.distance_fast(s[0], s[1], window=1, use_pruning=False)
+            m = dtw.distance_matrix_fast(s, window=1, max_dist=d, use_pruning=False)
+            assert m[0, 1] == pytest.approx(d)
+
+@numpyonly
+def test_distance_matrix_lanes_max_step():
+    """With max_step, the Euclidean upper bound used by use_pruning can be smaller than
+    the DTW distance. The lanes kernel should then give the same result as the pairwise kernel."""
+    with util_numpy.test_uses_numpy() as np:
+        s1 = np.array([0, .99, .99, .99, .99, .99, 0])
+        s2 = np.array([0, .99, .99, -.02, .99, .99, 0])
+        s = np.array([s1, s2, s1 + 0.05, s2 + 0.05])
+        assert dtw.distance(s1, s2, max_step=1) == pytest.approx(1.4, abs=1e-3)
+        for use_pruning in [False, True]:
+            kwargs = {"max_step": 1, "use_pruning": use_pruning}
+            expected = np.array([[dtw.distance_fast(si, sj, **kwargs) for sj in s] for si in s])
+            for parallel in [False, True]:
+                m = dtw.distance_matrix_fast(s, parallel=parallel, **kwargs)
+                idxs = np.triu_indices(len(s), k=1)
+                np.testing.assert_array_equal(m[idxs], expected[idxs])
+                ds = dtw.distances_to_fast(s1, s, parallel=parallel, **kwargs)
+                np.testing.assert_array_equal(ds, expected[0])
+
+
+@numpyonly
+@pytest.mark.parametrize("parallel,use_c", [(False, False), (False, True), (True, True)])
+def test_distance_matrix_out(tmp_path, parallel, use_c, monkeypatch):
+    """Write the distance matrix block by block in a memmap."""
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=7)
+        s = [rng.rand(rng.randint(15, 25)) for _ in range(14)]
+        # Small blocks of rows to test the transitions between blocks
+        monkeypatch.setattr(dtw._distance_matrix_out, "__defaults__", (None, None, False, 10))
+        for block in [None, ((2, 9), (4, 12))]:
+            for only_triu in [False, True]:
+                expected = dtw.distance_matrix(s, block=block, only_triu=only_triu, parallel=parallel, use_c=use_c)
+                out = np.memmap(tmp_path / "square.bin", dtype=np.float64, mode="w+", shape=(len(s), len(s)))
+                m = dtw.distance_matrix(s, block=block, only_triu=only_triu, parallel=parallel, use_c=use_c,
+                                        out=out)
+                assert m is out
+                np.testing.assert_array_equal(out, expected)
+            expected = dtw.distance_matrix(s, block=block, compact=True, parallel=parallel, use_c=use_c)
+            out = np.memmap(tmp_path / "condensed.bin", dtype=np.float64, mode="w+", shape=(len(expected),))
+            dtw.distance_matrix(s, block=block, compact=True, parallel=parallel, use_c=use_c, out=out)
+            np.testing.assert_array_equal(out, expected)
+        with pytest.raises(ValueError):
+            dtw.distance_matrix(s, compact=True, parallel=parallel, use_c=use_c, out=np.zeros(5))
+
+
+@numpyonly
+@pytest.mark.parametrize("parallel,use_c", [(False, False), (False, True), (True, True)])
+def test_distance_matrix_sparse(parallel, use_c):
+    """Only the distances smaller than max_dist are returned."""
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=9)
+        s = [np.cumsum(rng.randn(rng.randint(15, 25))) for _ in range(30)]
+        for block in [None, ((2, 20), (5, 25))]:
+            m = dtw.distance_matrix(s, block=block, max_dist=5, parallel=parallel, use_c=use_c)
+            rows, cols, values = dtw.distance_matrix(s, block=block, max_dist=5, sparse=True,
+                                                     parallel=parallel, use_c=use_c)
+            expected_rows, expected_cols = np.nonzero(np.triu(m < np.inf, k=1))
+            np.testing.assert_array_equal(rows, expected_rows)
+            np.testing.assert_array_equal(cols, expected_cols)
+            np.testing.assert_allclose(values, m[rows, cols])
+            assert 0 < len(values) < len(s) * (len(s) - 1) / 2
+
+
+@numpyonly
+@scipyonly
+def test_distance_matrix_sparse_scipy():
+    with util_numpy.test_uses_numpy() as np, util_numpy.test_uses_scipy():
+        rng = np.random.RandomState(seed=9)
+        s = np.cumsum(rng.randn(30, 20), axis=1)
+        m = dtw.distance_matrix_fast(s, max_dist=5)
+        m[np.isinf(m)] = 0
+        for sparse in ["coo", "csr"]:
+            m_sparse = dtw.distance_matrix_fast(s, max_dist=5, sparse=sparse)
+            assert m_sparse.format == sparse
+            np.testing.assert_allclose(m_sparse.toarray(), m)
+        m_sparse = dtw.distance_matrix_fast(s, max_dist=5, sparse="csr", only_triu=True)
+        np.testing.assert_allclose(m_sparse.toarray(), np.triu(m))
+
+
+@numpyonly
+@pytest.mark.parametrize("parallel,use_c", [(False, False), (False, True), (True, True)])
+def test_knn_graph(parallel, use_c):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=11)
+        for s in [[np.cumsum(rng.randn(rng.randint(15, 25))) for _ in range(25)],
+                  np.cumsum(rng.randn(25, 20), axis=1)]:
+            for kwargs in [{}, {"window": 3, "use_lb": True}, {"max_dist": 3}]:
+                m = dtw.distance_matrix(s, use_c=True, **kwargs)
+                np.fill_diagonal(m, np.inf)
+                idxs, dists = dtw.knn_graph(s, 4, parallel=parallel, use_c=use_c, **kwargs)
+                assert idxs.shape == (len(s), 4) and dists.shape == (len(s), 4)
+                np.testing.assert_allclose(dists, np.sort(m, axis=1)[:, :4])
+                found = idxs >= 0
+                np.testing.assert_allclose(m[np.nonzero(found)[0], idxs[found]], dists[found])
+                assert np.all(np.isinf(dists[~found]))
+
+
+@numpyonly
+@pytest.mark.parametrize("parallel,use_c", [(False, False), (False, True), (True, True)])
+def test_distance_matrix_control(parallel, use_c):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=13)
+        for s in [[np.cumsum(rng.randn(rng.randint(15, 25))) for _ in range(20)],
+                  np.cumsum(rng.randn(20, 20), axis=1)]:
+            expected = np.asarray(dtw.distance_matrix(s, compact=True, use_c=True))
+            progress = []
+            control = dtw.DTWControl(callback=lambda done, total: progress.append((done, total)))
+            d = dtw.distance_matrix(s, compact=True, parallel=parallel, use_c=use_c, control=control)
+            np.testing.assert_allclose(d, expected)
+            assert control.status == dtw.DTWControl.RUNNING
+            assert progress[-1] == (len(expected), len(expected))
+
+            control = dtw.DTWControl(callback=lambda done, total: done > total // 3)
+            d = np.asarray(dtw.distance_matrix(s, compact=True, parallel=parallel, use_c=use_c, control=control))
+            assert control.status == dtw.DTWControl.CANCELLED
+            computed = ~np.isnan(d)
+            assert 0 < computed.sum() < len(expected)
+            np.testing.assert_allclose(d[computed], expected[computed])
+
+            control = dtw.DTWControl(timeout=0)
+            m = dtw.distance_matrix(s, parallel=parallel, use_c=use_c, control=control)
+            assert control.status == dtw.DTWControl.TIMEOUT
+            assert np.isnan(m).any()
+
+
+@numpyonly
+@pytest.mark.parametrize("use_c,use_mp", [(True, False), (True, True), (False, True)])
+def test_distance_matrix_schedule(use_c, use_mp):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=19)
+        s = [np.cumsum(rng.randn(rng.choice([5, 10, 80]))) for _ in range(15)]
+        for kwargs in [{}, {"window": 3}, {"itakura_slope": 2}, {"block": ((2, 9), (4, 15))},
+                       {"block": ((2, 9), (4, 15), False), "compact": True}]:
+            expected = dtw.distance_matrix(s, use_c=use_c, **kwargs)
+            control = dtw.DTWControl()
+            d = dtw.distance_matrix(s, parallel=True, use_c=use_c, use_mp=use_mp, schedule="cost",
+                                    control=control, **kwargs)
+            np.testing.assert_allclose(d, expected)
+            assert control.done == control.total
+        with pytest.raises(ValueError):
+            dtw.distance_matrix(s, parallel=True, schedule="longest")
+        # The estimated cost counts the cells in the band
+        cost = dtw._pair_cost(80, 80, dtw.DTWSettings())
+        assert dtw._pair_cost(80, 80, dtw.DTWSettings(itakura_slope=2)) < cost / 2
+        band = [(max(0, i - 2), min(80, i + 3)) for i in range(80)]
+        assert dtw._pair_cost(80, 80, dtw.DTWSettings(band=band)) == sum(e - b for b, e in band) + 1
+
+
+@numpyonly
+@pytest.mark.parametrize("use_c,backend", [(False, "threads"), (True, "threads"),
+                                           (False, "sharedmem"), (True, "sharedmem")])
+def test_distance_matrix_backend(use_c, backend):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=23)
+        s = [np.cumsum(rng.randn(rng.randint(10, 30))) for _ in range(12)]
+        for kwargs in [{}, {"window": 3}, {"block": ((2, 9), (4, 12))},
+                       {"block": ((2, 9), (4, 12), False), "compact": True}]:
+            expected = dtw.distance_matrix(s, use_c=use_c, **kwargs)
+            for schedule in [None, "cost"]:
+                d = dtw.distance_matrix(s, parallel=True, use_c=use_c, backend=backend,
+                                        schedule=schedule, **kwargs)
+                np.testing.assert_allclose(d, expected)
+        with pytest.raises(ValueError):
+            dtw.distance_matrix(s, parallel=True, backend="gpu")
+        if not use_c:
+            with pytest.raises(ValueError):
+                dtw.distance_matrix(s, parallel=True, use_c=use_c, backend="openmp")
+
+
+@numpyonly
+@pytest.mark.parametrize("use_c", [False, True])
+def test_prepare(use_c):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=31)
+        s = [np.cumsum(rng.randn(rng.randint(8, 20))) for _ in range(10)]
+        for kwargs in [{}, {"window": 3}, {"use_pruning": True}, {"max_dist": 3.0}, {"psi": 2},
+                       {"penalty": 0.3, "window": 4}, {"inner_dist": "euclidean"},
+                       {"use_lb": True, "max_dist": 4.0}]:
+            fn = dtw.prepare(use_c=use_c, **kwargs)
+            for i in range(1, len(s)):
+                assert fn(s[0], s[i]) == pytest.approx(dtw.distance(s[0], s[i], use_c=use_c, **kwargs))
+        fn = dtw.prepare(use_c=use_c)
+        fn.max_dist = 2.0
+        assert fn.max_dist == 2.0
+        assert fn(s[0], s[1]) == dtw.distance(s[0], s[1], max_dist=2.0, use_c=use_c)
+        s_ndim = rng.randn(3, 10, 2)
+        fn = dtw.prepare(use_c=use_c, use_ndim=True, window=3)
+        assert fn(s_ndim[0], s_ndim[1]) == pytest.approx(
+            dtw.distance(s_ndim[0], s_ndim[1], use_c=use_c, use_ndim=True, window=3))
+
+
+@numpyonly
+@pytest.mark.parametrize("use_c", [False, True])
+def test_ragged_series(use_c):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=37)
+        s = [np.cumsum(rng.randn(rng.randint(8, 20))) for _ in range(10)]
+        r = util.RaggedSeries.from_list(s)
+        assert len(r) == len(s)
+        np.testing.assert_array_equal(r[3], s[3])
+        expected = dtw.distance_matrix(s, window=3, use_c=use_c)
+        np.testing.assert_allclose(dtw.distance_matrix(r, window=3, use_c=use_c), expected)
+        np.testing.assert_allclose(dtw.distance_matrix(r, window=3, use_c=use_c, parallel=True), expected)
+        np.testing.assert_allclose(dtw.distance_matrix(r[2:6], window=3, use_c=use_c), expected[2:6, 2:6])
+        np.testing.assert_allclose(dtw.distance_matrix(r[::3], window=3, use_c=use_c), expected[::3, ::3])
+        np.testing.assert_allclose(dtw.distances_to(s[0], r[1:], window=3, use_c=use_c), expected[0, 1:])
+        s_ndim = [rng.randn(rng.randint(8, 20), 2) for _ in range(5)]
+        r_ndim = util.RaggedSeries.from_list(s_ndim)
+        assert r_ndim.ndim == 2
+        np.testing.assert_allclose(dtw_ndim.distance_matrix(r_ndim, use_c=use_c),
+                                   dtw_ndim.distance_matrix(s_ndim, use_c=use_c))
+
+
+@numpyonly
+def test_distance_strided():
+    """Columns of a matrix and Fortran-ordered arrays are used without copying."""
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=41)
+        m = np.cumsum(rng.randn(40, 5), axis=0)
+        m_f = np.asfortranarray(np.cumsum(rng.randn(30, 5), axis=0))
+        for s1, s2 in [(m[:, 1], m_f[:, 2]), (m[::2, 3], m_f[1, :]), (m[::-1, 0], m[:, 4])]:
+            for kwargs in [{}, {"window": 3}, {"use_pruning": True}, {"psi": 2},
+                           {"use_lb": True, "max_dist": 5.0}, {"inner_dist": "euclidean"}]:
+                expected = dtw.distance(s1.copy(), s2.copy(), use_c=True, **kwargs)
+                assert dtw.distance(s1, s2, use_c=True, **kwargs) == pytest.approx(expected)
+                assert dtw.prepare(use_c=True, **kwargs)(s1, s2) == pytest.approx(expected)
+        for s1, s2 in [(m[:, 1:4], m_f[:, :3]), (m[::3, ::2], m_f[:, 2:5])]:
+            for kwargs in [{}, {"window": 3}, {"inner_dist": "euclidean"}]:
+                expected = dtw.distance_fast(s1.copy(), s2.copy(), use_ndim=True, **kwargs)
+                assert dtw.distance_fast(s1, s2, use_ndim=True, **kwargs) == pytest.approx(expected)
+                assert dtw.prepare(use_c=True, use_ndim=True, **kwargs)(s1, s2) == pytest.approx(expected)
+
+
+@numpyonly
+def test_distance_strided_readonly():
+    """Read-only buffers (e.g. memory maps in mode 'r') are used without copying."""
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=43)
+        m = np.cumsum(rng.randn(40, 3), axis=0)
+        m.setflags(write=False)
+        expected = dtw.distance(m[:, 0].copy(), m[:, 1].copy(), use_c=True)
+        assert dtw.distance_fast(m[:, 0], m[:, 1]) == pytest.approx(expected)
+        assert dtw.prepare(use_c=True)(m[:, 0], m[:, 1]) == pytest.approx(expected)
+        expected = dtw_ndim.distance_fast(m.copy(), m[::-1].copy())
+        assert dtw_ndim.distance_fast(m, m[::-1]) == pytest.approx(expected)
+        assert dtw.prepare(use_c=True, use_ndim=True)(m, m[::-1]) == pytest.approx(expected)
+        c = np.broadcast_to(m[0, 0], (40,))
+        expected = dtw.distance(c.copy(), m[:, 2].copy(), use_c=True)
+        assert dtw.distance_fast(c, m[:, 2]) == pytest.approx(expected)
+
+
+@numpyonly
+def test_executor():
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=29)
+        s = [np.cumsum(rng.randn(rng.randint(10, 30))) for _ in range(10)]
+        expected = dtw.distance_matrix(s, window=3)
+        with util.Executor(max_workers=2) as executor:
+            for backend in [None, "sharedmem"]:
+                d = dtw.distance_matrix(s, parallel=True, window=3, backend=backend, executor=executor)
+                np.testing.assert_allclose(d, expected)
+            d = dtw.distances_to(s[0], s, parallel=True, window=3, executor=executor)
+            np.testing.assert_allclose(d, expected[0])
+            d = dtw.cdist(s[:3], s, parallel=True, window=3, executor=executor)
+            np.testing.assert_allclose(d, expected[:3])
+            assert executor.running
+            # A global executor is used if no executor is given
+            assert util.set_executor(executor) is None
+            d = dtw.distance_matrix(s, parallel=True, window=3)
+            np.testing.assert_allclose(d, expected)
+            assert util.get_executor() is executor
+            other = util.get_executor("threads")
+            assert other is not executor and other.temporary
+            other.release()
+            # A given executor with another backend is not silently replaced
+            with pytest.raises(ValueError):
+                util.get_executor("threads", executor)
+        assert not executor.running
+        with pytest.raises(ValueError):
+            dtw.distance_matrix(s, parallel=True, window=3, executor=executor)
+        assert util.set_executor(None) is None
+
+
+@numpyonly
+@pytest.mark.parametrize("parallel", [False, True])
+def test_stats(parallel):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=7)
+        s = [np.cumsum(rng.randn(rng.randint(15, 25))) for _ in range(10)]
+        with dtw.stats() as st:
+            dtw.distance_fast(s[0], s[1])
+            with dtw.stats() as st_inner:
+                dtw.distance_fast(s[0], s[1], window=3)
+        assert st_inner.pairs == 1
+        assert st_inner.cells < len(s[0]) * len(s[1])
+        assert st.pairs == 2
+        assert st.cells == len(s[0]) * len(s[1]) + st_inner.cells
+
+        with dtw.stats() as st:
+            dtw.distance_matrix_fast(s, parallel=parallel)
+        assert st.pairs == len(s) * (len(s) - 1) // 2
+        assert st.pairs_pruned == 0 and st.pairs_abandoned == 0
+
+        with dtw.stats() as st:
+            dtw.distance_matrix_fast(s, parallel=parallel, max_dist=3, use_lb=True, use_eapruning=True)
+        assert st.pairs + st.pairs_pruned == len(s) * (len(s) - 1) // 2
+        # Lower bound cascade for all pairs and cumulative bound for early abandoning
+        assert st.lbs == len(s) * (len(s) - 1) // 2 + st.pairs
+        assert st.pairs_pruned > 0
+
+        with dtw.stats() as st:
+            dtw.distance_matrix_fast(s, parallel=parallel, max_dist=3, use_pruning=False, use_eapruning=True)
+        assert st.pairs_abandoned > 0 and st.rows_abandoned > 0
+        dtw.distance_fast(s[0], s[1])
+        assert dtw.stats().pairs == 0
+
+
+@numpyonly
+@pytest.mark.parametrize("parallel", [False, True])
+def test_stats_lanes(parallel):
+    """The lanes kernel only counts the pairs that are compared, not the unused lanes."""
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=8)
+        s = rng.rand(10, 30)
+        # The lanes kernel does not prune cells, the pairwise kernel does with use_pruning
+        for kwargs in [{}, {"window": 5}]:
+            with dtw.stats() as st_lanes:
+                dtw.distance_matrix_fast(s, parallel=parallel, use_pruning=False, **kwargs)
+            with dtw.stats() as st:
+                dtw.distance_matrix_fast(list(s), parallel=parallel, use_pruning=False, **kwargs)
+            assert st_lanes.pairs == st.pairs == len(s) * (len(s) - 1) // 2
+            assert st_lanes.cells == st.cells
+        with dtw.stats() as st_lanes:
+            dtw.distance_matrix_fast(s, parallel=parallel, max_dist=0.1)
+        assert st_lanes.pairs == len(s) * (len(s) - 1) // 2
+        assert 0 < st_lanes.pairs_abandoned <= st_lanes.pairs
+        assert st_lanes.rows_abandoned <= st_lanes.pairs_abandoned * (s.shape[1] - 1)
+
+
+def run_distances_to(parallel=False, use_c=False, use_mp=False):
+    with util_numpy.test_uses_numpy() as np:
+        np.random.seed(3)
+        s = [np.random.rand(np.random.randint(20, 30)) for _ in range(20)]
+        query = np.random.rand(25)
+        expected = [dtw.distance(query, si) for si in s]
+        d = dtw.distances_to(query, s, parallel=parallel, use_c=use_c, use_mp=use_mp)
+        np.testing.assert_allclose(d, expected)
+        idxs, d = dtw.distances_to(query, s, k=3, parallel=parallel, use_c=use_c, use_mp=use_mp)
+        np.testing.assert_allclose(d, np.sort(expected)[:3])
+        assert list(idxs) == list(np.argsort(expected)[:3])
+
+
+@numpyonly
+def test_distances_to():
+    for parallel in [False, True]:
+        for use_c in [False, True]:
+            run_distances_to(parallel=parallel, use_c=use_c)
+
+
+@numpyonly
+def test_distances_to_matrix():
+    with util_numpy.test_uses_numpy() as np:
+        np.random.seed(5)
+        s = np.random.rand(30, 15)
+        query = np.random.rand(15)
+        expected = [dtw.distance(query, si, window=3) for si in s]
+        d = dtw.distances_to_fast(query, s, window=3)
+        np.testing.assert_allclose(d, expected)
+        idxs, d = dtw.distances_to_fast(query, s, k=5, window=3, parallel=False)
+        np.testing.assert_allclose(d, np.sort(expected)[:5])
+
+
+def run_cdist(parallel=False, use_c=False, use_mp=False):
+    with util_numpy.test_uses_numpy() as np:
+        np.random.seed(11)
+        sa = np.random.rand(5, 12)
+        sb = [np.random.rand(np.random.randint(8, 14)) for _ in range(4)]
+        expected = np.array([[dtw.distance(a, b) for b in sb] for a in sa])
+        d = dtw.cdist(sa, sb, parallel=parallel, use_c=use_c, use_mp=use_mp)
+        assert d.shape == (5, 4)
+        np.testing.assert_allclose(d, expected)
+        d = dtw.cdist(sa, sa[:3], parallel=parallel, use_c=use_c, use_mp=use_mp)
+        np.testing.assert_allclose(d, [[dtw.distance(a, b) for b in sa[:3]] for a in sa])
+
+
+@numpyonly
+def test_cdist():
+    for parallel in [False, True]:
+        for use_c in [False, True]:
+            run_cdist(parallel=parallel, use_c=use_c)
+
+
+@numpyonly
+def test_distance_numpy():
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=7)
+        for kwargs in [{}, {"window": 3}, {"penalty": 0.1}, {"penalty_s1": 0.2, "penalty_s2": 0.05},
+                       {"psi": 2}, {"psi": (0, 1, 2, 0)}, {"max_step": 0.5}, {"max_dist": 1.2},
+                       {"use_pruning": True}, {"inner_dist": "euclidean"}, {"window": 2, "max_length_diff": 3}]:
+            for l1, l2 in [(12, 12), (10, 14), (15, 9)]:
+                s1, s2 = rng.rand(l1), rng.rand(l2)
+                d = dtw.distance(s1, s2, **kwargs)
+                d_np = dtw.distance_numpy(s1, s2, **kwargs)
+                assert d_np == pytest.approx(d), f"{kwargs}, {l1}, {l2}"
+                if "max_dist" in kwargs or "use_pruning" in kwargs:
+                    continue
+                d, paths = dtw.warping_paths(s1, s2, **kwargs)
+                d_np, paths_np = dtw.warping_paths_numpy(s1, s2, **kwargs)
+                assert d_np == pytest.approx(d), f"{kwargs}, {l1}, {l2}"
+                if paths is not None:
+                    np.testing.assert_allclose(paths_np, paths)
+
+
+@numpyonly
+def test_distance_numpy_without_c(monkeypatch):
+    with util_numpy.test_uses_numpy() as np:
+        s1 = np.array([0., 0, 1, 2, 1, 0, 1, 0, 0])
+        s2 = np.array([0., 1, 2, 0, 0, 0, 0, 0, 0])
+        monkeypatch.setattr(dtw, "dtw_cc", None)
+        assert dtw.distance(s1, s2) == pytest.approx(math.sqrt(2))
+        d, paths = dtw.warping_paths(s1, s2)
+        assert d == pytest.approx(math.sqrt(2))
+        assert paths.shape == (10, 10)
+
+
+@numpyonly
+def test_float32():
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=3)
+        s = rng.rand(5, 12)
+        s32 = s.astype(np.float32)
+        d = dtw.distance_fast(s[0], s[1], window=3)
+        d32 = dtw.distance_fast(s32[0], s32[1], window=3)
+        assert d32 == pytest.approx(d, rel=1e-5)
+        d32, paths32 = dtw.warping_paths_fast(s32[0], s32[1])
+        assert paths32.dtype == np.float32
+        assert d32 == pytest.approx(dtw.distance_fast(s[0], s[1]), rel=1e-5)
+        for parallel in [False, True]:
+            m = dtw.distance_matrix_fast(s, parallel=parallel)
+            m32 = dtw.distance_matrix_fast(s32, parallel=parallel)
+            assert m32.dtype == np.float32
+            np.testing.assert_allclose(m32, m, rtol=1e-5)
+            ds32 = dtw.distances_to_fast(s32[0], s32, parallel=parallel)
+            assert ds32.dtype == np.float32
+            np.testing.assert_allclose(ds32, dtw.distances_to_fast(s[0], s, parallel=parallel), rtol=1e-5)
+            cd32 = dtw.cdist_fast(s32[:2], s32, parallel=parallel)
+            assert cd32.dtype == np.float32
+            np.testing.assert_allclose(cd32, dtw.cdist_fast(s[:2], s, parallel=parallel), rtol=1e-5)
+        # Mixing float32 and float64 falls back to double precision
+        ds = dtw.distances_to_fast(s32[0], s)
+        assert ds.dtype == np.float64
+
+
+@numpyonly
+@pytest.mark.parametrize("band_kwargs", [{"itakura_slope": 2}, {"itakura_slope": 1.5, "window": 5},
+                                         {"band": [(max(0, i - 3), min(20, i + 4)) for i in range(20)]}])
+def test_band(band_kwargs):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=9)
+        s = np.cumsum(rng.randn(6, 20), axis=1)
+        settings = dtw.DTWSettings(**band_kwargs)
+        window = band_kwargs.get("window", 20)
+        band = []
+        for i in range(20):
+            b, e = settings.band_row(i, 20, 20)
+            band.append((max(b, i - window + 1), min(e, i + window)))
+        # Reference: the cumulative cost matrix without cells outside of the band
+        d_ref = np.full((21, 21), np.inf)
+        d_ref[0, 0] = 0
+        for i in range(20):
+            for j in range(band[i][0], band[i][1]):
+                d_ref[i + 1, j + 1] = (s[0][i] - s[1][j]) ** 2 + \
+                    min(d_ref[i, j], d_ref[i, j + 1], d_ref[i + 1, j])
+        d_ref = np.sqrt(d_ref[20, 20])
+        assert dtw.distance(s[0], s[1], **band_kwargs) == pytest.approx(d_ref)
+        assert dtw.distance_fast(s[0], s[1], **band_kwargs) == pytest.approx(d_ref)
+        assert dtw.warping_paths(s[0], s[1], **band_kwargs)[0] == pytest.approx(d_ref)
+        assert dtw.warping_paths_fast(s[0], s[1], **band_kwargs)[0] == pytest.approx(d_ref)
+        d, wps = dtw.warping_paths_fast(s[0], s[1], compact=True, **band_kwargs)
+        assert d == pytest.approx(d_ref)
+        assert wps.shape[1] < 21
+        m = dtw.distance_matrix_fast(s, **band_kwargs)
+        m_py = dtw.distance_matrix(s, **band_kwargs)
+        np.testing.assert_allclose(m, m_py)
+        assert m[0, 1] == pytest.approx(d_ref)
+        assert np.all(m[np.triu_indices(6, 1)] >= dtw.distance_matrix_fast(s)[np.triu_indices(6, 1)] - 1e-9)
+
+
+@numpyonly
+@pytest.mark.parametrize("s1,band", [
+    ([0., 1., 2.], [(0, 3), (2, 5), (4, 6)]),
+    ([0., 1., 2.], [(0, 3), (2, 5), (4, 10)]),
+    ([0., 1., 2., 1.], [(0, 4), (2, 6), (3, 8), (6, 9)]),
+])
+def test_band_unequal_length(s1, band):
+    with util_numpy.test_uses_numpy() as np:
+        s1 = np.array(s1)
+        s2 = np.arange(10) * 0.3
+        d = dtw.distance(s1, s2, band=band)
+        assert dtw.distance_fast(s1, s2, band=band) == pytest.approx(d)
+        assert dtw.warping_paths(s1, s2, band=band)[0] == pytest.approx(d)
+        assert dtw.warping_paths_fast(s1, s2, band=band)[0] == pytest.approx(d)
+        assert dtw.warping_paths_fast(s1, s2, band=band, compact=True)[0] == pytest.approx(d)
+        if band[-1][1] < len(s2):
+            assert d == float('inf')
+
+
+@numpyonly
+def test_band_psi():
+    """The free start of psi does not depend on where the band of a row starts."""
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=11)
+        band = [(0, 3), (4, 5), (3, 5), (0, 3), (2, 4), (3, 5), (1, 4), (0, 2), (3, 5)]
+        for _ in range(10):
+            s1, s2 = np.cumsum(rng.randn(9)), np.cumsum(rng.randn(5))
+            for psi in [3, (3, 0, 0, 0), (2, 1, 1, 2)]:
+                d_ref = dtw.warping_paths(s1, s2, band=band, psi=psi)[0]
+                if psi == 3:
+                    assert d_ref < float('inf')
+                assert dtw.distance(s1, s2, band=band, psi=psi) == pytest.approx(d_ref)
+                assert dtw.distance_fast(s1, s2, band=band, psi=psi) == pytest.approx(d_ref)
+
+
+@numpyonly
+def test_band_numpy():
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=12)
+        s1, s2 = np.cumsum(rng.randn(10)), np.cumsum(rng.randn(12))
+        for kwargs in [{"itakura_slope": 1.2}, {"band": [(0, 12)] * 10}]:
+            with pytest.raises(ValueError):
+                dtw.distance_numpy(s1, s2, **kwargs)
+            with pytest.raises(ValueError):
+                dtw.warping_paths_numpy(s1, s2, **kwargs)
+
+
+@numpyonly
+def test_itakura_unequal_length():
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=10)
+        s1, s2 = np.cumsum(rng.randn(12)), np.cumsum(rng.randn(30))
+        d_py = dtw.distance(s1, s2, itakura_slope=3)
+        assert dtw.distance_fast(s1, s2, itakura_slope=3) == pytest.approx(d_py)
+        # The Euclidean distance is not an upper bound if its path is outside the parallelogram
+        assert dtw.distance_fast(s1, s2, itakura_slope=3, use_pruning=True) == pytest.approx(d_py)
+        path = dtw.warping_path_fast(s1, s2, itakura_slope=3)
+        settings = dtw.DTWSettings(itakura_slope=3)
+        assert all(settings.band_row(i, 12, 30)[0] <= j < settings.band_row(i, 12, 30)[1] for i, j in path)
+
+
 if __name__ == "__main__":
     logger.setLevel(logging.DEBUG)
     logger.addHandler(logging.StreamHandler(sys.stdout))
@@ -202,6 +202,49 @@ def test_distances2_fast_parallel():
         assert m[4] == pytest.approx(3.0000)
 
 
+@numpyonly
+def test_distances_to():
+    with util_numpy.test_uses_numpy() as np:
+        np.random.seed(7)
+        s = np.random.rand(12, 10, 3)
+        query = np.random.rand(9, 3)
+        expected = [dtw_ndim.distance(query, si) for si in s]
+        d1 = dtw_ndim.distances_to(query, s)
+        d2 = dtw_ndim.distances_to_fast(query, s)
+        d3 = dtw_ndim.distances_to_fast(query, list(s), parallel=False)
+        np.testing.assert_allclose(d1, expected)
+        np.testing.assert_allclose(d2, expected)
+        np.testing.assert_allclose(d3, expected)
+        idxs, d = dtw_ndim.distances_to_fast(query, s, k=2)
+        assert list(idxs) == list(np.argsort(expected)[:2])
+
+
+@numpyonly
+def test_cdist():
+    with util_numpy.test_uses_numpy() as np:
+        np.random.seed(13)
+        sa = np.random.rand(4, 10, 2)
+        sb = [np.random.rand(n, 2) for n in [8, 9, 11]]
+        expected = np.array([[dtw_ndim.distance(a, b) for b in sb] for a in sa])
+        np.testing.assert_allclose(dtw_ndim.cdist(sa, sb), expected)
+        np.testing.assert_allclose(dtw_ndim.cdist_fast(sa, sb), expected)
+        np.testing.assert_allclose(dtw_ndim.cdist_fast(sa, sa[:2], parallel=False),
+                                   [[dtw_ndim.distance(a, b) for b in sa[:2]] for a in sa])
+
+
+@numpyonly
+def test_float32():
+    with util_numpy.test_uses_numpy() as np:
+        np.random.seed(17)
+        s = np.random.rand(5, 10, 3)
+        s32 = s.astype(np.float32)
+        for parallel in [False, True]:
+            m = dtw_ndim.distance_matrix_fast(s, parallel=parallel)
+            m32 = dtw_ndim.distance_matrix_fast(s32, parallel=parallel)
+            assert m32.dtype == np.float32
+            np.testing.assert_allclose(m32, m, rtol=1e-5)
+
+
 if __name__ == "__main__":
     logger.setLevel(logging.DEBUG)
     logger.addHandler(logging.StreamHandler(sys.stdout))
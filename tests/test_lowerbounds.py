@@ -0,0 +1,160 @@
+import math
+import pytest
+from dtaidistance import dtw, lowerbounds, util, util_numpy
+
+
+numpyonly = pytest.mark.skipif("util_numpy.test_without_numpy()")
+
+
+@numpyonly
+@pytest.mark.parametrize("use_c", [False, True])
+def test_bounds(use_c):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=5)
+        for kwargs in [{}, {"window": 2}, {"window": 5, "penalty": 0.5}, {"inner_dist": "euclidean"}]:
+            for l1, l2 in [(20, 20), (15, 22), (22, 15)]:
+                s1, s2 = np.cumsum(rng.randn(l1)), np.cumsum(rng.randn(l2))
+                d = dtw.distance(s1, s2, **kwargs)
+                lb_kim = lowerbounds.lb_kim(s1, s2, use_c=use_c, **kwargs)
+                lb_keogh = lowerbounds.lb_keogh(s1, s2, use_c=use_c, **kwargs)
+                lb_improved = lowerbounds.lb_improved(s1, s2, use_c=use_c, **kwargs)
+                lb_cascade = lowerbounds.lb_cascade(s1, s2, use_c=use_c, **kwargs)
+                assert lb_kim <= d + 1e-9
+                assert lb_keogh <= lb_improved + 1e-9
+                assert lb_improved <= d + 1e-9
+                assert lb_cascade == pytest.approx(max(lb_kim, lb_keogh, lb_improved,
+                                                       lowerbounds.lb_keogh(s2, s1, **kwargs)))
+
+
+@numpyonly
+@pytest.mark.parametrize("use_c", [False, True])
+def test_bounds_psi(use_c):
+    with util_numpy.test_uses_numpy() as np:
+        s1 = np.array([0., 0, 1, 2, 1, 0, 1, 0, 0])
+        s2 = np.array([5., 1, 2, 0, 0, 0, 0, 0, 5])
+        assert lowerbounds.lb_kim(s1, s2, use_c=use_c) == pytest.approx(math.sqrt(50))
+        assert lowerbounds.lb_cascade(s1, s2, psi=1, use_c=use_c) == 0
+
+
+@numpyonly
+def test_use_lb():
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=11)
+        s = np.cumsum(rng.randn(30, 40), axis=1)
+        for use_c in [False, True]:
+            d = dtw.distance(s[0], s[1], max_dist=3, use_c=use_c)
+            d_lb = dtw.distance(s[0], s[1], max_dist=3, use_lb=True, use_c=use_c)
+            assert d_lb == d
+        for window in [None, 4]:
+            m = dtw.distance_matrix_fast(s, max_dist=6, window=window, use_pruning=False)
+            m_lb = dtw.distance_matrix_fast(s, max_dist=6, window=window, use_pruning=False, use_lb=True)
+            np.testing.assert_array_equal(m_lb, m)
+            ds = dtw.distances_to_fast(s[0], s, k=3, window=window)
+            ds_lb = dtw.distances_to_fast(s[0], s, k=3, window=window, use_lb=True)
+            np.testing.assert_array_equal(ds_lb, ds)
+
+
+@numpyonly
+@pytest.mark.parametrize("use_c", [False, True])
+def test_envelope(use_c):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=3)
+        for l, l_other, window in [(20, 20, 3), (15, 22, 2), (22, 15, 4), (10, 10, None), (12, 9, 1)]:
+            s = rng.randn(l)
+            lower, upper = lowerbounds.envelope(s, l_other, window, use_c=use_c)
+            w = max(l, l_other) if window is None else window
+            for i in range(l_other):
+                imin = max(0, i - max(0, l_other - l) - w + 1)
+                imax = min(l, i + max(0, l - l_other) + w)
+                assert lower[i] == pytest.approx(np.min(s[imin:imax]))
+                assert upper[i] == pytest.approx(np.max(s[imin:imax]))
+
+
+@numpyonly
+@pytest.mark.parametrize("use_c", [False, True])
+def test_envelope_reuse(use_c):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=13)
+        s = np.cumsum(rng.randn(10, 25), axis=1)
+        container = util.SeriesContainer(s)
+        envs = container.envelopes(window=3, use_c=use_c)
+        assert container.envelopes(window=3, use_c=use_c) is envs
+        for i in range(1, len(s)):
+            for lb_fn in [lowerbounds.lb_keogh, lowerbounds.lb_improved, lowerbounds.lb_cascade]:
+                lb = lb_fn(s[0], s[i], window=3, use_c=use_c)
+                assert lb_fn(envs[0], envs[i], window=3, use_c=use_c) == pytest.approx(lb)
+        with pytest.raises(ValueError):
+            lowerbounds.lb_keogh(s[0], envs[1], window=4, use_c=use_c)
+
+
+@numpyonly
+@pytest.mark.parametrize("use_c", [False, True])
+def test_lb_tie(use_c):
+    """A pair with a distance equal to max_dist is not pruned by the lower bounds."""
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=29)
+        pairs = [(np.array([-1.534385503189925, 0.044013882488013516, -0.8480189748616552, 0.854359659464361,
+                            -0.6521039861419132, -0.015959036350558186, -0.9724878798951184]),
+                  np.array([-0.5743807537540518, 0.06489885774962173, -0.6657346835282738, 0.8246319493588529,
+                            -0.5005607015447348, 0.11728476502164081, -0.5811703073001028]), 2)]
+        # With window=1, LB_Keogh is equal to the DTW distance
+        pairs += [(s1, s2, 1) for s1, s2 in rng.randn(300, 2, 20)]
+        for s1, s2, window in pairs:
+            d = dtw.distance(s1, s2, window=window, use_c=use_c)
+            assert dtw.distance(s1, s2, window=window, max_dist=d, use_lb=True, use_c=use_c) == pytest.approx(d)
+            if use_c:
+                m = dtw.distance_matrix_fast([s1, s2], window=window, max_dist=d, use_lb=True, use_pruning=False)
+                assert m[0, 1] == pytest.approx(d)
+
+@numpyonly
+@pytest.mark.parametrize("use_c", [False, True])
+def test_eapruning(use_c):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=17)
+        for kwargs in [{}, {"window": 3}, {"window": 4, "penalty": 0.2}, {"psi": 2},
+                       {"inner_dist": "euclidean"}]:
+            for l1, l2 in [(20, 20), (15, 22), (22, 15)]:
+                s1, s2 = np.cumsum(rng.randn(l1)), np.cumsum(rng.randn(l2))
+                d = dtw.distance(s1, s2, use_c=use_c, **kwargs)
+                for max_dist in [d * 0.5, d, d * 1.5]:
+                    d_ref = dtw.distance(s1, s2, max_dist=max_dist, use_c=use_c, **kwargs)
+                    d_ea = dtw.distance(s1, s2, max_dist=max_dist, use_eapruning=True, use_c=use_c, **kwargs)
+                    assert d_ea == pytest.approx(d_ref)
+        if use_c:
+            s = np.cumsum(rng.randn(30, 40), axis=1)
+            ds = dtw.distances_to_fast(s[0], s, k=3, window=5)
+            ds_ea = dtw.distances_to_fast(s[0], s, k=3, window=5, use_eapruning=True)
+            np.testing.assert_array_equal(ds_ea, ds)
+
+
+
+
+@numpyonly
+@pytest.mark.parametrize("use_c", [False, True])
+def test_eapruning_psi_tolerance(use_c):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=23)
+        for _ in range(50):
+            s1, s2 = rng.randn(25), rng.randn(25)
+            for kwargs in [{"psi": (0, 3, 0, 3)}, {"psi": (0, 2, 0, 0)}, {"use_pruning": True}]:
+                d = dtw.distance(s1, s2, use_c=use_c, **kwargs)
+                max_dist = None if kwargs.get("use_pruning") else d
+                d_ea = dtw.distance(s1, s2, max_dist=max_dist, use_eapruning=True, use_c=use_c, **kwargs)
+                assert d_ea == pytest.approx(d)
+@numpyonly
+@pytest.mark.parametrize("use_c", [False, True])
+def test_eapruning_ndim(use_c):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=19)
+        for kwargs in [{}, {"window": 3}]:
+            s1, s2 = np.cumsum(rng.randn(20, 3), axis=0), np.cumsum(rng.randn(17, 3), axis=0)
+            d = dtw.distance(s1, s2, use_ndim=True, use_c=use_c, **kwargs)
+            for max_dist in [d * 0.5, d, d * 1.5]:
+                d_ref = dtw.distance(s1, s2, max_dist=max_dist, use_ndim=True, use_c=use_c, **kwargs)
+                d_ea = dtw.distance(s1, s2, max_dist=max_dist, use_eapruning=True, use_ndim=True,
+                                    use_c=use_c, **kwargs)
+                assert d_ea == pytest.approx(d_ref)
+
+
+if __name__ == "__main__":
+    test_bounds(use_c=True)
@@ -0,0 +1,138 @@
+import os
+import time
+import pytest
+from dtaidistance import dtw, matrixstore, worker, util_numpy
+
+
+numpyonly = pytest.mark.skipif("util_numpy.test_without_numpy()")
+
+
+@numpyonly
+@pytest.mark.parametrize("use_c", [False, True])
+def test_store_resume(tmp_path, use_c):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=7)
+        s = np.cumsum(rng.randn(23, 30), axis=1)
+        kwargs = {"window": 3, "max_dist": 8}
+        m_ref = dtw.distance_matrix(s, use_c=use_c, **kwargs)
+        path = str(tmp_path / "store")
+        store = matrixstore.distance_matrix(s, path, tile_size=5, use_c=use_c, **kwargs)
+        assert store.is_complete()
+        assert len(store.tiles()) == 15
+        np.testing.assert_allclose(store.to_matrix(), m_ref)
+        m_triu = store.to_matrix(only_triu=True)
+        idxs = np.triu_indices(len(s), k=1)
+        np.testing.assert_allclose(m_triu[idxs], m_ref[idxs])
+        assert np.all(np.isinf(m_triu[np.tril_indices(len(s))]))
+        for r in range(len(s)):
+            np.testing.assert_allclose(store[r], m_ref[r])
+
+        # Simulate an interrupted computation
+        os.remove(store.tile_path(1, 3))
+        store = matrixstore.DistanceMatrixStore.open(path)
+        assert store.pending_tiles() == [(1, 3)]
+        assert np.isnan(store.row(7)).sum() == 5
+        mtime = os.path.getmtime(store.tile_path(0, 0))
+        store = matrixstore.distance_matrix(s, path, tile_size=5, use_c=use_c, **kwargs)
+        assert store.is_complete()
+        assert os.path.getmtime(store.tile_path(0, 0)) == mtime
+        np.testing.assert_allclose(store.to_matrix(), m_ref)
+
+        # A store cannot be continued with other settings or series
+        with pytest.raises(ValueError):
+            matrixstore.distance_matrix(s, path, tile_size=5, use_c=use_c, window=2)
+        with pytest.raises(ValueError):
+            matrixstore.distance_matrix(s[:-1], path, tile_size=5, use_c=use_c, **kwargs)
+
+
+@numpyonly
+def test_store_resume_settings(tmp_path):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=9)
+        s = np.cumsum(rng.randn(12, 20), axis=1)
+        kwargs = {"window": np.int64(5), "band": tuple((max(0, i - 3), min(20, i + 4)) for i in range(20))}
+        m_ref = dtw.distance_matrix(s, **kwargs)
+        path = str(tmp_path / "store")
+        store = matrixstore.distance_matrix(s, path, tile_size=5, **kwargs)
+        np.testing.assert_allclose(store.to_matrix(), m_ref)
+        os.remove(store.tile_path(0, 1))
+        store = matrixstore.distance_matrix(s, path, tile_size=5, **kwargs)
+        assert store.is_complete()
+        np.testing.assert_allclose(store.to_matrix(), m_ref)
+
+
+@numpyonly
+def test_store_fast(tmp_path):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=8)
+        s = np.cumsum(rng.randn(12, 30), axis=1)
+        store = matrixstore.distance_matrix_fast(s, str(tmp_path / "store"), tile_size=5, window=3)
+        assert store.settings["use_pruning"]
+        np.testing.assert_allclose(store.to_matrix(), dtw.distance_matrix_fast(s, window=3))
+
+
+@numpyonly
+def test_workers(tmp_path):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=9)
+        s = [np.cumsum(rng.randn(rng.randint(20, 30))) for _ in range(17)]
+        m_ref = dtw.distance_matrix(s, window=4)
+        path = str(tmp_path / "store")
+        store = worker.distance_matrix(s, path, nb_workers=3, tile_size=4, window=4, poll_interval=0.1)
+        assert store.is_complete()
+        np.testing.assert_allclose(store.to_matrix(), m_ref)
+        assert os.listdir(os.path.join(path, worker.locks_dirname)) == []
+
+
+@numpyonly
+def test_worker_locks(tmp_path):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=9)
+        s = np.cumsum(rng.randn(10, 20), axis=1)
+        path = str(tmp_path / "store")
+        store = worker.prepare(s, path, tile_size=4)
+        assert worker.claim_tile(store, 0, 1)
+        assert not worker.claim_tile(store, 0, 1)
+        assert worker.work(path, max_tiles=2) == 2
+        assert store.pending_tiles() == [(0, 1), (1, 1), (1, 2), (2, 2)]
+        # A stale lock is taken over
+        os.utime(worker.lock_path(store, 0, 1), (0, 0))
+        assert not worker.claim_tile(store, 0, 1, lock_timeout=None)
+        assert worker.claim_tile(store, 0, 1, lock_timeout=60)
+        worker.release_tile(store, 0, 1)
+        assert worker.main([path, "-q"]) == 0
+        assert store.is_complete()
+        np.testing.assert_allclose(store.to_matrix(), dtw.distance_matrix(s))
+
+
+def test_worker_heartbeat(tmp_path):
+    fn = str(tmp_path / "tile_0_0.lock")
+    with open(fn, "w") as ofile:
+        ofile.write(worker.worker_id())
+    os.utime(fn, (0, 0))
+    with worker.LockHeartbeat(fn, interval=0.01):
+        time.sleep(0.2)
+    # The lock of a tile that is computed does not become stale
+    assert time.time() - os.path.getmtime(fn) < 60
+
+
+@numpyonly
+def test_worker_failure(tmp_path):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=9)
+        s = np.cumsum(rng.randn(10, 20), axis=1)
+        path = str(tmp_path / "store")
+        # A worker that fails raises an exception instead of waiting forever
+        with pytest.raises(Exception, match="Worker exited"):
+            worker.distance_matrix(s, path, nb_workers=1, tile_size=4, window=-1)
+        # A tile that stays locked by a crashed worker raises after the timeout
+        path = str(tmp_path / "store2")
+        store = worker.prepare(s, path, tile_size=4)
+        assert worker.claim_tile(store, 0, 1)
+        with pytest.raises(Exception, match="not complete"):
+            worker.distance_matrix(s, path, nb_workers=0, tile_size=4, lock_timeout=None,
+                                   poll_interval=0.1, timeout=0.5)
+        # The lock is taken over when it becomes stale
+        os.utime(worker.lock_path(store, 0, 1), (0, 0))
+        store = worker.distance_matrix(s, path, nb_workers=0, tile_size=4, poll_interval=0.1)
+        assert store.is_complete()
@@ -0,0 +1,43 @@
+import pickle
+import pytest
+from dtaidistance import dtw, sharedmem, util_numpy
+
+
+numpyonly = pytest.mark.skipif("util_numpy.test_without_numpy()")
+
+
+@numpyonly
+def test_shared_series():
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=3)
+        for s in [[rng.randn(l) for l in [5, 12, 7]],
+                  rng.randn(4, 9),
+                  rng.randn(4, 9).astype(np.float32),
+                  [rng.randn(l, 2) for l in [5, 12, 7]]]:
+            with sharedmem.SharedSeries.create(s) as shared:
+                assert len(shared) == len(s)
+                # Unpickling attaches to the same shared memory instead of copying the values
+                attached = pickle.loads(pickle.dumps(shared))
+                assert attached is not shared
+                for i in range(len(s)):
+                    assert attached[i].dtype == np.asarray(s[i]).dtype
+                    np.testing.assert_array_equal(attached[i], s[i])
+                shared[0].flat[0] = 100
+                assert attached[0].flat[0] == 100
+                attached.close()
+
+
+@numpyonly
+def test_distance_matrix_sharedmem():
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=5)
+        s = [np.cumsum(rng.randn(rng.randint(5, 40))) for _ in range(20)]
+        expected = dtw.distance_matrix(s, use_c=True, window=4)
+        control = dtw.DTWControl()
+        d = dtw.distance_matrix(s, parallel=True, use_c=True, window=4, backend="sharedmem",
+                                control=control)
+        np.testing.assert_allclose(d, expected)
+        assert control.done == control.total
+        out = np.zeros(len(s) * (len(s) - 1) // 2)
+        dtw.distance_matrix(s, parallel=True, use_c=True, window=4, backend="sharedmem", out=out)
+        np.testing.assert_allclose(out, dtw.distance_matrix(s, use_c=True, window=4, compact=True))
@@ -320,6 +320,19 @@ def test_dtw_localconcurrences_short():
             pdf.close()
 
 
+@numpyonly
+def test_dtw_localconcurrences_float32():
+    """The LoCo C library uses double precision, float32 series are converted."""
+    with util_numpy.test_uses_numpy() as np:
+        series1 = np.array([0., -1, -1, 0, 1, 2, 1, 0, 0, 0, 1, 3, 2, 1, 0, 0, 0, -1, 0])
+        series2 = np.array([0.4, -0.9, -1.3, 1, 0.1, 2, 1, 0, 0, 10, 8, 3, 2, 1, 0, 0, 0, -1, 0])
+        kwargs = {"gamma": 1, "tau": 0.5, "delta": -1, "delta_factor": 0.1, "penalty": 0}
+        lc = local_concurrences(series1, series2, use_c=True, **kwargs)
+        lc2 = local_concurrences(series1.astype(np.float32), series2.astype(np.float32),
+                                 use_c=True, **kwargs)
+        np.testing.assert_allclose(lc.wp_slice_ts(), lc2.wp_slice_ts(), rtol=1e-5)
+
+
 @numpyonly
 def test_dtw_localconcurrences_short2():
     with util_numpy.test_uses_numpy() as np:
@@ -1,3 +1,4 @@
+import math
 import pytest
 import os
 import random
@@ -349,6 +350,72 @@ def test_subsequence():
             [np.inf,1.421,1.005,1.421,2.002,1.000,-1,-1,-1,-1,-1,-1], decimal=3)
 
 
+@numpyonly
+@pytest.mark.parametrize("kwargs", [{}, {"window": 4}, {"penalty": 0.5}, {"max_step": 1.2}])
+def test_warping_path_band(kwargs):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=7)
+        s1, s2 = np.cumsum(rng.randn(30)), np.cumsum(rng.randn(25))
+        band = [(max(0, i - 5), min(25, i + 3)) for i in range(30)]
+        band[-1] = (band[-1][0], 25)
+        # The C version only stores the cells in the band
+        path, d = dtw.warping_path_fast(s1, s2, include_distance=True, band=band, **kwargs)
+        path_py, d_py = dtw.warping_path(s1, s2, include_distance=True, band=band, **kwargs)
+        assert d == pytest.approx(d_py)
+        assert d == pytest.approx(dtw.distance_fast(s1, s2, band=band, **kwargs))
+        if d < float('inf'):
+            assert path == path_py
+            assert all(band[i][0] <= j < band[i][1] for i, j in path)
+
+
+@numpyonly
+@pytest.mark.parametrize("use_c", [False, True])
+def test_distance_approx(use_c):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=3)
+        for l1, l2 in [(200, 200), (150, 230), (9, 5)]:
+            s1, s2 = np.cumsum(rng.randn(l1)), np.cumsum(rng.randn(l2))
+            d_e = dtw.distance(s1, s2)
+            d, path = dtw.distance_approx(s1, s2, radius=2, include_path=True, use_c=use_c)
+            assert d >= d_e - 1e-9
+            assert path[0] == (0, 0) and path[-1] == (l1 - 1, l2 - 1)
+            assert d == pytest.approx(math.sqrt(sum((s1[i] - s2[j])**2 for i, j in path)))
+            d_c = dtw.distance_approx(s1, s2, radius=2, use_c=not use_c)
+            assert d_c == pytest.approx(d)
+            d = dtw.distance_approx(s1, s2, radius=max(l1, l2), use_c=use_c)
+            assert d == pytest.approx(d_e)
+        with pytest.raises(ValueError):
+            dtw.distance_approx(s1, s2, radius=2, window=3, use_c=use_c)
+        with pytest.raises(ValueError):
+            dtw.distance_approx(s1, s2, radius=2, band=[(0, l2)] * l1, use_c=use_c)
+        # A radius of zero only uses the projected path
+        assert dtw.distance_approx(s1, s2, radius=0, use_c=use_c) >= d_e - 1e-9
+        with pytest.raises(ValueError, match="non-negative"):
+            dtw.distance_approx(s1, s2, radius=-1, use_c=use_c)
+        assert dtw.distance_approx(s1[:0], s2, use_c=use_c) == float('inf')
+        assert dtw.distance_approx(s1, s2[:0], include_path=True, use_c=use_c) == (float('inf'), [])
+
+
+@numpyonly
+@pytest.mark.parametrize("use_c", [False, True])
+def test_distance_approx_max_step(use_c):
+    with util_numpy.test_uses_numpy() as np:
+        rng = np.random.RandomState(seed=5)
+        nb_inf = 0
+        for _ in range(20):
+            s1, s2 = rng.randn(30), rng.randn(25)
+            d, path = dtw.distance_approx(s1, s2, radius=1, include_path=True, max_step=1.5, use_c=use_c)
+            d_c = dtw.distance_approx(s1, s2, radius=1, max_step=1.5, use_c=not use_c)
+            assert d == pytest.approx(d_c)
+            if d == float('inf'):
+                nb_inf += 1
+                assert path == []
+        assert nb_inf > 0
+        d, path = dtw.distance_approx(s1, s2, radius=30, include_path=True, max_step=0.01, use_c=use_c)
+        assert d == float('inf')
+        assert path == []
+
+
 if __name__ == "__main__":
     with util_numpy.test_uses_numpy() as np:
         np.set_printoptions(precision=2, linewidth=120)